@@ -0,0 +1,105 @@
+"""Cache for AVUs of iRODS collections.
+
+AVU reads on the bag and download path (``bag_modified``, ``metadata_dirty``, ``isPublic``,
+``quotaUserName``, ...) each cost an ``imeta ls`` round trip.  This module caches them
+keyed by absolute collection path and attribute name at two levels:
+
+* a request-scoped store that lives from ``request_started`` to ``request_finished``, so
+  repeated reads inside one request cost a single round trip;
+* an optional shared store in the Django cache, enabled by setting
+  ``IRODS_AVU_CACHE_TIMEOUT`` to a positive number of seconds when the cache backend is
+  shared between processes (see ``hs_core.shared_cache``).
+
+Only the attributes named in ``IRODS_AVU_CACHE_ATTRIBUTES`` are cached; in particular the
+quota usage AVUs, which iRODS rules update behind our back, are never cached.  Writers
+must call ``invalidate`` for every collection whose AVUs they change, after the change;
+``IrodsStorage`` does this in ``setAVU`` and ``removeAVU``.
+"""
+
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started, request_finished
+
+from hs_core import shared_cache
+
+DEFAULT_CACHED_ATTRIBUTES = ('bag_modified', 'metadata_dirty', 'isPublic', 'quotaUserName',
+                             'resourceType')
+
+# returned by get() when an attribute is not cached; None is a valid cached value
+MISSING = object()
+
+_local = threading.local()
+
+
+def _request_store():
+    """Return the AVU store of the current request, or None outside of a request."""
+    return getattr(_local, 'store', None)
+
+
+def _begin_request(**kwargs):
+    _local.store = {}
+
+
+def _end_request(**kwargs):
+    _local.store = None
+
+
+request_started.connect(_begin_request, dispatch_uid='django_irods_avu_cache_begin')
+request_finished.connect(_end_request, dispatch_uid='django_irods_avu_cache_end')
+
+
+def cached_attributes():
+    return getattr(settings, 'IRODS_AVU_CACHE_ATTRIBUTES', DEFAULT_CACHED_ATTRIBUTES)
+
+
+def _shared_timeout():
+    # stale AVUs such as bag_modified must not be served across web and celery processes
+    return shared_cache.timeout('IRODS_AVU_CACHE_TIMEOUT')
+
+
+def _shared_key(path):
+    return u'irods_avu:{}'.format(path)
+
+
+def get(path, attribute):
+    """Return the cached value of attribute on collection path, or MISSING."""
+    if attribute not in cached_attributes():
+        return MISSING
+    store = _request_store()
+    if store is not None and attribute in store.get(path, {}):
+        return store[path][attribute]
+    if _shared_timeout() > 0:
+        avus = cache.get(_shared_key(path))
+        if avus is not None and attribute in avus:
+            if store is not None:
+                store.setdefault(path, {}).update(avus)
+            return avus[attribute]
+    return MISSING
+
+
+def set_many(path, avus):
+    """Cache a dict of {attribute: value} for collection path.
+
+    Attributes that are not cacheable are dropped.
+    """
+    avus = dict((k, v) for k, v in avus.items() if k in cached_attributes())
+    if not avus:
+        return
+    store = _request_store()
+    if store is not None:
+        store.setdefault(path, {}).update(avus)
+    if _shared_timeout() > 0:
+        shared = cache.get(_shared_key(path)) or {}
+        shared.update(avus)
+        cache.set(_shared_key(path), shared, _shared_timeout())
+
+
+def invalidate(path):
+    """Forget every cached AVU of collection path."""
+    store = _request_store()
+    if store is not None:
+        store.pop(path, None)
+    if _shared_timeout() > 0:
+        cache.delete(_shared_key(path))
@@ -0,0 +1,340 @@
+"""IrodsStorage API over a local directory tree, for running HydroShare without iRODS.
+
+``FileSystemStorage`` maps each logical iRODS path onto a directory tree, so that
+``/hydroshareZone/home/wwwHydroProxy/{res_id}/data/contents/a.csv`` is stored at
+``{IRODS_FS_STORAGE_ROOT}/hydroshareZone/home/wwwHydroProxy/{res_id}/data/contents/a.csv``;
+relative names are relative to the home collection of IRODS_USERNAME, as they are for
+IrodsStorage.  Collection AVUs are kept in a sidecar tree of JSON files under
+``{IRODS_FS_STORAGE_ROOT}/.avus``.
+
+Enable it in local_settings.py with::
+
+    IRODS_STORAGE_BACKEND = 'filesystem'
+    IRODS_FS_STORAGE_ROOT = '/var/lib/hydroshare/storage'
+
+This is meant for development and for benchmarking Django apart from iRODS: there is no
+quota accounting, iRODS tickets are not available, and federated resources still use
+iRODS.  To read local zone files straight from an NFS-mounted vault while keeping iRODS
+for everything else, set IRODS_VAULT_ROOT instead; see IrodsStorage.
+"""
+
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import zipfile
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.deconstruct import deconstructible
+
+from django_irods.icommands import SessionException, IRodsEnv
+from django_irods.storage import IrodsStorage
+
+AVU_DIR = '.avus'
+
+BAGIT_DATA_RE = re.compile(r"^\*BAGITDATA='(.*)'$")
+
+
+def _md5(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _not_found(name):
+    return SessionException(4, '', "{} does not exist".format(name))
+
+
+# the same path in migrations whichever backend is configured
+@deconstructible(path='django_irods.storage.IrodsStorage')
+class FileSystemStorage(IrodsStorage):
+    """IrodsStorage that keeps data objects and collections in a local directory tree."""
+
+    def __init__(self, option=None, root=None):
+        self.root = root or getattr(settings, 'IRODS_FS_STORAGE_ROOT', '/tmp/hydroshare_storage')
+        self.session = None
+        self.set_user_session(username=settings.IRODS_USERNAME)
+
+    def set_user_session(self, username=None, password=None, host=settings.IRODS_HOST,
+                         port=settings.IRODS_PORT, def_res=None, zone=settings.IRODS_ZONE,
+                         userid=0, sess_id=None):
+        homedir = "/" + zone + "/home/" + username
+        self.environment = IRodsEnv(pk=userid, host=host, port=port, def_res=def_res,
+                                    home_coll=homedir, cwd=homedir, username=username,
+                                    zone=zone, auth=password, irods_default_hash_scheme='MD5')
+
+    def set_fed_zone_session(self):
+        pass
+
+    def delete_user_session(self):
+        pass
+
+    def _local_path(self, name):
+        """Return the path in the local tree of logical path name."""
+        return os.path.join(self.root, self._abspath(name).lstrip('/'))
+
+    def _avu_path(self, name):
+        return os.path.join(self.root, AVU_DIR, self._abspath(name).lstrip('/') + '.json')
+
+    @staticmethod
+    def _makedirs(path):
+        try:
+            os.makedirs(path)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+
+    def _remove(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.remove(path)
+
+    def _copy(self, src, dest):
+        if os.path.isdir(src):
+            if os.path.isdir(dest):
+                # like icp -r, copy the collection into an existing collection
+                dest = os.path.join(dest, os.path.basename(src.rstrip('/')))
+            self._remove(dest)
+            shutil.copytree(src, dest)
+        else:
+            if os.path.isdir(dest):
+                dest = os.path.join(dest, os.path.basename(src))
+            shutil.copyfile(src, dest)
+
+    # files and collections
+
+    def getFile(self, src_name, dest_name):
+        src = self._local_path(src_name)
+        if not os.path.isfile(src):
+            raise _not_found(src_name)
+        shutil.copyfile(src, dest_name)
+
+    def runBagitRule(self, rule_name, input_path, input_resource):
+        """Write bagit.txt, manifest-md5.txt and tagmanifest-md5.txt as the iRODS rule does.
+
+        :param input_path: "*BAGITDATA='{collection path}'", as passed to the iRODS rule
+        """
+        match = BAGIT_DATA_RE.match(input_path)
+        if match is None:
+            raise SessionException(-1, '', "unexpected bagit rule input {}".format(input_path))
+        bag_dir = self._local_path(match.group(1))
+        with open(os.path.join(bag_dir, 'bagit.txt'), 'w') as f:
+            f.write("BagIt-Version: 0.96\nTag-File-Character-Encoding: UTF-8\n")
+        manifest = []
+        for dirpath, _, filenames in os.walk(os.path.join(bag_dir, 'data')):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                manifest.append("{}    {}\n".format(_md5(path), os.path.relpath(path, bag_dir)))
+        with open(os.path.join(bag_dir, 'manifest-md5.txt'), 'w') as f:
+            f.writelines(manifest)
+        tag_manifest = []
+        for filename in sorted(os.listdir(bag_dir)):
+            path = os.path.join(bag_dir, filename)
+            if os.path.isfile(path) and filename != 'tagmanifest-md5.txt':
+                tag_manifest.append("{}    {}\n".format(_md5(path), filename))
+        with open(os.path.join(bag_dir, 'tagmanifest-md5.txt'), 'w') as f:
+            f.writelines(tag_manifest)
+
+    def create_folder(self, name):
+        self._makedirs(self._local_path(name))
+
+    def zipup(self, in_name, out_name):
+        """Zip collection in_name into out_name; entries start with the collection name."""
+        src = self._local_path(in_name).rstrip('/')
+        if not os.path.isdir(src):
+            raise _not_found(in_name)
+        dest = self._local_path(out_name)
+        self._makedirs(os.path.dirname(dest))
+        parent = os.path.dirname(src)
+        with zipfile.ZipFile(dest, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+            for dirpath, dirnames, filenames in os.walk(src):
+                if not filenames and not dirnames:
+                    zf.write(dirpath, os.path.relpath(dirpath, parent))
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    zf.write(path, os.path.relpath(path, parent))
+
+    def unzip(self, zip_file_path, unzipped_folder=None):
+        abs_path = os.path.dirname(zip_file_path)
+        if not unzipped_folder:
+            unzipped_folder = os.path.splitext(os.path.basename(zip_file_path))[0].strip()
+
+        unzipped_folder = self._get_nonexistant_path(os.path.join(abs_path, unzipped_folder))
+        src = self._local_path(zip_file_path)
+        if not os.path.isfile(src):
+            raise _not_found(zip_file_path)
+        with zipfile.ZipFile(src) as zf:
+            zf.extractall(self._local_path(unzipped_folder))
+        return unzipped_folder
+
+    def copyFiles(self, src_name, dest_name, ires=None):
+        if src_name and dest_name:
+            src = self._local_path(src_name)
+            if not os.path.exists(src):
+                raise _not_found(src_name)
+            dest = self._local_path(dest_name)
+            self._makedirs(os.path.dirname(dest))
+            self._copy(src, dest)
+
+    def moveFile(self, src_name, dest_name):
+        if src_name and dest_name:
+            src = self._local_path(src_name)
+            if not os.path.exists(src):
+                raise _not_found(src_name)
+            dest = self._local_path(dest_name)
+            if os.path.isdir(dest):
+                # like imv, move into an existing collection
+                dest_name = os.path.join(dest_name, os.path.basename(src_name.rstrip('/')))
+                dest = self._local_path(dest_name)
+            self._makedirs(os.path.dirname(dest))
+            os.rename(src, dest)
+            if os.path.exists(self._avu_path(src_name)):
+                self._makedirs(os.path.dirname(self._avu_path(dest_name)))
+                os.rename(self._avu_path(src_name), self._avu_path(dest_name))
+
+    def saveFile(self, from_name, to_name, create_directory=False, data_type_str=''):
+        dest = self._local_path(to_name)
+        if create_directory:
+            self._makedirs(os.path.dirname(dest) if not to_name.endswith('/') else dest)
+        if from_name:
+            if not os.path.isdir(os.path.dirname(dest)):
+                raise _not_found(os.path.dirname(to_name))
+            shutil.copyfile(from_name, dest)
+
+    def _open(self, name, mode='rb'):
+        path = self._local_path(name)
+        if not os.path.isfile(path):
+            raise _not_found(name)
+        return open(path, mode)
+
+    def _save(self, name, content):
+        path = self._local_path(name)
+        self._makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            for chunk in content.chunks():
+                f.write(chunk)
+        return name
+
+    def delete(self, name):
+        self._remove(self._local_path(name))
+        self._remove(self._avu_path(name))
+
+    def exists(self, name):
+        return os.path.exists(self._local_path(name))
+
+    def _ils(self, path, recursive=False):
+        """Return the listing of collection path in the layout of ils -l, or ils -lr."""
+        local_path = self._local_path(path)
+        if not os.path.isdir(local_path):
+            raise _not_found(path)
+        collection = self._abspath(path).rstrip('/')
+        owner = self.environment.username[:12]
+        lines = [collection + ':']
+        subcollections = []
+        for name in sorted(os.listdir(local_path)):
+            full_path = os.path.join(local_path, name)
+            if os.path.isdir(full_path):
+                subcollections.append(name)
+            else:
+                modified = datetime.fromtimestamp(os.path.getmtime(full_path))
+                lines.append("  {:<12} {:>6} {} {:>12} {} & {}".format(
+                    owner, 0, 'fsResc', os.path.getsize(full_path),
+                    modified.strftime('%Y-%m-%d.%H:%M'), name))
+        for name in subcollections:
+            lines.append("  C- {}/{}".format(collection, name))
+        listing = "\n".join(lines) + "\n"
+        if recursive:
+            for name in subcollections:
+                listing += self._ils(os.path.join(collection, name), recursive=True)
+        return listing
+
+    def ils_l(self, path):
+        return self._ils(path)
+
+    def ils_lr(self, path):
+        return self._ils(path, recursive=True)
+
+    def listdir(self, path):
+        local_path = self._local_path(path)
+        if not os.path.isdir(local_path):
+            raise _not_found(path)
+        listing = ([], [], [])
+        names = sorted(os.listdir(local_path))
+        for name in names:
+            if os.path.isdir(os.path.join(local_path, name)):
+                listing[0].append(name)
+                listing[2].append("-1")
+        for name in names:
+            full_path = os.path.join(local_path, name)
+            if not os.path.isdir(full_path):
+                listing[1].append(name)
+                listing[2].append(str(os.path.getsize(full_path)))
+        return listing
+
+    def file_sizes(self, path):
+        local_path = self._local_path(path)
+        if not os.path.isdir(local_path):
+            raise _not_found(path)
+        sizes = {}
+        for dirpath, _, filenames in os.walk(local_path):
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                name = os.path.join(path.rstrip('/'), os.path.relpath(full_path, local_path))
+                sizes[name] = os.path.getsize(full_path)
+        return sizes
+
+    def size(self, name):
+        path = self._local_path(name)
+        if not os.path.isfile(path):
+            raise _not_found(name)
+        return os.path.getsize(path)
+
+    # AVUs, stored as one JSON object of {attribute: value} per collection
+
+    def _update_avus(self, name, update):
+        path = self._avu_path(name)
+        self._makedirs(os.path.dirname(path))
+        with open(path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            avus = self._read_avus(name)
+            update(avus)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(avus, f)
+            os.rename(path + '.tmp', path)
+
+    def _read_avus(self, name):
+        try:
+            with open(self._avu_path(name)) as f:
+                return json.load(f)
+        except IOError as ex:
+            if ex.errno == errno.ENOENT:
+                return {}
+            raise
+
+    def setAVU(self, name, attName, attVal, attUnit=None):
+        if not os.path.isdir(self._local_path(name)):
+            raise _not_found(name)
+        self._update_avus(name, lambda avus: avus.update({attName: str(attVal)}))
+
+    def removeAVU(self, name, attName, attVal):
+        def remove(avus):
+            if avus.get(attName) == attVal:
+                del avus[attName]
+        self._update_avus(name, remove)
+
+    def getAVU(self, name, attName):
+        if not os.path.isdir(self._local_path(name)):
+            raise _not_found(name)
+        return self._read_avus(name).get(attName)
+
+    def getAVUs(self, name):
+        if not os.path.isdir(self._local_path(name)):
+            raise _not_found(name)
+        return self._read_avus(name)
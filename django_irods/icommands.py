@@ -257,8 +257,20 @@ class Session(object):
             return stdout, stderr
 
 
+def get_session_class():
+    """Returns the Session implementation selected by settings.IRODS_SESSION_BACKEND.
+
+    'icommands' (the default) runs every command as a subprocess; 'native' serves the
+    common commands over pooled connections and falls back to subprocesses otherwise.
+    """
+    if getattr(settings, 'IRODS_SESSION_BACKEND', 'icommands') == 'native':
+        from django_irods.native import NativeSession
+        return NativeSession
+    return Session
+
+
 if getattr(settings, 'IRODS_GLOBAL_SESSION', False) and getattr(settings, 'USE_IRODS', False):
-    GLOBAL_SESSION = Session()
+    GLOBAL_SESSION = get_session_class()()
     GLOBAL_ENVIRONMENT = GLOBAL_SESSION.create_environment()
     GLOBAL_SESSION.run('iinit', None, GLOBAL_ENVIRONMENT.auth)
 else:
@@ -0,0 +1,519 @@
+"""Native iRODS session backend with a bounded, reusable connection pool.
+
+``NativeSession`` is a drop-in replacement for ``icommands.Session``.  The icommands
+used on the hot path of ``IrodsStorage`` (``ils``, ``imeta``, ``imkdir``, ``iput``,
+``iget``, ``irm``, ``imv`` and ``icp``) are served over pooled python-irodsclient
+connections and their output is rendered in the same format the icommands produce,
+so existing callers that parse ``stdout`` keep working unchanged.  Any other
+icommand, any unsupported option, and any connection-level failure falls back to
+the subprocess path of ``icommands.Session``.
+
+Enable it in local_settings.py with::
+
+    IRODS_SESSION_BACKEND = 'native'
+    IRODS_POOL_MAX_SIZE = 4             # connections per zone, per worker process
+    IRODS_POOL_IDLE_SECONDS = 300       # evict connections idle for longer than this
+    IRODS_POOL_CHECK_SECONDS = 60       # health check connections idle for longer than this
+    IRODS_POOL_ACQUIRE_TIMEOUT = 5      # seconds to wait for a free connection
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from django_irods.icommands import Session, SessionException, IRodsEnv
+
+try:
+    from irods.session import iRODSSession
+    from irods.models import Collection
+    from irods.meta import iRODSMeta
+    from irods.exception import CollectionDoesNotExist, DataObjectDoesNotExist, \
+        CAT_NO_ROWS_FOUND
+    from irods import keywords as kw
+    NATIVE_AVAILABLE = True
+except ImportError:
+    NATIVE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ILS_TIME_FORMAT = '%Y-%m-%d.%H:%M'
+
+# commands that may have taken effect when their native handler fails, and that would
+# fail or act twice if run again with icommands
+NOT_REPEATABLE = ('imv', 'irm', 'iput')
+
+
+class PoolExhausted(Exception):
+    """Raised when no pooled connection becomes available within the acquire timeout."""
+    pass
+
+
+class ObjectNotFound(Exception):
+    """Raised by the native handlers when a logical path does not exist in iRODS."""
+    pass
+
+
+class ConnectionPool(object):
+    """A bounded pool of authenticated iRODS sessions for one (host, port, user, zone).
+
+    Pools are per process: a pool that notices it has been inherited across a fork
+    drops the connections of its parent and starts over.
+    """
+
+    def __init__(self, host, port, username, password, zone, max_size=4, idle_seconds=300,
+                 check_seconds=60, acquire_timeout=5):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.zone = zone
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.check_seconds = check_seconds
+        self.acquire_timeout = acquire_timeout
+        self._idle = []  # list of (connection, time of last release)
+        self._in_use = 0
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        return iRODSSession(host=self.host, port=self.port, user=self.username,
+                            password=self.password, zone=self.zone)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.cleanup()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _healthy(conn):
+        try:
+            # server_version checks out a socket and exchanges a message with the server
+            conn.server_version
+            return True
+        except Exception:
+            return False
+
+    def _reset_after_fork(self):
+        # must be called while holding self._cond
+        if self._pid != os.getpid():
+            # sockets inherited from the parent must not be shared; forget them
+            self._idle = []
+            self._in_use = 0
+            self._pid = os.getpid()
+
+    def _evict_idle(self):
+        # must be called while holding self._cond
+        now = time.time()
+        keep = []
+        for conn, released in self._idle:
+            if now - released > self.idle_seconds:
+                self._close(conn)
+            else:
+                keep.append((conn, released))
+        self._idle = keep
+
+    def acquire(self):
+        """Check out a connection, creating one if the pool is below its size limit."""
+        deadline = time.time() + self.acquire_timeout
+        while True:
+            candidate = None
+            with self._cond:
+                self._reset_after_fork()
+                self._evict_idle()
+                while not self._idle and self._in_use >= self.max_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolExhausted("no free iRODS connection for {}@{}".format(
+                            self.username, self.zone))
+                    self._cond.wait(remaining)
+                self._in_use += 1
+                if self._idle:
+                    candidate = self._idle.pop()
+
+            if candidate is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self.release(None, discard=True)
+                    raise
+
+            conn, released = candidate
+            if time.time() - released <= self.check_seconds or self._healthy(conn):
+                return conn
+            # stale connection: throw it away and try again
+            self.release(conn, discard=True)
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it if discard is True."""
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._in_use = max(self._in_use - 1, 0)
+            if conn is not None:
+                if discard or len(self._idle) >= self.max_size:
+                    self._close(conn)
+                else:
+                    self._idle.append((conn, time.time()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except (ObjectNotFound, NotImplementedError, SessionException):
+            # logical errors leave the connection in a good state
+            self.release(conn)
+            raise
+        except Exception:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        """Close all idle connections."""
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._idle = []
+
+    @property
+    def stats(self):
+        with self._cond:
+            return {'in_use': self._in_use, 'idle': len(self._idle), 'max_size': self.max_size}
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(host, port, username, password, zone):
+    """Return the process-wide pool for a zone login, creating it on first use."""
+    key = (host, str(port), username, zone)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None or pool.password != password:
+            if pool is not None:
+                pool.close()
+            pool = ConnectionPool(
+                host, port, username, password, zone,
+                max_size=getattr(settings, 'IRODS_POOL_MAX_SIZE', 4),
+                idle_seconds=getattr(settings, 'IRODS_POOL_IDLE_SECONDS', 300),
+                check_seconds=getattr(settings, 'IRODS_POOL_CHECK_SECONDS', 60),
+                acquire_timeout=getattr(settings, 'IRODS_POOL_ACQUIRE_TIMEOUT', 5))
+            _POOLS[key] = pool
+        return pool
+
+
+def close_all_pools():
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.close()
+        _POOLS.clear()
+
+
+def _utf8(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def format_ils_data_object(obj):
+    """Render a data object the way ``ils -l`` does, one line per replica."""
+    lines = []
+    modified = obj.modify_time.strftime(ILS_TIME_FORMAT) if obj.modify_time else ''
+    replicas = getattr(obj, 'replicas', None) or [None]
+    for replica in replicas:
+        number = replica.number if replica is not None else 0
+        resource = replica.resource_name if replica is not None else ''
+        lines.append("  {owner} {number:>6} {resource} {size:>12} {modified} & {name}".format(
+            owner=_utf8(obj.owner_name), number=number, resource=_utf8(resource),
+            size=obj.size, modified=modified, name=_utf8(obj.name)))
+    return "\n".join(lines) + "\n"
+
+
+def format_ils_collection(coll, long_format=True):
+    """Render a collection listing the way ``ils [-l]`` does."""
+    out = [_utf8(coll.path) + ":\n"]
+    for obj in coll.data_objects:
+        if long_format:
+            out.append(format_ils_data_object(obj))
+        else:
+            out.append("  " + _utf8(obj.name) + "\n")
+    for sub in coll.subcollections:
+        out.append("  C- " + _utf8(sub.path) + "\n")
+    return "".join(out)
+
+
+def format_imeta_ls(path, avus):
+    """Render a list of (name, value, units) the way ``imeta ls -C`` does."""
+    out = ["AVUs defined for collection {}:".format(_utf8(path))]
+    if not avus:
+        out.append("None")
+    for i, (name, value, units) in enumerate(avus):
+        if i:
+            out.append("----")
+        out.append("attribute: " + _utf8(name))
+        out.append("value: " + _utf8(value))
+        out.append("units: " + (_utf8(units) if units else ''))
+    return "\n".join(out) + "\n"
+
+
+def _split_options(args, flags_with_values=()):
+    """Split icommand arguments into ({flag: value}, [positional]).
+
+    Returns None when an option appears that is not understood, so that the caller
+    can fall back to the subprocess path.
+    """
+    options = {}
+    positional = []
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg.startswith('-') and len(arg) > 1:
+            if arg in flags_with_values:
+                if not args:
+                    return None
+                options[arg] = args.pop(0)
+            else:
+                for flag in arg[1:]:
+                    options['-' + flag] = True
+        else:
+            positional.append(arg)
+    return options, positional
+
+
+class NativeSession(Session):
+    """An icommands-compatible session that serves common icommands over pooled
+    native connections and falls back to subprocesses for everything else.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(NativeSession, self).__init__(*args, **kwargs)
+        self.environment = None
+        self._password = None
+        self._handlers = {
+            'ils': self._ils,
+            'imeta': self._imeta,
+            'imkdir': self._imkdir,
+            'iput': self._iput,
+            'iget': self._iget,
+            'irm': self._irm,
+            'imv': self._imv,
+            'icp': self._icp,
+        }
+
+    def create_environment(self, myEnv=None):
+        self.environment = super(NativeSession, self).create_environment(myEnv)
+        return self.environment
+
+    def _load_environment(self):
+        """Recover connection parameters from an existing irods_environment.json."""
+        env_path = os.path.join(self.session_path, "irods_environment.json")
+        with open(env_path) as env_file:
+            env = json.load(env_file)
+        return IRodsEnv(pk=-1, host=env['irods_host'], port=env['irods_port'],
+                        def_res=env.get('irods_default_resource'),
+                        home_coll=env.get('irods_home'), cwd=env.get('irods_cwd'),
+                        username=env['irods_user_name'], zone=env['irods_zone_name'],
+                        auth=self._password, irods_default_hash_scheme='MD5')
+
+    @property
+    def pool(self):
+        if self.environment is None and self.session_file_exists():
+            self.environment = self._load_environment()
+        env = self.environment
+        password = self._password or (env.auth if env else None)
+        if env is None or not password:
+            return None
+        return get_pool(env.host, env.port, env.username, password, env.zone)
+
+    def _abspath(self, path):
+        if path.startswith('/'):
+            return path.rstrip('/') or '/'
+        cwd = self.environment.cwd or self.environment.home_coll
+        return os.path.join(cwd, path).rstrip('/')
+
+    @staticmethod
+    def repeatable(icommand, args):
+        """Whether icommand may run again with icommands after its native handler failed."""
+        if icommand == 'imeta':
+            return not args or args[0] != 'rm'
+        return icommand not in NOT_REPEATABLE
+
+    def run(self, icommand, data=None, *args):
+        if icommand == 'iinit':
+            # keep the subprocess environment authenticated for fallback commands
+            result = super(NativeSession, self).run(icommand, data, *args)
+            self._password = args[0] if args else None
+            return result
+
+        handler = self._handlers.get(icommand)
+        pool = self.pool if (handler and NATIVE_AVAILABLE and data is None) else None
+        if pool is None:
+            return super(NativeSession, self).run(icommand, data, *args)
+
+        started = False
+        try:
+            with pool.connection() as conn:
+                started = True
+                result = handler(conn, *args)
+        except ObjectNotFound as ex:
+            raise SessionException(4, '', str(ex))
+        except (PoolExhausted, NotImplementedError) as ex:
+            if __debug__:
+                logger.debug("native {} unavailable ({}); using icommands".format(icommand, ex))
+            return super(NativeSession, self).run(icommand, data, *args)
+        except SessionException:
+            raise
+        except Exception as ex:
+            if started and not self.repeatable(icommand, args):
+                raise SessionException(-1, '', "native {} failed: {}".format(icommand, ex))
+            logger.warn("native {} failed ({}); retrying with icommands".format(icommand, ex))
+            return super(NativeSession, self).run(icommand, data, *args)
+        return result, ''
+
+    # native handlers: each returns stdout, raises ObjectNotFound for missing paths and
+    # NotImplementedError for anything it does not handle
+
+    def _get_object(self, conn, path):
+        """Return ('collection', coll) or ('dataobject', obj) for a logical path."""
+        try:
+            return 'collection', conn.collections.get(path)
+        except CollectionDoesNotExist:
+            pass
+        try:
+            return 'dataobject', conn.data_objects.get(path)
+        except (DataObjectDoesNotExist, CollectionDoesNotExist):
+            raise ObjectNotFound("{} does not exist".format(path))
+
+    def _ils(self, conn, *args):
+        parsed = _split_options(args)
+        if parsed is None or set(parsed[0]) - {'-l', '-r'} or len(parsed[1]) > 1:
+            raise NotImplementedError("ils options")
+        options, positional = parsed
+        path = self._abspath(positional[0] if positional else '')
+        kind, item = self._get_object(conn, path)
+        if kind == 'collection':
+            if '-r' in options:
+                return "".join(format_ils_collection(coll, long_format='-l' in options)
+                               for coll, _, _ in item.walk())
+            return format_ils_collection(item, long_format='-l' in options)
+        if '-l' in options:
+            return format_ils_data_object(item)
+        return "  " + _utf8(item.path) + "\n"
+
+    def _imeta(self, conn, *args):
+        if len(args) < 3 or args[1] != '-C':
+            raise NotImplementedError("imeta only supports collections")
+        subcommand, path, rest = args[0], self._abspath(args[2]), args[3:]
+        if subcommand == 'ls':
+            if len(rest) > 1:
+                raise NotImplementedError("imeta ls options")
+            try:
+                avus = conn.metadata.get(Collection, path)
+            except (CollectionDoesNotExist, CAT_NO_ROWS_FOUND):
+                raise ObjectNotFound("{} does not exist".format(path))
+            if rest:
+                avus = [m for m in avus if m.name == rest[0]]
+            return format_imeta_ls(path, [(m.name, m.value, m.units) for m in avus])
+        if subcommand in ('set', 'rm') and len(rest) in (2, 3):
+            meta = iRODSMeta(*rest)
+            try:
+                coll = conn.collections.get(path)
+            except CollectionDoesNotExist:
+                raise ObjectNotFound("{} does not exist".format(path))
+            if subcommand == 'set':
+                coll.metadata[meta.name] = meta
+            else:
+                coll.metadata.remove(meta)
+            return ''
+        raise NotImplementedError("imeta {}".format(subcommand))
+
+    def _imkdir(self, conn, *args):
+        parsed = _split_options(args)
+        if parsed is None or set(parsed[0]) - {'-p'} or len(parsed[1]) != 1:
+            raise NotImplementedError("imkdir options")
+        conn.collections.create(self._abspath(parsed[1][0]))
+        return ''
+
+    def _iput(self, conn, *args):
+        parsed = _split_options(args, flags_with_values=('-D',))
+        if parsed is None or set(parsed[0]) - {'-f', '-D'} or len(parsed[1]) != 2:
+            raise NotImplementedError("iput options")
+        options, (local_path, irods_path) = parsed
+        put_options = {}
+        if '-f' in options:
+            put_options[kw.FORCE_FLAG_KW] = ''
+        if '-D' in options:
+            put_options[kw.DATA_TYPE_KW] = options['-D']
+        if self.environment.def_res:
+            put_options[kw.DEST_RESC_NAME_KW] = self.environment.def_res
+        conn.data_objects.put(local_path, self._abspath(irods_path), **put_options)
+        return ''
+
+    def _iget(self, conn, *args):
+        parsed = _split_options(args)
+        if parsed is None or set(parsed[0]) - {'-f'} or len(parsed[1]) != 2 or \
+                parsed[1][1] == '-':
+            raise NotImplementedError("iget options")
+        options, (irods_path, local_path) = parsed
+        get_options = {kw.FORCE_FLAG_KW: ''} if '-f' in options else {}
+        try:
+            conn.data_objects.get(self._abspath(irods_path), local_path, **get_options)
+        except (DataObjectDoesNotExist, CollectionDoesNotExist):
+            raise ObjectNotFound("{} does not exist".format(irods_path))
+        return ''
+
+    def _irm(self, conn, *args):
+        parsed = _split_options(args)
+        if parsed is None or set(parsed[0]) - {'-r', '-f'} or len(parsed[1]) != 1:
+            raise NotImplementedError("irm options")
+        options, positional = parsed
+        path = self._abspath(positional[0])
+        kind, _ = self._get_object(conn, path)
+        if kind == 'collection':
+            if '-r' not in options:
+                raise NotImplementedError("irm of a collection without -r")
+            conn.collections.remove(path, recurse=True, force='-f' in options)
+        else:
+            conn.data_objects.unlink(path, force='-f' in options)
+        return ''
+
+    def _imv(self, conn, *args):
+        if len(args) != 2 or any(a.startswith('-') for a in args):
+            raise NotImplementedError("imv options")
+        src, dest = self._abspath(args[0]), self._abspath(args[1])
+        kind, _ = self._get_object(conn, src)
+        if kind == 'collection':
+            conn.collections.move(src, dest)
+        else:
+            conn.data_objects.move(src, dest)
+        return ''
+
+    def _icp(self, conn, *args):
+        parsed = _split_options(args, flags_with_values=('-R',))
+        if parsed is None or set(parsed[0]) - {'-r', '-f', '-R'} or len(parsed[1]) != 2:
+            raise NotImplementedError("icp options")
+        options, (src, dest) = parsed
+        src, dest = self._abspath(src), self._abspath(dest)
+        kind, _ = self._get_object(conn, src)
+        if kind == 'collection':
+            # recursive collection copies are left to icp
+            raise NotImplementedError("icp of a collection")
+        copy_options = {}
+        if '-f' in options:
+            copy_options[kw.FORCE_FLAG_KW] = ''
+        if '-R' in options:
+            copy_options[kw.DEST_RESC_NAME_KW] = options['-R']
+        conn.data_objects.copy(src, dest, **copy_options)
+        return ''
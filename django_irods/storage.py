@@ -1,4 +1,5 @@
 import os
+import shutil
 from tempfile import NamedTemporaryFile
 from uuid import uuid4
 from urllib import urlencode
@@ -9,12 +10,50 @@ from django.core.files.storage import Storage
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ValidationError
 
-from django_irods import icommands
-from icommands import Session, GLOBAL_SESSION, GLOBAL_ENVIRONMENT, SessionException, IRodsEnv
+from django_irods import icommands, avu_cache, streaming
+from icommands import GLOBAL_SESSION, GLOBAL_ENVIRONMENT, SessionException, IRodsEnv
+
+
+def get_storage_class():
+    """Returns the Storage implementation selected by settings.IRODS_STORAGE_BACKEND.
+
+    'irods' (the default) keeps files in iRODS; 'filesystem' keeps them in a local
+    directory tree, see django_irods.fs_storage.
+    """
+    if getattr(settings, 'IRODS_STORAGE_BACKEND', 'irods') == 'filesystem':
+        from django_irods.fs_storage import FileSystemStorage
+        return FileSystemStorage
+    return IrodsStorage
+
+
+def _parse_data_object(line):
+    """Return (name, size) of a data object line of ils -l, or None for other lines."""
+    # don't use split for filename to preserve spaces in filename
+    fields = line.split(None, 6)
+    if len(fields) < 6 or fields[0] == 'C-':
+        # the last line is empty
+        return None
+    if fields[1] != '0':
+        # filter replicas
+        return None
+    # create a seperator based off the id, date, &
+    sep = " ".join(fields[3:6])
+    filename = line.split(sep)[1].strip()
+    if not filename:
+        return None
+    return filename, fields[3]
 
 
 @deconstructible
 class IrodsStorage(Storage):
+    """Storage of files in iRODS through icommands sessions.
+
+    If the vault of the local zone is mounted on this host, set IRODS_VAULT_ROOT to the
+    directory that corresponds to the zone collection (the parent of its 'home'
+    directory); file reads and size and existence checks of local zone data objects are
+    then served from the mount. Writes and AVUs always go through iRODS.
+    """
+
     def __init__(self, option=None):
         if option == 'federated':
             # resource should be saved in federated zone
@@ -46,10 +85,10 @@ class IrodsStorage(Storage):
             irods_default_hash_scheme='MD5'
         )
         if sess_id is None:
-            self.session = Session(session_id=uuid4())
+            self.session = icommands.get_session_class()(session_id=uuid4())
             self.environment = self.session.create_environment(myEnv=userEnv)
         else:
-            self.session = Session(session_id=sess_id)
+            self.session = icommands.get_session_class()(session_id=sess_id)
             if self.session.session_file_exists():
                 self.environment = userEnv
             else:
@@ -77,7 +116,32 @@ class IrodsStorage(Storage):
     def download(self, name):
         return self._open(name, mode='rb')
 
+    def _abspath(self, name):
+        """ return the absolute logical path of name """
+        name = name.rstrip('/')
+        environment = getattr(self, 'environment', None)
+        if not name.startswith('/') and environment is not None:
+            return os.path.join(environment.cwd, name)
+        return name
+
+    def _vault_path(self, name):
+        """ return the path of data object name in the mounted vault, or None """
+        vault_root = getattr(settings, 'IRODS_VAULT_ROOT', None)
+        if not vault_root:
+            return None
+        zone_prefix = '/' + settings.IRODS_ZONE + '/'
+        path = self._abspath(name)
+        if not path.startswith(zone_prefix):
+            return None
+        path = os.path.join(vault_root, path[len(zone_prefix):])
+        # collections are only created in the vault once they hold files
+        return path if os.path.isfile(path) else None
+
     def getFile(self, src_name, dest_name):
+        vault_path = self._vault_path(src_name)
+        if vault_path is not None:
+            shutil.copyfile(vault_path, dest_name)
+            return
         self.session.run("iget", None, '-f', src_name, dest_name)
 
     def runBagitRule(self, rule_name, input_path, input_resource):
@@ -93,6 +157,14 @@ class IrodsStorage(Storage):
         # SessionException will be raised from run() in icommands.py
         self.session.run("irule", None, '-F', rule_name, input_path, input_resource)
 
+    def create_folder(self, name):
+        """
+        Create collection name, and any missing parent collections, as mkdir -p does
+        :param name: the collection path
+        :return: None
+        """
+        self.session.run("imkdir", None, '-p', name)
+
     def zipup(self, in_name, out_name):
         """
         run iRODS ibun command to generate zip file for the bag
@@ -103,6 +175,7 @@ class IrodsStorage(Storage):
         self.session.run("imkdir", None, '-p', out_name.rsplit('/', 1)[0])
         # SessionException will be raised from run() in icommands.py
         self.session.run("ibun", None, '-cDzip', '-f', out_name, in_name)
+        streaming.invalidate(out_name)
 
     def unzip(self, zip_file_path, unzipped_folder=None):
         """
@@ -148,10 +221,30 @@ class IrodsStorage(Storage):
         """
 
         # SessionException will be raised from run() in icommands.py
-        if attUnit:
-            self.session.run("imeta", None, 'set', '-C', name, attName, attVal, attUnit)
-        else:
-            self.session.run("imeta", None, 'set', '-C', name, attName, attVal)
+        try:
+            if attUnit:
+                self.session.run("imeta", None, 'set', '-C', name, attName, attVal, attUnit)
+            else:
+                self.session.run("imeta", None, 'set', '-C', name, attName, attVal)
+        finally:
+            # after the write, so that a concurrent read cannot cache the old value again
+            avu_cache.invalidate(self._avu_cache_path(name))
+
+    def removeAVU(self, name, attName, attVal):
+        """
+        remove AVU from resource collection
+
+        Parameters:
+        :param
+        name: the resource collection name to remove AVU from.
+        attName: the attribute name to remove
+        attVal: the attribute value to remove
+        """
+        # SessionException will be raised from run() in icommands.py
+        try:
+            self.session.run("imeta", None, 'rm', '-C', name, attName, attVal)
+        finally:
+            avu_cache.invalidate(self._avu_cache_path(name))
 
     def getAVU(self, name, attName):
         """
@@ -167,14 +260,51 @@ class IrodsStorage(Storage):
         indicate additional info
         """
 
+        cache_path = self._avu_cache_path(name)
+        cached = avu_cache.get(cache_path, attName)
+        if cached is not avu_cache.MISSING:
+            return cached
+
         # SessionException will be raised from run() in icommands.py
         stdout = self.session.run("imeta", None, 'ls', '-C', name, attName)[0].split("\n")
         ret_att = stdout[1].strip()
         if ret_att == 'None':  # queried attribute does not exist
-            return None
+            value = None
         else:
             vals = stdout[2].split(":")
-            return vals[1].strip()
+            value = vals[1].strip()
+        avu_cache.set_many(cache_path, {attName: value})
+        return value
+
+    def getAVUs(self, name):
+        """
+        get all AVUs of a resource collection in one round trip and fill the AVU cache with
+        them, so that subsequent getAVU() calls for the same collection are served from cache
+
+        Parameters:
+        :param
+        name: the resource collection name to get AVUs from.
+        :return: a dict of {attribute name: attribute value}
+        """
+        # SessionException will be raised from run() in icommands.py
+        stdout = self.session.run("imeta", None, 'ls', '-C', name)[0].split("\n")
+        avus = {}
+        attribute = None
+        for line in stdout[1:]:
+            if line.startswith('attribute:'):
+                attribute = line.split(":", 1)[1].strip()
+            elif line.startswith('value:') and attribute is not None:
+                avus[attribute] = line.split(":", 1)[1].strip()
+                attribute = None
+        # attributes that are absent are cached as None so they are not queried again
+        cached = dict((att, None) for att in avu_cache.cached_attributes())
+        cached.update(avus)
+        avu_cache.set_many(self._avu_cache_path(name), cached)
+        return avus
+
+    def _avu_cache_path(self, name):
+        """ return the absolute collection path used as the AVU cache key """
+        return self._abspath(name)
 
     def copyFiles(self, src_name, dest_name, ires=None):
         """
@@ -195,6 +325,7 @@ class IrodsStorage(Storage):
                 self.session.run("icp", None, '-rf', '-R', ires, src_name, dest_name)
             else:
                 self.session.run("icp", None, '-rf', src_name, dest_name)
+            streaming.invalidate(dest_name)
         return
 
     def moveFile(self, src_name, dest_name):
@@ -212,6 +343,10 @@ class IrodsStorage(Storage):
                 if not self.exists(splitstrs[0]):
                     self.session.run("imkdir", None, '-p', splitstrs[0])
             self.session.run("imv", None, src_name, dest_name)
+            avu_cache.invalidate(self._avu_cache_path(src_name))
+            avu_cache.invalidate(self._avu_cache_path(dest_name))
+            streaming.invalidate(src_name)
+            streaming.invalidate(dest_name)
         return
 
     def saveFile(self, from_name, to_name, create_directory=False, data_type_str=''):
@@ -243,9 +378,13 @@ class IrodsStorage(Storage):
                     # IRODS 4.0.2, sometimes iput fails on the first try.
                     # A second try seems to fix it.
                     self.session.run("iput", None, '-f', from_name, to_name)
+            streaming.invalidate(to_name)
         return
 
     def _open(self, name, mode='rb'):
+        vault_path = self._vault_path(name)
+        if vault_path is not None and mode in ('r', 'rb'):
+            return open(vault_path, mode)
         tmp = NamedTemporaryFile()
         self.session.run("iget", None, '-f', name, tmp.name)
         return tmp
@@ -263,12 +402,17 @@ class IrodsStorage(Storage):
                 # IRODS 4.0.2, sometimes iput fails on the first try. A second try seems to fix it.
                 self.session.run("iput", None, '-f', f.name, name)
             os.unlink(f.name)
+        streaming.invalidate(name)
         return name
 
     def delete(self, name):
         self.session.run("irm", None, "-rf", name)
+        avu_cache.invalidate(self._avu_cache_path(name))
+        streaming.invalidate(name)
 
     def exists(self, name):
+        if self._vault_path(name) is not None:
+            return True
         try:
             stdout = self.session.run("ils", None, name)[0]
             return stdout != ""
@@ -279,6 +423,10 @@ class IrodsStorage(Storage):
         # in it's own method to mock for testing
         return self.session.run("ils", None, "-l", path)[0]
 
+    def ils_lr(self, path):
+        # in it's own method to mock for testing
+        return self.session.run("ils", None, "-lr", path)[0]
+
     def listdir(self, path):
         stdout = self.ils_l(path).split("\n")
         listing = ([], [], [])
@@ -291,24 +439,37 @@ class IrodsStorage(Storage):
                     listing[0].append(dirname)
                     listing[2].append("-1")
             else:
-                # don't use split for filename to preserve spaces in filename
-                line = stdout[i].split(None, 6)
-                if len(line) < 6:
-                    # the last line is empty
-                    continue
-                if line[1] != '0':
-                    # filter replicas
-                    continue
-                # create a seperator based off the id, date, &
-                sep = " ".join(line[3:6])
-                filename = stdout[i].split(sep)[1].strip()
-                size = line[3]
-                if filename:
-                    listing[1].append(filename)
-                    listing[2].append(size)
+                data_object = _parse_data_object(stdout[i])
+                if data_object:
+                    listing[1].append(data_object[0])
+                    listing[2].append(data_object[1])
         return listing
 
+    def file_sizes(self, path):
+        """
+        Return {name: size in bytes} of every data object under collection path, with a
+        single recursive ils; names are path joined with the path relative to it.
+        """
+        stdout = self.ils_lr(path).split("\n")
+        sizes = {}
+        root = None
+        collection = path.rstrip('/')
+        for line in stdout:
+            if line and not line.startswith(' ') and line.endswith(':'):
+                # header of the listing of a collection, as an absolute path
+                if root is None:
+                    root = line[:-1]
+                collection = path.rstrip('/') + line[len(root):-1]
+                continue
+            data_object = _parse_data_object(line)
+            if data_object:
+                sizes[collection + '/' + data_object[0]] = int(data_object[1])
+        return sizes
+
     def size(self, name):
+        vault_path = self._vault_path(name)
+        if vault_path is not None:
+            return os.path.getsize(vault_path)
         stdout = self.session.run("ils", None, "-l", name)[0].split()
         return int(stdout[3])
 
@@ -0,0 +1,269 @@
+"""Streaming of iRODS data objects over pooled native connections.
+
+Downloads that cannot be handed to nginx used to cost two icommands subprocesses: ``ils -l``
+for the Content-Length and ``iget ... -`` whose stdout pipe was streamed back.  With the
+native session backend (see django_irods.native), this module instead
+
+* reads size and checksum of a data object with one catalog query, optionally cached in
+  the Django cache for ``IRODS_STAT_CACHE_TIMEOUT`` seconds (0, the default, disables it,
+  as does a cache backend that is not shared between processes; IrodsStorage forgets the
+  entry of a path it writes, moves or deletes);
+* reads the data object in chunks of ``IRODS_STREAM_CHUNK_SIZE`` bytes over a pooled
+  connection, starting at any offset, so that HTTP Range requests and resumed downloads
+  are served without reading the skipped bytes.
+
+``open_download`` does not depend on Django's request and response classes, so that a
+standalone file serving worker can call it and iterate (or close) the body itself;
+``streaming_response`` wraps it for Django views.
+"""
+
+import logging
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+
+from django_irods.icommands import SessionException
+from django_irods.native import NATIVE_AVAILABLE, PoolExhausted
+from hs_core import shared_cache
+
+if NATIVE_AVAILABLE:
+    from irods.exception import CollectionDoesNotExist, DataObjectDoesNotExist
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class ObjectStat(namedtuple('ObjectStat', 'size checksum modified')):
+    """Catalog metadata of a data object; checksum and modified may be None."""
+
+    @property
+    def etag(self):
+        if self.checksum:
+            return '"{}"'.format(self.checksum)
+        return '"{}-{}"'.format(self.size, self.modified or '')
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header asks for bytes beyond the end of the data object."""
+    pass
+
+
+def _native_pool(session):
+    """Return the connection pool of a native session, or None for icommands sessions."""
+    if not NATIVE_AVAILABLE:
+        return None
+    return getattr(session, 'pool', None)
+
+
+def _stat_key(path):
+    return u'irods_stat:{}'.format(path)
+
+
+def _stat_timeout():
+    return shared_cache.timeout('IRODS_STAT_CACHE_TIMEOUT')
+
+
+def invalidate(path):
+    """Forget the cached catalog metadata of data object path."""
+    if _stat_timeout() > 0:
+        cache.delete(_stat_key(path))
+
+
+def data_object_stat(session, path):
+    """Return the ObjectStat of data object path.
+
+    :raises SessionException: if the data object does not exist
+    """
+    if _stat_timeout() > 0:
+        stat = cache.get(_stat_key(path))
+        if stat is not None:
+            return ObjectStat(*stat)
+
+    pool = _native_pool(session)
+    stat = None
+    if pool is not None:
+        try:
+            with pool.connection() as conn:
+                obj = conn.data_objects.get(session._abspath(path))
+                modified = obj.modify_time.strftime('%Y%m%d%H%M%S') if obj.modify_time else None
+                stat = ObjectStat(obj.size, obj.checksum, modified)
+        except (DataObjectDoesNotExist, CollectionDoesNotExist):
+            raise SessionException(4, '', "{} does not exist".format(path))
+        except Exception as ex:
+            logger.warn("native stat of {} failed ({}); using ils".format(path, ex))
+    if stat is None:
+        stdout = session.run("ils", None, "-l", path)[0].split()
+        stat = ObjectStat(int(stdout[3]), None, None)
+
+    if _stat_timeout() > 0:
+        cache.set(_stat_key(path), tuple(stat), _stat_timeout())
+    return stat
+
+
+def parse_range(header, size):
+    """Return the inclusive (first, last) byte positions asked for by a Range header.
+
+    Returns None when the whole data object should be sent: the header is absent or
+    malformed, or asks for several ranges, which are not supported.
+
+    :raises RangeNotSatisfiable: if the range starts beyond the end of the data object
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # a suffix range: the last bytes of the data object
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or last < first:
+        raise RangeNotSatisfiable()
+    return first, last
+
+
+class DataObjectStream(object):
+    """Iterator over bytes of a data object, read over one pooled connection.
+
+    The connection is checked out by open() and returned to the pool when the stream is
+    exhausted or closed, whichever comes first.
+    """
+
+    def __init__(self, pool, path, offset=0, length=None, chunk_size=None):
+        self.pool = pool
+        self.path = path
+        self.offset = offset
+        self.remaining = length
+        self.chunk_size = chunk_size or getattr(settings, 'IRODS_STREAM_CHUNK_SIZE',
+                                                DEFAULT_CHUNK_SIZE)
+        self._conn = None
+        self._file = None
+
+    def open(self):
+        """Check out a connection and open the data object at the requested offset.
+
+        :raises PoolExhausted: if no connection becomes available in time
+        """
+        self._conn = self.pool.acquire()
+        try:
+            self._file = self._conn.data_objects.open(self.path, 'r')
+            if self.offset:
+                self._file.seek(self.offset)
+        except (DataObjectDoesNotExist, CollectionDoesNotExist):
+            self.close()
+            raise SessionException(4, '', "{} does not exist".format(self.path))
+        except Exception:
+            self.close(discard=True)
+            raise
+        return self
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self._file is None or (self.remaining is not None and self.remaining <= 0):
+            self.close()
+            raise StopIteration
+        size = self.chunk_size
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+        try:
+            data = self._file.read(size)
+        except Exception:
+            self.close(discard=True)
+            raise
+        if not data:
+            if self.remaining:
+                logger.warn("{} ended {} bytes early".format(self.path, self.remaining))
+            self.close()
+            raise StopIteration
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        return data
+
+    __next__ = next
+
+    def close(self, discard=False):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                discard = True
+            self._file = None
+        if self._conn is not None:
+            self.pool.release(self._conn, discard=discard)
+            self._conn = None
+
+
+def open_download(session, path, range_header=None, if_range=None, stat=None):
+    """Prepare a GET of data object path.
+
+    :param session: a native session; see django_irods.native.NativeSession
+    :param path: the data object, absolute or relative to the home collection of session
+    :param range_header: value of the Range request header, if any
+    :param if_range: value of the If-Range request header, if any
+    :param stat: the ObjectStat of path, if already known
+    :return: (status, headers, body) where headers is a list of (name, value) and body an
+        iterable of byte strings with a close() method, or None if session cannot stream
+        natively (no connection pool, or no free connection)
+    """
+    pool = _native_pool(session)
+    if pool is None:
+        return None
+    if stat is None:
+        stat = data_object_stat(session, path)
+
+    headers = [('Accept-Ranges', 'bytes'), ('ETag', stat.etag)]
+    byte_range = None
+    if range_header and (not if_range or if_range == stat.etag):
+        try:
+            byte_range = parse_range(range_header, stat.size)
+        except RangeNotSatisfiable:
+            headers.append(('Content-Range', 'bytes */{}'.format(stat.size)))
+            return 416, headers, []
+
+    if byte_range is None:
+        status, offset, length = 200, 0, stat.size
+    else:
+        first, last = byte_range
+        status, offset, length = 206, first, last - first + 1
+        headers.append(('Content-Range', 'bytes {}-{}/{}'.format(first, last, stat.size)))
+    headers.append(('Content-Length', str(length)))
+
+    body = DataObjectStream(pool, session._abspath(path), offset, length)
+    try:
+        body.open()
+    except PoolExhausted:
+        return None
+    return status, headers, body
+
+
+def streaming_response(session, path, request, content_type, filename, stat=None):
+    """Return a Django response streaming data object path, honouring Range requests.
+
+    Returns None if session cannot stream natively; see open_download.
+    """
+    download = open_download(session, path, request.META.get('HTTP_RANGE'),
+                             request.META.get('HTTP_IF_RANGE'), stat)
+    if download is None:
+        return None
+    status, headers, body = download
+    if status == 416:
+        response = HttpResponse(status=status)
+    else:
+        response = StreamingHttpResponse(body, status=status, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="{name}"'.format(name=filename)
+    for name, value in headers:
+        response[name] = value
+    return response
@@ -0,0 +1,117 @@
+import tempfile
+
+from django.core.signals import request_started, request_finished
+from django.test import SimpleTestCase, override_settings
+
+from django_irods import avu_cache
+from django_irods.icommands import IRodsEnv
+from django_irods.storage import IrodsStorage
+
+# AVUs are only kept between requests in a cache that every process sees
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(prefix='avu_cache'),
+}}
+
+
+class CountingSession(object):
+    """Stands in for an icommands session and records the commands it runs."""
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.commands = []
+
+    def run(self, icommand, data=None, *args):
+        self.commands.append((icommand,) + args)
+        return self.stdout, ''
+
+
+class TestAVUCache(SimpleTestCase):
+
+    def setUp(self):
+        super(TestAVUCache, self).setUp()
+        request_started.send(sender=self.__class__)
+        self.storage = IrodsStorage.__new__(IrodsStorage)
+        self.storage.environment = IRodsEnv(
+            pk=-1, host='localhost', port=1247, def_res='hydroshareReplResc',
+            home_coll='/hydroshareZone/home/wwwHydroProxy',
+            cwd='/hydroshareZone/home/wwwHydroProxy', username='wwwHydroProxy',
+            zone='hydroshareZone', auth='secret', irods_default_hash_scheme='MD5')
+
+    def tearDown(self):
+        request_finished.send(sender=self.__class__)
+        super(TestAVUCache, self).tearDown()
+
+    def test_getAVU_is_cached_within_a_request(self):
+        self.storage.session = CountingSession(
+            "AVUs defined for collection /hydroshareZone/home/wwwHydroProxy/abc:\n"
+            "attribute: bag_modified\nvalue: true\nunits: \n")
+        self.assertEqual(self.storage.getAVU('abc', 'bag_modified'), 'true')
+        self.assertEqual(self.storage.getAVU('abc', 'bag_modified'), 'true')
+        # relative and absolute paths share a cache entry
+        self.assertEqual(self.storage.getAVU('/hydroshareZone/home/wwwHydroProxy/abc',
+                                             'bag_modified'), 'true')
+        self.assertEqual(len(self.storage.session.commands), 1)
+
+    def test_setAVU_invalidates(self):
+        self.storage.session = CountingSession(
+            "AVUs defined for collection /hydroshareZone/home/wwwHydroProxy/abc:\nNone\n")
+        self.assertIsNone(self.storage.getAVU('abc', 'metadata_dirty'))
+        self.storage.setAVU('/hydroshareZone/home/wwwHydroProxy/abc', 'metadata_dirty', 'true')
+        self.storage.getAVU('abc', 'metadata_dirty')
+        self.assertEqual([c[0:2] for c in self.storage.session.commands],
+                         [('imeta', 'ls'), ('imeta', 'set'), ('imeta', 'ls')])
+
+    def test_value_read_during_the_write_is_not_kept(self):
+        storage = self.storage
+
+        class ReadingSession(CountingSession):
+            def run(self, icommand, data=None, *args):
+                result = super(ReadingSession, self).run(icommand, data, *args)
+                if args[0] == 'set':
+                    # another reader caches the value before the write is visible
+                    storage.getAVU('abc', 'metadata_dirty')
+                return result
+
+        storage.session = ReadingSession(
+            "AVUs defined for collection /hydroshareZone/home/wwwHydroProxy/abc:\nNone\n")
+        storage.setAVU('abc', 'metadata_dirty', 'true')
+        storage.getAVU('abc', 'metadata_dirty')
+        self.assertEqual([c[0:2] for c in storage.session.commands],
+                         [('imeta', 'set'), ('imeta', 'ls'), ('imeta', 'ls')])
+
+    def test_getAVUs_fills_cache_in_one_round_trip(self):
+        self.storage.session = CountingSession(
+            "AVUs defined for collection /hydroshareZone/home/wwwHydroProxy/abc:\n"
+            "attribute: isPublic\nvalue: false\nunits: \n----\n"
+            "attribute: quotaUserName\nvalue: someone\nunits: \n")
+        avus = self.storage.getAVUs('abc')
+        self.assertEqual(avus, {'isPublic': 'false', 'quotaUserName': 'someone'})
+        self.assertEqual(self.storage.getAVU('abc', 'quotaUserName'), 'someone')
+        self.assertIsNone(self.storage.getAVU('abc', 'bag_modified'))
+        self.assertEqual(len(self.storage.session.commands), 1)
+
+    def test_uncacheable_attributes_and_no_request(self):
+        self.assertIs(avu_cache.get('/zone/abc', 'bags-usage'), avu_cache.MISSING)
+        avu_cache.set_many('/zone/abc', {'bags-usage': '10'})
+        self.assertIs(avu_cache.get('/zone/abc', 'bags-usage'), avu_cache.MISSING)
+
+        request_finished.send(sender=self.__class__)
+        avu_cache.set_many('/zone/abc', {'isPublic': 'true'})
+        self.assertIs(avu_cache.get('/zone/abc', 'isPublic'), avu_cache.MISSING)
+
+    @override_settings(IRODS_AVU_CACHE_TIMEOUT=60, CACHES=SHARED_CACHES)
+    def test_shared_between_requests(self):
+        avu_cache.invalidate('/zone/abc')
+        avu_cache.set_many('/zone/abc', {'isPublic': 'true'})
+        request_finished.send(sender=self.__class__)
+        request_started.send(sender=self.__class__)
+        self.assertEqual(avu_cache.get('/zone/abc', 'isPublic'), 'true')
+        avu_cache.invalidate('/zone/abc')
+
+    @override_settings(IRODS_AVU_CACHE_TIMEOUT=60)
+    def test_not_shared_through_a_process_local_cache(self):
+        avu_cache.set_many('/zone/abc', {'isPublic': 'true'})
+        request_finished.send(sender=self.__class__)
+        request_started.send(sender=self.__class__)
+        self.assertIs(avu_cache.get('/zone/abc', 'isPublic'), avu_cache.MISSING)
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.test import SimpleTestCase, override_settings
+
+from django_irods.fs_storage import FileSystemStorage
+from django_irods.icommands import SessionException
+from django_irods.storage import IrodsStorage
+
+
+@override_settings(IRODS_USERNAME='wwwHydroProxy')
+class TestFileSystemStorage(SimpleTestCase):
+
+    def setUp(self):
+        super(TestFileSystemStorage, self).setUp()
+        self.root = tempfile.mkdtemp()
+        self.storage = FileSystemStorage(root=self.root)
+        self.local_file = os.path.join(self.root, 'upload.txt')
+        with open(self.local_file, 'w') as f:
+            f.write('some data')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        super(TestFileSystemStorage, self).tearDown()
+
+    def test_logical_paths_map_into_the_root(self):
+        self.storage.saveFile(self.local_file, 'abc/data/contents/a.txt', True)
+        self.assertTrue(os.path.isfile(os.path.join(
+            self.root, 'hydroshareZone/home/wwwHydroProxy/abc/data/contents/a.txt')))
+        self.assertTrue(self.storage.exists(
+            '/hydroshareZone/home/wwwHydroProxy/abc/data/contents/a.txt'))
+        self.assertEqual(self.storage.size('abc/data/contents/a.txt'), 9)
+        with self.storage.open('abc/data/contents/a.txt') as f:
+            self.assertEqual(f.read(), 'some data')
+
+    def test_listdir_move_copy_and_delete(self):
+        self.storage.saveFile(self.local_file, 'abc/data/contents/a.txt', True)
+        self.storage.saveFile('', 'abc/data/contents/empty/', True)
+        self.assertEqual(self.storage.listdir('abc/data/contents'),
+                         (['empty'], ['a.txt'], ['-1', '9']))
+
+        self.storage.moveFile('abc/data/contents/a.txt', 'abc/data/contents/empty')
+        self.assertTrue(self.storage.exists('abc/data/contents/empty/a.txt'))
+        self.storage.copyFiles('abc/data/contents/empty', 'abc/data/contents/copy')
+        self.assertTrue(self.storage.exists('abc/data/contents/copy/a.txt'))
+
+        self.storage.delete('abc/data/contents/empty')
+        self.assertFalse(self.storage.exists('abc/data/contents/empty'))
+        with self.assertRaises(SessionException):
+            self.storage.listdir('abc/data/contents/empty')
+
+    def test_file_sizes(self):
+        self.storage.saveFile(self.local_file, 'abc/data/contents/a.txt', True)
+        self.storage.saveFile(self.local_file, 'abc/data/contents/sub/b.txt', True)
+        self.assertEqual(self.storage.file_sizes('abc/data/contents'),
+                         {'abc/data/contents/a.txt': 9, 'abc/data/contents/sub/b.txt': 9})
+        with self.assertRaises(SessionException):
+            self.storage.file_sizes('abc/data/missing')
+
+    def test_zipup_and_unzip(self):
+        self.storage.saveFile(self.local_file, 'abc/data/contents/a.txt', True)
+        self.storage.zipup('abc', 'bags/abc.zip')
+        with zipfile.ZipFile(os.path.join(self.root,
+                                          'hydroshareZone/home/wwwHydroProxy/bags/abc.zip')) as zf:
+            self.assertEqual(zf.namelist(), ['abc/data/contents/a.txt'])
+        self.assertEqual(self.storage.unzip('bags/abc.zip'), 'bags/abc')
+        self.assertTrue(self.storage.exists('bags/abc/abc/data/contents/a.txt'))
+
+    def test_avus_are_kept_per_collection(self):
+        self.storage.saveFile('', 'abc/', True)
+        self.assertIsNone(self.storage.getAVU('abc', 'bag_modified'))
+        self.storage.setAVU('abc', 'bag_modified', 'true')
+        self.storage.setAVU('abc', 'isPublic', 'false')
+        self.assertEqual(self.storage.getAVU('abc', 'bag_modified'), 'true')
+        self.assertEqual(self.storage.getAVUs('abc'),
+                         {'bag_modified': 'true', 'isPublic': 'false'})
+        self.storage.removeAVU('abc', 'isPublic', 'false')
+        self.assertEqual(self.storage.getAVUs('abc'), {'bag_modified': 'true'})
+        with self.assertRaises(SessionException):
+            self.storage.getAVU('missing', 'bag_modified')
+
+    def test_ils_listings_parse_as_those_of_irods(self):
+        self.storage.saveFile(self.local_file, 'abc/data/contents/a b.txt', True)
+        self.storage.saveFile(self.local_file, 'abc/data/contents/sub/b.txt', True)
+        # the parsers of IrodsStorage read the listings of ils -l and ils -lr
+        directories, files, sizes = IrodsStorage.listdir(self.storage, 'abc/data/contents')
+        self.assertEqual((directories, files, sorted(sizes)), (['sub'], ['a b.txt'], ['-1', '9']))
+        self.assertEqual(IrodsStorage.file_sizes(self.storage, 'abc/data/contents'),
+                         self.storage.file_sizes('abc/data/contents'))
+        with self.assertRaises(SessionException):
+            self.storage.ils_l('abc/data/missing')
+
+    def test_create_folder(self):
+        self.storage.create_folder('abc/data/contents/x/y')
+        self.assertEqual(self.storage.listdir('abc/data/contents/x'), (['y'], [], ['-1']))
+        # as imkdir -p, an existing folder is not an error
+        self.storage.create_folder('abc/data/contents/x')
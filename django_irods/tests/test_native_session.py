@@ -0,0 +1,154 @@
+from collections import namedtuple
+from datetime import datetime
+
+from django.test import SimpleTestCase
+
+from django_irods import native
+from django_irods.icommands import Session, SessionException
+from django_irods.native import ConnectionPool, NativeSession, PoolExhausted, \
+    format_ils_collection, format_imeta_ls, _split_options
+
+Replica = namedtuple('Replica', ['number', 'resource_name'])
+DataObj = namedtuple('DataObj', ['owner_name', 'size', 'modify_time', 'name', 'path',
+                                 'replicas'])
+Coll = namedtuple('Coll', ['path', 'data_objects', 'subcollections'])
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.closed = False
+
+    def cleanup(self):
+        self.closed = True
+
+
+class FailingSession(NativeSession):
+    """A native session whose handlers fail after they started, and whose icommands
+    fallback is recorded rather than run."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._handlers = dict((icommand, self._fail) for icommand in
+                              ('ils', 'imeta', 'imkdir', 'iput', 'irm', 'imv'))
+        self.fallbacks = []
+
+    @property
+    def pool(self):
+        return self._pool
+
+    def _fail(self, conn, *args):
+        raise IOError("connection reset")
+
+
+class TestNativeSession(SimpleTestCase):
+
+    def _pool(self, **kwargs):
+        pool = ConnectionPool('localhost', 1247, 'wwwHydroProxy', 'secret', 'hydroshareZone',
+                              **kwargs)
+        pool._connect = FakeConnection
+        return pool
+
+    def test_ils_collection_format_is_parseable_by_listdir(self):
+        modified = datetime(2018, 1, 21, 15, 9)
+        coll = Coll(
+            path='/hydroshareZone/home/wwwHydroProxy/abc/data/contents',
+            data_objects=[DataObj('wwwHydroProxy', 9191, modified, 'CRB METHODS.csv', '',
+                                  [Replica(0, 'hydroshareResc'),
+                                   Replica(1, 'hydroshareReplResc')])],
+            subcollections=[Coll('/hydroshareZone/home/wwwHydroProxy/abc/data/contents/sub',
+                                 [], [])])
+        stdout = format_ils_collection(coll).split("\n")
+        self.assertEqual(stdout[0], coll.path + ":")
+        line = stdout[1].split(None, 6)
+        self.assertEqual(line[1], '0')
+        self.assertEqual(line[3], '9191')
+        self.assertEqual(stdout[1].split(" ".join(line[3:6]))[1].strip(), 'CRB METHODS.csv')
+        self.assertEqual(stdout[2].split(None, 6)[1], '1')
+        self.assertEqual(stdout[3], "  C- " + coll.path + "/sub")
+
+    def test_imeta_ls_format_matches_getavu_parsing(self):
+        stdout = format_imeta_ls('/zone/abc', [('bag_modified', 'true', None)]).split("\n")
+        self.assertNotEqual(stdout[1].strip(), 'None')
+        self.assertEqual(stdout[2].split(":")[1].strip(), 'true')
+        stdout = format_imeta_ls('/zone/abc', []).split("\n")
+        self.assertEqual(stdout[1].strip(), 'None')
+
+    def test_split_options(self):
+        options, positional = _split_options(['-D', 'generic', '-f', 'a', 'b'],
+                                             flags_with_values=('-D',))
+        self.assertEqual(options, {'-D': 'generic', '-f': True})
+        self.assertEqual(positional, ['a', 'b'])
+        options, positional = _split_options(['-rf', 'a'])
+        self.assertEqual(options, {'-r': True, '-f': True})
+
+    def test_pool_reuses_connections(self):
+        pool = self._pool(max_size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            self.assertIs(first, second)
+        self.assertEqual(pool.stats, {'in_use': 0, 'idle': 1, 'max_size': 2})
+
+    def test_pool_is_bounded(self):
+        pool = self._pool(max_size=1, acquire_timeout=0)
+        conn = pool.acquire()
+        self.assertRaises(PoolExhausted, pool.acquire)
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+
+    def test_pool_evicts_idle_and_discards_broken_connections(self):
+        pool = self._pool(idle_seconds=-1)
+        with pool.connection() as conn:
+            pass
+        with pool.connection() as other:
+            self.assertIsNot(conn, other)
+        self.assertTrue(conn.closed)
+
+        pool = self._pool()
+        try:
+            with pool.connection() as conn:
+                raise IOError("connection reset")
+        except IOError:
+            pass
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats['idle'], 0)
+
+    def test_get_pool_is_shared_per_zone_login(self):
+        native.close_all_pools()
+        pool = native.get_pool('localhost', 1247, 'wwwHydroProxy', 'secret', 'hydroshareZone')
+        self.assertIs(pool, native.get_pool('localhost', '1247', 'wwwHydroProxy', 'secret',
+                                            'hydroshareZone'))
+        self.assertIsNot(pool, native.get_pool('localhost', 1247, 'wwwHydroProxy', 'secret',
+                                               'hydroshareuserZone'))
+        native.close_all_pools()
+
+    def test_only_repeatable_commands_fall_back_after_a_native_failure(self):
+        self.addCleanup(setattr, native, 'NATIVE_AVAILABLE', native.NATIVE_AVAILABLE)
+        self.addCleanup(setattr, Session, 'run', Session.run)
+        native.NATIVE_AVAILABLE = True
+
+        def fallback(session, icommand, data=None, *args):
+            session.fallbacks.append(icommand)
+            return '', ''
+        Session.run = fallback
+
+        session = FailingSession(self._pool())
+        session.run('ils', None, '-l', 'abc')
+        session.run('imeta', None, 'set', '-C', 'abc', 'isPublic', 'true')
+        session.run('imkdir', None, '-p', 'abc')
+        self.assertEqual(session.fallbacks, ['ils', 'imeta', 'imkdir'])
+
+        for args in (('imv', 'abc', 'def'), ('irm', '-rf', 'abc'), ('iput', '-f', 'a', 'abc'),
+                     ('imeta', 'rm', '-C', 'abc', 'isPublic', 'true')):
+            self.assertRaises(SessionException, session.run, args[0], None, *args[1:])
+        self.assertEqual(session.fallbacks, ['ils', 'imeta', 'imkdir'])
+
+        # nothing was run yet when no connection could be made
+        pool = self._pool()
+
+        def refuse():
+            raise IOError("connection refused")
+        pool._connect = refuse
+        session = FailingSession(pool)
+        session.run('irm', None, '-rf', 'abc')
+        self.assertEqual(session.fallbacks, ['irm'])
@@ -72,3 +72,26 @@ class TestStorage(TestCase):
 
         listing = storage.listdir("path")
         self.assertEqual(len(listing[1]), 3)
+
+    def test_file_sizes(self):
+        def mocked_ils_lr(self, path):
+            return "/hydroshareZone/home/wwwHydroProxy" \
+                   "/ff7435cd22d94914ad3a674c40b229e9/data/contents:\n" \
+                "  wwwHydroProx      0 hydroshareReplResc;hydroshareResc" \
+                   "         9191 2018-01-21.15:09 & CRB METHODS.csv\n" \
+                "  wwwHydroProx      1 hydroshareReplResc;mdcRRResource;hydrodata2Resource" \
+                   "         9191 2018-01-21.15:09 & CRB METHODS.csv\n" \
+                "  C- /hydroshareZone/home/wwwHydroProxy" \
+                   "/ff7435cd22d94914ad3a674c40b229e9/data/contents/sub folder\n" \
+                "/hydroshareZone/home/wwwHydroProxy" \
+                   "/ff7435cd22d94914ad3a674c40b229e9/data/contents/sub folder:\n" \
+                "  wwwHydroProx      0 hydroshareReplResc;hydroshareResc" \
+                   "         6195 2018-01-21.15:09 & CRB_SITES.csv\n"
+        storage = self.res.get_irods_storage()
+        funcType = type(IrodsStorage.ils_lr)
+        storage.ils_lr = funcType(mocked_ils_lr, storage, IrodsStorage)
+
+        sizes = storage.file_sizes("ff7435cd22d94914ad3a674c40b229e9/data/contents")
+        self.assertEqual(sizes, {
+            'ff7435cd22d94914ad3a674c40b229e9/data/contents/CRB METHODS.csv': 9191,
+            'ff7435cd22d94914ad3a674c40b229e9/data/contents/sub folder/CRB_SITES.csv': 6195})
@@ -0,0 +1,70 @@
+from io import BytesIO
+
+from django.test import SimpleTestCase
+
+from django_irods.streaming import DataObjectStream, ObjectStat, RangeNotSatisfiable, \
+    parse_range
+
+
+class FakeDataObjects(object):
+    def __init__(self, content):
+        self.content = content
+
+    def open(self, path, mode):
+        return BytesIO(self.content)
+
+
+class FakeConnection(object):
+    def __init__(self, content):
+        self.data_objects = FakeDataObjects(content)
+
+
+class FakePool(object):
+    def __init__(self, content):
+        self.content = content
+        self.in_use = 0
+
+    def acquire(self):
+        self.in_use += 1
+        return FakeConnection(self.content)
+
+    def release(self, conn, discard=False):
+        self.in_use -= 1
+
+
+class TestStreaming(SimpleTestCase):
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=500-', 1000), (500, 999))
+        self.assertEqual(parse_range('bytes=900-2000', 1000), (900, 999))
+        # suffix ranges ask for the last bytes
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-2000', 1000), (0, 999))
+        # absent, malformed and multiple ranges mean the whole data object
+        self.assertIsNone(parse_range(None, 1000))
+        self.assertIsNone(parse_range('bytes=a-b', 1000))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000))
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=1000-', 1000)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=-0', 1000)
+
+    def test_stream_reads_range_in_chunks_and_releases_connection(self):
+        pool = FakePool(b'0123456789')
+        stream = DataObjectStream(pool, '/zone/home/abc/data/contents/f.txt', offset=2,
+                                  length=5, chunk_size=2).open()
+        self.assertEqual(pool.in_use, 1)
+        self.assertEqual(list(stream), [b'23', b'45', b'6'])
+        self.assertEqual(pool.in_use, 0)
+
+    def test_closing_stream_early_releases_connection(self):
+        pool = FakePool(b'0123456789')
+        stream = DataObjectStream(pool, '/zone/f.txt', length=10, chunk_size=4).open()
+        self.assertEqual(next(stream), b'0123')
+        stream.close()
+        self.assertEqual(pool.in_use, 0)
+
+    def test_etag(self):
+        self.assertEqual(ObjectStat(10, 'sha2:abc=', None).etag, '"sha2:abc="')
+        self.assertEqual(ObjectStat(10, None, '20190401120000').etag, '"10-20190401120000"')
@@ -0,0 +1,25 @@
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from django_irods.zip_download import streaming_enabled
+
+
+class TestStreamingEnabled(SimpleTestCase):
+
+    def setUp(self):
+        super(TestStreamingEnabled, self).setUp()
+        self.factory = RequestFactory()
+
+    def _enabled(self, query=''):
+        return streaming_enabled(self.factory.get('/django_irods/download/' + query))
+
+    @override_settings(HS_STREAMING_ZIP=True)
+    def test_requests_may_opt_out(self):
+        self.assertTrue(self._enabled())
+        self.assertTrue(self._enabled('?streaming=true'))
+        self.assertFalse(self._enabled('?streaming=false'))
+        self.assertFalse(self._enabled('?streaming=False'))
+
+    @override_settings(HS_STREAMING_ZIP=False)
+    def test_requests_may_not_opt_in(self):
+        self.assertFalse(self._enabled())
+        self.assertFalse(self._enabled('?streaming=true'))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import os
+import zipfile
+from contextlib import contextmanager
+from functools import partial
+from io import BytesIO
+
+from django.test import SimpleTestCase
+
+from django_irods.zipstream import ZipMember, ZipStream
+
+
+@contextmanager
+def _open(content):
+    yield BytesIO(content)
+
+
+class TestZipStream(SimpleTestCase):
+
+    def _archive(self, members, chunk_size=1024):
+        stream = ZipStream(members, chunk_size=chunk_size)
+        content = b''.join(stream)
+        self.assertEqual(stream.size, len(content))
+        return zipfile.ZipFile(BytesIO(content))
+
+    def test_members(self):
+        text = b'a,b\n1,2\n' * 1000
+        binary = os.urandom(5000)
+        members = iter([
+            ZipMember('folder/a.csv', partial(_open, text), len(text), 1500000000),
+            ZipMember('folder/b.bin', partial(_open, binary), len(binary),
+                      compress_type=zipfile.ZIP_STORED),
+            ZipMember(u'folder/\xe9t\xe9.txt', partial(_open, b'unicode')),
+            ZipMember('folder/empty/'),
+        ])
+        zf = self._archive(members)
+        self.assertIsNone(zf.testzip())
+        self.assertEqual(zf.namelist(), ['folder/a.csv', 'folder/b.bin', u'folder/\xe9t\xe9.txt',
+                                         'folder/empty/'])
+        self.assertEqual(zf.read('folder/a.csv'), text)
+        self.assertEqual(zf.read('folder/b.bin'), binary)
+        self.assertEqual(zf.read(u'folder/\xe9t\xe9.txt'), b'unicode')
+        self.assertEqual(zf.getinfo('folder/a.csv').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertLess(zf.getinfo('folder/a.csv').compress_size, len(text))
+        self.assertEqual(zf.getinfo('folder/b.bin').compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(zf.getinfo('folder/a.csv').date_time[0], 2017)
+
+    def test_members_opened_in_turn(self):
+        opened = []
+
+        @contextmanager
+        def tracked(name):
+            opened.append(name)
+            yield BytesIO(name.encode('ascii'))
+
+        def members():
+            for name in ('x', 'y'):
+                yield ZipMember(name, partial(tracked, name))
+
+        stream = iter(ZipStream(members()))
+        next(stream)
+        self.assertEqual(opened, [])
+        b''.join(stream)
+        self.assertEqual(opened, ['x', 'y'])
+
+    def test_empty(self):
+        zf = self._archive([])
+        self.assertEqual(zf.namelist(), [])
@@ -9,7 +9,7 @@ from django.core.exceptions import PermissionDenied
 from django.http import HttpResponse, FileResponse, HttpResponseRedirect
 from rest_framework.decorators import api_view
 
-from django_irods import icommands
+from django_irods import icommands, streaming, zip_download
 from hs_core.hydroshare import check_resource_type
 from hs_core.hydroshare.hs_bagit import create_bag_files
 from hs_core.signals import pre_download_file, pre_check_bag_flag
@@ -69,6 +69,7 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
     is_zip_request = request.GET.get('zipped', "False").lower() == "true"
     is_sf_agg_file = False
     is_sf_request = False
+    res_file = None  # the ResourceFile of a single file request
 
     if split_path_strs[0] == 'bags':
         is_bag_download = True
@@ -133,6 +134,7 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
                 for f in ResourceFile.objects.filter(object_id=res.id):
                     if path == f.storage_path:
                         is_sf_agg_file = True
+                        res_file = f
                         if not is_zip_request and f.has_logical_file and \
                                 f.logical_file.is_single_file_aggregation:
                             download_url = request.GET.get('url_download', 'false').lower()
@@ -164,7 +166,10 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
     # if none of these are set, it's a normal download
 
     # determine active session
-    if res.is_federated:
+    if istorage.session is None:
+        # files are kept in a local directory tree; see django_irods.fs_storage
+        session = None
+    elif res.is_federated:
         # the resource is stored in federated zone
         session = icommands.ACTIVE_SESSION
     else:
@@ -195,6 +200,13 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
 
     if is_zip_request:
 
+        if zip_download.streaming_enabled(request):
+            response = zip_download.zip_response(request, res, irods_path, is_sf_agg_file,
+                                                 is_sf_request)
+            if response is not None:
+                res.update_download_count()
+                return response
+
         if use_async:
             task = create_temp_zip.apply_async((res_id, irods_path, irods_output_path,
                                                 is_sf_agg_file, is_sf_request))
@@ -242,6 +254,10 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
         else:
             irods_output_path = os.path.join(res.resource_federation_path, output_path)
 
+        # read all resource AVUs in one round trip; the AVU cache serves the reads below, and
+        # those made by create_bag_by_irods() when it runs within this request rather than
+        # as a celery task
+        res.getAVUs()
         bag_modified = res.getAVU('bag_modified')
         # recreate the bag if it doesn't exist even if bag_modified is "false".
         if __debug__:
@@ -260,6 +276,12 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
             bag_modified = "True"
 
         if bag_modified is None or bag_modified:
+            if zip_download.streaming_enabled(request):
+                response = zip_download.bag_response(request, res)
+                if response is not None:
+                    res.update_download_count()
+                    return response
+
             if use_async:
                 # task parameter has to be passed in as a tuple or list, hence (res_id,) is needed
                 # Note that since we are using JSON for task parameter serialization, no complex
@@ -309,10 +331,26 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
     mime_type = mimetypes.guess_type(output_path)
     if mime_type[0] is not None:
         mtype = mime_type[0]
+    # the checksum stored with a file that is downloaded as it is; see hs_core/checksums.py
+    stored_checksum = None
+    if res_file is not None and irods_output_path == irods_path:
+        stored_checksum = res_file._checksum_md5 or None
+    if session is None:
+        res.update_download_count()
+        response = FileResponse(istorage.open(irods_output_path), content_type=mtype)
+        response['Content-Disposition'] = 'attachment; filename="{name}"'.format(
+            name=output_path.split('/')[-1])
+        response['Content-Length'] = istorage.size(irods_output_path)
+        if stored_checksum:
+            response['ETag'] = '"{}"'.format(stored_checksum)
+        return response
+
     # retrieve file size to set up Content-Length header
-    # TODO: standardize this to make it less brittle
-    stdout = session.run("ils", None, "-l", irods_output_path)[0].split()
-    flen = int(stdout[3])
+    stat = streaming.data_object_stat(session, irods_output_path)
+    if not stat.checksum and stored_checksum:
+        # iRODS has not checksummed this data object
+        stat = stat._replace(checksum=stored_checksum)
+    flen = stat.size
 
     # Allow reverse proxy if request was forwarded by nginx (HTTP_X_DJANGO_REVERSE_PROXY='true')
     # and reverse proxy is possible according to configuration (SENDFILE_ON=True)
@@ -387,10 +425,21 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
     # if reverse proxy is enabled, then this is because the resource is remote and federated
     # OR the user specifically requested a non-proxied download.
 
-    options = ('-',)  # we're redirecting to stdout.
-    # this unusual way of calling works for streaming federated or local resources
     if __debug__:
         logger.debug("Locally streaming {}".format(output_path))
+
+    # read the file over a pooled connection when the session is native
+    response = streaming.streaming_response(session, irods_output_path, request, mtype,
+                                            output_path.split('/')[-1], stat=stat)
+    if response is not None:
+        # count resumed downloads once, when their first byte is sent
+        if response.status_code == 200 or \
+                response.get('Content-Range', '').startswith('bytes 0-'):
+            res.update_download_count()
+        return response
+
+    options = ('-',)  # we're redirecting to stdout.
+    # this unusual way of calling works for streaming federated or local resources
     # track download count
     res.update_download_count()
     proc = session.run_safe('iget', None, irods_output_path, *options)
@@ -0,0 +1,174 @@
+"""Folder, single file and bag downloads streamed to the client as zip archives.
+
+Zipped downloads are otherwise made by the create_temp_zip and create_bag_by_irods tasks:
+the zip is written to iRODS, the client polls for it and delete_zip removes it a day
+later.  In streaming mode the archive is instead written into the response as the files
+are read (see django_irods.zipstream), with the same member names ibun would have used:
+
+* a folder is zipped with its files and the aggregation _meta.xml and _resmap.xml files
+  kept among them;
+* a single file {name} is zipped as {name}/{name}, along with {name}_meta.xml and
+  {name}_resmap.xml when it is a single file aggregation;
+* a bag is zipped from the resource collection, with bagit.txt and manifests computed from
+  the files as they are streamed.
+
+Streaming is used when HS_STREAMING_ZIP is True, unless a request opts out of it with
+?streaming=false, and needs the storage access of django_irods.fs_storage or of the
+native session backend; otherwise the tasks are used as before.  Files whose extension is
+in HS_ZIP_STORED_EXTENSIONS, or all files when a request has ?compression=store, are
+stored without compression.
+"""
+
+import hashlib
+import os
+import zipfile
+from contextlib import contextmanager
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from django_irods.zipstream import ZipMember, ZipStream
+from hs_core.hydroshare.incremental_bag import BAGIT_TXT, GENERATED_FILES, bag_store
+
+DEFAULT_STORED_EXTENSIONS = ('.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.jpg',
+                             '.jpeg', '.png', '.gif', '.mp3', '.mp4', '.nc', '.h5', '.hdf5')
+
+
+def streaming_enabled(request):
+    # requests may opt out of streaming, but not into it where it is disabled
+    if request.GET.get('streaming', '').lower() == 'false':
+        return False
+    return getattr(settings, 'HS_STREAMING_ZIP', False)
+
+
+def _compress_type(request, name):
+    if request.GET.get('compression', '').lower() == 'store':
+        return zipfile.ZIP_STORED
+    stored = getattr(settings, 'HS_ZIP_STORED_EXTENSIONS', DEFAULT_STORED_EXTENSIONS)
+    if os.path.splitext(name)[1].lower() in stored:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _HashingReader(object):
+    def __init__(self, source, md5):
+        self.source = source
+        self.md5 = md5
+
+    def read(self, size):
+        data = self.source.read(size)
+        self.md5.update(data)
+        return data
+
+
+@contextmanager
+def _hashing(open_source, md5):
+    with open_source() as source:
+        yield _HashingReader(source, md5)
+
+
+@contextmanager
+def _content(make_content):
+    """Open generated content, computed when the archive reaches it."""
+    yield BytesIO(make_content())
+
+
+def _response(members, filename):
+    response = StreamingHttpResponse(ZipStream(members), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="{name}"'.format(name=filename)
+    return response
+
+
+def _collection_members(request, store, collection, checksums=None):
+    """Members for the data objects and empty collections under collection.
+
+    If checksums is a dict, the md5 of every file is added to it as the file is streamed,
+    keyed by its path relative to collection.
+    """
+    parent = os.path.dirname(collection.rstrip('/'))
+    prefix = os.path.basename(collection.rstrip('/')) + '/'
+    for entry in store.walk(collection):
+        if entry.is_dir:
+            yield ZipMember(entry.name, modified=entry.modified)
+            continue
+        relative = entry.name[len(prefix):]
+        if checksums is not None and relative in GENERATED_FILES:
+            # tag files of an earlier bag are replaced by fresh ones
+            continue
+        open_source = partial(store.open, os.path.join(parent, entry.name), 'rb')
+        if checksums is not None:
+            md5 = checksums[relative] = hashlib.md5()
+            open_source = partial(_hashing, open_source, md5)
+        yield ZipMember(entry.name, open_source, entry.size, entry.modified,
+                        _compress_type(request, entry.name))
+
+
+def _bag_members(request, store, collection):
+    checksums = {}
+    for member in _collection_members(request, store, collection, checksums):
+        yield member
+
+    prefix = os.path.basename(collection.rstrip('/')) + '/'
+
+    def manifest():
+        return ''.join("{}    {}\n".format(checksums[name].hexdigest(), name)
+                       for name in sorted(checksums) if name.startswith('data/'))
+
+    def tag_manifest():
+        lines = ["{}    bagit.txt\n".format(hashlib.md5(BAGIT_TXT).hexdigest()),
+                 "{}    manifest-md5.txt\n".format(hashlib.md5(manifest()).hexdigest())]
+        if 'readme.txt' in checksums:
+            lines.append("{}    readme.txt\n".format(checksums['readme.txt'].hexdigest()))
+        return ''.join(lines)
+
+    # the manifests are computed once all of the files above have been streamed
+    yield ZipMember(prefix + 'bagit.txt', partial(_content, lambda: BAGIT_TXT))
+    yield ZipMember(prefix + 'manifest-md5.txt', partial(_content, manifest))
+    yield ZipMember(prefix + 'tagmanifest-md5.txt', partial(_content, tag_manifest))
+
+
+def zip_response(request, res, irods_path, is_sf_agg_file, is_sf_request):
+    """Return a response streaming the zip of irods_path, or None if it cannot be streamed.
+
+    :param irods_path: path of a folder or file of resource res, with the federation path
+    :param is_sf_agg_file: irods_path is a file that is a single file aggregation
+    :param is_sf_request: irods_path is a file rather than a folder
+    """
+    istorage = res.get_irods_storage()
+    store = bag_store(istorage)
+    if store is None:
+        return None
+
+    if res.resource_type == "CompositeResource":
+        # as create_temp_zip does
+        if '/data/contents/' in irods_path:
+            short_path = irods_path.split('/data/contents/')[1]
+            res.create_aggregation_xml_documents(aggregation_name=short_path)
+        else:
+            res.create_aggregation_xml_documents()
+
+    name = irods_path.rstrip('/').split('/')[-1]
+    if is_sf_request:
+        members = [ZipMember(u'{0}/{0}'.format(name), partial(store.open, irods_path, 'rb'),
+                             compress_type=_compress_type(request, name))]
+        if is_sf_agg_file:
+            for suffix in ('_resmap.xml', '_meta.xml'):
+                if istorage.exists(irods_path + suffix):
+                    members.append(ZipMember(u'{0}/{0}{1}'.format(name, suffix),
+                                             partial(store.open, irods_path + suffix, 'rb')))
+    else:
+        members = _collection_members(request, store, irods_path)
+    return _response(members, name + '.zip')
+
+
+def bag_response(request, res):
+    """Return a response streaming a bag of resource res, or None if it cannot be streamed.
+
+    The bag files (resourcemetadata.xml and resourcemap.xml) must be up to date.
+    """
+    store = bag_store(res.get_irods_storage())
+    if store is None:
+        return None
+    return _response(_bag_members(request, store, res.root_path), res.short_id + '.zip')
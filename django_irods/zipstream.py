@@ -0,0 +1,183 @@
+"""Zip archives written as a stream, for sending to a client as they are made.
+
+zipfile needs to seek back over each member to fill in its checksum and sizes, so it
+cannot write into an HTTP response.  ZipStream writes every member with a data
+descriptor after its data instead, which lets it produce the archive front to back while
+reading one chunk of one member at a time.  ZIP64 records are written for members of
+4 GiB or more, or of unknown size, and for archives that outgrow the classic limits.
+"""
+
+import struct
+import time
+import zlib
+import zipfile
+
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP_MAX = 0xFFFFFFFF
+ZIP_FILECOUNT_LIMIT = 0xFFFF
+
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def dos_date_time(modified):
+    """DOS date and time of seconds since the epoch; zip dates cannot precede 1980."""
+    dt = time.localtime(modified if modified is not None else time.time())
+    if dt.tm_year < 1980:
+        return 0x21, 0  # 1980-01-01 00:00
+    date = (dt.tm_year - 1980) << 9 | dt.tm_mon << 5 | dt.tm_mday
+    dos_time = dt.tm_hour << 11 | dt.tm_min << 5 | (dt.tm_sec // 2)
+    return date, dos_time
+
+
+class ZipMember(object):
+    """A member to be streamed.
+
+    :param name: name in the archive; names of directories end with '/'
+    :param open: callable returning a context manager that yields an object with read(),
+        called when the member is reached; None for directories
+    :param size: size in bytes if known; members of unknown size are written as ZIP64
+    :param modified: seconds since the epoch, or None for now
+    :param compress_type: zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED
+    """
+
+    def __init__(self, name, open=None, size=None, modified=None,
+                 compress_type=zipfile.ZIP_DEFLATED):
+        self.name = name
+        self.open = open
+        self.size = size
+        self.modified = modified
+        self.compress_type = compress_type if open is not None else zipfile.ZIP_STORED
+
+
+class ZipStream(object):
+    """Iterator over the bytes of a zip archive of members, made as it is iterated.
+
+    members may be a generator: each member is only looked at when the archive reaches it.
+    """
+
+    def __init__(self, members, chunk_size=CHUNK_SIZE):
+        self.members = members
+        self.chunk_size = chunk_size
+        self.size = 0
+
+    def __iter__(self):
+        central_directory = []
+        for member in self.members:
+            for data in self._member(member, central_directory):
+                self.size += len(data)
+                yield data
+        for data in self._end(central_directory):
+            self.size += len(data)
+            yield data
+
+    def _member(self, member, central_directory):
+        name = member.name.encode('utf-8') if isinstance(member.name, unicode) else member.name
+        flags = FLAG_DATA_DESCRIPTOR
+        try:
+            name.decode('ascii')
+        except UnicodeDecodeError:
+            flags |= FLAG_UTF8
+        zip64 = member.open is not None and (member.size is None or member.size > ZIP64_LIMIT)
+        date, dos_time = dos_date_time(member.modified)
+        offset = self.size
+
+        extra = b''
+        if zip64:
+            # real sizes follow in the data descriptor
+            extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0)
+        header = struct.pack('<4sHHHHHLLLHH', b'PK\003\004', 45 if zip64 else 20, flags,
+                             member.compress_type, dos_time, date, 0,
+                             ZIP_MAX if zip64 else 0, ZIP_MAX if zip64 else 0,
+                             len(name), len(extra))
+        yield header + name + extra
+
+        crc = 0
+        file_size = 0
+        compress_size = 0
+        if member.open is not None:
+            compressor = None
+            if member.compress_type == zipfile.ZIP_DEFLATED:
+                compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            with member.open() as source:
+                while True:
+                    chunk = source.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    crc = zlib.crc32(chunk, crc)
+                    file_size += len(chunk)
+                    if compressor is not None:
+                        chunk = compressor.compress(chunk)
+                    if chunk:
+                        compress_size += len(chunk)
+                        yield chunk
+            if compressor is not None:
+                chunk = compressor.flush()
+                compress_size += len(chunk)
+                yield chunk
+        crc &= 0xFFFFFFFF
+
+        if zip64:
+            yield struct.pack('<4sLQQ', b'PK\007\010', crc, compress_size, file_size)
+        else:
+            if file_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT:
+                raise zipfile.LargeZipFile("{} is larger than its announced size".format(
+                    member.name))
+            yield struct.pack('<4sLLL', b'PK\007\010', crc, compress_size, file_size)
+
+        central_directory.append((name, flags, member.compress_type, dos_time, date, crc,
+                                  compress_size, file_size, offset, zip64))
+
+    def _end(self, central_directory):
+        start = self.size
+        size = 0
+        buffered = []
+        buffered_size = 0
+        for (name, flags, compress_type, dos_time, date, crc, compress_size, file_size,
+             offset, zip64) in central_directory:
+            extra_fields = []
+            if file_size > ZIP64_LIMIT:
+                extra_fields.append(file_size)
+                file_size = ZIP_MAX
+            if compress_size > ZIP64_LIMIT:
+                extra_fields.append(compress_size)
+                compress_size = ZIP_MAX
+            if offset > ZIP64_LIMIT:
+                extra_fields.append(offset)
+                offset = ZIP_MAX
+            extra = b''
+            if extra_fields:
+                extra = struct.pack('<HH' + 'Q' * len(extra_fields), 0x0001,
+                                    8 * len(extra_fields), *extra_fields)
+            version = 45 if zip64 or extra_fields else 20
+            is_dir = name.endswith(b'/')
+            external_attr = (0o40775 << 16) | 0x10 if is_dir else 0o644 << 16
+            record = struct.pack('<4sBBHHHHHLLLHHHHHLL', b'PK\001\002', version, 3, version,
+                                 flags, compress_type, dos_time, date, crc, compress_size,
+                                 file_size, len(name), len(extra), 0, 0, 0, external_attr,
+                                 offset) + name + extra
+            size += len(record)
+            # central directory records are small; emit them in chunks
+            buffered.append(record)
+            buffered_size += len(record)
+            if buffered_size >= self.chunk_size:
+                yield b''.join(buffered)
+                buffered = []
+                buffered_size = 0
+        if buffered:
+            yield b''.join(buffered)
+
+        count = len(central_directory)
+        end = b''
+        if count > ZIP_FILECOUNT_LIMIT or size > ZIP64_LIMIT or start > ZIP64_LIMIT:
+            zip64_end = start + size
+            end += struct.pack('<4sQHHLLQQQQ', b'PK\006\006', 44, 45, 45, 0, 0, count, count,
+                               size, start)
+            end += struct.pack('<4sLQL', b'PK\006\007', 0, zip64_end, 1)
+            count = min(count, ZIP_FILECOUNT_LIMIT)
+            size = min(size, ZIP_MAX)
+            start = min(start, ZIP_MAX)
+        end += struct.pack('<4s4H2LH', b'PK\005\006', 0, 0, count, count, size, start, 0)
+        yield end
@@ -9,6 +9,7 @@ This code is not a design pattern for actually interacting with communities.
 
 from django.core.management.base import BaseCommand
 from hs_access_control.models.community import Community
+from hs_access_control.models.effective import EffectivePrivilege
 from hs_access_control.models.privilege import PrivilegeCodes, \
         UserGroupPrivilege, UserCommunityPrivilege, GroupCommunityPrivilege
 from hs_access_control.management.utilities import community_from_name_or_id, \
@@ -277,6 +278,7 @@ class Command(BaseCommand):
                     if gcp.allow_view != (not options['prohibit_view']):
                         gcp.allow_view = not options['prohibit_view']
                         gcp.save()
+                        EffectivePrivilege.privilege_changed(group=group, community=community)
                     # pass privilege changes through the privilege system to record provenance.
                     if gcp.privilege != privilege or owner != gcp.grantor:
                         GroupCommunityPrivilege.share(group=group, community=community,
@@ -295,6 +297,7 @@ class Command(BaseCommand):
                     if gcp.allow_view != (not options['prohibit_view']):
                         gcp.allow_view = not options['prohibit_view']
                         gcp.save()
+                        EffectivePrivilege.privilege_changed(group=group, community=community)
 
             elif action == 'remove':
 
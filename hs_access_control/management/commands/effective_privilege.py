@@ -0,0 +1,97 @@
+"""
+This compares the materialized effective privileges of users over resources with
+a fresh computation from the privilege tables, and optionally repairs them.
+
+"""
+
+from django.core.management.base import BaseCommand
+from hs_core.models import BaseResource
+from hs_access_control.models import EffectivePrivilege, PrivilegeCodes
+from hs_access_control.management.utilities import user_from_name
+
+
+def usage():
+    print("effective_privilege usage:")
+    print("  effective_privilege [{username}] [--fix] [--canonical]")
+    print("Where:")
+    print("  {username} is a user name; all users are checked if omitted.")
+    print("  --fix rewrites the rows that differ.")
+    print("  --canonical also checks each row of the user against ResourceAccess.")
+
+
+def describe(key, privilege):
+    user_id, resource_id, via = key
+    return "user id={} resource id={} via {}: {}".format(
+        user_id, resource_id, dict(EffectivePrivilege.VIA_CHOICES)[via],
+        PrivilegeCodes.NAMES[privilege])
+
+
+class Command(BaseCommand):
+    help = """Verify the materialized effective privileges of users over resources."""
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('username', nargs='?', type=str)
+
+        parser.add_argument(
+            '--fix',
+            action='store_true',  # True for presence, False for absence
+            dest='fix',  # value is options['fix']
+            help='rewrite the rows that differ from the computation',
+        )
+
+        parser.add_argument(
+            '--canonical',
+            action='store_true',
+            dest='canonical',
+            help='also compare with the per-resource routines of ResourceAccess',
+        )
+
+    def handle(self, *args, **options):
+
+        users = None
+        user = None
+        if options['username'] is not None:
+            user = user_from_name(options['username'])
+            if user is None:
+                usage()
+                exit(1)
+            users = [user.pk]
+
+        computed = EffectivePrivilege.compute(users=users)
+        stored = dict((key, privilege) for key, (_, privilege)
+                      in EffectivePrivilege.stored(users=users).items())
+
+        differences = 0
+        for key in sorted(set(computed) | set(stored)):
+            expected = computed.get(key, PrivilegeCodes.NONE)
+            found = stored.get(key, PrivilegeCodes.NONE)
+            if expected != found:
+                differences += 1
+                print("stored {}, computed {}".format(describe(key, found),
+                                                      PrivilegeCodes.NAMES[expected]))
+
+        if options['canonical']:
+            if user is None:
+                print("--canonical requires a username.")
+                usage()
+                exit(1)
+            routines = ((EffectivePrivilege.USER, 'get_effective_user_privilege'),
+                        (EffectivePrivilege.GROUP, 'get_effective_group_privilege'),
+                        (EffectivePrivilege.COMMUNITY, 'get_effective_community_privilege'))
+            resource_ids = set(resource_id for _, resource_id, _ in set(computed) | set(stored))
+            for resource in BaseResource.objects.filter(pk__in=resource_ids)\
+                    .select_related('raccess'):
+                for via, routine in routines:
+                    key = (user.pk, resource.pk, via)
+                    expected = getattr(resource.raccess, routine)(user)
+                    found = stored.get(key, PrivilegeCodes.NONE)
+                    if expected != found:
+                        differences += 1
+                        print("stored {}, ResourceAccess {}".format(
+                            describe(key, found), PrivilegeCodes.NAMES[expected]))
+
+        print("{} differences found.".format(differences))
+        if differences and options['fix']:
+            changed = EffectivePrivilege.refresh(users=users)
+            print("{} rows repaired.".format(changed))
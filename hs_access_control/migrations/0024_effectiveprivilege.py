@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0045_resourcefile_checksums'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hs_access_control', '0023_auto_20190131_1523'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePrivilege',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('privilege', models.IntegerField(choices=[(1, b'Owner'), (2, b'Change'), (3, b'View')], editable=False)),
+                ('via', models.IntegerField(choices=[(1, b'User'), (2, b'Group'), (3, b'Community')], editable=False, help_text=b'kind of path through which privilege is held')),
+                ('resource', models.ForeignKey(editable=False, help_text=b'resource to which privilege applies', on_delete=django.db.models.deletion.CASCADE, related_name='r2erp', to='hs_core.BaseResource')),
+                ('user', models.ForeignKey(editable=False, help_text=b'user holding privilege', on_delete=django.db.models.deletion.CASCADE, related_name='u2erp', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='effectiveprivilege',
+            unique_together=set([('user', 'resource', 'via')]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from django.db import migrations
+
+from hs_access_control.models import EffectivePrivilege
+
+
+def populate_effective_privilege(apps, schema_editor):
+    """
+    Compute the materialized effective privileges of all users
+
+    This uses the model itself rather than the historical one, so that the table
+    is computed exactly as it is maintained.
+    """
+    EffectivePrivilege.refresh()
+
+
+def undo_populate_effective_privilege(apps, schema_editor):
+    EffectivePrivilege.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_access_control', '0024_effectiveprivilege'),
+    ]
+
+    operations = [
+        migrations.RunPython(code=populate_effective_privilege,
+                             reverse_code=undo_populate_effective_privilege),
+    ]
@@ -0,0 +1,260 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.db import transaction
+from django.db.models import Q
+
+from hs_core.models import BaseResource
+from hs_access_control import privilege_cache
+from hs_access_control.models.privilege import PrivilegeCodes, UserResourcePrivilege, \
+        GroupResourcePrivilege
+
+#############################################
+# Materialized effective privilege of users over resources
+#
+# Listing the resources of a user from the privilege tables takes a join of
+# user -> group -> community -> group -> resource privileges per privilege code,
+# which is slow for members of large groups.  EffectivePrivilege instead holds one row
+# per (user, resource, via) with the privilege that the user holds over the resource
+# through that path, with resource flags already applied:
+#
+# * via USER: the UserResourcePrivilege of the user;
+# * via GROUP: the least (strongest) GroupResourcePrivilege over the resource of the
+#   active groups of which the user is a member;
+# * via COMMUNITY: the privilege that the user receives through the communities of those
+#   groups, as ResourceAccess.get_effective_community_privilege computes it.
+#
+# CHANGE is reported as VIEW for immutable resources.  The rows are refreshed in the
+# same transaction as the change that affects them: PrivilegeBase.update (and thus every
+# share, unshare and undo_share) calls privilege_changed, ResourceAccess and GroupAccess
+# refresh the rows of their resources when immutable or active change, and
+# UserAccess.delete_group refreshes those of the resources of the deleted group.
+# A refresh also forgets the cached authorization decisions of the users and resources
+# involved (see hs_access_control.privilege_cache).
+# The management command effective_privilege compares the table with a fresh
+# computation and repairs it.
+#############################################
+
+
+def _pk(thing):
+    return getattr(thing, 'pk', thing)
+
+
+def _effective(privilege, immutable):
+    """ Apply the immutable flag of a resource to a privilege over it """
+    if immutable and privilege == PrivilegeCodes.CHANGE:
+        return PrivilegeCodes.VIEW
+    return privilege
+
+
+class EffectivePrivilege(models.Model):
+    """ Effective privilege of a user over a resource through one kind of path
+
+    **This is a system table** maintained by the privilege routines; it is never
+    written by application code.
+    """
+    USER = 1
+    GROUP = 2
+    COMMUNITY = 3
+    VIA_CHOICES = (
+        (USER, 'User'),
+        (GROUP, 'Group'),
+        (COMMUNITY, 'Community')
+    )
+
+    user = models.ForeignKey(User,
+                             null=False,
+                             editable=False,
+                             related_name='u2erp',
+                             help_text='user holding privilege')
+
+    resource = models.ForeignKey(BaseResource,
+                                 null=False,
+                                 editable=False,
+                                 related_name='r2erp',
+                                 help_text='resource to which privilege applies')
+
+    privilege = models.IntegerField(choices=PrivilegeCodes.CHOICES,
+                                    editable=False)
+
+    via = models.IntegerField(choices=VIA_CHOICES,
+                              editable=False,
+                              help_text='kind of path through which privilege is held')
+
+    class Meta:
+        unique_together = ('user', 'resource', 'via')
+
+    def __str__(self):
+        """ Return printed depiction for debugging """
+        return str.format("<user id={} holds {} ({}) over resource id={} via {}>",
+                          str(self.user_id), PrivilegeCodes.NAMES[self.privilege],
+                          str(self.privilege), str(self.resource_id),
+                          dict(self.VIA_CHOICES)[self.via])
+
+    @classmethod
+    def vias(cls, via_user=True, via_group=False, via_community=False):
+        """ Return the codes of the paths selected by the flags """
+        return [via for via, selected in ((cls.USER, via_user),
+                                          (cls.GROUP, via_group),
+                                          (cls.COMMUNITY, via_community)) if selected]
+
+    @classmethod
+    def compute(cls, users=None, resources=None):
+        """
+        Compute effective privileges from the privilege tables
+
+        :param users: ids of users to limit the computation to, or None for all users
+        :param resources: ids of resources to limit the computation to, or None for all
+        :return: dict of {(user id, resource id, via): privilege}
+        """
+        def scope(user_path):
+            kwargs = {}
+            if users is not None:
+                kwargs[user_path + '__in'] = users
+            else:
+                kwargs[user_path + '__isnull'] = False
+            if resources is not None:
+                kwargs['resource__in'] = resources
+            return kwargs
+
+        computed = {}
+
+        # via USER
+        for user_id, resource_id, privilege, immutable in UserResourcePrivilege.objects\
+                .filter(**scope('user'))\
+                .values_list('user_id', 'resource_id', 'privilege',
+                             'resource__raccess__immutable'):
+            computed[(user_id, resource_id, cls.USER)] = _effective(privilege, immutable)
+
+        # via GROUP: the least privilege of active groups of which the user is a member
+        member = 'group__g2ugp__user'
+        for user_id, resource_id, privilege, immutable in GroupResourcePrivilege.objects\
+                .filter(group__gaccess__active=True, **scope(member))\
+                .values_list(member, 'resource_id', 'privilege',
+                             'resource__raccess__immutable'):
+            key = (user_id, resource_id, cls.GROUP)
+            privilege = _effective(privilege, immutable)
+            if computed.get(key, PrivilegeCodes.NONE) > privilege:
+                computed[key] = privilege
+
+        # via COMMUNITY: as ResourceAccess.__get_raw_community_privilege, CHANGE only if both
+        # the least group privilege and the least community privilege are CHANGE.
+        member = 'group__g2gcp__community__c2gcp__group__g2ugp__user'
+        community_privilege = 'group__g2gcp__community__c2gcp__privilege'
+        least = defaultdict(lambda: [PrivilegeCodes.NONE, PrivilegeCodes.NONE, False])
+        for user_id, resource_id, privilege, cprivilege, immutable in GroupResourcePrivilege\
+                .objects\
+                .filter(Q(group__gaccess__active=True,
+                          group__g2gcp__allow_view=True,
+                          **scope(member)) |
+                        Q(group__gaccess__active=True,
+                          privilege=PrivilegeCodes.CHANGE,
+                          group__g2gcp__community__c2gcp__privilege=PrivilegeCodes.CHANGE,
+                          **scope(member)))\
+                .values_list(member, 'resource_id', 'privilege', community_privilege,
+                             'resource__raccess__immutable'):
+            row = least[(user_id, resource_id, cls.COMMUNITY)]
+            row[0] = min(row[0], privilege)
+            row[1] = min(row[1], cprivilege)
+            row[2] = immutable
+        for key, (privilege, cprivilege, immutable) in least.items():
+            if privilege == PrivilegeCodes.CHANGE and cprivilege == PrivilegeCodes.CHANGE:
+                computed[key] = _effective(PrivilegeCodes.CHANGE, immutable)
+            else:
+                computed[key] = PrivilegeCodes.VIEW
+
+        return computed
+
+    @classmethod
+    def stored(cls, users=None, resources=None):
+        """ Return the rows within a scope, as compute does, with their ids """
+        rows = cls.objects.all()
+        if users is not None:
+            rows = rows.filter(user__in=users)
+        if resources is not None:
+            rows = rows.filter(resource__in=resources)
+        return dict(((user_id, resource_id, via), (pk, privilege))
+                    for pk, user_id, resource_id, via, privilege
+                    in rows.values_list('pk', 'user_id', 'resource_id', 'via', 'privilege'))
+
+    @classmethod
+    def refresh(cls, users=None, resources=None):
+        """
+        Bring the rows of the given users and resources up to date
+
+        :param users: ids or instances of users, or None for all users
+        :param resources: ids or instances of resources, or None for all resources
+        :return: the number of rows created, changed or removed
+
+        With no arguments, this rebuilds the whole table.
+        """
+        if users is not None:
+            users = [_pk(u) for u in users]
+        if resources is not None:
+            resources = [_pk(r) for r in resources]
+        if users == [] or resources == []:
+            return 0
+
+        with transaction.atomic():
+            computed = cls.compute(users=users, resources=resources)
+            stored = cls.stored(users=users, resources=resources)
+            stale = [pk for key, (pk, _) in stored.items() if key not in computed]
+            changed = defaultdict(list)
+            new = []
+            for key, privilege in computed.items():
+                if key not in stored:
+                    user_id, resource_id, via = key
+                    new.append(cls(user_id=user_id, resource_id=resource_id, via=via,
+                                   privilege=privilege))
+                elif stored[key][1] != privilege:
+                    changed[privilege].append(stored[key][0])
+            if stale:
+                cls.objects.filter(pk__in=stale).delete()
+            for privilege, pks in changed.items():
+                cls.objects.filter(pk__in=pks).update(privilege=privilege)
+            cls.objects.bulk_create(new)
+            privilege_cache.invalidate(users=users, resources=resources)
+        return len(stale) + sum(len(pks) for pks in changed.values()) + len(new)
+
+    @classmethod
+    def group_resources(cls, group):
+        """ Return the ids of the resources whose rows depend upon a group """
+        return list(GroupResourcePrivilege.objects
+                    .filter(Q(group=group) | Q(group__g2gcp__community__c2gcp__group=group))
+                    .values_list('resource_id', flat=True).distinct())
+
+    @classmethod
+    def privilege_changed(cls, **kwargs):
+        """
+        Refresh the rows affected by a change in a privilege record
+
+        This takes the keys of the record, as PrivilegeBase.update does:
+
+            * privilege_changed(user={X}, resource={Y})
+            * privilege_changed(group={X}, resource={Y})
+            * privilege_changed(user={X}, group={Y})
+            * privilege_changed(user={X}, community={Y})
+            * privilege_changed(group={X}, community={Y})
+
+        For changes of many records, as in PrivilegeBase.bulk_update, each key may be
+        a list of keys, and the rows of every combination of them are refreshed.
+
+        **This is a system routine** called by PrivilegeBase.update.
+        """
+        keys = dict((name, list(value) if isinstance(value, (list, tuple, set)) else [value])
+                    for name, value in kwargs.items())
+        if 'resource' in keys:
+            if 'user' in keys:
+                cls.refresh(users=keys['user'], resources=keys['resource'])
+            else:
+                cls.refresh(resources=keys['resource'])
+        elif 'group' in keys and 'user' in keys:
+            cls.refresh(users=keys['user'])
+        elif 'group' in keys and 'community' in keys:
+            # the resources of the groups, and those that their members see in the communities
+            cls.refresh(resources=GroupResourcePrivilege.objects
+                        .filter(Q(group__in=keys['group']) |
+                                Q(group__g2gcp__community__in=keys['community']))
+                        .values_list('resource_id', flat=True).distinct())
+        # user privileges over communities do not confer privilege over resources
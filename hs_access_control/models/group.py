@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User, Group
 from django.db import models
+from django.db import transaction
 from django.db.models import Q, F
 
 from hs_core.models import BaseResource
@@ -80,6 +81,23 @@ class GroupAccess(models.Model):
     date_created = models.DateTimeField(editable=False, auto_now_add=True)
     picture = models.ImageField(upload_to='group', null=True, blank=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(GroupAccess, cls).from_db(db, field_names, values)
+        # remember the stored flag to notice changes in save
+        instance._saved_active = dict(zip(field_names, values)).get('active')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """ Save flags; refresh the effective privileges of members if active changed """
+        from hs_access_control.models.effective import EffectivePrivilege
+        with transaction.atomic():
+            super(GroupAccess, self).save(*args, **kwargs)
+            if self.active != getattr(self, '_saved_active', True):
+                EffectivePrivilege.refresh(
+                    resources=EffectivePrivilege.group_resources(self.group_id))
+        self._saved_active = self.active
+
     ####################################
     # group membership: owners, edit_users, view_users are parallel to those in resources
     ####################################
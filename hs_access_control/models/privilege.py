@@ -109,7 +109,11 @@ class PrivilegeBase(models.Model):
         There are no access control rules applied; this routine is unconditional.
         Only use this routine if you wish to completely bypass access control.
         Note also that using this routine directly breaks provenance and disables undo.
+
+        The materialized EffectivePrivilege rows affected by the change are refreshed
+        in the same transaction.
         """
+        from hs_access_control.models.effective import EffectivePrivilege
         grantor = kwargs['grantor']
         privilege = kwargs.get('privilege', None)
         if privilege is not None and privilege < PrivilegeCodes.NONE:
@@ -124,12 +128,15 @@ class PrivilegeBase(models.Model):
                     record.privilege = privilege
                     record.grantor = grantor
                     record.save()
+                EffectivePrivilege.privilege_changed(**kwargs)
         else:
             if 'privilege' in kwargs:
                 del kwargs['privilege']
             del kwargs['grantor']
-            cls.objects.filter(**kwargs) \
-               .delete()
+            with transaction.atomic():
+                cls.objects.filter(**kwargs) \
+                   .delete()
+                EffectivePrivilege.privilege_changed(**kwargs)
 
     @classmethod
     def share(cls, **kwargs):
@@ -179,6 +186,62 @@ class PrivilegeBase(models.Model):
         """
         cls.update(cls, privilege=PrivilegeCodes.NONE, **kwargs)
 
+    @classmethod
+    def bulk_update(cls, records, privilege, grantor, provenance):
+        """
+        Update the privilege records of many pairs of keys at once, with their provenance.
+
+        :param records: list of dicts of keys, e.g., [{'user': {X}, 'resource': {Y}}, ...]
+        :param privilege: privilege to assign to every pair; PrivilegeCodes.NONE removes it.
+        :param grantor: user who requested privilege.
+        :param provenance: the provenance model matching this privilege model.
+
+        Every pair ends up as after update() and a provenance update of that pair, so that
+        undo is unaffected, but privileges are written with one UPDATE, DELETE or INSERT,
+        and provenance with one INSERT, in one transaction.
+
+        **This is a system routine** and not recommended for use in application code.
+        There are no access control rules applied; this routine is unconditional.
+        """
+        from django.utils.timezone import now
+        from hs_access_control.models.effective import EffectivePrivilege
+        if not records:
+            return
+        names = sorted(records[0])
+        pks = []
+        seen = set()
+        for record in records:
+            pair = tuple(getattr(record[name], 'pk', record[name]) for name in names)
+            if pair not in seen:
+                seen.add(pair)
+                pks.append(pair)
+
+        existing = {}
+        query = dict((name + '__in', set(key[i] for key in pks))
+                     for i, name in enumerate(names))
+        for row in cls.objects.filter(**query)\
+                .values_list('pk', *[name + '_id' for name in names]):
+            existing[tuple(row[1:])] = row[0]
+
+        with transaction.atomic():
+            found = [existing[key] for key in pks if key in existing]
+            if privilege is not None and privilege < PrivilegeCodes.NONE:
+                cls.objects.filter(pk__in=found)\
+                    .update(privilege=privilege, grantor=grantor, start=now())
+                cls.objects.bulk_create([
+                    cls(privilege=privilege, grantor=grantor,
+                        **dict((name + '_id', pk) for name, pk in zip(names, key)))
+                    for key in pks if key not in existing])
+            else:
+                cls.objects.filter(pk__in=found).delete()
+            provenance.objects.bulk_create([
+                provenance(privilege=privilege, grantor=grantor, undone=False,
+                           **dict((name + '_id', pk) for name, pk in zip(names, key)))
+                for key in pks])
+            EffectivePrivilege.privilege_changed(
+                **dict((name, sorted(set(key[i] for key in pks)))
+                       for i, name in enumerate(names)))
+
 
 class UserGroupPrivilege(PrivilegeBase):
     """ Privileges of a user over a group
@@ -502,6 +565,23 @@ class UserResourcePrivilege(PrivilegeBase):
         # post to privilege table.
         cls.update(user=r.user, resource=r.resource, privilege=r.privilege, grantor=r.grantor)
 
+    @classmethod
+    def bulk_share(cls, records, privilege, grantor):
+        """
+        Share or unshare many resources with many users and update provenance
+
+        ***This completely bypasses access control*** but keeps provenance in sync.
+
+        :param records: list of dicts {'user': {X}, 'resource': {Y}}
+        :param privilege: privilege 1-4; PrivilegeCodes.NONE unshares.
+        :param grantor: user who requested privilege.
+
+        This is equivalent to a share or unshare of each pair; see PrivilegeBase.bulk_update.
+        """
+        # prevent import loops
+        from hs_access_control.models.provenance import UserResourceProvenance
+        cls.bulk_update(records, privilege, grantor, UserResourceProvenance)
+
     @classmethod
     def get_undo_users(cls, **kwargs):
         """ Get a set of users for which the current user can undo privilege
@@ -653,6 +733,23 @@ class GroupResourcePrivilege(PrivilegeBase):
         r = GroupResourceProvenance.get_current_record(**kwargs)
         cls.update(group=r.group, resource=r.resource, privilege=r.privilege, grantor=r.grantor)
 
+    @classmethod
+    def bulk_share(cls, records, privilege, grantor):
+        """
+        Share or unshare many resources with many groups and update provenance
+
+        ***This completely bypasses access control*** but keeps provenance in sync.
+
+        :param records: list of dicts {'group': {X}, 'resource': {Y}}
+        :param privilege: privilege 2-4; PrivilegeCodes.NONE unshares.
+        :param grantor: user who requested privilege.
+
+        This is equivalent to a share or unshare of each pair; see PrivilegeBase.bulk_update.
+        """
+        # prevent import loops
+        from hs_access_control.models.provenance import GroupResourceProvenance
+        cls.bulk_update(records, privilege, grantor, GroupResourceProvenance)
+
     @classmethod
     def get_undo_groups(cls, **kwargs):
         """ Get a set of groups for which the current user can undo privilege
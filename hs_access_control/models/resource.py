@@ -1,9 +1,11 @@
 from django.contrib.auth.models import User, Group
 from django.db import models
+from django.db import transaction
 from django.db.models import Q, Subquery
 from django.core.exceptions import PermissionDenied
 
 from hs_core.models import BaseResource
+from hs_access_control import privilege_cache
 from hs_access_control.models.privilege import PrivilegeCodes as PC, \
         UserResourcePrivilege, GroupResourcePrivilege
 
@@ -49,6 +51,26 @@ class ResourceAccess(models.Model):
                                                      help_text='whether to require agreement to '
                                                                'resource rights statement for '
                                                                'resource content downloads')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(ResourceAccess, cls).from_db(db, field_names, values)
+        # remember the stored flag to notice changes in save
+        instance._saved_immutable = dict(zip(field_names, values)).get('immutable')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save flags; refresh the effective privileges over the resource if immutable changed,
+        and forget cached authorization decisions about it.
+        """
+        from hs_access_control.models.effective import EffectivePrivilege
+        with transaction.atomic():
+            super(ResourceAccess, self).save(*args, **kwargs)
+            if self.immutable != getattr(self, '_saved_immutable', False):
+                EffectivePrivilege.refresh(resources=[self.resource_id])
+            privilege_cache.invalidate(resources=[self.resource_id])
+        self._saved_immutable = self.immutable
     #############################################
     # workalike queries adapt to old access control system
     #############################################
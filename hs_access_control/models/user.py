@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User, Group
 from django.db import models
+from django.db import transaction
 from django.db.models import Q, Subquery
 from django.core.exceptions import PermissionDenied
 
@@ -240,7 +241,11 @@ class UserAccess(models.Model):
             # GroupResourcePrivilege.objects.filter(group=this_group).delete()
             # access_group.delete()
 
-            this_group.delete()
+            from hs_access_control.models.effective import EffectivePrivilege
+            with transaction.atomic():
+                resources = EffectivePrivilege.group_resources(this_group)
+                this_group.delete()
+                EffectivePrivilege.refresh(resources=resources)
         else:
             raise PermissionDenied("User must own group")
 
@@ -1307,6 +1312,57 @@ class UserAccess(models.Model):
             else:
                 return BaseResource.objects.none()
 
+    def get_effective_resource_privileges(self, via_user=True, via_group=False,
+                                          via_community=False):
+        """
+        Get the combined privilege of the user over each resource that the user can access
+
+        :param via_user: True to incorporate user privilege
+        :param via_group: True to incorporate group privilege
+        :param via_community: True to incorporate member group privileges
+
+        Returns: QuerySet of dicts {'resource': resource id, 'privilege': privilege code}
+
+        This reads the materialized EffectivePrivilege table, so that it takes one
+        query regardless of the number of groups and communities involved. As in
+        get_resources_with_explicit_access, the lowest privilege number (highest privilege)
+        over the selected paths wins, and immutable resources have VIEW rather than CHANGE.
+        """
+        from hs_access_control.models.effective import EffectivePrivilege
+        if not self.user.is_active:
+            raise PermissionDenied("Requesting user is not active")
+
+        return EffectivePrivilege.objects\
+            .filter(user=self.user,
+                    via__in=EffectivePrivilege.vias(via_user, via_group, via_community))\
+            .values('resource')\
+            .annotate(privilege=models.Min('privilege'))\
+            .order_by()
+
+    def get_resources_with_effective_privilege(self, this_privilege, via_user=True,
+                                               via_group=False, via_community=False):
+        """
+        Get a list of resources over which the combined privilege of the user is this_privilege
+
+        :param this_privilege: A privilege code 1-3
+        :param via_user: True to incorporate user privilege
+        :param via_group: True to incorporate group privilege
+        :param via_community: True to incorporate member group privileges
+
+        Returns: list of resource objects (QuerySet)
+
+        This is the counterpart of get_resources_with_explicit_access that reads
+        the materialized EffectivePrivilege table rather than joining privileges.
+        """
+        if __debug__:
+            assert this_privilege >= PrivilegeCodes.OWNER and this_privilege <= PrivilegeCodes.VIEW
+
+        privileges = self.get_effective_resource_privileges(via_user=via_user,
+                                                            via_group=via_group,
+                                                            via_community=via_community)
+        return BaseResource.objects.filter(
+            pk__in=privileges.filter(privilege=this_privilege).values('resource'))
+
     #############################################
     # Check access permissions for self (user)
     #############################################
@@ -1932,6 +1988,274 @@ class UserAccess(models.Model):
             raise PermissionDenied("Insufficient privilege to unshare resource")
         return True
 
+    ######################################
+    # share and unshare many resources at once
+    ######################################
+
+    def __check_share_resources(self, these_resources, this_privilege):
+        """
+        Raise exception unless the current user can share all of these resources at a
+        given privilege, as __check_share_resource does when no target user is given.
+
+        :param these_resources: resources to check
+        :param this_privilege: privilege to assign
+        :return: dict of {resource id: effective privilege of the current user}, or None
+                 for an administrator, for the checks that depend upon the target.
+
+        This takes a constant number of queries.
+        """
+        if self.user.is_superuser:
+            return None  # admin can do anything
+
+        privileges = dict((p['resource'], p['privilege'])
+                          for p in self.get_effective_resource_privileges(
+                              via_user=True, via_group=True, via_community=True)
+                          .filter(resource__in=these_resources))
+        shareable = dict(BaseResource.objects.filter(pk__in=[r.pk for r in these_resources])
+                         .values_list('pk', 'raccess__shareable'))
+        for this_resource in these_resources:
+            grantor_priv = privileges.get(this_resource.pk, PrivilegeCodes.NONE)
+            if grantor_priv == PrivilegeCodes.OWNER:
+                continue  # owner can do anything
+            if not shareable.get(this_resource.pk):
+                raise PermissionDenied("User must own resource {} or have sharing privilege"
+                                       .format(this_resource.short_id))
+            if grantor_priv > PrivilegeCodes.VIEW:
+                raise PermissionDenied("User has no privilege over resource {}"
+                                       .format(this_resource.short_id))
+            if grantor_priv > this_privilege:
+                raise PermissionDenied("User has insufficient privilege over resource {}"
+                                       .format(this_resource.short_id))
+        return privileges
+
+    def __owner_counts(self, these_resources):
+        """ Return {resource id: number of owners} of these resources """
+        return dict(UserResourcePrivilege.objects
+                    .filter(resource__in=these_resources, privilege=PrivilegeCodes.OWNER)
+                    .values('resource')
+                    .annotate(n=models.Count('id'))
+                    .values_list('resource', 'n'))
+
+    def __check_remove_owner(self, this_resource, this_user, owners, removed):
+        """
+        Raise exception if removing ownership of this_user, after removing that of
+        removed other owners, leaves this_resource without an owner or its quota holder
+        without ownership.
+        """
+        if owners.get(this_resource.pk, 0) - removed < 1:
+            raise PermissionDenied("Cannot remove sole owner of resource {}"
+                                   .format(this_resource.short_id))
+        qholder = this_resource.get_quota_holder()
+        if qholder and qholder == this_user:
+            raise PermissionDenied("Cannot remove the quota holder of resource {} from "
+                                   "ownership".format(this_resource.short_id))
+
+    def share_resources_with_users(self, these_resources, these_users, this_privilege):
+        """
+        Share each of a set of resources with each of a set of users
+
+        :param these_resources: resources to share
+        :param these_users: users with whom to share them
+        :param this_privilege: privilege to assign: 1-3
+        :return: the number of (resource, user) pairs shared
+
+        This applies the rules of share_resource_with_user to every pair, with a
+        constant number of queries, and shares either every pair or, if any pair cannot
+        be shared, none of them.  Pairs in which the user already holds this_privilege
+        are left alone rather than refused.  Privileges and provenance are written in
+        bulk, so that each pair can be undone as after share_resource_with_user.
+        """
+        from hs_access_control.models.effective import EffectivePrivilege
+        if __debug__:  # during testing only, check argument types and preconditions
+            assert this_privilege >= PrivilegeCodes.OWNER and this_privilege <= PrivilegeCodes.VIEW
+
+        these_resources = list(these_resources)
+        these_users = list(these_users)
+        if not self.user.is_active:
+            raise PermissionDenied("Requesting user is not active")
+        for this_user in these_users:
+            if not this_user.is_active:
+                raise PermissionDenied("Target user {} is not active".format(this_user.username))
+
+        grantor_privs = self.__check_share_resources(these_resources, this_privilege)
+        held = dict(((u, r), p) for u, r, p in UserResourcePrivilege.objects
+                    .filter(user__in=these_users, resource__in=these_resources)
+                    .values_list('user_id', 'resource_id', 'privilege'))
+        # targets are considered to have only user privilege, as in __check_share_resource
+        grantee_privs = dict(((u, r), p) for u, r, p in EffectivePrivilege.objects
+                             .filter(via=EffectivePrivilege.USER,
+                                     user__in=these_users, resource__in=these_resources)
+                             .values_list('user_id', 'resource_id', 'privilege'))
+        owners = self.__owner_counts(these_resources)
+
+        records = []
+        for this_resource in these_resources:
+            removed = 0
+            for this_user in these_users:
+                key = (this_user.pk, this_resource.pk)
+                if held.get(key) == this_privilege:
+                    continue
+                grantee_priv = grantee_privs.get(key, PrivilegeCodes.NONE)
+                if grantor_privs is not None and \
+                        grantor_privs.get(this_resource.pk) != PrivilegeCodes.OWNER:
+                    if grantee_priv == this_privilege:
+                        raise PermissionDenied("Non-owners cannot reshare at existing privilege")
+                    if this_privilege > grantee_priv and this_user != self.user:
+                        raise PermissionDenied("Non-owners cannot decrease privileges for others")
+                if grantee_priv == PrivilegeCodes.OWNER and this_privilege != PrivilegeCodes.OWNER:
+                    removed += 1
+                    self.__check_remove_owner(this_resource, this_user, owners, removed)
+                records.append({'user': this_user, 'resource': this_resource})
+
+        UserResourcePrivilege.bulk_share(records, this_privilege, self.user)
+        return len(records)
+
+    def unshare_resources_with_users(self, these_resources, these_users):
+        """
+        Remove each of a set of users from access to each of a set of resources
+
+        :param these_resources: resources to unshare
+        :param these_users: users with which to unshare them
+        :return: the number of (resource, user) pairs unshared
+
+        This applies the rules of unshare_resource_with_user to every pair, with a
+        constant number of queries, and unshares either every pair or none of them.
+        Pairs in which the user holds no privilege of its own are left alone.
+        """
+        these_resources = list(these_resources)
+        these_users = list(these_users)
+        if not self.user.is_active:
+            raise PermissionDenied("Requesting user is not active")
+        for this_user in these_users:
+            if not this_user.is_active:
+                raise PermissionDenied("Target user {} is not active".format(this_user.username))
+
+        held = dict(((u, r), p) for u, r, p in UserResourcePrivilege.objects
+                    .filter(user__in=these_users, resource__in=these_resources)
+                    .values_list('user_id', 'resource_id', 'privilege'))
+        owned = set(UserResourcePrivilege.objects
+                    .filter(user=self.user, resource__in=these_resources,
+                            privilege=PrivilegeCodes.OWNER)
+                    .values_list('resource_id', flat=True))
+        owners = self.__owner_counts(these_resources)
+
+        records = []
+        for this_resource in these_resources:
+            removed = 0
+            for this_user in these_users:
+                privilege = held.get((this_user.pk, this_resource.pk))
+                if privilege is None:
+                    continue
+                if not self.user.is_superuser and this_resource.pk not in owned \
+                        and this_user != self.user:
+                    raise PermissionDenied("You do not have permission to remove the sharing "
+                                           "of resource {}".format(this_resource.short_id))
+                if privilege == PrivilegeCodes.OWNER:
+                    removed += 1
+                    self.__check_remove_owner(this_resource, this_user, owners, removed)
+                records.append({'user': this_user, 'resource': this_resource})
+
+        UserResourcePrivilege.bulk_share(records, PrivilegeCodes.NONE, self.user)
+        return len(records)
+
+    def share_resources_with_groups(self, these_resources, these_groups, this_privilege):
+        """
+        Share each of a set of resources with each of a set of groups
+
+        :param these_resources: resources to share
+        :param these_groups: groups with which to share them
+        :param this_privilege: privilege to assign: 2-3
+        :return: the number of (resource, group) pairs shared
+
+        This applies the rules of share_resource_with_group to every pair, with a
+        constant number of queries, and shares either every pair or none of them.
+        Pairs in which the group already holds this_privilege are left alone rather
+        than refused.
+        """
+        if this_privilege == PrivilegeCodes.OWNER:
+            raise PermissionDenied("Groups cannot own resources")
+        if this_privilege < PrivilegeCodes.OWNER or this_privilege > PrivilegeCodes.VIEW:
+            raise PermissionDenied("Privilege level not valid")
+
+        these_resources = list(these_resources)
+        these_groups = list(these_groups)
+        if not self.user.is_active:
+            raise PermissionDenied("Requesting user is not active")
+        inactive = Group.objects.filter(pk__in=[g.pk for g in these_groups],
+                                        gaccess__active=False)
+        if inactive.exists():
+            raise PermissionDenied("Group to share with is not active")
+
+        self.__check_share_resources(these_resources, this_privilege)
+        if not self.user.is_superuser:
+            # members, and members of groups with CHANGE over a community of the group
+            allowed = set(UserGroupPrivilege.objects
+                          .filter(user=self.user, group__in=these_groups)
+                          .values_list('group_id', flat=True))
+            allowed.update(GroupCommunityPrivilege.objects
+                           .filter(privilege=PrivilegeCodes.CHANGE,
+                                   community__c2gcp__group__in=these_groups,
+                                   group__g2ugp__user=self.user)
+                           .values_list('community__c2gcp__group', flat=True))
+            for this_group in these_groups:
+                if this_group.pk not in allowed:
+                    raise PermissionDenied("User is not a member of group {} and not an admin"
+                                           .format(this_group.name))
+
+        held = dict(((g, r), p) for g, r, p in GroupResourcePrivilege.objects
+                    .filter(group__in=these_groups, resource__in=these_resources)
+                    .values_list('group_id', 'resource_id', 'privilege'))
+        records = [{'group': this_group, 'resource': this_resource}
+                   for this_resource in these_resources
+                   for this_group in these_groups
+                   if held.get((this_group.pk, this_resource.pk)) != this_privilege]
+
+        GroupResourcePrivilege.bulk_share(records, this_privilege, self.user)
+        return len(records)
+
+    def unshare_resources_with_groups(self, these_resources, these_groups):
+        """
+        Remove each of a set of groups from access to each of a set of resources
+
+        :param these_resources: resources to unshare
+        :param these_groups: groups with which to unshare them
+        :return: the number of (resource, group) pairs unshared
+
+        This applies the rules of unshare_resource_with_group to every pair, with a
+        constant number of queries, and unshares either every pair or none of them.
+        Pairs in which the group holds no privilege are left alone.
+        """
+        these_resources = list(these_resources)
+        these_groups = list(these_groups)
+        if not self.user.is_active:
+            raise PermissionDenied("Requesting user is not active")
+        inactive = Group.objects.filter(pk__in=[g.pk for g in these_groups],
+                                        gaccess__active=False)
+        if inactive.exists():
+            raise PermissionDenied("Group is not active")
+
+        held = set(GroupResourcePrivilege.objects
+                   .filter(group__in=these_groups, resource__in=these_resources)
+                   .values_list('group_id', 'resource_id'))
+        if not self.user.is_superuser:
+            owned = set(UserResourcePrivilege.objects
+                        .filter(user=self.user, resource__in=these_resources,
+                                privilege=PrivilegeCodes.OWNER)
+                        .values_list('resource_id', flat=True))
+            for this_resource in these_resources:
+                if this_resource.pk not in owned and \
+                        any((g.pk, this_resource.pk) in held for g in these_groups):
+                    raise PermissionDenied("Insufficient privilege to unshare resource {}"
+                                           .format(this_resource.short_id))
+
+        records = [{'group': this_group, 'resource': this_resource}
+                   for this_resource in these_resources
+                   for this_group in these_groups
+                   if (this_group.pk, this_resource.pk) in held]
+
+        GroupResourcePrivilege.bulk_share(records, PrivilegeCodes.NONE, self.user)
+        return len(records)
+
     def get_resource_unshare_users(self, this_resource):
         """
         Get a list of users who could be unshared from this resource.
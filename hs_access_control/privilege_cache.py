@@ -0,0 +1,155 @@
+"""Cache of the authorization decisions of users over resources.
+
+hs_core.views.utils.authorize runs for almost every resource view, download, folder listing
+and REST call, often several times per request for the same user and resource, and each
+uaccess.can_view_resource, can_change_resource, ... it calls queries user, group and
+community privileges in turn.  decide() caches its decisions keyed by (user, resource) at
+two levels, as django_irods.avu_cache does for AVUs:
+
+* a request-scoped store that lives from ``request_started`` to ``request_finished``, so
+  repeated checks inside one request cost nothing;
+* a shared store in the Django cache, enabled by setting ``PRIVILEGE_CACHE_TIMEOUT`` to a
+  positive number of seconds.  Since a revoked privilege must be forgotten by every
+  process at once, this store is only used when the default cache backend is shared by
+  all web and celery processes (see hs_core.shared_cache).
+
+Shared entries are versioned rather than deleted, as hs_core.aggregation_index does: each
+user and each resource has a version token in the Django cache, and an entry is only found
+under the tokens it was computed with.  invalidate() replaces the tokens.  It is called by
+EffectivePrivilege.refresh, through which every change of privilege, group activity and
+immutability passes, and by ResourceAccess.save, since every resource flag bears on the
+decisions.  Tokens are replaced at once and again when the transaction commits, so that a
+decision computed concurrently from the data before the commit is not found afterwards.
+"""
+
+import threading
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.core.signals import request_started, request_finished
+from django.db import transaction
+
+from hs_core import shared_cache
+
+_local = threading.local()
+
+ALL = 'all'
+
+
+def _request_store():
+    """Return the decision store of the current request, or None outside of a request."""
+    return getattr(_local, 'store', None)
+
+
+def _begin_request(**kwargs):
+    _local.store = {}
+
+
+def _end_request(**kwargs):
+    _local.store = None
+
+
+request_started.connect(_begin_request, dispatch_uid='hs_access_control_privilege_cache_begin')
+request_finished.connect(_end_request, dispatch_uid='hs_access_control_privilege_cache_end')
+
+
+def _shared_timeout():
+    return shared_cache.timeout('PRIVILEGE_CACHE_TIMEOUT')
+
+
+def _version_key(kind, pk):
+    return u'privilege_cache:{}:{}'.format(kind, pk)
+
+
+def _versions(user_pk, resource_pk):
+    """Return the current version tokens that entries of user and resource depend upon."""
+    keys = [_version_key(ALL, ''), _version_key('user', user_pk),
+            _version_key('resource', resource_pk)]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            # never invalidated, or evicted from the cache: entries cached before now are stale
+            version = uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions.append(version)
+    return versions
+
+
+def _store_key(user, resource):
+    return (user.pk, user.is_superuser, resource.pk)
+
+
+def _shared_key(user, resource):
+    return u'privilege_cache:{}:{}:{}:{}'.format(
+        user.pk, int(user.is_superuser), resource.pk,
+        ':'.join(_versions(user.pk, resource.pk)))
+
+
+def decide(user, resource, action, compute):
+    """Return the cached decision of whether user may take action on resource.
+
+    :param user: an active, authenticated user
+    :param resource: the resource
+    :param action: a hashable name of the action, e.g. an ACTION_TO_AUTHORIZE value
+    :param compute: a callable returning the decision when it is not cached
+    """
+    store = _request_store()
+    entry = store.get(_store_key(user, resource)) if store is not None else None
+    if entry is not None and action in entry:
+        return entry[action]
+
+    shared_key = None
+    if _shared_timeout() > 0:
+        shared_key = _shared_key(user, resource)
+        shared = cache.get(shared_key)
+        if shared is not None:
+            if entry is None:
+                entry = shared
+            else:
+                entry.update(shared)
+    if entry is None:
+        entry = {}
+    if store is not None:
+        store[_store_key(user, resource)] = entry
+    if action in entry:
+        return entry[action]
+
+    entry[action] = compute()
+    if shared_key is not None:
+        cache.set(shared_key, entry, _shared_timeout())
+    return entry[action]
+
+
+def _replace_versions(users, resources):
+    if users is None and resources is None:
+        cache.set(_version_key(ALL, ''), uuid4().hex, None)
+        return
+    for user_pk in users or ():
+        cache.set(_version_key('user', user_pk), uuid4().hex, None)
+    for resource_pk in resources or ():
+        cache.set(_version_key('resource', resource_pk), uuid4().hex, None)
+
+
+def invalidate(users=None, resources=None):
+    """Forget the decisions about the users and resources with the given ids.
+
+    With no arguments, every decision is forgotten.
+    """
+    users = list(users) if users is not None else None
+    resources = list(resources) if resources is not None else None
+
+    store = _request_store()
+    if store is not None:
+        if users is None and resources is None:
+            store.clear()
+        else:
+            for key in list(store):
+                user_pk, _, resource_pk = key
+                if user_pk in (users or ()) or resource_pk in (resources or ()):
+                    del store[key]
+
+    _replace_versions(users, resources)
+    transaction.on_commit(lambda: _replace_versions(users, resources))
@@ -0,0 +1,134 @@
+from django.test import TestCase
+from django.contrib.auth.models import Group
+from django.core.exceptions import PermissionDenied
+
+from hs_access_control.models import PrivilegeCodes, EffectivePrivilege, \
+    UserResourcePrivilege, GroupResourcePrivilege, UserResourceProvenance
+from hs_access_control.tests.utilities import global_reset
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestBulkShare(MockIRODSTestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(TestBulkShare, self).setUp()
+        global_reset()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+
+        self.dog = hydroshare.create_account(
+            'dog@gmail.com',
+            username='dog',
+            first_name='a little arfer',
+            last_name='last_name_dog',
+            superuser=False,
+            groups=[]
+        )
+
+        self.cat = hydroshare.create_account(
+            'cat@gmail.com',
+            username='cat',
+            first_name='not a dog',
+            last_name='last_name_cat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.bat = hydroshare.create_account(
+            'bat@gmail.com',
+            username='bat',
+            first_name='not a cat',
+            last_name='last_name_bat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.cats = self.cat.uaccess.create_group(
+            title='cats',
+            description="This is the cats group",
+            purpose="Our purpose to collaborate on begging.")
+
+        self.holes = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.dog,
+            title='all about dog holes',
+            metadata=[],
+        )
+
+        self.bones = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.dog,
+            title='all about dog bones',
+            metadata=[],
+        )
+
+        self.posts = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.cat,
+            title='all about scratching posts',
+            metadata=[],
+        )
+
+    def assertSynchronized(self):
+        stored = dict((key, privilege) for key, (_, privilege)
+                      in EffectivePrivilege.stored().items())
+        self.assertEqual(stored, EffectivePrivilege.compute())
+
+    def test_01_share_and_unshare_users(self):
+        """ bulk sharing with users is equivalent to sharing each pair """
+        resources = [self.holes, self.bones]
+        self.assertEqual(self.dog.uaccess.share_resources_with_users(
+            resources, [self.cat, self.bat], PrivilegeCodes.CHANGE), 4)
+        for resource in resources:
+            for user in (self.cat, self.bat):
+                self.assertTrue(user.uaccess.can_change_resource(resource))
+                self.assertEqual(UserResourceProvenance.get_privilege(
+                    resource=resource, user=user), PrivilegeCodes.CHANGE)
+        self.assertSynchronized()
+
+        # pairs already shared at that privilege are left alone
+        self.assertEqual(self.dog.uaccess.share_resources_with_users(
+            resources, [self.cat], PrivilegeCodes.CHANGE), 0)
+
+        # each pair can be undone as after a single share
+        self.dog.uaccess.share_resources_with_users(resources, [self.cat], PrivilegeCodes.VIEW)
+        self.dog.uaccess.undo_share_resource_with_user(self.holes, self.cat)
+        self.assertTrue(self.cat.uaccess.can_change_resource(self.holes))
+        self.assertFalse(self.cat.uaccess.can_change_resource(self.bones))
+
+        self.assertEqual(self.dog.uaccess.unshare_resources_with_users(
+            resources, [self.cat, self.bat]), 4)
+        self.assertFalse(UserResourcePrivilege.objects.filter(
+            resource__in=resources, user__in=[self.cat, self.bat]).exists())
+        self.assertSynchronized()
+
+    def test_02_all_or_nothing(self):
+        """ a pair that cannot be shared prevents sharing any """
+        with self.assertRaises(PermissionDenied):
+            self.dog.uaccess.share_resources_with_users(
+                [self.holes, self.posts], [self.bat], PrivilegeCodes.VIEW)
+        self.assertFalse(self.bat.uaccess.can_view_resource(self.holes))
+
+        # the sole owner cannot be removed
+        with self.assertRaises(PermissionDenied):
+            self.dog.uaccess.unshare_resources_with_users([self.holes, self.bones], [self.dog])
+        self.assertTrue(self.dog.uaccess.owns_resource(self.bones))
+
+    def test_03_share_and_unshare_groups(self):
+        """ bulk sharing with groups is equivalent to sharing each pair """
+        self.cat.uaccess.share_group_with_user(self.cats, self.dog, PrivilegeCodes.VIEW)
+        resources = [self.holes, self.bones]
+        self.assertEqual(self.dog.uaccess.share_resources_with_groups(
+            resources, [self.cats], PrivilegeCodes.VIEW), 2)
+        for resource in resources:
+            self.assertTrue(self.cat.uaccess.can_view_resource(resource))
+        self.assertSynchronized()
+
+        with self.assertRaises(PermissionDenied):
+            self.dog.uaccess.share_resources_with_groups(resources, [self.cats],
+                                                         PrivilegeCodes.OWNER)
+
+        self.assertEqual(self.dog.uaccess.unshare_resources_with_groups(
+            resources, [self.cats]), 2)
+        self.assertFalse(GroupResourcePrivilege.objects.filter(group=self.cats).exists())
+        self.assertSynchronized()
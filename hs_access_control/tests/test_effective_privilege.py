@@ -0,0 +1,163 @@
+from django.test import TestCase
+from django.contrib.auth.models import Group
+
+from hs_access_control.models import PrivilegeCodes, EffectivePrivilege
+from hs_access_control.tests.utilities import global_reset, is_equal_to_as_set
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestEffectivePrivilege(MockIRODSTestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(TestEffectivePrivilege, self).setUp()
+        global_reset()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+
+        self.dog = hydroshare.create_account(
+            'dog@gmail.com',
+            username='dog',
+            first_name='a little arfer',
+            last_name='last_name_dog',
+            superuser=False,
+            groups=[]
+        )
+
+        self.cat = hydroshare.create_account(
+            'cat@gmail.com',
+            username='cat',
+            first_name='not a dog',
+            last_name='last_name_cat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.cat2 = hydroshare.create_account(
+            'cat2@gmail.com',
+            username='cat2',
+            first_name='not a dog',
+            last_name='last_name_cat2',
+            superuser=False,
+            groups=[]
+        )
+
+        self.dogs = self.dog.uaccess.create_group(
+            title='dogs',
+            description="This is the dogs group",
+            purpose="Our purpose to collaborate on barking."
+        )
+
+        self.cats = self.cat.uaccess.create_group(
+            title='cats',
+            description="This is the cats group",
+            purpose="Our purpose to collaborate on begging.")
+        self.cat.uaccess.share_group_with_user(self.cats, self.cat2, PrivilegeCodes.VIEW)
+
+        self.holes = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.dog,
+            title='all about dog holes',
+            metadata=[],
+        )
+
+        self.posts = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.cat,
+            title='all about scratching posts',
+            metadata=[],
+        )
+
+    def assertSynchronized(self):
+        """ the stored rows are those that a fresh computation produces """
+        stored = dict((key, privilege) for key, (_, privilege)
+                      in EffectivePrivilege.stored().items())
+        self.assertEqual(stored, EffectivePrivilege.compute())
+
+    def privilege(self, user, resource, via):
+        return EffectivePrivilege.objects.get(user=user, resource=resource, via=via).privilege
+
+    def test_01_user_sharing(self):
+        """ user share, unshare and undo maintain effective privileges """
+        self.assertEqual(self.privilege(self.dog, self.holes, EffectivePrivilege.USER),
+                         PrivilegeCodes.OWNER)
+
+        self.dog.uaccess.share_resource_with_user(self.holes, self.cat, PrivilegeCodes.CHANGE)
+        self.assertEqual(self.privilege(self.cat, self.holes, EffectivePrivilege.USER),
+                         PrivilegeCodes.CHANGE)
+        self.assertSynchronized()
+
+        self.dog.uaccess.unshare_resource_with_user(self.holes, self.cat)
+        self.assertFalse(EffectivePrivilege.objects.filter(user=self.cat,
+                                                           resource=self.holes).exists())
+        self.assertSynchronized()
+
+        self.dog.uaccess.share_resource_with_user(self.holes, self.cat, PrivilegeCodes.VIEW)
+        self.dog.uaccess.undo_share_resource_with_user(self.holes, self.cat)
+        self.assertFalse(EffectivePrivilege.objects.filter(user=self.cat,
+                                                           resource=self.holes).exists())
+        self.assertSynchronized()
+
+    def test_02_group_sharing_and_flags(self):
+        """ group sharing, membership, immutable and active maintain effective privileges """
+        self.dog.uaccess.share_resource_with_group(self.holes, self.cats, PrivilegeCodes.CHANGE)
+        self.assertEqual(self.privilege(self.cat2, self.holes, EffectivePrivilege.GROUP),
+                         PrivilegeCodes.CHANGE)
+        self.assertSynchronized()
+
+        self.holes.raccess.immutable = True
+        self.holes.raccess.save()
+        self.assertEqual(self.privilege(self.cat2, self.holes, EffectivePrivilege.GROUP),
+                         PrivilegeCodes.VIEW)
+        self.holes.raccess.immutable = False
+        self.holes.raccess.save()
+        self.assertEqual(self.privilege(self.cat2, self.holes, EffectivePrivilege.GROUP),
+                         PrivilegeCodes.CHANGE)
+
+        self.cats.gaccess.active = False
+        self.cats.gaccess.save()
+        self.assertFalse(EffectivePrivilege.objects.filter(user=self.cat2,
+                                                           resource=self.holes).exists())
+        self.cats.gaccess.active = True
+        self.cats.gaccess.save()
+        self.assertSynchronized()
+
+        self.cat.uaccess.unshare_group_with_user(self.cats, self.cat2)
+        self.assertFalse(EffectivePrivilege.objects.filter(user=self.cat2,
+                                                           resource=self.holes).exists())
+        self.assertSynchronized()
+
+        self.cat.uaccess.delete_group(self.cats)
+        self.assertFalse(EffectivePrivilege.objects.filter(
+            resource=self.holes, via=EffectivePrivilege.GROUP).exists())
+        self.assertSynchronized()
+
+    def test_03_community_sharing(self):
+        """ sharing communities with groups maintains effective privileges """
+        self.dog.uaccess.share_resource_with_group(self.holes, self.dogs, PrivilegeCodes.VIEW)
+        # allow dog to share the community with cats
+        self.cat.uaccess.share_group_with_user(self.cats, self.dog, PrivilegeCodes.OWNER)
+        pets = self.dog.uaccess.create_community(
+                'all kinds of pets',
+                'collaboration on how to be a better pet.')
+        self.dog.uaccess.share_community_with_group(pets, self.dogs, PrivilegeCodes.VIEW)
+        self.dog.uaccess.share_community_with_group(pets, self.cats, PrivilegeCodes.VIEW)
+        self.assertEqual(self.privilege(self.cat2, self.holes, EffectivePrivilege.COMMUNITY),
+                         PrivilegeCodes.VIEW)
+        self.assertSynchronized()
+
+        self.dog.uaccess.unshare_community_with_group(pets, self.cats)
+        self.assertFalse(EffectivePrivilege.objects.filter(user=self.cat2,
+                                                           resource=self.holes).exists())
+        self.assertSynchronized()
+
+    def test_04_listing(self):
+        """ listings from effective privileges match explicit access """
+        self.dog.uaccess.share_resource_with_group(self.holes, self.cats, PrivilegeCodes.CHANGE)
+        self.cat.uaccess.share_resource_with_user(self.posts, self.cat2, PrivilegeCodes.VIEW)
+        for user in (self.dog, self.cat, self.cat2):
+            for privilege in (PrivilegeCodes.OWNER, PrivilegeCodes.CHANGE, PrivilegeCodes.VIEW):
+                self.assertTrue(is_equal_to_as_set(
+                    user.uaccess.get_resources_with_effective_privilege(privilege,
+                                                                        via_group=True),
+                    user.uaccess.get_resources_with_explicit_access(privilege,
+                                                                    via_group=True)))
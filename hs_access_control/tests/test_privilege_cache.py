@@ -0,0 +1,109 @@
+import tempfile
+from collections import namedtuple
+
+from django.core.signals import request_started, request_finished
+from django.test import SimpleTestCase, override_settings
+
+from hs_access_control import privilege_cache
+
+# decisions are only shared through a cache that every process sees
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(prefix='privilege_cache'),
+}}
+
+User = namedtuple('User', 'pk is_superuser')
+Resource = namedtuple('Resource', 'pk')
+
+
+class Decisions(object):
+    """ Stands in for the uaccess routines and counts the decisions computed """
+
+    def __init__(self, value=True):
+        self.value = value
+        self.computed = 0
+
+    def __call__(self):
+        self.computed += 1
+        return self.value
+
+
+class TestPrivilegeCache(SimpleTestCase):
+
+    def setUp(self):
+        super(TestPrivilegeCache, self).setUp()
+        request_started.send(sender=self.__class__)
+        self.user = User(pk=-1, is_superuser=False)
+        self.resource = Resource(pk=-2)
+        privilege_cache.invalidate(users=[self.user.pk], resources=[self.resource.pk])
+        with self.settings(CACHES=SHARED_CACHES):
+            privilege_cache.invalidate(users=[self.user.pk], resources=[self.resource.pk])
+
+    def tearDown(self):
+        request_finished.send(sender=self.__class__)
+        super(TestPrivilegeCache, self).tearDown()
+
+    def new_request(self):
+        request_finished.send(sender=self.__class__)
+        request_started.send(sender=self.__class__)
+
+    @override_settings(PRIVILEGE_CACHE_TIMEOUT=0)
+    def test_decisions_are_cached_within_a_request(self):
+        decisions = Decisions()
+        for _ in range(3):
+            self.assertTrue(privilege_cache.decide(self.user, self.resource, 1, decisions))
+        self.assertEqual(decisions.computed, 1)
+        # each action is decided separately
+        privilege_cache.decide(self.user, self.resource, 2, decisions)
+        self.assertEqual(decisions.computed, 2)
+        # without a shared store, a new request decides again
+        self.new_request()
+        privilege_cache.decide(self.user, self.resource, 1, decisions)
+        self.assertEqual(decisions.computed, 3)
+
+    @override_settings(PRIVILEGE_CACHE_TIMEOUT=60, CACHES=SHARED_CACHES)
+    def test_decisions_are_shared_between_requests(self):
+        decisions = Decisions()
+        privilege_cache.decide(self.user, self.resource, 1, decisions)
+        self.new_request()
+        privilege_cache.decide(self.user, self.resource, 1, decisions)
+        self.assertEqual(decisions.computed, 1)
+        # superusers are decided apart
+        privilege_cache.decide(User(pk=self.user.pk, is_superuser=True), self.resource, 1,
+                               decisions)
+        self.assertEqual(decisions.computed, 2)
+
+    @override_settings(PRIVILEGE_CACHE_TIMEOUT=60)
+    def test_not_shared_through_a_process_local_cache(self):
+        # with the default LocMemCache, other processes would never see an invalidation
+        decisions = Decisions()
+        privilege_cache.decide(self.user, self.resource, 1, decisions)
+        self.new_request()
+        privilege_cache.decide(self.user, self.resource, 1, decisions)
+        self.assertEqual(decisions.computed, 2)
+
+    @override_settings(PRIVILEGE_CACHE_TIMEOUT=60, CACHES=SHARED_CACHES)
+    def test_invalidate(self):
+        decisions = Decisions()
+        privilege_cache.decide(self.user, self.resource, 1, decisions)
+        privilege_cache.invalidate(resources=[self.resource.pk])
+        privilege_cache.decide(self.user, self.resource, 1, decisions)
+        self.assertEqual(decisions.computed, 2)
+
+        self.new_request()
+        privilege_cache.invalidate(users=[self.user.pk])
+        privilege_cache.decide(self.user, self.resource, 1, decisions)
+        self.assertEqual(decisions.computed, 3)
+
+        self.new_request()
+        privilege_cache.invalidate()
+        privilege_cache.decide(self.user, self.resource, 1, decisions)
+        self.assertEqual(decisions.computed, 4)
+
+        # decisions about other resources are kept
+        other = Resource(pk=-3)
+        privilege_cache.decide(self.user, other, 1, decisions)
+        privilege_cache.invalidate(resources=[self.resource.pk])
+        self.new_request()
+        privilege_cache.decide(self.user, other, 1, decisions)
+        self.assertEqual(decisions.computed, 5)
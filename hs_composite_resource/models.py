@@ -37,17 +37,18 @@ class CompositeResource(BaseResource):
     @property
     def logical_files(self):
         """Returns a list of all logical file type objects associated with this resource """
-
-        lf_list = []
-        lf_list.extend(self.filesetlogicalfile_set.all())
-        lf_list.extend(self.genericlogicalfile_set.all())
-        lf_list.extend(self.geofeaturelogicalfile_set.all())
-        lf_list.extend(self.netcdflogicalfile_set.all())
-        lf_list.extend(self.georasterlogicalfile_set.all())
-        lf_list.extend(self.reftimeserieslogicalfile_set.all())
-        lf_list.extend(self.timeserieslogicalfile_set.all())
-
-        return lf_list
+        return self.aggregation_index.logical_files
+
+    def aggregation_querysets(self):
+        """Querysets of all logical file type objects associated with this resource, read by
+        the aggregation index"""
+        return [self.filesetlogicalfile_set.select_related('metadata'),
+                self.genericlogicalfile_set.select_related('metadata'),
+                self.geofeaturelogicalfile_set.select_related('metadata'),
+                self.netcdflogicalfile_set.select_related('metadata'),
+                self.georasterlogicalfile_set.select_related('metadata'),
+                self.reftimeserieslogicalfile_set.select_related('metadata'),
+                self.timeserieslogicalfile_set.select_related('metadata')]
 
     @property
     def can_be_published(self):
@@ -95,11 +96,7 @@ class CompositeResource(BaseResource):
          :param file_path: Resource file path (full file path starting with resource id)
          for which the aggregation object to be retrieved
         """
-        for res_file in self.files.all():
-            if res_file.full_path == file_path:
-                if res_file.has_logical_file:
-                    return res_file.logical_file
-        return None
+        return self.aggregation_index.get_file_aggregation(file_path)
 
     def get_folder_aggregation_type_to_set(self, dir_path):
         """Returns an aggregation (file type) type that the specified folder *dir_path* can
@@ -123,19 +120,37 @@ class CompositeResource(BaseResource):
         irods_path = dir_path
         if self.is_federated:
             irods_path = os.path.join(self.resource_federation_path, irods_path)
-        store = istorage.listdir(irods_path)
         files_in_folder = ResourceFile.list_folder(self, folder=irods_path, sub_folders=False)
 
+        def files_in_sub_folders():
+            return ResourceFile.list_folder(self, folder=irods_path, sub_folders=True)
+
+        def has_sub_folders():
+            store = istorage.listdir(irods_path)
+            return bool(store[0])
+
+        return self.aggregation_type_to_set(files_in_folder, files_in_sub_folders,
+                                            has_sub_folders)
+
+    @staticmethod
+    def aggregation_type_to_set(files_in_folder, files_in_sub_folders, has_sub_folders):
+        """Returns the aggregation (file type) type that a folder that is not an aggregation
+        can be set to, or None.
+
+        :param files_in_folder: list of ResourceFile objects directly in the folder
+        :param files_in_sub_folders: callable returning the ResourceFile objects in the folder
+        and its sub folders; only called if the folder has no files of its own
+        :param has_sub_folders: callable returning True if the folder has sub folders; only
+        called if the folder has files of its own
+        """
         if not files_in_folder:
             # folder is empty
             # check sub folders for files - if file exist we can set FileSet aggregation
-            files_in_sub_folders = ResourceFile.list_folder(self, folder=irods_path,
-                                                            sub_folders=True)
-            if files_in_sub_folders:
+            if files_in_sub_folders():
                 return FileSetLogicalFile.__name__
 
             return None
-        if store[0]:
+        if has_sub_folders():
             # there are folders under dir_path as well as files - only FileSet can bet set
             return FileSetLogicalFile.__name__
 
@@ -202,9 +217,8 @@ class CompositeResource(BaseResource):
         """
 
         if aggregation_name is None:
-            for aggregation in self.logical_files:
-                if aggregation.metadata.is_dirty:
-                    aggregation.create_aggregation_xml_documents()
+            for aggregation in self.aggregation_index.dirty_aggregations:
+                aggregation.create_aggregation_xml_documents()
         else:
             try:
                 aggregation = self.get_aggregation_by_name(aggregation_name)
@@ -260,10 +274,9 @@ class CompositeResource(BaseResource):
         :return an aggregation object if found
         :raises ObjectDoesNotExist if no matching aggregation is found
         """
-        for aggregation in self.logical_files:
-            # remove the last slash in aggregation_name if any
-            if aggregation.aggregation_name.rstrip('/') == name:
-                return aggregation
+        aggregation = self.aggregation_index.get_by_name(name)
+        if aggregation is not None:
+            return aggregation
 
         raise ObjectDoesNotExist("No matching aggregation was found for name:{}".format(name))
 
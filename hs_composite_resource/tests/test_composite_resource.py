@@ -12,6 +12,7 @@ from hs_core.models import BaseResource, ResourceFile
 from hs_core.hydroshare.utils import resource_file_add_process, get_resource_by_shortkey
 from hs_core.views.utils import create_folder, move_or_rename_file_or_folder, remove_folder, \
     unzip_file, add_reference_url_to_resource, edit_reference_url_in_resource
+from hs_core.views.folder_listing import FolderListing
 from hs_composite_resource.models import CompositeResource
 from hs_file_types.models import GenericLogicalFile, GeoRasterLogicalFile, GenericFileMetaData, \
     RefTimeseriesLogicalFile, FileSetLogicalFile, NetCDFLogicalFile, TimeSeriesLogicalFile, \
@@ -1924,3 +1925,61 @@ class CompositeResourceTest(MockIRODSTestCaseMixin, TransactionTestCase,
 
         self.assertNotEqual(RefTimeseriesLogicalFile.objects.first().metadata.abstract,
                             "overwritten")
+
+    def test_folder_listing(self):
+        """Test that the bulk folder listing reports folders, aggregations and files"""
+
+        self.create_composite_resource()
+        for folder in ('dir1', 'dir2', 'dir2/sub'):
+            ResourceFile.create_folder(self.composite_resource, folder)
+        self.add_file_to_resource(file_to_add=self.generic_file, upload_folder='dir1')
+        self.add_file_to_resource(file_to_add=self.generic_file, upload_folder='dir2/sub')
+        res_file = self.add_file_to_resource(file_to_add=self.generic_file)
+
+        folders, files = FolderListing(self.composite_resource, '').listing()
+        folders = dict((folder['name'], folder) for folder in folders)
+        self.assertEqual(set(folders.keys()), {'dir1', 'dir2'})
+        # a folder with a single text file, and a folder with files in sub folders only
+        self.assertEqual(folders['dir1']['folder_aggregation_type_to_set'],
+                         FileSetLogicalFile.__name__)
+        self.assertEqual(folders['dir2']['folder_aggregation_type_to_set'],
+                         FileSetLogicalFile.__name__)
+        self.assertEqual([f['pk'] for f in files], [res_file.pk])
+
+        FileSetLogicalFile.set_file_type(self.composite_resource, self.user, folder_path='dir1')
+        folders, _ = FolderListing(self.composite_resource, '').listing()
+        folders = dict((folder['name'], folder) for folder in folders)
+        self.assertEqual(folders['dir1']['folder_aggregation_type'], FileSetLogicalFile.__name__)
+        self.assertEqual(folders['dir1']['folder_aggregation_type_to_set'], '')
+
+        _, files = FolderListing(self.composite_resource, 'dir1').listing()
+        self.assertEqual(len(files), 1)
+        self.assertEqual(files[0]['name'], self.generic_file_name)
+        self.assertEqual(files[0]['logical_type'], FileSetLogicalFile.__name__)
+
+    def test_aggregation_index(self):
+        """Test that the aggregation index of a resource follows changes to its aggregations"""
+
+        self.create_composite_resource()
+        res_file = self.add_file_to_resource(file_to_add=self.generic_file)
+        resource = self.composite_resource
+        self.assertEqual(resource.logical_files, [])
+        self.assertEqual(len(resource.non_logical_files), 1)
+
+        GenericLogicalFile.set_file_type(resource, self.user, res_file.id)
+        # the same resource instance sees the new aggregation
+        self.assertEqual(len(resource.logical_files), 1)
+        self.assertEqual(resource.non_logical_files, [])
+        aggregation = resource.get_aggregation_by_name(self.generic_file_name)
+        self.assertEqual(aggregation.__class__, GenericLogicalFile)
+
+        # once built, the index answers without querying the database
+        resource.aggregation_types
+        with self.assertNumQueries(0):
+            resource.logical_files
+            resource.aggregation_types
+            resource.get_aggregation_by_name(self.generic_file_name)
+
+        aggregation.remove_aggregation()
+        self.assertEqual(resource.logical_files, [])
+        self.assertEqual(len(resource.non_logical_files), 1)
@@ -0,0 +1,155 @@
+"""Index of the aggregations (logical files) of a resource.
+
+Properties such as logical_files, non_logical_files, aggregation_types and the lookup of an
+aggregation by name used to walk every resource file and fetch its logical file, or query
+each logical file type, every time they were called, and then query the files of each
+aggregation to work out its name.  AggregationIndex loads, with a constant number of
+queries,
+
+* the resource files, with their logical files attached;
+* the aggregations, with their metadata (and hence dirty state) attached;
+* the files of each aggregation, attached so that aggregation_name needs no query;
+
+and answers those properties from memory.
+
+An index is kept on the resource instance and rebuilt when the resource's files,
+aggregations or aggregation metadata change.  Changes are detected through a version token
+per resource, kept in the Django cache and replaced by the receivers in hs_core.receivers
+whenever a ResourceFile, logical file or logical file metadata object is saved or deleted.
+"""
+
+from uuid import uuid4
+
+from django.core.cache import cache
+
+
+def _version_key(resource_pk):
+    return u'aggregation_index:{}'.format(resource_pk)
+
+
+def invalidate(resource_pk):
+    """Mark every index of a resource as stale."""
+    if resource_pk is not None:
+        cache.set(_version_key(resource_pk), uuid4().hex, None)
+
+
+def _current_version(resource_pk):
+    version = cache.get(_version_key(resource_pk))
+    if version is None:
+        # never invalidated, or evicted from the cache: indexes built before now are stale
+        version = uuid4().hex
+        if not cache.add(_version_key(resource_pk), version, None):
+            version = cache.get(_version_key(resource_pk), version)
+    return version
+
+
+def get_index(resource):
+    """Return the up-to-date AggregationIndex of a resource instance."""
+    version = _current_version(resource.pk)
+    index = getattr(resource, '_aggregation_index', None)
+    if index is None or index.version != version:
+        index = AggregationIndex(resource, version)
+        resource._aggregation_index = index
+    return index
+
+
+class AggregationIndex(object):
+    """Files and aggregations of one resource, loaded in bulk."""
+
+    def __init__(self, resource, version=None):
+        from django.contrib.contenttypes.models import ContentType
+        from hs_core.models import ResourceFile
+
+        self.version = version
+
+        querysets = resource.aggregation_querysets()
+        if querysets is not None:
+            self.files = list(resource.files.all())
+            self.aggregations = []
+            for queryset in querysets:
+                self.aggregations.extend(queryset)
+        else:
+            # aggregations are only reachable through the files
+            self.files = list(resource.files.all()
+                              .prefetch_related('logical_file_content_object'))
+            self.aggregations = []
+            for f in self.files:
+                if f.logical_file is not None and f.logical_file not in self.aggregations:
+                    self.aggregations.append(f.logical_file)
+
+        by_key = {}
+        for aggregation in self.aggregations:
+            content_type = ContentType.objects.get_for_model(aggregation)
+            by_key[(content_type.id, aggregation.pk)] = aggregation
+
+        resource_cache_attr = ResourceFile.content_object.cache_attr
+        logical_file_cache_attr = ResourceFile.logical_file_content_object.cache_attr
+        files_of = dict((key, []) for key in by_key)
+        for f in self.files:
+            # every file belongs to this resource; spare each file a query for it
+            setattr(f, resource_cache_attr, resource)
+            key = (f.logical_file_content_type_id, f.logical_file_object_id)
+            if key in by_key:
+                setattr(f, logical_file_cache_attr, by_key[key])
+                files_of[key].append(f)
+            elif f.logical_file_content_type_id is None:
+                setattr(f, logical_file_cache_attr, None)
+        for key, aggregation in by_key.items():
+            # read by aggregation.first_file, and thus aggregation_name
+            aggregation._index_files = sorted(files_of[key], key=lambda f: f.pk)
+
+        self._by_name = None
+
+    @property
+    def logical_files(self):
+        return list(self.aggregations)
+
+    @property
+    def non_logical_files(self):
+        return [f for f in self.files if f.logical_file is None]
+
+    @property
+    def generic_logical_files(self):
+        generic_logical_files = []
+        for f in self.files:
+            aggregation = f.logical_file
+            if aggregation is not None and \
+                    aggregation.__class__.__name__ == "GenericLogicalFile" and \
+                    aggregation not in generic_logical_files:
+                generic_logical_files.append(aggregation)
+        return generic_logical_files
+
+    @property
+    def aggregation_types(self):
+        """Display names of the aggregation types in the resource, each type once."""
+        aggr_types = []
+        aggr_type_names = []
+        for aggregation in self.aggregations:
+            if aggregation.type_name() not in aggr_type_names:
+                aggr_type_names.append(aggregation.type_name())
+                aggr_types.append(aggregation.get_aggregation_display_name().split(":")[0])
+        return aggr_types
+
+    @property
+    def dirty_aggregations(self):
+        return [aggregation for aggregation in self.aggregations
+                if aggregation.metadata.is_dirty]
+
+    def get_by_name(self, name):
+        """Return the aggregation named *name* (its path), or None."""
+        if self._by_name is None:
+            self._by_name = {}
+            for aggregation in self.aggregations:
+                if not aggregation.is_fileset and not aggregation._index_files:
+                    # an aggregation without files has no name
+                    continue
+                # remove the last slash in aggregation_name if any
+                self._by_name.setdefault(aggregation.aggregation_name.rstrip('/'), aggregation)
+        return self._by_name.get(name)
+
+    def get_file_aggregation(self, file_path):
+        """Return the aggregation of the file with full path *file_path*, or None."""
+        for f in self.files:
+            if f.full_path == file_path:
+                return f.logical_file
+        return None
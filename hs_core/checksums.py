@@ -0,0 +1,62 @@
+"""MD5 and SHA-256 digests of resource file contents.
+
+ResourceFile keeps the digests of its file in _checksum_md5 and _checksum_sha256.  They are
+computed in the pass that already reads the bytes: an uploaded file is wrapped in a
+ChecksummingFile, which hashes the chunks as the storage backend copies them, and a file
+replaced in place is hashed from the local copy that is being saved.  Files that are copied
+or moved within iRODS are hashed the first time their digests are asked for.
+
+Bag manifests, resource checksums (hs_core.hydroshare.get_checksum), the checks of
+check_irods_files --checksums, duplicate detection and download ETags read the stored
+digests rather than the files.
+"""
+
+import hashlib
+
+from django.core.files import File
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class Digests(object):
+    """MD5 and SHA-256 of a stream of chunks, and its length."""
+
+    def __init__(self):
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def update(self, chunk):
+        self.md5.update(chunk)
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+
+    def hexdigests(self):
+        """Return (md5, sha256) as hexadecimal strings."""
+        return self.md5.hexdigest(), self.sha256.hexdigest()
+
+
+def file_digests(fileobj, chunk_size=CHUNK_SIZE):
+    """Return the Digests of the contents of open file fileobj, read from where it is."""
+    digests = Digests()
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        digests.update(chunk)
+    return digests
+
+
+class ChecksummingFile(File):
+    """File that computes the digests of a File as storage reads it with chunks().
+
+    After the file has been saved, digests holds the Digests of what was saved.
+    """
+
+    def __init__(self, file):
+        super(ChecksummingFile, self).__init__(file, file.name)
+        self.digests = None
+
+    def chunks(self, chunk_size=None):
+        # chunks() reads from the beginning, so start over each time
+        self.digests = Digests()
+        for chunk in self.file.chunks(chunk_size):
+            self.digests.update(chunk)
+            yield chunk
@@ -27,9 +27,13 @@ class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
         """
         from hs_core.models import BaseResource
         from hs_access_control.models import ResourceAccess
+        from hs_core import solr_queue
     
         if isinstance(instance, BaseResource):
             if hasattr(instance, 'raccess') and hasattr(instance, 'metadata'): 
+                # defer the update to the batched indexing queue unless it is full
+                if solr_queue.is_deferred() and solr_queue.enqueue(instance.pk):
+                    return
                 # work around for failure of super(BaseResource, instance) to work properly.
                 # this always succeeds because this is a post-save object action. 
                 newinstance = BaseResource.objects.get(pk=instance.pk)
@@ -65,6 +69,7 @@ class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
         """
         from hs_core.models import BaseResource
         from hs_access_control.models import ResourceAccess
+        from hs_core import solr_queue
 
         # only delete the SOLR instance when the raccess field is recursively deleted.
         # At this point, the resource still exists.
@@ -74,6 +79,9 @@ class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
         if isinstance(instance, ResourceAccess):
             newinstance = instance.resource # automatically a BaseResource
             newsender = BaseResource
+            # the queue removes the document once it finds the resource gone or private
+            if solr_queue.is_deferred() and solr_queue.enqueue(newinstance.pk):
+                return
             # self.handle_delete(newsender, newinstance)
             using_backends = self.connection_router.for_write(instance=newinstance)
             for using in using_backends:
@@ -0,0 +1,392 @@
+"""Incremental creation of resource bags.
+
+create_bag_by_irods used to run the iRODS bagit rule and an ``ibun -cDzip`` of the whole
+resource collection whenever a bag was out of date, so that editing the abstract of a
+large resource re-zipped all of its files.  IncrementalBagBuilder updates the previous bag
+in place instead:
+
+* every zip member records the modification time of the data object it was made from in
+  its member comment, and the previous manifest-md5.txt records its checksum;
+* members whose data object has the same size and modification time are kept where they
+  are in the zip, with their checksum taken from the previous manifest;
+* members of changed, added and removed data objects, and the generated tag files
+  (bagit.txt, manifest-md5.txt, tagmanifest-md5.txt), are dropped from the central
+  directory; changed and added data objects and fresh tag files are appended, followed by
+  a new central directory.
+
+Dropped members stay in the zip as unreferenced bytes.  When they would make up more than
+HS_BAG_COMPACT_RATIO of the zip, or when the previous bag was not built by this module,
+the bag is rebuilt from scratch.
+
+The builder needs random access to the bag: it works on FileSystemStorage and on iRODS
+through the native session backend (see django_irods.native).  For other sessions
+incremental_bag_builder() returns None and the iRODS rule and ibun are used as before.
+"""
+
+import calendar
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from django_irods.fs_storage import FileSystemStorage
+from django_irods.icommands import SessionException
+from django_irods.native import NATIVE_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+BAGIT_TXT = "BagIt-Version: 0.96\nTag-File-Character-Encoding: UTF-8\n"
+
+# tag files written by the builder; the copies in the collection are not zipped from there
+GENERATED_FILES = ('bagit.txt', 'manifest-md5.txt', 'tagmanifest-md5.txt')
+
+MTIME_COMMENT = 'mtime={}'
+
+
+class Entry(namedtuple('Entry', 'name size modified')):
+    """A data object, or an empty collection, of the collection to be bagged.
+
+    name is relative to the parent of the collection, as in the zip; names of collections
+    end with '/'. modified is in seconds since the epoch.
+    """
+
+    @property
+    def is_dir(self):
+        return self.name.endswith('/')
+
+
+def _md5_file(fp):
+    md5 = hashlib.md5()
+    for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+        md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _member_span(info):
+    """Bytes taken by a member in the zip before the central directory."""
+    span = 30 + len(info.filename) + len(info.extra) + info.compress_size
+    if info.flag_bits & 0x08:
+        # data descriptor
+        span += 16
+    return span
+
+
+def _parse_manifest(content):
+    checksums = {}
+    for line in content.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) == 2:
+            checksums[parts[1].strip()] = parts[0]
+    return checksums
+
+
+class LocalBagStore(object):
+    """Collection and bag in the local tree of a FileSystemStorage."""
+
+    can_truncate = True
+
+    def __init__(self, istorage):
+        self.istorage = istorage
+
+    def _path(self, name):
+        return self.istorage._local_path(name)
+
+    def walk(self, collection):
+        root = self._path(collection)
+        parent = os.path.dirname(root)
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            if not dirnames and not filenames:
+                entries.append(Entry(os.path.relpath(dirpath, parent) + '/', 0, None))
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                entries.append(Entry(os.path.relpath(path, parent), stat.st_size,
+                                     int(stat.st_mtime)))
+        return entries
+
+    def exists(self, name):
+        return os.path.isfile(self._path(name))
+
+    def open(self, name, mode):
+        path = self._path(name)
+        if mode.startswith('w') and not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        return open(path, mode)
+
+    @contextmanager
+    def fetch(self, name, modified):
+        """Yield (local path, md5) of data object name."""
+        path = self._path(name)
+        with open(path, 'rb') as f:
+            md5 = _md5_file(f)
+        yield path, md5
+
+    def save(self, name, content):
+        with self.open(name, 'wb') as f:
+            f.write(content)
+
+
+class IrodsBagStore(object):
+    """Collection and bag in iRODS, accessed over pooled native connections."""
+
+    can_truncate = False
+
+    MODES = {'rb': 'r', 'r+b': 'r+', 'wb': 'w'}
+
+    def __init__(self, session, pool):
+        self.session = session
+        self.pool = pool
+
+    def walk(self, collection):
+        with self.pool.connection() as conn:
+            coll = conn.collections.get(self.session._abspath(collection))
+            parent = os.path.dirname(coll.path)
+            entries = []
+            for sub_coll, sub_colls, data_objects in coll.walk():
+                if not sub_colls and not data_objects:
+                    entries.append(Entry(os.path.relpath(sub_coll.path, parent) + '/', 0, None))
+                for obj in sorted(data_objects, key=lambda o: o.name):
+                    entries.append(Entry(os.path.relpath(obj.path, parent), obj.size,
+                                         calendar.timegm(obj.modify_time.utctimetuple())))
+        return entries
+
+    def exists(self, name):
+        with self.pool.connection() as conn:
+            return conn.data_objects.exists(self.session._abspath(name))
+
+    @contextmanager
+    def open(self, name, mode):
+        path = self.session._abspath(name)
+        with self.pool.connection() as conn:
+            if mode == 'wb' and not conn.data_objects.exists(path):
+                conn.collections.create(os.path.dirname(path))
+                conn.data_objects.create(path)
+            f = conn.data_objects.open(path, self.MODES[mode])
+            try:
+                yield f
+            finally:
+                f.close()
+
+    @contextmanager
+    def fetch(self, name, modified):
+        """Yield (local path, md5) of a temporary copy of data object name."""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, os.path.basename(name))
+            md5 = hashlib.md5()
+            with self.open(name, 'rb') as source, open(path, 'wb') as target:
+                for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                    md5.update(chunk)
+                    target.write(chunk)
+            # zipfile dates the member from the file
+            os.utime(path, (modified, modified))
+            yield path, md5.hexdigest()
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def save(self, name, content):
+        with self.open(name, 'wb') as f:
+            f.write(content)
+
+
+def bag_store(istorage):
+    """Return a LocalBagStore or IrodsBagStore for istorage, or None if it has neither."""
+    if isinstance(istorage, FileSystemStorage):
+        return LocalBagStore(istorage)
+    session = getattr(istorage, 'session', None)
+    pool = getattr(session, 'pool', None) if NATIVE_AVAILABLE else None
+    if pool is None:
+        return None
+    return IrodsBagStore(session, pool)
+
+
+def incremental_bag_builder(istorage, collection, bag_name):
+    """Return an IncrementalBagBuilder for storage istorage, or None if it cannot have one."""
+    if not getattr(settings, 'HS_BAG_INCREMENTAL', True):
+        return None
+    store = bag_store(istorage)
+    if store is None:
+        return None
+    return IncrementalBagBuilder(store, collection, bag_name)
+
+
+def update_bag(istorage, collection, bag_name):
+    """Bring bag bag_name of collection up to date incrementally.
+
+    :return: True if the bag was updated; False if it has to be made with the iRODS bagit
+        rule and ibun instead, because istorage gives no random access to it or the builder
+        failed for reasons other than iRODS errors, which are logged
+    :raises SessionException: if iRODS reports an error
+    """
+    builder = incremental_bag_builder(istorage, collection, bag_name)
+    if builder is None:
+        return False
+    try:
+        stats = builder.build()
+    except SessionException:
+        raise
+    except Exception as ex:
+        logger.exception("incremental bag of {} failed: {}".format(collection, ex))
+        return False
+    if __debug__:
+        logger.debug("bag {} kept {kept} and wrote {written} members".format(bag_name, **stats))
+    return True
+
+
+class IncrementalBagBuilder(object):
+    """Brings the bag of a resource collection up to date with the collection."""
+
+    def __init__(self, store, collection, bag_name, compact_ratio=None):
+        """
+        :param store: a LocalBagStore or IrodsBagStore
+        :param collection: path of the resource collection, {res_id} or an absolute path
+        :param bag_name: path of the bag zip
+        :param compact_ratio: rebuild the bag when more than this fraction of it would be
+            dropped members; defaults to settings.HS_BAG_COMPACT_RATIO
+        """
+        self.store = store
+        self.collection = collection.rstrip('/')
+        self.bag_name = bag_name
+        self.prefix = os.path.basename(self.collection) + '/'
+        if compact_ratio is None:
+            compact_ratio = getattr(settings, 'HS_BAG_COMPACT_RATIO', 0.5)
+        self.compact_ratio = compact_ratio
+
+    def _relative(self, name):
+        return name[len(self.prefix):]
+
+    def _needs_checksum(self, entry):
+        relative = self._relative(entry.name)
+        return not entry.is_dir and (relative.startswith('data/') or relative == 'readme.txt')
+
+    def _read_previous(self):
+        """Return (members, checksums, bag size) of the previous bag, or None."""
+        if not self.store.exists(self.bag_name):
+            return None
+        with self.store.open(self.bag_name, 'rb') as f:
+            try:
+                zf = zipfile.ZipFile(f)
+                members = dict((info.filename, info) for info in zf.infolist())
+                checksums = {}
+                for name in ('manifest-md5.txt', 'tagmanifest-md5.txt'):
+                    if self.prefix + name in members:
+                        checksums.update(_parse_manifest(zf.read(self.prefix + name)))
+                start_dir = zf.start_dir
+            except (zipfile.BadZipfile, zipfile.LargeZipFile, IOError) as ex:
+                logger.warn("rebuilding unreadable bag {}: {}".format(self.bag_name, ex))
+                return None
+            f.seek(0, os.SEEK_END)
+            return members, checksums, start_dir, f.tell()
+
+    def _is_unchanged(self, entry, info, checksums):
+        if info is None:
+            return False
+        if entry.is_dir:
+            return True
+        if info.comment != MTIME_COMMENT.format(entry.modified) or \
+                info.file_size != entry.size:
+            return False
+        return not self._needs_checksum(entry) or self._relative(entry.name) in checksums
+
+    def build(self):
+        """Write the bag; return a dict with the number of members kept and written."""
+        entries = [e for e in self.store.walk(self.collection)
+                   if self._relative(e.name) not in GENERATED_FILES]
+        previous = self._read_previous()
+
+        kept, changed = [], []
+        checksums = {}
+        if previous is not None:
+            members, old_checksums, start_dir, old_size = previous
+            for entry in entries:
+                if self._is_unchanged(entry, members.get(entry.name), old_checksums):
+                    kept.append(entry)
+                    relative = self._relative(entry.name)
+                    if relative in old_checksums:
+                        checksums[relative] = old_checksums[relative]
+                else:
+                    changed.append(entry)
+            live = sum(_member_span(members[e.name]) for e in kept)
+            dead = start_dir - live
+            if not kept or dead > self.compact_ratio * (live + dead +
+                                                        sum(e.size for e in changed)):
+                previous = None
+            else:
+                try:
+                    self._append(members, kept, changed, checksums, old_size)
+                    return {'kept': len(kept), 'written': len(changed), 'rebuilt': False}
+                except _TooShort:
+                    logger.info("rebuilding bag {} that would shrink".format(self.bag_name))
+
+        checksums = {}
+        with self.store.open(self.bag_name, 'wb') as f:
+            zf = zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+            self._write_members(zf, entries, checksums)
+            self._write_tag_files(zf, entries, checksums)
+            zf.close()
+        return {'kept': 0, 'written': len(entries), 'rebuilt': True}
+
+    def _append(self, members, kept, changed, checksums, old_size):
+        keep = set(e.name for e in kept)
+        with self.store.open(self.bag_name, 'r+b') as f:
+            zf = zipfile.ZipFile(f, 'a', zipfile.ZIP_DEFLATED, allowZip64=True)
+            # drop members from the central directory; their bytes become unreferenced
+            zf.filelist = [info for info in zf.filelist if info.filename in keep]
+            zf.NameToInfo = dict((info.filename, info) for info in zf.filelist)
+            zf._didModify = True
+            self._write_members(zf, changed, checksums)
+            self._write_tag_files(zf, kept + changed, checksums)
+            zf.close()
+            end = f.tell()
+            if self.store.can_truncate:
+                f.truncate(end)
+            elif end < old_size:
+                # stale bytes after the new end record would be taken for it
+                raise _TooShort()
+
+    def _write_members(self, zf, entries, checksums):
+        for entry in entries:
+            if entry.is_dir:
+                info = zipfile.ZipInfo(entry.name, time.gmtime()[:6])
+                info.external_attr = (0o40775 << 16) | 0x10
+                zf.writestr(info, b'')
+                continue
+            store_name = os.path.join(os.path.dirname(self.collection), entry.name)
+            with self.store.fetch(store_name, entry.modified) as (path, md5):
+                zf.write(path, entry.name)
+            zf.filelist[-1].comment = MTIME_COMMENT.format(entry.modified)
+            checksums[self._relative(entry.name)] = md5
+
+    def _write_tag_files(self, zf, entries, checksums):
+        manifest = ''.join("{}    {}\n".format(checksums[self._relative(e.name)],
+                                                self._relative(e.name))
+                           for e in entries
+                           if not e.is_dir and self._relative(e.name).startswith('data/'))
+        tag_files = [('bagit.txt', BAGIT_TXT), ('manifest-md5.txt', manifest)]
+        tag_manifest = ''.join("{}    {}\n".format(hashlib.md5(content).hexdigest(), name)
+                               for name, content in tag_files)
+        if 'readme.txt' in checksums:
+            tag_manifest += "{}    readme.txt\n".format(checksums['readme.txt'])
+        tag_files.append(('tagmanifest-md5.txt', tag_manifest))
+
+        now = time.localtime()[:6]
+        for name, content in tag_files:
+            info = zipfile.ZipInfo(self.prefix + name, now)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            zf.writestr(info, content)
+            # keep the copies in the collection that the iRODS rule used to write
+            self.store.save(os.path.join(self.collection, name), content)
+
+
+class _TooShort(Exception):
+    pass
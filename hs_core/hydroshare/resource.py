@@ -1,3 +1,4 @@
+import hashlib
 import os
 import zipfile
 import shutil
@@ -295,6 +296,9 @@ def get_checksum(pk):
     Returns a checksum for the specified resource using the MD5 algorithm. The result is used to
     determine if two instances referenced by a pid are identical.
 
+    The checksum is the MD5 of a manifest listing the MD5 and path of every file in the
+    resource, taken from the checksums stored with the files.
+
     REST URL:  GET /checksum/{pid}
 
     Parameters:
@@ -309,7 +313,10 @@ def get_checksum(pk):
     Exceptions.NotFound - The resource specified by pid does not exist
     Exception.ServiceFailure - The service is unable to process the request
     """
-    raise NotImplementedError()
+    resource = utils.get_resource_by_shortkey(pk)
+    files = sorted(resource.files.all(), key=lambda f: f.short_path)
+    manifest = u''.join(u"{}    {}\n".format(f.checksum_md5, f.short_path) for f in files)
+    return hashlib.md5(manifest.encode('utf-8')).hexdigest()
 
 
 def check_resource_files(files=()):
@@ -3,7 +3,6 @@ import logging
 
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist, ValidationError
 from django.contrib.auth.models import User, Group
-from django.contrib.gis.geos import Polygon, Point
 from django.core.files import File
 from django.core.files.uploadedfile import UploadedFile
 from django.core import exceptions
@@ -352,33 +351,7 @@ def get_resource_list(creator=None, group=None, user=None, owner=None, from_date
         if not north or not west or not south or not east: \
             raise ValueError("coverage queries must have north, west, south, and east params")
 
-        coverages = set()
-        search_polygon = Polygon.from_bbox((east,south,west,north))
-
-        for coverage in Coverage.objects.filter(type="box"):
-            coverage_polygon = Polygon.from_bbox((
-                coverage.value.get('eastlimit', None),
-                coverage.value.get('southlimit', None),
-                coverage.value.get('westlimit', None),
-                coverage.value.get('northlimit', None)
-            ))
-
-            if search_polygon.intersects(coverage_polygon):
-                coverages.add(coverage.id)
-
-        for coverage in Coverage.objects.filter(type="point"):
-            try:
-                coverage_shape = Point(
-                    coverage.value.get('east', None),
-                    coverage.value.get('north', None),
-                )
-
-                if search_polygon.intersects(coverage_shape):
-                    coverages.add(coverage.id)
-            except Exception as e:
-                log.error("Coverage value invalid for coverage id %d" % coverage.id)
-
-        coverage_hits = (Coverage.objects.filter(id__in=coverages))
+        coverage_hits = Coverage.intersecting(north, south, east, west)
         q.append(Q(object_id__in=coverage_hits.values_list('object_id', flat=True)))
 
     if contributor:
@@ -441,10 +414,16 @@ def get_resource_list(creator=None, group=None, user=None, owner=None, from_date
                 # No matches on title or abstract, so treat as no results of search
                 flt = flt.none()
 
+    # titles, the default ordering of pages, is not unique; ordering by pk as well keeps
+    # resources with equal titles from repeating or going missing across pages
+    flt = flt.order_by('titles', 'pk')
+
     # TODO The below is legacy pagination... need to find out if anything is using it and delete
+    # counting evaluates the query, so only do so when a slice is asked for; otherwise the
+    # caller receives a lazy queryset that it can paginate in the database
     qcnt = 0
-    if flt:
-        qcnt = len(flt)
+    if start is not None or count is not None:
+        qcnt = flt.count()
 
     if start is not None and count is not None:
         if qcnt > start:
@@ -26,10 +26,12 @@ from mezzanine.conf import settings
 from hs_core.signals import pre_create_resource, post_create_resource, pre_add_files_to_resource, \
     post_add_files_to_resource
 from hs_core.models import AbstractResource, BaseResource, ResourceFile
+from hs_core.checksums import file_digests
+from hs_core import landing_page_cache
 from hs_core.hydroshare.hs_bagit import create_bag_files
 
 from django_irods.icommands import SessionException
-from django_irods.storage import IrodsStorage
+from django_irods.storage import IrodsStorage, get_storage_class
 from theme.models import QuotaMessage
 
 
@@ -57,6 +59,50 @@ def get_resource_types():
     return resource_types
 
 
+def prefetch_metadata(resources, lookups, extended_lookups=()):
+    """
+    Attach the metadata of a list of resources, with lookups prefetched, in bulk.
+
+    Metadata objects are loaded with one query per metadata class, and each lookup with one
+    query per metadata class, rather than one query per resource for each.  The metadata is
+    cached on each resource, so resource.metadata does not query again.  Prefetched relations
+    are only used by .all(); filter(), first() and values() still query the database.
+
+    :param resources: list of BaseResource instances
+    :param lookups: relations of CoreMetaData to prefetch, e.g. ('creators', '_title')
+    :param extended_lookups: sequence of (metadata class, lookups) for relations that only
+        some metadata classes have
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from django.db.models import prefetch_related_objects
+
+    # metadata objects are of different classes; prefetch relations one class at a time
+    groups = {}
+    for res in resources:
+        if res.content_type_id is not None and res.object_id is not None:
+            groups.setdefault(res.content_type_id, []).append(res)
+    metadata_cache_attr = BaseResource.content_object.cache_attr
+    for content_type_id, group in groups.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        metadata = model.objects.in_bulk([res.object_id for res in group])
+        model_lookups = list(lookups)
+        for metadata_class, class_lookups in extended_lookups:
+            if issubclass(model, metadata_class):
+                model_lookups.extend(class_lookups)
+        prefetch_related_objects(list(metadata.values()), *model_lookups)
+        for res in group:
+            if res.object_id in metadata:
+                setattr(res, metadata_cache_attr, metadata[res.object_id])
+
+
+def first_of(elements):
+    """Return the element with the lowest id, as QuerySet.first() would, from prefetched rows."""
+    elements = list(elements)
+    if not elements:
+        return None
+    return min(elements, key=lambda element: element.pk)
+
+
 def get_resource_instance(app, model_name, pk, or_404=True):
     model = apps.get_model(app, model_name)
     if or_404:
@@ -299,6 +345,8 @@ def replace_resource_file_on_irods(new_file, original_resource_file, user):
 
     # Note: this doesn't update metadata at all.
     istorage.saveFile(new_file, ori_storage_path, True)
+    with open(new_file, 'rb') as f:
+        original_resource_file.set_checksums(file_digests(f))
 
     # do this so that the bag will be regenerated prior to download of the bag
     resource_modified(ori_res, by_user=user, overwrite_bag=False)
@@ -466,6 +514,7 @@ def resource_modified(resource, by_user=None, overwrite_bag=True):
     # seems this is the best place to sync resource title with metadata title
     resource.title = resource.metadata.title.value
     resource.save()
+    landing_page_cache.invalidate(resource.pk)
     if resource.metadata.dates.all().filter(type='modified'):
         res_modified_date = resource.metadata.dates.all().filter(type='modified')[0]
         resource.metadata.update_element('date', res_modified_date.id)
@@ -871,7 +920,7 @@ def create_empty_contents_directory(resource):
     res_contents_dir = resource.file_path
     istorage = resource.get_irods_storage()
     if not istorage.exists(res_contents_dir):
-        istorage.session.run("imkdir", None, '-p', res_contents_dir)
+        istorage.create_folder(res_contents_dir)
 
 
 def add_file_to_resource(resource, f, folder=None, source_name='',
@@ -947,7 +996,9 @@ def add_file_to_resource(resource, f, folder=None, source_name='',
     # TODO: generate this from data in ResourceFile rather than extension
     if file_format_type not in [mime.value for mime in resource.metadata.formats.all()]:
         resource.metadata.create_element('format', value=file_format_type)
-    ret.calculate_size()
+    if ret._size < 0:
+        # uploads are sized as they are stored; files copied within iRODS are not
+        ret.calculate_size()
 
     return ret
 
@@ -1047,7 +1098,7 @@ class ZipContents(object):
 
 
 def get_file_storage():
-    return IrodsStorage() if getattr(settings, 'USE_IRODS', False) else DefaultStorage()
+    return get_storage_class()() if getattr(settings, 'USE_IRODS', False) else DefaultStorage()
 
 
 def resolve_request(request):
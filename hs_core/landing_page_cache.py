@@ -0,0 +1,72 @@
+"""Cache of the parts of a resource landing page that do not depend upon the viewer.
+
+get_page_context reads the readme from iRODS and renders its markdown, reads the quota
+holder AVU, and builds the citation, metadata status and keywords from the metadata, on
+every view of a landing page.  get_parts keeps these in the Django cache, keyed by resource
+and by a version token per resource, as hs_core.aggregation_index does, so that a popular
+resource is rendered once per change rather than once per view.  The cache is enabled by
+setting ``LANDING_PAGE_CACHE_TIMEOUT`` to a positive number of seconds, and only takes
+effect with a cache backend shared by all web and celery processes (see
+hs_core.shared_cache), since a change must reach every process that renders the page.
+
+invalidate() replaces the token.  It is called by resource_modified, through which metadata
+edits pass, by set_quota_holder, and by the receivers in hs_core.receivers when a resource
+file or the access flags of a resource are saved or deleted.  The token is replaced at once
+and again when the transaction commits, so that parts computed concurrently from the data
+before the commit are not found afterwards.
+
+Only the read-only landing page uses the cache; parts that depend upon the viewer, such as
+the permissions, the tool list and the session messages, are computed on every view.
+"""
+
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from hs_core import shared_cache
+
+
+def _version_key(resource_pk):
+    return u'landing_page:{}'.format(resource_pk)
+
+
+def _replace_version(resource_pk):
+    cache.set(_version_key(resource_pk), uuid4().hex, None)
+
+
+def invalidate(resource_pk):
+    """Mark the cached landing page parts of a resource as stale."""
+    if resource_pk is not None:
+        _replace_version(resource_pk)
+        transaction.on_commit(lambda: _replace_version(resource_pk))
+
+
+def _current_version(resource_pk):
+    version = cache.get(_version_key(resource_pk))
+    if version is None:
+        # never invalidated, or evicted from the cache: parts cached before now are stale
+        version = uuid4().hex
+        if not cache.add(_version_key(resource_pk), version, None):
+            version = cache.get(_version_key(resource_pk), version)
+    return version
+
+
+def _timeout():
+    return shared_cache.timeout('LANDING_PAGE_CACHE_TIMEOUT')
+
+
+def get_parts(resource, compute):
+    """Return the cached landing page parts of a resource.
+
+    :param resource: the resource whose landing page is rendered
+    :param compute: a callable returning the parts, a picklable dict, when not cached
+    """
+    if _timeout() <= 0:
+        return compute()
+    key = u'landing_page:{}:{}'.format(resource.pk, _current_version(resource.pk))
+    parts = cache.get(key)
+    if parts is None:
+        parts = compute()
+        cache.set(key, parts, _timeout())
+    return parts
@@ -9,6 +9,9 @@ This checks that:
 2. every iRODS file in {short_id}/data/contents corresponds to a ResourceFile
 3. every iRODS directory {short_id} corresponds to a Django resource
 
+* Optional argument --checksums also checks the contents of every file against its stored
+  checksums, and stores the checksums of files that have none.
+
 * By default, prints errors on stdout.
 * Optional argument --log instead logs output to system log.
 """
@@ -60,6 +63,12 @@ class Command(BaseCommand):
             dest='unreferenced',
             help='check for unreferenced iRODS directories',
         )
+        parser.add_argument(
+            '--checksums',
+            action='store_true',  # True for presence, False for absence
+            dest='checksums',
+            help='check file contents against stored checksums',
+        )
 
     def handle(self, *args, **options):
         if options['unreferenced']:
@@ -75,6 +84,7 @@ class Command(BaseCommand):
                 except BaseResource.DoesNotExist:
                     msg = "Resource with id {} not found in Django Resources".format(rid)
                     print(msg)
+                    continue
 
                 print("LOOKING FOR FILE ERRORS FOR RESOURCE {}".format(rid))
                 if options['clean_irods']:
@@ -83,13 +93,16 @@ class Command(BaseCommand):
                     print(' (deleting Django file objects without files)')
                 if options['sync_ispublic']:
                     print(' (correcting isPublic in iRODs)')
+                if options['checksums']:
+                    print(' (checking file checksums)')
                 check_irods_files(resource, stop_on_error=False,
                                   echo_errors=not options['log'],
                                   log_errors=options['log'],
                                   return_errors=False,
                                   clean_irods=options['clean_irods'],
                                   clean_django=options['clean_django'],
-                                  sync_ispublic=options['sync_ispublic'])
+                                  sync_ispublic=options['sync_ispublic'],
+                                  check_checksums=options['checksums'])
 
         else:  # check all resources
             print("LOOKING FOR FILE ERRORS FOR ALL RESOURCES")
@@ -99,6 +112,8 @@ class Command(BaseCommand):
                 print(' (deleting Django file objects without files)')
             if options['sync_ispublic']:
                 print(' (correcting isPublic in iRODs)')
+            if options['checksums']:
+                print(' (checking file checksums)')
             for r in BaseResource.objects.all():
                 check_irods_files(r, stop_on_error=False,
                                   echo_errors=not options['log'],  # Don't both log and echo
@@ -106,4 +121,5 @@ class Command(BaseCommand):
                                   return_errors=False,
                                   clean_irods=options['clean_irods'],
                                   clean_django=options['clean_django'],
-                                  sync_ispublic=options['sync_ispublic'])
+                                  sync_ispublic=options['sync_ispublic'],
+                                  check_checksums=options['checksums'])
@@ -0,0 +1,79 @@
+"""Measure the database cost of preparing SOLR documents.
+* Prepares the documents of a sample of indexed resources three ways and prints the number
+  of queries and the time spent per document:
+  - unprefetched: every prepare_* method queries the database for itself;
+  - per resource: each resource is prefetched on its own, as the realtime signal processor does;
+  - batched: resources are prefetched in batches, as the deferred index queue does.
+* Optional argument --count: number of resources to sample (default 100).
+* Optional argument --batch: batch size of the batched run (default 100).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from haystack import indexes
+
+from hs_core.search_indexes import BaseResourceIndex, prefetch_index_metadata
+
+
+class Command(BaseCommand):
+    help = "Report queries and time per SOLR document"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--count',
+            dest='count',
+            type=int,
+            default=100,
+            help='number of resources to sample',
+        )
+
+        parser.add_argument(
+            '--batch',
+            dest='batch',
+            type=int,
+            default=100,
+            help='number of resources prefetched together in the batched run',
+        )
+
+    def sample(self, index, count):
+        """Return freshly loaded resources, so that no run profits from an earlier one."""
+        return list(index.index_queryset().order_by('pk')[:count])
+
+    def measure(self, label, index, resources, prepare):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.time()
+            prepare(resources)
+            elapsed = time.time() - start
+        count = max(len(resources), 1)
+        print("{:>14}: {:8.1f} queries/document {:8.1f} ms/document".format(
+            label, len(queries) / float(count), 1000 * elapsed / count))
+
+    def handle(self, *args, **options):
+        index = BaseResourceIndex()
+        batch = max(options['batch'], 1)
+
+        def unprefetched(resources):
+            for res in resources:
+                # skip BaseResourceIndex.prepare, which prefetches
+                indexes.SearchIndex.prepare(index, res)
+
+        def per_resource(resources):
+            for res in resources:
+                index.full_prepare(res)
+
+        def batched(resources):
+            for start in range(0, len(resources), batch):
+                chunk = resources[start:start + batch]
+                prefetch_index_metadata(chunk)
+                for res in chunk:
+                    index.full_prepare(res)
+
+        resources = self.sample(index, options['count'])
+        print("preparing {} resources".format(len(resources)))
+        self.measure('unprefetched', index, resources, unprefetched)
+        self.measure('per resource', index, self.sample(index, options['count']), per_resource)
+        self.measure('batched', index, self.sample(index, options['count']), batched)
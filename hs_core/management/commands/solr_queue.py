@@ -0,0 +1,52 @@
+"""Report on and manage the queue of deferred SOLR updates.
+* By default, prints the queue depth, the age of the oldest entry and the failing entries.
+* Optional argument --process: index every queued resource now.
+* Optional argument --retry: reset the attempt count of failing entries so they are retried.
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from hs_core.models import ResourceIndexQueue
+from hs_core.solr_queue import process_queue, max_attempts, get_identifier
+
+
+class Command(BaseCommand):
+    help = "Report the depth of the deferred SOLR indexing queue"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--process',
+            action='store_true',  # True for presence, False for absence
+            dest='process',       # value is options['process']
+            help='index all queued resources now, ignoring the settle time',
+        )
+
+        parser.add_argument(
+            '--retry',
+            action='store_true',  # True for presence, False for absence
+            dest='retry',         # value is options['retry']
+            help='retry resources that have exhausted their indexing attempts',
+        )
+
+    def handle(self, *args, **options):
+        failing = ResourceIndexQueue.objects.filter(attempts__gte=max_attempts())
+
+        if options['retry']:
+            count = failing.update(attempts=0, last_error='')
+            print("{} failing resources will be retried".format(count))
+
+        if options['process']:
+            done, failed = process_queue(settle_seconds=0)
+            print("{} resources indexed, {} failed".format(done, failed))
+
+        queue = ResourceIndexQueue.objects.all()
+        print("queue depth: {}".format(queue.count()))
+        oldest = queue.order_by('queued').first()
+        if oldest is not None:
+            print("oldest entry: {} seconds".format(int((now() - oldest.queued).total_seconds())))
+        print("failing: {}".format(failing.count()))
+        for entry in failing.order_by('queued'):
+            print("  {} ({} attempts): {}".format(get_identifier(entry.resource_pk),
+                                                  entry.attempts, entry.last_error))
@@ -0,0 +1,233 @@
+"""Rebuild the SOLR index in parallel, resuming after interruptions.
+* By default, re-indexes every public or discoverable resource.
+* Optional argument --modified-since: only resources whose last_updated date is on or after
+  the given ISO date or datetime; those that are now private are removed from the index.
+* Optional argument --workers: number of worker processes (default: number of cores).
+* Optional argument --chunk-size: number of resources sent to a worker at a time.
+* Optional argument --checkpoint: file recording finished chunks; a rerun with the same
+  arguments skips them and retries the resources that failed.
+* Optional argument --restart: ignore and overwrite an existing checkpoint.
+* Optional argument --clear: remove all resources from the index first (not when resuming).
+
+Each chunk is prepared with the bulk metadata prefetch and sent with one SOLR update per
+backend, exactly as the deferred index queue does (hs_core.solr_queue).
+"""
+
+import json
+import os
+from datetime import datetime, time
+from multiprocessing import Pool, cpu_count
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections as db_connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from haystack import connection_router, connections
+
+from hs_core.models import BaseResource, Date
+from hs_core.search_indexes import BaseResourceIndex
+
+DEFAULT_CHECKPOINT = 'solr_reindex.checkpoint'
+
+
+def _init_worker():
+    # connections inherited from the parent process must not be shared between processes
+    db_connections.close_all()
+
+
+def _reindex_chunk(resource_pks):
+    """Index one chunk in a worker process; returns the chunk and its failures."""
+    from hs_core.solr_queue import _index_batch
+    try:
+        errors = _index_batch(resource_pks)
+    except Exception as ex:
+        errors = dict((pk, str(ex)) for pk in resource_pks)
+    return resource_pks, errors
+
+
+def parse_since(value):
+    """Return an aware datetime from an ISO date or datetime string."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError("--modified-since: {} is not an ISO date or datetime"
+                               .format(value))
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def modified_resource_pks(since):
+    """Return primary keys of resources whose last_updated date is on or after since."""
+    modified = Date.objects.filter(type='modified', start_date__gte=since)\
+        .values_list('content_type_id', 'object_id')
+    by_content_type = {}
+    for content_type_id, object_id in modified:
+        by_content_type.setdefault(content_type_id, []).append(object_id)
+    if not by_content_type:
+        return []
+    query = Q()
+    for content_type_id, object_ids in by_content_type.items():
+        query |= Q(content_type_id=content_type_id, object_id__in=object_ids)
+    return list(BaseResource.objects.filter(query).order_by('pk').values_list('pk', flat=True))
+
+
+class Checkpoint(object):
+    """Finished chunks, as inclusive primary key ranges, and failed resources of a run."""
+
+    def __init__(self, path, arguments):
+        self.path = path
+        self.arguments = arguments
+        self.done = []
+        self.failed = {}
+
+    def load(self):
+        """Read the checkpoint; return False if there is none."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        if state['arguments'] != self.arguments:
+            raise CommandError("checkpoint {} was written by a run with arguments {}; "
+                               "use --restart to discard it"
+                               .format(self.path, state['arguments']))
+        self.done = [tuple(r) for r in state['done']]
+        self.failed = dict((int(pk), error) for pk, error in state['failed'].items())
+        return True
+
+    def save(self):
+        # write and rename, so that an interruption never leaves a truncated checkpoint
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'arguments': self.arguments, 'done': self.done,
+                       'failed': self.failed}, f)
+        os.rename(tmp, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def is_done(self, pk):
+        return pk not in self.failed and any(low <= pk <= high for low, high in self.done)
+
+    def record(self, resource_pks, errors):
+        self.done.append((resource_pks[0], resource_pks[-1]))
+        for pk in resource_pks:
+            self.failed.pop(pk, None)
+        self.failed.update(errors)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SOLR index with a pool of processes, resuming from a checkpoint"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--modified-since',
+            dest='modified_since',
+            help='only resources last updated on or after this ISO date or datetime',
+        )
+
+        parser.add_argument(
+            '--workers',
+            dest='workers',
+            type=int,
+            default=cpu_count(),
+            help='number of worker processes',
+        )
+
+        parser.add_argument(
+            '--chunk-size',
+            dest='chunk_size',
+            type=int,
+            default=200,
+            help='number of resources indexed by a worker at a time',
+        )
+
+        parser.add_argument(
+            '--checkpoint',
+            dest='checkpoint',
+            default=DEFAULT_CHECKPOINT,
+            help='file recording the progress of the run',
+        )
+
+        parser.add_argument(
+            '--restart',
+            action='store_true',  # True for presence, False for absence
+            dest='restart',       # value is options['restart']
+            help='discard an existing checkpoint and start over',
+        )
+
+        parser.add_argument(
+            '--clear',
+            action='store_true',  # True for presence, False for absence
+            dest='clear',         # value is options['clear']
+            help='remove all resources from the index before a new run',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+        since = options['modified_since']
+        if since is not None:
+            since = parse_since(since)
+
+        checkpoint = Checkpoint(options['checkpoint'],
+                                {'modified_since': since.isoformat() if since else None})
+        if options['restart']:
+            checkpoint.remove()
+        resuming = checkpoint.load()
+
+        if options['clear'] and not resuming:
+            for using in connection_router.for_write():
+                connections[using].get_backend().clear(models=[BaseResource])
+            print("cleared the index")
+
+        if since is not None:
+            resource_pks = modified_resource_pks(since)
+        else:
+            resource_pks = list(BaseResourceIndex().index_queryset().order_by('pk')
+                                .values_list('pk', flat=True))
+        total = len(resource_pks)
+        resource_pks = [pk for pk in resource_pks if not checkpoint.is_done(pk)]
+        if resuming:
+            print("resuming from {}: {} of {} resources left"
+                  .format(checkpoint.path, len(resource_pks), total))
+        else:
+            print("{} resources to index".format(total))
+        checkpoint.save()
+
+        chunks = [resource_pks[i:i + chunk_size]
+                  for i in range(0, len(resource_pks), chunk_size)]
+        # the workers open their own database connections
+        db_connections.close_all()
+        pool = Pool(processes=max(options['workers'], 1), initializer=_init_worker)
+        indexed = 0
+        try:
+            for chunk, errors in pool.imap_unordered(_reindex_chunk, chunks):
+                checkpoint.record(chunk, errors)
+                checkpoint.save()
+                indexed += len(chunk) - len(errors)
+                print("{} of {} resources indexed".format(indexed, len(resource_pks)))
+            pool.close()
+        except KeyboardInterrupt:
+            pool.terminate()
+            print("interrupted; rerun with the same arguments to resume")
+            raise
+        except BaseException:
+            # e.g. the checkpoint could not be saved; join() would wait for the workers
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+        if checkpoint.failed:
+            print("{} resources failed; rerun with the same arguments to retry them:"
+                  .format(len(checkpoint.failed)))
+            for pk, error in sorted(checkpoint.failed.items()):
+                print("  {}: {}".format(pk, error))
+        else:
+            checkpoint.remove()
+            print("done")
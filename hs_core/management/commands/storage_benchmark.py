@@ -0,0 +1,99 @@
+"""Measure the latency of storage operations apart from the rest of Django.
+* Runs the read operations that the resource landing page, file browser and downloads make
+  against the files of a sample of resources, and prints the time per operation:
+  exists, listdir, getAVU, size and reading a whole file.
+* Resources, their files and their paths are loaded before timing starts, so the database
+  does not count towards the figures.
+* Optional argument --count: number of resources to sample (default 20).
+* Optional argument --files: number of files per resource to size and read (default 5).
+* Optional argument --backend: 'irods' or 'filesystem'; defaults to IRODS_STORAGE_BACKEND.
+"""
+
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from django_irods.fs_storage import FileSystemStorage
+from django_irods.storage import IrodsStorage, get_storage_class
+from hs_core.models import BaseResource
+
+OPERATIONS = ('exists', 'listdir', 'getAVU', 'size', 'read')
+
+
+class Command(BaseCommand):
+    help = "Report the time per storage operation"
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--count',
+            dest='count',
+            type=int,
+            default=20,
+            help='number of resources to sample',
+        )
+
+        parser.add_argument(
+            '--files',
+            dest='files',
+            type=int,
+            default=5,
+            help='number of files per resource to size and read',
+        )
+
+        parser.add_argument(
+            '--backend',
+            dest='backend',
+            choices=('irods', 'filesystem'),
+            help='storage backend to measure',
+        )
+
+    def handle(self, *args, **options):
+        if options['backend'] == 'irods':
+            istorage = IrodsStorage()
+        elif options['backend'] == 'filesystem':
+            istorage = FileSystemStorage()
+        else:
+            istorage = get_storage_class()()
+
+        samples = []
+        resources = BaseResource.objects.filter(resource_federation_path='').order_by('pk')
+        for res in resources[:options['count']]:
+            file_paths = [f.storage_path for f in res.files.all()[:options['files']]]
+            samples.append((res.root_path, res.file_path, file_paths))
+
+        times = defaultdict(list)
+
+        def timed(operation, function, *args):
+            start = time.time()
+            result = function(*args)
+            times[operation].append(time.time() - start)
+            return result
+
+        def read(path):
+            with istorage.open(path) as f:
+                while f.read(1024 * 1024):
+                    pass
+
+        failures = 0
+        for root_path, file_path, file_paths in samples:
+            try:
+                timed('exists', istorage.exists, root_path)
+                timed('listdir', istorage.listdir, file_path)
+                timed('getAVU', istorage.getAVU, root_path, 'bag_modified')
+                for path in file_paths:
+                    timed('size', istorage.size, path)
+                    timed('read', read, path)
+            except Exception as ex:
+                failures += 1
+                print("{}: {}".format(root_path, ex))
+
+        print("{} on {} resources, {} failed".format(type(istorage).__name__, len(samples),
+                                                     failures))
+        for operation in OPERATIONS:
+            if times[operation]:
+                durations = sorted(times[operation])
+                print("{:>8}: {:6d} calls {:8.1f} ms/call {:8.1f} ms max".format(
+                    operation, len(durations), 1000 * sum(durations) / len(durations),
+                    1000 * durations[-1]))
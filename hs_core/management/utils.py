@@ -21,6 +21,7 @@ from hs_file_types.utils import set_logical_file_type, get_logical_file_type
 
 from requests import post
 
+from hs_core.checksums import file_digests
 from hs_core.models import BaseResource
 from hs_core.hydroshare import get_resource_by_shortkey
 from hs_core.views.utils import link_irods_file_to_django
@@ -137,7 +138,8 @@ def fix_irods_user_paths(resource, log_actions=True, echo_actions=False, return_
 
 def check_irods_files(resource, stop_on_error=False, log_errors=True,
                       echo_errors=False, return_errors=False,
-                      sync_ispublic=False, clean_irods=False, clean_django=False):
+                      sync_ispublic=False, clean_irods=False, clean_django=False,
+                      check_checksums=False):
     """Check whether files in resource.files and on iRODS agree.
 
     :param resource: resource to check
@@ -149,6 +151,8 @@ def check_irods_files(resource, stop_on_error=False, log_errors=True,
            and AVU isPublic
     :param clean_irods: whether to delete files in iRODs that are not in Django
     :param clean_django: whether to delete files in Django that are not in iRODs
+    :param check_checksums: whether to check the contents of files against their stored
+           checksums, and store the checksums of files that have none
     """
     from hs_core.hydroshare.resource import delete_resource_file
 
@@ -209,6 +213,24 @@ def check_irods_files(resource, stop_on_error=False, log_errors=True,
                     errors.append(msg)
                 if stop_on_error:
                     raise ValidationError(msg)
+            elif check_checksums:
+                if not f._checksum_md5:
+                    f.calculate_checksums()
+                    continue
+                with istorage.open(f.storage_path) as fd:
+                    md5, sha256 = file_digests(fd).hexdigests()
+                if (md5, sha256) != (f._checksum_md5, f._checksum_sha256):
+                    ecount += 1
+                    msg = "check_irods_files: file {} does not match its stored checksum"\
+                        .format(f.storage_path)
+                    if echo_errors:
+                        print(msg)
+                    if log_errors:
+                        logger.error(msg)
+                    if return_errors:
+                        errors.append(msg)
+                    if stop_on_error:
+                        raise ValidationError(msg)
 
         # Step 3: for composite resources, does every composite metadata file exist?
         from hs_composite_resource.models import CompositeResource as CR
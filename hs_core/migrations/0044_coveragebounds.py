@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# copies of hs_core.models.longitude_ranges and coverage_bounds as of this migration, so
+# that later changes to them do not change what it does
+def longitude_ranges(west, east):
+    if west <= east:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east)]
+
+
+def coverage_bounds(coverage_type, value):
+    try:
+        if coverage_type == 'box':
+            north, south = float(value['northlimit']), float(value['southlimit'])
+            west, east = float(value['westlimit']), float(value['eastlimit'])
+        elif coverage_type == 'point':
+            north = south = float(value['north'])
+            west = east = float(value['east'])
+        else:
+            return []
+    except (KeyError, TypeError, ValueError):
+        return []
+    south, north = min(south, north), max(south, north)
+    return [(south, north, range_west, range_east)
+            for range_west, range_east in longitude_ranges(west, east)]
+
+
+def populate_bounds(apps, schema_editor):
+    Coverage = apps.get_model('hs_core', 'Coverage')
+    CoverageBounds = apps.get_model('hs_core', 'CoverageBounds')
+    rows = []
+    for coverage in Coverage.objects.filter(type__in=('box', 'point')).iterator():
+        for south, north, west, east in coverage_bounds(coverage.type,
+                                                        json.loads(coverage._value)):
+            rows.append(CoverageBounds(coverage_id=coverage.id, south=south, north=north,
+                                       west=west, east=east))
+    CoverageBounds.objects.bulk_create(rows, batch_size=1000)
+
+
+def backwards(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0043_resourceindexqueue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverageBounds',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('south', models.FloatField(db_index=True)),
+                ('north', models.FloatField(db_index=True)),
+                ('west', models.FloatField(db_index=True)),
+                ('east', models.FloatField(db_index=True)),
+                ('coverage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bounds', to='hs_core.Coverage')),
+            ],
+        ),
+        migrations.RunPython(populate_bounds, backwards),
+    ]
@@ -18,12 +18,12 @@ from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.auth.models import User, Group
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models import Q, Sum
+from django.db.models import Case, Q, Sum, Value, When
 from django.db.models.signals import post_save
 from django.db import transaction
 from django.dispatch import receiver
 from django.utils.timezone import now
-from django_irods.storage import IrodsStorage
+from django_irods.storage import IrodsStorage, get_storage_class
 from django.conf import settings
 from django.core.files import File
 from django.core.exceptions import ObjectDoesNotExist, ValidationError, \
@@ -41,7 +41,9 @@ from mezzanine.pages.managers import PageManager
 
 from dominate.tags import div, legend, table, tbody, tr, th, td, h4
 
+from hs_core.checksums import ChecksummingFile, file_digests
 from hs_core.irods import ResourceIRODSMixin, ResourceFileIRODSMixin
+from hs_core import landing_page_cache
 import unicodedata
 
 
@@ -1115,6 +1117,33 @@ class Coverage(AbstractMetaDataElement):
         """Return json representation of coverage values."""
         return json.loads(self._value)
 
+    def save(self, *args, **kwargs):
+        """Save the coverage and keep its CoverageBounds in step with its value."""
+        super(Coverage, self).save(*args, **kwargs)
+        self.update_bounds()
+
+    def update_bounds(self):
+        """Replace the CoverageBounds rows of this coverage with those of its current value."""
+        self.bounds.all().delete()
+        CoverageBounds.objects.bulk_create([
+            CoverageBounds(coverage=self, south=south, north=north, west=west, east=east)
+            for south, north, west, east in coverage_bounds(self.type, self.value)])
+
+    @classmethod
+    def intersecting(cls, north, south, east, west):
+        """Return the spatial coverages that intersect a bounding box, queried via the index.
+
+        As for coverages, a box whose west longitude exceeds its east longitude crosses the
+        antimeridian.
+        """
+        north, south = max(float(north), float(south)), min(float(north), float(south))
+        longitudes = Q()
+        for range_west, range_east in longitude_ranges(float(west), float(east)):
+            longitudes |= Q(bounds__west__lte=range_east, bounds__east__gte=range_west)
+        # a single filter() call, so that all conditions apply to the same CoverageBounds row
+        return cls.objects.filter(longitudes, bounds__south__lte=north,
+                                  bounds__north__gte=south).distinct()
+
     @classmethod
     def create(cls, **kwargs):
         """Define custom create method for Coverage model.
@@ -1452,6 +1481,49 @@ class Coverage(AbstractMetaDataElement):
         return coverage_form
 
 
+def longitude_ranges(west, east):
+    """Split a longitude interval that crosses the antimeridian into two plain intervals."""
+    if west <= east:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east)]
+
+
+def coverage_bounds(coverage_type, value):
+    """Return the (south, north, west, east) rows that index a box or point coverage value.
+
+    A point is a box of zero extent. Returns an empty list for period coverages and for
+    values without numeric coordinates.
+    """
+    try:
+        if coverage_type == 'box':
+            north, south = float(value['northlimit']), float(value['southlimit'])
+            west, east = float(value['westlimit']), float(value['eastlimit'])
+        elif coverage_type == 'point':
+            north = south = float(value['north'])
+            west = east = float(value['east'])
+        else:
+            return []
+    except (KeyError, TypeError, ValueError):
+        return []
+    south, north = min(south, north), max(south, north)
+    return [(south, north, range_west, range_east)
+            for range_west, range_east in longitude_ranges(west, east)]
+
+
+class CoverageBounds(models.Model):
+    """Bounding box of a box or point Coverage in indexed columns, for spatial queries.
+
+    Coverage keeps these rows up to date whenever it is saved; a box that crosses the
+    antimeridian is stored as two rows, one on each side of it.
+    """
+
+    coverage = models.ForeignKey(Coverage, on_delete=models.CASCADE, related_name='bounds')
+    south = models.FloatField(db_index=True)
+    north = models.FloatField(db_index=True)
+    west = models.FloatField(db_index=True)
+    east = models.FloatField(db_index=True)
+
+
 class Format(AbstractMetaDataElement):
     """Define Format custom metadata element model."""
 
@@ -1927,6 +1999,7 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
                 # holder will be reduced as a result of setting quota holder to a different user
                 self.removeAVU(attname, oldqu)
         self.setAVU(attname, new_holder.username)
+        landing_page_cache.invalidate(self.pk)
         update_quota_usage(res=self, user=setter)
 
     def get_quota_holder(self):
@@ -1954,7 +2027,7 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
         """
         istorage = self.get_irods_storage()
         root_path = self.root_path
-        istorage.session.run("imeta", None, 'rm', '-C', root_path, attribute, value)
+        istorage.removeAVU(root_path, attribute, value)
 
     def setAVU(self, attribute, value):
         """Set an AVU at the resource level.
@@ -1970,9 +2043,18 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
         # the need for setting quota holder on the resource collection before adding files into
         # the resource collection in order for the real-time iRODS quota micro-services to work
         if not istorage.exists(root_path):
-            istorage.session.run("imkdir", None, '-p', root_path)
+            istorage.create_folder(root_path)
         istorage.setAVU(root_path, attribute, value)
 
+    def getAVUs(self):
+        """Read all AVUs of the resource collection in a single round trip.
+
+        This fills the AVU cache so that subsequent getAVU() calls made while serving the
+        same request do not go back to iRODS.
+        """
+        istorage = self.get_irods_storage()
+        return istorage.getAVUs(self.root_path)
+
     def getAVU(self, attribute):
         """Get an AVU for a resource.
 
@@ -2296,44 +2378,36 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
     @property
     def logical_files(self):
         """Get a list of logical files for resource."""
-        logical_files_list = []
-        for res_file in self.files.all():
-            if res_file.logical_file is not None:
-                if res_file.logical_file not in logical_files_list:
-                    logical_files_list.append(res_file.logical_file)
-        return logical_files_list
+        return self.aggregation_index.logical_files
 
     @property
     def aggregation_types(self):
         """Gets a list of all aggregation types that currently exist in this resource"""
-        aggr_types = []
-        aggr_type_names = []
-        for lf in self.logical_files:
-            if lf.type_name not in aggr_type_names:
-                aggr_type_names.append(lf.type_name)
-                aggr_type = lf.get_aggregation_display_name().split(":")[0]
-                aggr_types.append(aggr_type)
-        return aggr_types
+        return self.aggregation_index.aggregation_types
 
     @property
     def non_logical_files(self):
         """Get list of non-logical files for resource."""
-        non_logical_files_list = []
-        for res_file in self.files.all():
-            if res_file.logical_file is None:
-                if res_file.logical_file not in non_logical_files_list:
-                    non_logical_files_list.append(res_file)
-        return non_logical_files_list
+        return self.aggregation_index.non_logical_files
 
     @property
     def generic_logical_files(self):
         """Get list of generic logical files for resource."""
-        generic_logical_files_list = []
-        for res_file in self.files.all():
-            if res_file.has_generic_logical_file:
-                if res_file.logical_file not in generic_logical_files_list:
-                    generic_logical_files_list.append(res_file.logical_file)
-        return generic_logical_files_list
+        return self.aggregation_index.generic_logical_files
+
+    @property
+    def aggregation_index(self):
+        """Files and aggregations of this resource, loaded in bulk and kept until they change.
+
+        See hs_core.aggregation_index.
+        """
+        from hs_core.aggregation_index import get_index
+        return get_index(self)
+
+    def aggregation_querysets(self):
+        """Querysets of every aggregation of this resource, for resource types that keep
+        aggregations that are not reachable through their files; None otherwise."""
+        return None
 
     def get_logical_files(self, logical_file_class_name):
         """Get a list of logical files (aggregations) for a specified logical file class name."""
@@ -2529,7 +2603,7 @@ class ResourceFile(ResourceFileIRODSMixin):
 
     # This pair of FileFields deals with the fact that there are two kinds of storage
     resource_file = models.FileField(upload_to=get_path, max_length=4096,
-                                     null=True, blank=True, storage=IrodsStorage())
+                                     null=True, blank=True, storage=get_storage_class()())
     fed_resource_file = models.FileField(upload_to=get_path, max_length=4096,
                                          null=True, blank=True, storage=FedStorage())
 
@@ -2547,6 +2621,9 @@ class ResourceFile(ResourceFileIRODSMixin):
     logical_file_content_object = GenericForeignKey('logical_file_content_type',
                                                     'logical_file_object_id')
     _size = models.BigIntegerField(default=-1)
+    # digests of the file contents, empty until calculated; see hs_core/checksums.py
+    _checksum_md5 = models.CharField(max_length=32, blank=True, default='')
+    _checksum_sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True)
 
     def __str__(self):
         """Return resource filename or federated resource filename for string representation."""
@@ -2601,7 +2678,10 @@ class ResourceFile(ResourceFileIRODSMixin):
         kwargs['file_folder'] = folder
 
         # if file is an open file, use native copy by setting appropriate variables
+        checksumming = None
         if isinstance(file, File):
+            # digest the file as it is copied to storage
+            file = checksumming = ChecksummingFile(file)
             if resource.is_federated:
                 kwargs['resource_file'] = None
                 kwargs['fed_resource_file'] = file
@@ -2651,7 +2731,10 @@ class ResourceFile(ResourceFileIRODSMixin):
         # Actually create the file record
         # when file is a File, the file is copied to storage in this step
         # otherwise, the copy must precede this step.
-        return ResourceFile.objects.create(**kwargs)
+        res_file = ResourceFile.objects.create(**kwargs)
+        if checksumming is not None and checksumming.digests is not None:
+            res_file.set_checksums(checksumming.digests)
+        return res_file
 
     # TODO: automagically handle orphaned logical files
     def delete(self):
@@ -2751,6 +2834,51 @@ class ResourceFile(ResourceFileIRODSMixin):
                 self._size = 0
         self.save()
 
+    @property
+    def checksum_md5(self):
+        """Return the MD5 of the file contents.
+        Calculates the checksums first if they have not been calculated yet."""
+        if not self._checksum_md5:
+            self.calculate_checksums()
+        return self._checksum_md5
+
+    @property
+    def checksum_sha256(self):
+        """Return the SHA-256 of the file contents.
+        Calculates the checksums first if they have not been calculated yet."""
+        if not self._checksum_sha256:
+            self.calculate_checksums()
+        return self._checksum_sha256
+
+    def set_checksums(self, digests):
+        """Saves the size and checksums of the contents, from hs_core.checksums.Digests"""
+        self._checksum_md5, self._checksum_sha256 = digests.hexdigests()
+        self._size = digests.size
+        self.save(update_fields=['_checksum_md5', '_checksum_sha256', '_size'])
+
+    def calculate_checksums(self):
+        """Reads the file once and saves its size and checksums to the DB"""
+        istorage = self.resource.get_irods_storage()
+        try:
+            with istorage.open(self.storage_path) as f:
+                digests = file_digests(f)
+        except SessionException:
+            logger = logging.getLogger(__name__)
+            logger.warn("file {} not found".format(self.storage_path))
+            return
+        self.set_checksums(digests)
+
+    def find_duplicates(self):
+        """Return the other files of the resource that have the same contents, or none if
+        the file cannot be read."""
+        checksum = self.checksum_sha256
+        if not checksum:
+            return ResourceFile.objects.none()
+        return ResourceFile.objects.filter(object_id=self.object_id,
+                                           content_type_id=self.content_type_id,
+                                           _checksum_sha256=checksum)\
+            .exclude(pk=self.pk)
+
     # ResourceFile API handles file operations
     def set_storage_path(self, path, test_exists=True):
         """Bind this ResourceFile instance to an existing file.
@@ -3122,6 +3250,20 @@ class Bags(models.Model):
         return self.content_object.get_content_model()
 
 
+class ResourceIndexQueue(models.Model):
+    """Resources whose SOLR documents are out of date and await a batched update.
+
+    Entries are unique per resource, so repeated saves of one resource coalesce into a single
+    entry. The resource is referenced by primary key rather than by foreign key because an
+    entry must outlive a deleted resource in order to remove its SOLR document.
+    """
+
+    resource_pk = models.IntegerField(unique=True)
+    queued = models.DateTimeField(default=now, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+
 class PublicResourceManager(models.Manager):
     """Extend Django model Manager to allow for public resource access."""
 
@@ -3189,11 +3331,11 @@ class BaseResource(Page, AbstractResource):
         return AbstractResource.can_view(self, request)
 
     def get_irods_storage(self):
-        """Return either IrodsStorage or FedStorage."""
+        """Return either IrodsStorage (or the configured local storage) or FedStorage."""
         if self.resource_federation_path:
             return FedStorage()
         else:
-            return IrodsStorage()
+            return get_storage_class()()
 
     @property
     def is_federated(self):
@@ -3353,8 +3495,7 @@ class BaseResource(Page, AbstractResource):
         Raises SessionException if iRODS fails.
         """
         # trigger file size read for files that haven't been set yet
-        for f in self.files.filter(_size__lt=0):
-            f.calculate_size()
+        self.calculate_file_sizes()
         # compute the total file size for the resource
         res_size_dict = self.files.aggregate(Sum('_size'))
         # handle case if no resource files
@@ -3364,6 +3505,46 @@ class BaseResource(Page, AbstractResource):
             res_size = 0
         return res_size
 
+    def calculate_file_sizes(self):
+        """Read the sizes of the files whose size is not known yet and save them to the DB.
+
+        Rather than an ils and an UPDATE per file, as ResourceFile.calculate_size does, the
+        resource collection is listed once and the sizes are written in batches.
+
+        Returns the number of files sized; the files of a resource whose collection does not
+        exist yet are given a size of 0.
+        Raises SessionException if iRODS fails to list an existing collection.
+        """
+        files = self.files.filter(_size__lt=0)\
+            .values_list('id', 'resource_file', 'fed_resource_file')
+        if not files:
+            return 0
+        istorage = self.get_irods_storage()
+        try:
+            sizes = istorage.file_sizes(self.file_path)
+        except SessionException:
+            if istorage.exists(self.file_path):
+                raise
+            # the collection does not exist yet
+            sizes = {}
+
+        file_sizes = {}
+        for pk, name, fed_name in files:
+            path = fed_name if self.is_federated else name
+            if path not in sizes:
+                logger = logging.getLogger(__name__)
+                logger.warn("file {} not found".format(path))
+            file_sizes[pk] = sizes.get(path, 0)
+
+        pks = list(file_sizes)
+        batch_size = 1000  # files per UPDATE
+        for i in range(0, len(pks), batch_size):
+            batch = pks[i:i + batch_size]
+            ResourceFile.objects.filter(pk__in=batch).update(_size=Case(
+                *[When(pk=pk, then=Value(file_sizes[pk])) for pk in batch],
+                output_field=models.BigIntegerField()))
+        return len(pks)
+
     @property
     def verbose_name(self):
         """Return verbose name of content_model."""
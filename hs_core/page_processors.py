@@ -2,12 +2,13 @@
 
 from dateutil import parser
 from django.conf import settings
+from django.contrib.auth.models import User
 from django.contrib.auth.views import redirect_to_login
 from django.core.exceptions import PermissionDenied
 from mezzanine.pages.page_processors import processor_for
 
 from forms import ExtendedMetadataForm
-from hs_core import languages_iso
+from hs_core import languages_iso, landing_page_cache
 from hs_core.hydroshare.resource import METADATA_STATUS_SUFFICIENT, METADATA_STATUS_INSUFFICIENT, \
     res_has_web_reference
 from hs_core.models import GenericResource, Relation
@@ -63,7 +64,12 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
     if user.is_authenticated():
         resource_is_mine = content_model.rlabels.is_mine(user)
 
-    metadata_status = _get_metadata_status(content_model)
+    if resource_edit:
+        parts = _get_page_parts(content_model)
+    else:
+        parts = landing_page_cache.get_parts(content_model,
+                                             lambda: _get_page_parts(content_model))
+    metadata_status = parts['metadata_status']
 
     belongs_to_collections = content_model.collections.all()
 
@@ -112,14 +118,13 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
 
     allow_copy = can_user_copy_resource(content_model, user)
 
-    qholder = content_model.get_quota_holder()
-
-    readme = content_model.get_readme_file_content()
-    if readme is None:
-        readme = ''
-    has_web_ref = res_has_web_reference(content_model)
+    qholder = None
+    if parts['quota_holder']:
+        qholder = User.objects.filter(username=parts['quota_holder']).first()
 
-    keywords = json.dumps([sub.value for sub in content_model.metadata.subjects.all()])
+    readme = parts['readme']
+    has_web_ref = parts['show_web_reference_note']
+    keywords = parts['keywords']
 
     # user requested the resource in READONLY mode
     if not resource_edit:
@@ -168,14 +173,14 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
         abstract = content_model.metadata.description.abstract if \
             content_model.metadata.description else None
 
-        missing_metadata_elements = content_model.metadata.get_required_missing_elements()
+        missing_metadata_elements = parts['missing_metadata_elements']
         maps_key = settings.MAPS_KEY if hasattr(settings, 'MAPS_KEY') else ''
 
         context = {
                    'cm': content_model,
                    'resource_edit_mode': resource_edit,
                    'metadata_form': None,
-                   'citation': content_model.get_citation(),
+                   'citation': parts['citation'],
                    'title': title,
                    'readme': readme,
                    'abstract': abstract,
@@ -293,8 +298,8 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
                'spatial_coverage': spatial_coverage_data_dict,
                'keywords': keywords,
                'metadata_status': metadata_status,
-               'missing_metadata_elements': content_model.metadata.get_required_missing_elements(),
-               'citation': content_model.get_citation(),
+               'missing_metadata_elements': parts['missing_metadata_elements'],
+               'citation': parts['citation'],
                'rights': content_model.metadata.rights,
                'bag_url': bag_url,
                'current_user': user,
@@ -356,6 +361,24 @@ def check_for_validation(request):
     return None
 
 
+def _get_page_parts(resource):
+    """Return the parts of the page context that do not depend upon the viewer.
+
+    These are kept by hs_core.landing_page_cache, and so must be picklable.
+    """
+    qholder = resource.get_quota_holder()
+    readme = resource.get_readme_file_content()
+    return {
+        'metadata_status': _get_metadata_status(resource),
+        'missing_metadata_elements': resource.metadata.get_required_missing_elements(),
+        'citation': resource.get_citation(),
+        'quota_holder': qholder.username if qholder else None,
+        'readme': readme if readme is not None else '',
+        'show_web_reference_note': res_has_web_reference(resource),
+        'keywords': json.dumps([sub.value for sub in resource.metadata.subjects.all()]),
+    }
+
+
 def _get_metadata_status(resource):
     if resource.metadata.has_all_required_elements():
         metadata_status = METADATA_STATUS_SUFFICIENT
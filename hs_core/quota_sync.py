@@ -0,0 +1,159 @@
+"""Bulk synchronization of user quotas with the iRODS quota usage AVUs.
+
+iRODS quota micro-services keep the storage used by each user in a '<username>-usage' AVU
+on the bags collection of the data zone and of the user zone.  update_quota_usage_task reads
+the two AVUs of one user with one 'imeta ls' each, which is right after a single resource
+changes but makes a refresh of every user a matter of hours.  Here
+
+* sync_usage() reads all usage AVUs of each zone in one 'imeta ls' of its bags collection,
+  sums them per user in memory, and writes the used values that changed with a few
+  UPDATE ... CASE statements;
+* update_grace_periods() computes the grace periods of all users from one query of their
+  quotas, writes those that changed in the same way, and returns the users to warn, whose
+  emails hs_core.tasks.manage_task_weekly queues for celery to send.
+"""
+
+import logging
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, FloatField, IntegerField, Value, When
+
+from django_irods.icommands import SessionException
+from django_irods.storage import IrodsStorage
+from hs_core.hydroshare.utils import convert_file_size_to_unit
+from theme.models import QuotaMessage, UserQuota
+
+logger = logging.getLogger(__name__)
+
+HS_INTERNAL_ZONE = 'hydroshare'
+USAGE_SUFFIX = '-usage'
+UPDATE_BATCH_SIZE = 1000
+
+
+def _zone_bagit_paths():
+    """Return the bags collections of the data zone and of the user zone."""
+    return (settings.IRODS_BAGIT_PATH,
+            os.path.join('/', settings.HS_USER_IRODS_ZONE, 'home',
+                         settings.HS_LOCAL_PROXY_USER_IN_FED_ZONE, settings.IRODS_BAGIT_PATH))
+
+
+def read_usage(istorage, path):
+    """Return {username: bytes used} from the usage AVUs on collection path."""
+    try:
+        avus = istorage.getAVUs(path)
+    except SessionException:
+        # there are no usage AVUs if no user has resources in this zone
+        return {}
+    usage = {}
+    for name, value in avus.items():
+        if not name.endswith(USAGE_SUFFIX):
+            continue
+        try:
+            usage[name[:-len(USAGE_SUFFIX)]] = float(value)
+        except (TypeError, ValueError):
+            logger.warning("invalid quota usage AVU {}={} on {}".format(name, value, path))
+    return usage
+
+
+def total_usage(*zone_usages):
+    """Return {username: bytes used in all zones} from {username: bytes} of each zone."""
+    totals = {}
+    for usage in zone_usages:
+        for username, size in usage.items():
+            if size >= 0:
+                totals[username] = totals.get(username, 0) + size
+    return totals
+
+
+def bulk_update(field, output_field, values):
+    """Set field of the UserQuota rows with the pks of values, a dict of {pk: value}."""
+    pks = list(values)
+    for i in range(0, len(pks), UPDATE_BATCH_SIZE):
+        batch = pks[i:i + UPDATE_BATCH_SIZE]
+        UserQuota.objects.filter(pk__in=batch).update(**{field: Case(
+            *[When(pk=pk, then=Value(values[pk])) for pk in batch],
+            output_field=output_field)})
+
+
+def _quotas():
+    """Return the hydroshare zone quotas of active users, as manage_task_weekly checks."""
+    return UserQuota.objects.filter(zone=HS_INTERNAL_ZONE, user__is_active=True,
+                                    user__is_superuser=False)
+
+
+def sync_usage(istorage=None):
+    """Update the used values of all quotas from the usage AVUs of both zones.
+
+    :return: the number of quotas whose used value changed
+    """
+    if istorage is None:
+        istorage = IrodsStorage()
+    usage = total_usage(*[read_usage(istorage, path) for path in _zone_bagit_paths()])
+
+    changed = {}
+    missing = 0
+    for pk, username, unit, used_value in _quotas().values_list('pk', 'user__username', 'unit',
+                                                                'used_value').iterator():
+        if username not in usage:
+            # the user has no resources in either zone
+            missing += 1
+            continue
+        new_value = convert_file_size_to_unit(usage[username], unit)
+        if new_value != used_value:
+            changed[pk] = new_value
+    if missing:
+        logger.debug("{} users have no quota usage AVU in either zone".format(missing))
+
+    with transaction.atomic():
+        bulk_update('used_value', FloatField(), changed)
+    return len(changed)
+
+
+def grace_period(used_percent, remaining_grace_period, qmsg):
+    """Return (new remaining grace period, whether to warn) of a quota used at used_percent.
+
+    This is the weekly step of the grace period: it starts once the hard quota is exceeded,
+    counts down a day per run, is 0 (enforced) beyond the hard limit, and is turned off
+    below the soft limit.
+    """
+    if used_percent < qmsg.soft_limit_percent:
+        return (-1 if remaining_grace_period >= 0 else remaining_grace_period), False
+    if used_percent >= qmsg.hard_limit_percent:
+        return 0, True
+    if used_percent >= 100:
+        if remaining_grace_period < 0:
+            return qmsg.grace_period, True
+        if remaining_grace_period > 0:
+            return remaining_grace_period - 1, True
+    return remaining_grace_period, True
+
+
+def update_grace_periods():
+    """Advance the grace periods of all quotas by a day.
+
+    :return: the ids of the users over their soft limit, who should be warned
+    """
+    if not QuotaMessage.objects.exists():
+        QuotaMessage.objects.create()
+    qmsg = QuotaMessage.objects.first()
+
+    changed = {}
+    warn = []
+    rows = _quotas().values_list('pk', 'user_id', 'used_value', 'allocated_value',
+                                 'remaining_grace_period')
+    for pk, user_id, used_value, allocated_value, remaining in rows.iterator():
+        if allocated_value <= 0:
+            logger.warning("quota {} of user {} has no allocation".format(pk, user_id))
+            continue
+        new_remaining, warning = grace_period(used_value * 100.0 / allocated_value, remaining,
+                                              qmsg)
+        if new_remaining != remaining:
+            changed[pk] = new_remaining
+        if warning:
+            warn.append(user_id)
+
+    with transaction.atomic():
+        bulk_update('remaining_grace_period', IntegerField(), changed)
+    return warn
@@ -1,12 +1,18 @@
 """Signal receivers for the hs_core app."""
 
+from django.apps import apps
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from hs_core.signals import pre_metadata_element_create, pre_metadata_element_update, \
     post_delete_resource, post_add_geofeature_aggregation, post_add_generic_aggregation, \
     post_add_netcdf_aggregation, post_add_raster_aggregation, post_add_timeseries_aggregation, \
     post_add_reftimeseries_aggregation, post_remove_file_aggregation, post_raccess_change
 from hs_core.tasks import update_web_services
-from hs_core.models import GenericResource, Party
+from hs_core.models import GenericResource, Party, ResourceFile
+from hs_core import aggregation_index, landing_page_cache
+from hs_access_control.models import ResourceAccess
+from hs_file_types.models.base import AbstractLogicalFile, AbstractFileMetaData
 from django.conf import settings
 from forms import SubjectsForm, AbstractValidationForm, CreatorValidationForm, \
     ContributorValidationForm, RelationValidationForm, SourceValidationForm, RightsValidationForm, \
@@ -168,3 +174,44 @@ def hs_update_web_services(sender, **kwargs):
             settings.HSWS_PUBLISH_URLS,
             kwargs.get("resource").short_id
         ), countdown=1)
+
+
+def aggregation_index_invalidation_handler(sender, instance, **kwargs):
+    """Mark the aggregation index of a resource stale when its files or aggregations change."""
+    if isinstance(instance, ResourceFile):
+        aggregation_index.invalidate(instance.object_id)
+    elif isinstance(instance, AbstractLogicalFile):
+        aggregation_index.invalidate(instance.resource_id)
+    elif isinstance(instance, AbstractFileMetaData):
+        try:
+            aggregation_index.invalidate(instance.logical_file.resource_id)
+        except ObjectDoesNotExist:
+            # metadata is saved before the logical file that refers to it is created
+            pass
+
+
+def landing_page_invalidation_handler(sender, instance, **kwargs):
+    """Mark the cached landing page of a resource stale when its files or flags change."""
+    if isinstance(instance, ResourceFile):
+        landing_page_cache.invalidate(instance.object_id)
+    else:
+        # a logical file or the ResourceAccess of the resource
+        landing_page_cache.invalidate(instance.resource_id)
+
+
+def connect_to_models(handler, base_classes):
+    """Connect handler to post_save and post_delete of each model derived from base_classes.
+
+    Receivers of these signals are connected per sender, so that saving other models does
+    not run them.
+    """
+    for model in apps.get_models():
+        if issubclass(model, base_classes):
+            post_save.connect(handler, sender=model)
+            post_delete.connect(handler, sender=model)
+
+
+connect_to_models(aggregation_index_invalidation_handler,
+                  (ResourceFile, AbstractLogicalFile, AbstractFileMetaData))
+connect_to_models(landing_page_invalidation_handler,
+                  (ResourceFile, AbstractLogicalFile, ResourceAccess))
@@ -1,12 +1,15 @@
 """Define search indexes for hs_core module."""
 
+from collections import defaultdict
+
 from haystack import indexes
 from hs_core.models import BaseResource
+from hs_core.hydroshare.utils import first_of
 from hs_geographic_feature_resource.models import GeographicFeatureMetaData
 from hs_app_netCDF.models import NetcdfMetaData
 from ref_ts.models import RefTSMetadata
 from hs_app_timeseries.models import TimeSeriesMetaData
-from django.db.models import Q
+from django.db.models import Q, prefetch_related_objects
 from datetime import datetime
 from nameparser import HumanName
 import probablepeople
@@ -63,6 +66,50 @@ def normalize_name(name):
     return normalized.strip()
 
 
+# metadata relations read by BaseResourceIndex, prefetched in bulk by prefetch_index_metadata()
+CORE_METADATA_LOOKUPS = ('_title', '_description', 'creators', 'contributors', 'subjects',
+                         'coverages', 'formats', 'identifiers', '_language', 'sources',
+                         'relations', '_publisher')
+EXTENDED_METADATA_LOOKUPS = (
+    (GeographicFeatureMetaData, ('geometryinformations', 'fieldinformations')),
+    (NetcdfMetaData, ('variables',)),
+    (RefTSMetadata, ('variables', 'sites', 'methods', 'quality_levels', 'datasources')),
+    (TimeSeriesMetaData, ('_variables', '_sites', '_methods', '_time_series_results')),
+)
+
+
+def prefetch_index_metadata(resources):
+    """
+    Load everything BaseResourceIndex reads about a batch of resources with bulk queries.
+
+    Metadata objects are fetched with one query per metadata class, and each metadata
+    relation with one query per metadata class, instead of several queries per prepare_*
+    method per resource. Owners, comments and access flags are fetched once for the batch.
+    The results are cached on the resource instances, so prepare_* methods read from memory.
+    """
+    from hs_access_control.models import UserResourcePrivilege, PrivilegeCodes
+    from hs_core.hydroshare.utils import get_resource_types, prefetch_metadata
+
+    resources = [res for res in resources if not getattr(res, '_index_prefetched', False)]
+    if not resources:
+        return
+
+    prefetch_metadata(resources, CORE_METADATA_LOOKUPS, EXTENDED_METADATA_LOOKUPS)
+    prefetch_related_objects(resources, 'raccess', 'comments')
+
+    owners = defaultdict(list)
+    for urp in UserResourcePrivilege.objects.filter(resource__in=resources,
+                                                    privilege=PrivilegeCodes.OWNER,
+                                                    user__is_active=True).select_related('user'):
+        owners[urp.resource_id].append(urp.user)
+
+    resource_types = dict((rt._meta.model_name, rt) for rt in get_resource_types())
+    for res in resources:
+        res._index_owners = owners[res.pk]
+        res._index_content_class = resource_types.get(res.content_model)
+        res._index_prefetched = True
+
+
 class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     """Define base class for resource indexes."""
 
@@ -154,7 +201,34 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     def index_queryset(self, using=None):
         """Return queryset including discoverable and public resources."""
         return self.get_model().objects.filter(Q(raccess__discoverable=True) |
-                                               Q(raccess__public=True))
+                                               Q(raccess__public=True))\
+            .select_related('raccess')
+
+    def prepare(self, obj):
+        """Prepare the document from metadata loaded in bulk rather than per field."""
+        prefetch_index_metadata([obj])
+        return super(BaseResourceIndex, self).prepare(obj)
+
+    def _first_creator(self, obj):
+        return first_of(creator for creator in obj.metadata.creators.all() if creator.order == 1)
+
+    def _owners(self, obj):
+        owners = getattr(obj, '_index_owners', None)
+        if owners is None:
+            owners = list(obj.raccess.owners.all())
+        return owners
+
+    def _verbose_name(self, obj):
+        content_class = getattr(obj, '_index_content_class', None)
+        if content_class is None:
+            return obj.verbose_name
+        return content_class._meta.verbose_name
+
+    def _discovery_content_type(self, obj):
+        content_class = getattr(obj, '_index_content_class', None)
+        if content_class is None:
+            return obj.discovery_content_type
+        return content_class.discovery_content_type
 
     def prepare_created(self, obj):
         return obj.created.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -164,16 +238,18 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_title(self, obj):
         """Return metadata title if exists, otherwise return 'none'."""
-        if hasattr(obj, 'metadata') and obj.metadata.title.value is not None:
-            return obj.metadata.title.value.lstrip()
+        title = first_of(obj.metadata._title.all()) if hasattr(obj, 'metadata') else None
+        if title is not None and title.value is not None:
+            return title.value.lstrip()
         else:
             return 'none'
 
     def prepare_abstract(self, obj):
         """Return metadata abstract if exists, otherwise return None."""
-        if hasattr(obj, 'metadata') and obj.metadata.description is not None and \
-                obj.metadata.description.abstract is not None:
-            return obj.metadata.description.abstract.lstrip()
+        description = first_of(obj.metadata._description.all()) \
+            if hasattr(obj, 'metadata') else None
+        if description is not None and description.abstract is not None:
+            return description.abstract.lstrip()
         else:
             return None
 
@@ -184,7 +260,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         This must be represented as a single-value field to enable sorting.
         """
         if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
+            first_creator = self._first_creator(obj)
             if first_creator.name:
                 return first_creator.name.lstrip()
             elif first_creator.organization:
@@ -202,7 +278,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         This must be represented as a single-value field to enable sorting.
         """
         if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
+            first_creator = self._first_creator(obj)
             if first_creator.name:
                 normalized = normalize_name(first_creator.name)
                 return normalized
@@ -220,7 +296,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         This field is stored but not indexed, to avoid hitting the Django database during response.
         """
         if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
+            first_creator = self._first_creator(obj)
             if first_creator.description is not None:
                 return first_creator.description
             else:
@@ -236,8 +312,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             return [normalize_name(creator.name)
-                    for creator in obj.metadata.creators.all()
-                    .exclude(name__isnull=True).exclude(name='')]
+                    for creator in obj.metadata.creators.all() if creator.name]
         else:
             return []
 
@@ -249,8 +324,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             output1 = [normalize_name(contributor.name)
-                       for contributor in obj.metadata.contributors.all()
-                       .exclude(name__isnull=True).exclude(name='')]
+                       for contributor in obj.metadata.contributors.all() if contributor.name]
             return list(set(output1))  # eliminate duplicates
         else:
             return []
@@ -263,7 +337,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             return [subject.value.strip() for subject in obj.metadata.subjects.all()
-                    .exclude(value__isnull=True)]
+                    if subject.value is not None]
         else:
             return []
 
@@ -283,7 +357,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         Return metadata publisher if it exists; otherwise return empty array.
         """
         if hasattr(obj, 'metadata'):
-            publisher = obj.metadata.publisher
+            publisher = first_of(obj.metadata._publisher.all())
             if publisher is not None:
                 return unicode(publisher).lstrip()
             else:
@@ -295,7 +369,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """Return metadata emails if exists, otherwise return empty array."""
         if hasattr(obj, 'metadata'):
             return [creator.email.strip() for creator in obj.metadata.creators.all()
-                    .exclude(email__isnull=True).exclude(email='')]
+                    if creator.email]
         else:
             return []
 
@@ -322,7 +396,8 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     def prepare_replaced(self, obj):
         """Return True if 'isReplacedBy' attribute exists, otherwise return False."""
         if hasattr(obj, 'metadata'):
-            return obj.metadata.relations.all().filter(type='isReplacedBy').exists()
+            return any(relation.type == 'isReplacedBy'
+                       for relation in obj.metadata.relations.all())
         else:
             return False
 
@@ -525,7 +600,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     def prepare_language(self, obj):
         """Return resource language if exists, otherwise return None."""
         if hasattr(obj, 'metadata'):
-            return obj.metadata.language.code.strip()
+            return first_of(obj.metadata._language.all()).code.strip()
         else:
             return None
 
@@ -545,11 +620,11 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_resource_type(self, obj):
         """Resource type is verbose_name attribute of obj argument."""
-        return obj.verbose_name
+        return self._verbose_name(obj)
 
     def prepare_content_type(self, obj):
-        if obj.verbose_name != 'Composite Resource':
-            return [obj.discovery_content_type]
+        if self._verbose_name(obj) != 'Composite Resource':
+            return [self._discovery_content_type(obj)]
         else:
             output = []
             for f in obj.logical_files:
@@ -567,7 +642,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     def prepare_owner_login(self, obj):
         """Return list of usernames that have ownership access to resource."""
         if hasattr(obj, 'raccess'):
-            return [owner.username for owner in obj.raccess.owners.all()]
+            return [owner.username for owner in self._owners(obj)]
         else:
             return []
 
@@ -576,7 +651,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """Return list of names of resource owners."""
         names = []
         if hasattr(obj, 'raccess'):
-            for owner in obj.raccess.owners.all():
+            for owner in self._owners(obj):
                 name = normalize_name(owner.first_name.capitalize() +
                                       ' ' + owner.last_name.capitalize())
                 names.append(name)
@@ -589,24 +664,22 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         output1 = []
         output2 = []
         if hasattr(obj, 'raccess'):
-            for owner in obj.raccess.owners.all():
+            for owner in self._owners(obj):
                 name = normalize_name(owner.first_name.capitalize() +
                                       ' ' + owner.last_name.capitalize())
                 output0.append(name)
 
         if hasattr(obj, 'metadata'):
             output1 = [normalize_name(creator.name)
-                       for creator in obj.metadata.creators.all()
-                       .exclude(name__isnull=True).exclude(name='')]
+                       for creator in obj.metadata.creators.all() if creator.name]
             output2 = [normalize_name(contributor.name)
-                       for contributor in obj.metadata.contributors.all()
-                       .exclude(name__isnull=True).exclude(name='')]
+                       for contributor in obj.metadata.contributors.all() if contributor.name]
         return list(set(output0 + output1 + output2))  # eliminate duplicates
 
     def prepare_owners_count(self, obj):
         """Return count of resource owners if 'raccess' attribute exists, othrerwise return 0."""
         if hasattr(obj, 'raccess'):
-            return obj.raccess.owners.all().count()
+            return len(self._owners(obj))
         else:
             return 0
 
@@ -664,7 +737,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                geometry_info = obj.metadata.geometryinformation
+                geometry_info = first_of(obj.metadata.geometryinformations.all())
                 if geometry_info is not None:
                     return geometry_info.geometryType
                 else:
@@ -680,7 +753,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
+                field_info = first_of(obj.metadata.fieldinformations.all())
                 if field_info is not None and field_info.fieldName is not None:
                     return field_info.fieldName.strip()
                 else:
@@ -696,7 +769,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
+                field_info = first_of(obj.metadata.fieldinformations.all())
                 if field_info is not None and field_info.fieldType is not None:
                     return field_info.fieldType.strip()
                 else:
@@ -712,7 +785,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
+                field_info = first_of(obj.metadata.fieldinformations.all())
                 if field_info is not None and field_info.fieldTypeCode is not None:
                     return field_info.fieldTypeCode.strip()
                 else:
@@ -0,0 +1,31 @@
+"""Timeouts of caches that are shared between web and celery processes.
+
+privilege_cache, landing_page_cache and tool_index keep entries in the Django cache under
+version tokens that are replaced on change.  A replaced token only reaches the other
+processes if they all use the same cache, so these caches are only enabled when the
+default cache backend is shared, e.g. memcached, redis, a database or a file based cache.
+Django's default, LocMemCache, is private to each process; with it, a change made in one
+worker would not be seen by the others until their entries expired.  The AVU and stat
+caches of django_irods, whose entries are invalidated by path, are guarded the same way.
+"""
+
+from django.conf import settings
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared(alias='default'):
+    """Return True if the cache alias is shared between processes."""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    return backend is not None and backend not in PROCESS_LOCAL_BACKENDS
+
+
+def timeout(setting_name):
+    """Return the timeout named by a setting, or 0 unless the default cache is shared."""
+    seconds = getattr(settings, setting_name, 0)
+    if seconds > 0 and not is_shared():
+        return 0
+    return seconds
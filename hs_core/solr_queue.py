@@ -0,0 +1,195 @@
+"""Deferred, batched SOLR indexing.
+
+Instead of preparing and pushing a SOLR document inside every request that saves a resource,
+HydroRealtimeSignalProcessor enqueues the primary key of the resource in ResourceIndexQueue.
+A periodic celery task (hs_core.tasks.process_solr_index_queue) then
+
+* waits until a resource has not been saved for SOLR_INDEX_QUEUE_SETTLE seconds, so that a
+  burst of saves from one metadata edit or upload produces a single update;
+* fetches the pending resources in batches of SOLR_INDEX_QUEUE_BATCH and sends the public and
+  discoverable ones to SOLR with one bulk update per batch, removing all others, after loading
+  their metadata with a handful of bulk queries (hs_core.search_indexes.prefetch_index_metadata);
+* keeps failing entries in the queue and retries them up to SOLR_INDEX_MAX_ATTEMPTS times.
+
+Runs hold a Postgres advisory lock, so that a run started while another is still going,
+in any process, leaves the queue to it rather than indexing the same entries twice.
+
+When the queue holds more than SOLR_INDEX_QUEUE_MAX_DEPTH entries that are still to be
+indexed, not counting those that exhausted their attempts, enqueue() refuses new
+entries and the signal processor indexes synchronously, which slows down the producers
+rather than letting the queue grow without bound.
+
+The management command solr_queue reports the queue depth and can process it on demand.
+"""
+
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils.timezone import now
+from haystack import connection_router, connections
+from haystack.exceptions import NotHandled
+
+from hs_core.models import BaseResource, ResourceIndexQueue
+
+logger = logging.getLogger(__name__)
+
+# key of the advisory lock held by process_queue
+QUEUE_LOCK_KEY = 0x536f6c72  # 'Solr'
+
+
+def is_deferred():
+    """Return True if SOLR updates should go through the queue."""
+    return getattr(settings, 'SOLR_INDEX_DEFERRED', True) and \
+        not getattr(settings, 'TESTING', False)
+
+
+def max_attempts():
+    return getattr(settings, 'SOLR_INDEX_MAX_ATTEMPTS', 5)
+
+
+def queue_depth():
+    """Return the number of entries still to be indexed."""
+    return ResourceIndexQueue.objects.filter(attempts__lt=max_attempts()).count()
+
+
+def enqueue(resource_pk):
+    """Mark a resource as needing a SOLR update.
+
+    :param resource_pk: primary key of the BaseResource
+    :return: True if the resource is queued; False if the queue is full, in which case the
+             caller should update SOLR synchronously.
+    """
+    if ResourceIndexQueue.objects.filter(resource_pk=resource_pk)\
+            .update(queued=now(), attempts=0, last_error=''):
+        return True  # coalesced with an entry that is already queued
+
+    max_depth = getattr(settings, 'SOLR_INDEX_QUEUE_MAX_DEPTH', 10000)
+    if queue_depth() >= max_depth:
+        logger.warning("SOLR index queue holds more than {} entries; indexing resource {} "
+                       "synchronously".format(max_depth, resource_pk))
+        return False
+
+    try:
+        with transaction.atomic():
+            ResourceIndexQueue.objects.create(resource_pk=resource_pk)
+    except IntegrityError:
+        # queued concurrently by another request
+        ResourceIndexQueue.objects.filter(resource_pk=resource_pk)\
+            .update(queued=now(), attempts=0, last_error='')
+    return True
+
+
+def get_identifier(resource_pk):
+    """Return the SOLR document id of a resource, which may no longer exist."""
+    return u'{}.{}.{}'.format(BaseResource._meta.app_label, BaseResource._meta.model_name,
+                              resource_pk)
+
+
+def _index_batch(resource_pks):
+    """Push one batch of resources to every SOLR backend.
+
+    :return: dict of {resource_pk: error message} for resources that could not be indexed
+    """
+    from hs_core.search_indexes import prefetch_index_metadata
+
+    resources = BaseResource.objects.filter(pk__in=resource_pks).select_related('raccess')
+    to_update = []
+    to_remove = set(resource_pks)
+    for res in resources:
+        if hasattr(res, 'raccess') and (res.raccess.public or res.raccess.discoverable):
+            to_update.append(res)
+            to_remove.discard(res.pk)
+    prefetch_index_metadata(to_update)
+
+    errors = {}
+    for using in connection_router.for_write():
+        try:
+            index = connections[using].get_unified_index().get_index(BaseResource)
+        except NotHandled:
+            logger.exception("Failure: BaseResource is not indexed by SOLR backend %s", using)
+            continue
+        backend = connections[using].get_backend()
+
+        if to_update:
+            try:
+                backend.update(index, to_update)
+            except Exception:
+                # find the resources that spoil the batch and index the others
+                for res in to_update:
+                    try:
+                        backend.update(index, [res])
+                    except Exception as ex:
+                        logger.exception("Failure: changes to resource %s not added to "
+                                         "Solr Index.", res.short_id)
+                        errors[res.pk] = str(ex)
+
+        for resource_pk in to_remove:
+            try:
+                index.remove_object(get_identifier(resource_pk), using=using)
+            except Exception as ex:
+                logger.exception("Failure: delete of resource %s from Solr Index failed.",
+                                 resource_pk)
+                errors[resource_pk] = str(ex)
+    return errors
+
+
+@contextmanager
+def _queue_lock():
+    """Yield True if the advisory lock of the queue was taken, False if another session
+    holds it.  The lock is released on exit, or by the database if the process dies."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [QUEUE_LOCK_KEY])
+        locked = cursor.fetchone()[0]
+    try:
+        yield locked
+    finally:
+        if locked:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [QUEUE_LOCK_KEY])
+
+
+def process_queue(settle_seconds=None, batch_size=None):
+    """Index every queued resource that has been quiet for settle_seconds, unless another
+    run is processing the queue.
+
+    :return: tuple (number of resources indexed or removed, number of failures)
+    """
+    with _queue_lock() as locked:
+        if not locked:
+            logger.info("SOLR index queue is being processed by another run")
+            return 0, 0
+        return _process_queue(settle_seconds, batch_size)
+
+
+def _process_queue(settle_seconds, batch_size):
+    if settle_seconds is None:
+        settle_seconds = getattr(settings, 'SOLR_INDEX_QUEUE_SETTLE', 10)
+    if batch_size is None:
+        batch_size = getattr(settings, 'SOLR_INDEX_QUEUE_BATCH', 100)
+    # entries queued after the cutoff, including those re-queued while a batch is being
+    # processed and those that fail, wait for the next run
+    cutoff = now() - timedelta(seconds=settle_seconds)
+
+    done = failed = 0
+    while True:
+        resource_pks = list(ResourceIndexQueue.objects
+                            .filter(queued__lte=cutoff, attempts__lt=max_attempts())
+                            .order_by('queued')
+                            .values_list('resource_pk', flat=True)[:batch_size])
+        if not resource_pks:
+            break
+
+        errors = _index_batch(resource_pks)
+        succeeded = [pk for pk in resource_pks if pk not in errors]
+        ResourceIndexQueue.objects.filter(resource_pk__in=succeeded, queued__lte=cutoff)\
+            .delete()
+        for resource_pk, error in errors.items():
+            ResourceIndexQueue.objects.filter(resource_pk=resource_pk)\
+                .update(attempts=F('attempts') + 1, last_error=error, queued=now())
+        done += len(succeeded)
+        failed += len(errors)
+    return done, failed
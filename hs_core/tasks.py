@@ -17,19 +17,22 @@ from celery import shared_task
 from celery.schedules import crontab
 from celery.task import periodic_task
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import send_mail
 from rest_framework import status
 
 from hs_core.hydroshare import utils
 from hs_core.hydroshare.hs_bagit import create_bag_files
+from hs_core.hydroshare.incremental_bag import update_bag
 from hs_core.hydroshare.resource import get_activated_doi, get_resource_doi, \
     get_crossref_url, deposit_res_metadata_with_crossref
-from django_irods.storage import IrodsStorage
-from theme.models import UserQuota, QuotaMessage, UserProfile, User
+from django_irods.storage import IrodsStorage, get_storage_class
+from theme.models import UserQuota, UserProfile, User
 
 from django_irods.icommands import SessionException
 
-from hs_core.models import BaseResource
+from hs_core.models import BaseResource, ResourceFile
+from hs_core.quota_sync import update_grace_periods
 from theme.utils import get_quota_message
 
 # Pass 'django' into getLogger instead of __name__
@@ -49,7 +52,7 @@ def nightly_zips_cleanup():
     zips_daily_date = "zips/{daily_date}".format(daily_date=date_folder)
     if __debug__:
         logger.debug("cleaning up {}".format(zips_daily_date))
-    istorage = IrodsStorage()
+    istorage = get_storage_class()()
     if istorage.exists(zips_daily_date):
         istorage.delete(zips_daily_date)
     federated_prefixes = BaseResource.objects.all().values_list('resource_federation_path')\
@@ -67,6 +70,41 @@ def nightly_zips_cleanup():
                 istorage.delete(zips_daily_date)
 
 
+@periodic_task(ignore_result=True,
+               run_every=timedelta(seconds=getattr(settings, 'SOLR_INDEX_QUEUE_INTERVAL', 30)))
+def process_solr_index_queue():
+    """Push resources queued by HydroRealtimeSignalProcessor to SOLR in batches."""
+    from hs_core.solr_queue import process_queue
+
+    # runs that take longer than the interval leave the queue to the run in progress
+    done, failed = process_queue()
+    if failed:
+        logger.warning("SOLR index queue: {} resources indexed, {} failed"
+                       .format(done, failed))
+
+
+@periodic_task(ignore_result=True,
+               run_every=timedelta(seconds=getattr(settings, 'FILE_SIZE_BACKFILL_INTERVAL',
+                                                   60 * 60)))
+def backfill_file_sizes():
+    """Read the sizes of resource files that are not known yet, a resource at a time."""
+    lock_id = 'hs_core.tasks.backfill_file_sizes'
+    if not cache.add(lock_id, 'locked', 60 * 60):
+        return
+    try:
+        resource_ids = ResourceFile.objects.filter(_size__lt=0)\
+            .values_list('object_id', flat=True).distinct()\
+            .order_by('object_id')[:getattr(settings, 'FILE_SIZE_BACKFILL_BATCH', 100)]
+        for resource in BaseResource.objects.filter(id__in=list(resource_ids)):
+            try:
+                resource.calculate_file_sizes()
+            except SessionException as ex:
+                logger.warning("cannot read the file sizes of resource {}: {}"
+                               .format(resource.short_id, ex.stderr))
+    finally:
+        cache.delete(lock_id)
+
+
 @periodic_task(ignore_result=True, run_every=crontab(minute=0, hour=0))
 def sync_email_subscriptions():
     sixty_days = datetime.today() - timedelta(days=60)
@@ -206,62 +244,43 @@ def manage_task_nightly():
 @periodic_task(ignore_result=True, run_every=crontab(minute=15, hour=0, day_of_week=1))
 def manage_task_weekly():
     # check over quota cases and send quota warning emails as needed
-    hs_internal_zone = "hydroshare"
-    if not QuotaMessage.objects.exists():
-        QuotaMessage.objects.create()
-    qmsg = QuotaMessage.objects.first()
-    users = User.objects.filter(is_active=True).filter(is_superuser=False).all()
-    for u in users:
-        uq = UserQuota.objects.filter(user__username=u.username, zone=hs_internal_zone).first()
-        if uq:
-            used_percent = uq.used_percent
-            if used_percent >= qmsg.soft_limit_percent:
-                if used_percent >= 100 and used_percent < qmsg.hard_limit_percent:
-                    if uq.remaining_grace_period < 0:
-                        # triggers grace period counting
-                        uq.remaining_grace_period = qmsg.grace_period
-                    elif uq.remaining_grace_period > 0:
-                        # reduce remaining_grace_period by one day
-                        uq.remaining_grace_period -= 1
-                elif used_percent >= qmsg.hard_limit_percent:
-                    # set grace period to 0 when user quota exceeds hard limit
-                    uq.remaining_grace_period = 0
-                uq.save()
-
-                if u.first_name and u.last_name:
-                    sal_name = '{} {}'.format(u.first_name, u.last_name)
-                elif u.first_name:
-                    sal_name = u.first_name
-                elif u.last_name:
-                    sal_name = u.last_name
-                else:
-                    sal_name = u.username
-
-                msg_str = 'Dear ' + sal_name + ':\n\n'
-
-                ori_qm = get_quota_message(u)
-                # make embedded settings.DEFAULT_SUPPORT_EMAIL clickable with subject auto-filled
-                replace_substr = "<a href='mailto:{0}?subject=Request more quota'>{0}</a>".format(
-                    settings.DEFAULT_SUPPORT_EMAIL)
-                new_qm = ori_qm.replace(settings.DEFAULT_SUPPORT_EMAIL, replace_substr)
-                msg_str += new_qm
-
-                msg_str += '\n\nHydroShare Support'
-                subject = 'Quota warning'
-                try:
-                    # send email for people monitoring and follow-up as needed
-                    send_mail(subject, '', settings.DEFAULT_FROM_EMAIL,
-                              [u.email, settings.DEFAULT_SUPPORT_EMAIL],
-                              html_message=msg_str)
-                except Exception as ex:
-                    logger.debug("Failed to send quota warning email: " + ex.message)
-            else:
-                if uq.remaining_grace_period >= 0:
-                    # turn grace period off now that the user is below quota soft limit
-                    uq.remaining_grace_period = -1
-                    uq.save()
-        else:
-            logger.debug('user ' + u.username + ' does not have UserQuota foreign key relation')
+    for user_id in update_grace_periods():
+        send_quota_warning_email.apply_async((user_id,))
+
+
+@shared_task
+def send_quota_warning_email(user_id):
+    """Email a quota warning to the user with user_id and to support."""
+    u = User.objects.filter(pk=user_id).first()
+    if u is None:
+        return
+    if u.first_name and u.last_name:
+        sal_name = '{} {}'.format(u.first_name, u.last_name)
+    elif u.first_name:
+        sal_name = u.first_name
+    elif u.last_name:
+        sal_name = u.last_name
+    else:
+        sal_name = u.username
+
+    msg_str = 'Dear ' + sal_name + ':\n\n'
+
+    ori_qm = get_quota_message(u)
+    # make embedded settings.DEFAULT_SUPPORT_EMAIL clickable with subject auto-filled
+    replace_substr = "<a href='mailto:{0}?subject=Request more quota'>{0}</a>".format(
+        settings.DEFAULT_SUPPORT_EMAIL)
+    new_qm = ori_qm.replace(settings.DEFAULT_SUPPORT_EMAIL, replace_substr)
+    msg_str += new_qm
+
+    msg_str += '\n\nHydroShare Support'
+    subject = 'Quota warning'
+    try:
+        # send email for people monitoring and follow-up as needed
+        send_mail(subject, '', settings.DEFAULT_FROM_EMAIL,
+                  [u.email, settings.DEFAULT_SUPPORT_EMAIL],
+                  html_message=msg_str)
+    except Exception as ex:
+        logger.debug("Failed to send quota warning email: " + ex.message)
 
 
 @shared_task
@@ -318,7 +337,7 @@ def add_zip_file_contents_to_resource(pk, zip_file_path):
 
 @shared_task
 def delete_zip(zip_path):
-    istorage = IrodsStorage()
+    istorage = get_storage_class()()
     if istorage.exists(zip_path):
         istorage.delete(zip_path)
 
@@ -453,8 +472,10 @@ def create_bag_by_irods(resource_id):
             # for now as a workaround which could be raised from potential race conditions when
             # multiple ibun commands try to create the same zip file or the very same resource
             # gets deleted by another request when being downloaded
-            istorage.runBagitRule(bagit_rule_file, bagit_input_path, bagit_input_resource)
-            istorage.zipup(irods_bagit_input_path, bag_full_name)
+            # rewrite only what changed since the last bag when the storage allows it
+            if not update_bag(istorage, irods_bagit_input_path, bag_full_name):
+                istorage.runBagitRule(bagit_rule_file, bagit_input_path, bagit_input_resource)
+                istorage.zipup(irods_bagit_input_path, bag_full_name)
             istorage.setAVU(irods_bagit_input_path, 'bag_modified', "false")
             return True
         except SessionException as ex:
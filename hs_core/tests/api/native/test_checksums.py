@@ -0,0 +1,33 @@
+import hashlib
+from io import BytesIO
+
+from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+
+from hs_core.checksums import ChecksummingFile, file_digests
+
+
+class TestChecksums(SimpleTestCase):
+
+    def test_file_digests(self):
+        content = b'abc' * 1000
+        digests = file_digests(BytesIO(content), chunk_size=7)
+        self.assertEqual(digests.hexdigests(), (hashlib.md5(content).hexdigest(),
+                                                hashlib.sha256(content).hexdigest()))
+        self.assertEqual(digests.size, len(content))
+
+    def test_checksumming_file(self):
+        content = b'x,y\n1,2\n' * 100
+        upload = SimpleUploadedFile('data.csv', content)
+        wrapped = ChecksummingFile(upload)
+        self.assertIsInstance(wrapped, File)
+        self.assertEqual(wrapped.name, 'data.csv')
+        self.assertEqual(wrapped.size, len(content))
+        self.assertIsNone(wrapped.digests)
+
+        # a second read, as storage retrying a copy would, digests the contents once
+        b''.join(wrapped.chunks(chunk_size=64))
+        self.assertEqual(b''.join(wrapped.chunks(chunk_size=64)), content)
+        self.assertEqual(wrapped.digests.hexdigests()[0], hashlib.md5(content).hexdigest())
+        self.assertEqual(wrapped.digests.size, len(content))
@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+
+from django_irods.fs_storage import FileSystemStorage
+from hs_core import hydroshare
+from hs_core.hydroshare.utils import create_empty_contents_directory
+from hs_core.views.utils import create_folder
+
+STORAGE_ROOT = tempfile.mkdtemp(prefix='fs_storage_resource')
+
+
+@override_settings(IRODS_STORAGE_BACKEND='filesystem', IRODS_FS_STORAGE_ROOT=STORAGE_ROOT)
+class TestFileSystemStorageResource(TestCase):
+    """ resources can be created and organized without iRODS """
+
+    def setUp(self):
+        super(TestFileSystemStorageResource, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'fs_user@email.com',
+            username='fsuser',
+            first_name='some_first_name',
+            last_name='some_last_name',
+            superuser=False,
+            groups=[self.group]
+        )
+
+    def tearDown(self):
+        shutil.rmtree(STORAGE_ROOT, ignore_errors=True)
+        super(TestFileSystemStorageResource, self).tearDown()
+
+    def test_create_resource(self):
+        res = hydroshare.create_resource('CompositeResource', self.user, 'My Test Resource',
+                                         create_bag=False)
+        istorage = res.get_irods_storage()
+        self.assertIsInstance(istorage, FileSystemStorage)
+        self.assertTrue(os.path.isdir(istorage._local_path(res.root_path)))
+        self.assertEqual(res.getAVU('quotaUserName'), self.user.username)
+        self.assertEqual(res.get_quota_holder(), self.user)
+
+        create_empty_contents_directory(res)
+        self.assertTrue(istorage.exists(res.file_path))
+        create_folder(res.short_id, 'data/contents/sub')
+        self.assertEqual(istorage.listdir(res.file_path)[0], ['sub'])
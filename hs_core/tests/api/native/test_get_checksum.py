@@ -29,6 +29,7 @@ class TestGetChecksum(MockIRODSTestCaseMixin, TestCase):
         )
 
     def test_get_checksum(self):
-        with self.assertRaises(NotImplementedError):
-            hydroshare.get_checksum(self.res.short_id)
+        # the checksum of a resource without files is that of an empty manifest
+        self.assertEqual(hydroshare.get_checksum(self.res.short_id),
+                         'd41d8cd98f00b204e9800998ecf8427e')
 
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.test import SimpleTestCase, override_settings
+
+from django_irods.fs_storage import FileSystemStorage
+from hs_core.hydroshare.incremental_bag import IncrementalBagBuilder, LocalBagStore
+
+
+@override_settings(IRODS_USERNAME='wwwHydroProxy')
+class TestIncrementalBag(SimpleTestCase):
+
+    def setUp(self):
+        super(TestIncrementalBag, self).setUp()
+        self.root = tempfile.mkdtemp()
+        self.storage = FileSystemStorage(root=self.root)
+        self.write('abc/readme.txt', 'readme')
+        self.write('abc/data/resourcemetadata.xml', '<metadata/>')
+        self.big = os.urandom(100000)
+        self.write('abc/data/contents/big.csv', self.big)
+        self.write('abc/data/contents/small.csv', 'a,b')
+        self.builder = IncrementalBagBuilder(LocalBagStore(self.storage), 'abc', 'bags/abc.zip')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        super(TestIncrementalBag, self).tearDown()
+
+    def write(self, name, content, mtime=1500000000):
+        path = self.storage._local_path(name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(content)
+        os.utime(path, (mtime, mtime))
+
+    def read_bag(self):
+        with zipfile.ZipFile(self.storage._local_path('bags/abc.zip')) as zf:
+            self.assertIsNone(zf.testzip())
+            return dict((name, zf.read(name)) for name in zf.namelist())
+
+    def test_only_changed_files_are_rewritten(self):
+        self.assertEqual(self.builder.build(), {'kept': 0, 'written': 4, 'rebuilt': True})
+        self.write('abc/data/resourcemetadata.xml', '<metadata>new</metadata>', 1600000000)
+        self.write('abc/data/contents/added.csv', 'c,d')
+        os.remove(self.storage._local_path('abc/data/contents/small.csv'))
+
+        self.assertEqual(self.builder.build(), {'kept': 2, 'written': 2, 'rebuilt': False})
+        bag = self.read_bag()
+        self.assertEqual(sorted(bag), ['abc/bagit.txt', 'abc/data/contents/added.csv',
+                                       'abc/data/contents/big.csv',
+                                       'abc/data/resourcemetadata.xml',
+                                       'abc/manifest-md5.txt', 'abc/readme.txt',
+                                       'abc/tagmanifest-md5.txt'])
+        self.assertEqual(bag['abc/data/resourcemetadata.xml'], '<metadata>new</metadata>')
+        manifest = bag['abc/manifest-md5.txt']
+        self.assertIn('data/contents/big.csv', manifest)
+        self.assertNotIn('data/contents/small.csv', manifest)
+        self.assertIn('readme.txt', bag['abc/tagmanifest-md5.txt'])
+        # the tag files are also kept in the collection
+        self.assertTrue(self.storage.exists('abc/manifest-md5.txt'))
+
+    def test_bag_is_rebuilt_when_mostly_superseded(self):
+        self.builder.build()
+        big = os.urandom(100000)
+        self.write('abc/data/contents/big.csv', big, 1600000000)
+        self.assertTrue(self.builder.build()['rebuilt'])
+        self.assertEqual(self.read_bag()['abc/data/contents/big.csv'], big)
@@ -0,0 +1,67 @@
+import tempfile
+from collections import namedtuple
+
+from django.test import SimpleTestCase, override_settings
+
+from hs_core import landing_page_cache
+
+# parts are only cached in a cache that every process sees
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(prefix='landing_page_cache'),
+}}
+
+Resource = namedtuple('Resource', 'pk')
+
+
+class Parts(object):
+    """ Stands in for the page processor and counts the parts computed """
+
+    def __init__(self):
+        self.computed = 0
+
+    def __call__(self):
+        self.computed += 1
+        return {'citation': 'citation {}'.format(self.computed)}
+
+
+class TestLandingPageCache(SimpleTestCase):
+
+    def setUp(self):
+        super(TestLandingPageCache, self).setUp()
+        self.resource = Resource(pk=-1)
+        with self.settings(CACHES=SHARED_CACHES):
+            landing_page_cache.invalidate(self.resource.pk)
+
+    @override_settings(LANDING_PAGE_CACHE_TIMEOUT=60, CACHES=SHARED_CACHES)
+    def test_parts_are_cached_until_invalidated(self):
+        parts = Parts()
+        for _ in range(3):
+            self.assertEqual(landing_page_cache.get_parts(self.resource, parts)['citation'],
+                             'citation 1')
+        self.assertEqual(parts.computed, 1)
+
+        landing_page_cache.invalidate(self.resource.pk)
+        self.assertEqual(landing_page_cache.get_parts(self.resource, parts)['citation'],
+                         'citation 2')
+
+        # parts of other resources are kept
+        other = Resource(pk=-2)
+        landing_page_cache.get_parts(other, parts)
+        landing_page_cache.invalidate(self.resource.pk)
+        landing_page_cache.get_parts(other, parts)
+        self.assertEqual(parts.computed, 3)
+
+    @override_settings(LANDING_PAGE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        parts = Parts()
+        landing_page_cache.get_parts(self.resource, parts)
+        landing_page_cache.get_parts(self.resource, parts)
+        self.assertEqual(parts.computed, 2)
+
+    @override_settings(LANDING_PAGE_CACHE_TIMEOUT=60)
+    def test_not_cached_in_a_process_local_cache(self):
+        parts = Parts()
+        landing_page_cache.get_parts(self.resource, parts)
+        landing_page_cache.get_parts(self.resource, parts)
+        self.assertEqual(parts.computed, 2)
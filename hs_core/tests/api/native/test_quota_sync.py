@@ -0,0 +1,73 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from mock import MagicMock
+
+from django_irods.icommands import SessionException
+from hs_core import hydroshare
+from hs_core.quota_sync import grace_period, sync_usage, update_grace_periods
+from theme.models import QuotaMessage, UserQuota
+
+GB = 1024.0 ** 3
+
+
+class TestQuotaSync(TestCase):
+    def setUp(self):
+        super(TestQuotaSync, self).setUp()
+        self.hs_group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.users = [hydroshare.create_account('user{}@email.com'.format(i),
+                                                username='user{}'.format(i),
+                                                first_name='first', last_name='last',
+                                                superuser=False, groups=[self.hs_group])
+                      for i in range(3)]
+        self.qmsg = QuotaMessage.objects.create()
+
+    def _quota(self, user):
+        return UserQuota.objects.get(user=user, zone='hydroshare')
+
+    def test_sync_usage(self):
+        zones = [{'user0-usage': str(2 * GB), 'user1-usage': str(GB), 'bag_modified': 'true'},
+                 {'user0-usage': str(GB)}]
+        istorage = MagicMock()
+        istorage.getAVUs.side_effect = lambda path: zones.pop(0)
+
+        self.assertEqual(sync_usage(istorage), 2)
+        self.assertEqual(istorage.getAVUs.call_count, 2)
+        self.assertAlmostEqual(self._quota(self.users[0]).used_value, 3)
+        self.assertAlmostEqual(self._quota(self.users[1]).used_value, 1)
+        # no usage AVU in either zone
+        self.assertEqual(self._quota(self.users[2]).used_value, 0)
+
+    def test_sync_usage_without_user_zone_avus(self):
+        zones = [{'user0-usage': str(GB)}, SessionException(1, 'no collection', '')]
+        istorage = MagicMock()
+        istorage.getAVUs.side_effect = zones
+
+        self.assertEqual(sync_usage(istorage), 1)
+        self.assertAlmostEqual(self._quota(self.users[0]).used_value, 1)
+
+    def test_grace_period(self):
+        soft, hard = self.qmsg.soft_limit_percent, self.qmsg.hard_limit_percent
+        self.assertEqual(grace_period(soft - 1, -1, self.qmsg), (-1, False))
+        self.assertEqual(grace_period(soft - 1, 3, self.qmsg), (-1, False))
+        self.assertEqual(grace_period(soft, -1, self.qmsg), (-1, True))
+        self.assertEqual(grace_period(100, -1, self.qmsg), (self.qmsg.grace_period, True))
+        self.assertEqual(grace_period(100, 3, self.qmsg), (2, True))
+        self.assertEqual(grace_period(100, 0, self.qmsg), (0, True))
+        self.assertEqual(grace_period(hard, 5, self.qmsg), (0, True))
+
+    def test_update_grace_periods(self):
+        over, under, inactive = [self._quota(u) for u in self.users]
+        over.used_value = over.allocated_value
+        over.save()
+        under.remaining_grace_period = 2
+        under.save()
+        inactive.used_value = inactive.allocated_value
+        inactive.save()
+        self.users[2].is_active = False
+        self.users[2].save()
+
+        self.assertEqual(update_grace_periods(), [self.users[0].pk])
+        self.assertEqual(self._quota(self.users[0]).remaining_grace_period,
+                         self.qmsg.grace_period)
+        self.assertEqual(self._quota(self.users[1]).remaining_grace_period, -1)
+        self.assertEqual(self._quota(self.users[2]).remaining_grace_period, -1)
@@ -0,0 +1,72 @@
+from mock import patch
+
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+
+from hs_core import hydroshare, solr_queue
+from hs_core.models import ResourceIndexQueue
+from hs_core.testing import MockIRODSTestCaseMixin
+
+
+class TestSolrIndexQueue(MockIRODSTestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestSolrIndexQueue, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'queue@usu.edu',
+            username='queue',
+            first_name='Queue',
+            last_name='User',
+            superuser=False,
+            groups=[]
+        )
+        self.res = hydroshare.create_resource('CompositeResource', self.user, 'Queued resource')
+
+    def test_enqueue_coalesces(self):
+        self.assertTrue(solr_queue.enqueue(self.res.pk))
+        self.assertTrue(solr_queue.enqueue(self.res.pk))
+        self.assertEqual(solr_queue.queue_depth(), 1)
+
+    @override_settings(SOLR_INDEX_QUEUE_MAX_DEPTH=1)
+    def test_full_queue_refuses_new_resources(self):
+        self.assertTrue(solr_queue.enqueue(self.res.pk))
+        self.assertFalse(solr_queue.enqueue(self.res.pk + 1))
+        # resources already queued are still accepted
+        self.assertTrue(solr_queue.enqueue(self.res.pk))
+
+    @override_settings(SOLR_INDEX_QUEUE_MAX_DEPTH=1)
+    def test_exhausted_entries_do_not_fill_the_queue(self):
+        solr_queue.enqueue(self.res.pk)
+        ResourceIndexQueue.objects.filter(resource_pk=self.res.pk)\
+            .update(attempts=solr_queue.max_attempts())
+        self.assertEqual(solr_queue.queue_depth(), 0)
+        self.assertTrue(solr_queue.enqueue(self.res.pk + 1))
+
+    def test_process_queue_leaves_the_queue_to_a_run_in_progress(self):
+        solr_queue.enqueue(self.res.pk)
+        with patch('hs_core.solr_queue._queue_lock') as queue_lock, \
+                patch('hs_core.solr_queue._index_batch', return_value={}) as index_batch:
+            queue_lock.return_value.__enter__.return_value = False
+            self.assertEqual(solr_queue.process_queue(settle_seconds=0), (0, 0))
+            self.assertFalse(index_batch.called)
+        self.assertEqual(solr_queue.queue_depth(), 1)
+
+    def test_process_queue_respects_settle_time(self):
+        solr_queue.enqueue(self.res.pk)
+        with patch('hs_core.solr_queue._index_batch', return_value={}) as index_batch:
+            self.assertEqual(solr_queue.process_queue(settle_seconds=3600), (0, 0))
+            self.assertEqual(solr_queue.process_queue(settle_seconds=0), (1, 0))
+            index_batch.assert_called_once_with([self.res.pk])
+        self.assertEqual(solr_queue.queue_depth(), 0)
+
+    def test_process_queue_retries_failures(self):
+        solr_queue.enqueue(self.res.pk)
+        with patch('hs_core.solr_queue._index_batch', return_value={self.res.pk: 'down'}):
+            self.assertEqual(solr_queue.process_queue(settle_seconds=0), (0, 1))
+        entry = ResourceIndexQueue.objects.get(resource_pk=self.res.pk)
+        self.assertEqual(entry.attempts, 1)
+        self.assertEqual(entry.last_error, 'down')
+
+        # a new save resets the retry budget
+        solr_queue.enqueue(self.res.pk)
+        self.assertEqual(ResourceIndexQueue.objects.get(resource_pk=self.res.pk).attempts, 0)
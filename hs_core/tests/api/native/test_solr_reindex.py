@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from hs_core.management.commands.solr_reindex import Checkpoint, parse_since
+
+
+class TestSolrReindexCheckpoint(SimpleTestCase):
+    def setUp(self):
+        super(TestSolrReindexCheckpoint, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super(TestSolrReindexCheckpoint, self).tearDown()
+
+    def test_resume_skips_done_chunks_and_retries_failures(self):
+        checkpoint = Checkpoint(self.path, {'modified_since': None})
+        self.assertFalse(checkpoint.load())
+        checkpoint.record([1, 2, 3], {2: 'solr down'})
+        checkpoint.save()
+
+        resumed = Checkpoint(self.path, {'modified_since': None})
+        self.assertTrue(resumed.load())
+        self.assertTrue(resumed.is_done(1))
+        self.assertFalse(resumed.is_done(2))
+        self.assertFalse(resumed.is_done(4))
+
+        resumed.record([2], {})
+        self.assertTrue(resumed.is_done(2))
+
+    def test_checkpoint_of_another_run_is_refused(self):
+        Checkpoint(self.path, {'modified_since': None}).save()
+        with self.assertRaises(CommandError):
+            Checkpoint(self.path, {'modified_since': '2019-01-01T00:00:00+00:00'}).load()
+
+    def test_parse_since(self):
+        self.assertTrue(timezone.is_aware(parse_since('2019-04-01')))
+        self.assertEqual(parse_since('2019-04-01T12:30:00Z').hour, 12)
+        with self.assertRaises(CommandError):
+            parse_since('last tuesday')
@@ -23,6 +23,58 @@ class TestResourceList(HSRESTTestCase):
         self.assertEqual(content['count'], 1)
         self.assertEqual(content['results'][0]['resource_id'], pid)
 
+    def test_resource_list_by_cursor(self):
+        pids = []
+        for title in ('Resource 1', 'Resource 2', 'Resource 3'):
+            res = resource.create_resource('GenericResource', self.user, title)
+            pids.append(res.short_id)
+            self.resources_to_delete.append(res.short_id)
+
+        crawled = []
+        response = self.client.get('/hsapi/resource/', {'cursor': '', 'count': 2},
+                                   format='json')
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            content = json.loads(response.content)
+            self.assertLessEqual(len(content['results']), 2)
+            crawled.extend(item['resource_id'] for item in content['results'])
+            if content['next'] is None:
+                break
+            response = self.client.get(content['next'], format='json')
+        self.assertEqual(sorted(crawled), sorted(pids))
+
+    def test_resource_list_pages_with_equal_titles(self):
+        pids = []
+        for _ in range(3):
+            res = resource.create_resource('GenericResource', self.user, 'Same Title')
+            pids.append(res.short_id)
+            self.resources_to_delete.append(res.short_id)
+
+        listed = []
+        for page in (1, 2, 3):
+            response = self.client.get('/hsapi/resource/', {'page': page, 'count': 1},
+                                       format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            listed.extend(item['resource_id'] for item in json.loads(response.content)['results'])
+        self.assertEqual(sorted(listed), sorted(pids))
+
+    def test_resource_list_streamed(self):
+        pids = []
+        for title in ('Resource 1', 'Resource 2'):
+            res = resource.create_resource('GenericResource', self.user, title)
+            pids.append(res.short_id)
+            self.resources_to_delete.append(res.short_id)
+
+        with self.settings(HS_RESOURCE_LIST_STREAM_THRESHOLD=0,
+                           HS_RESOURCE_LIST_STREAM_CHUNK=1):
+            response = self.client.get('/hsapi/resource/', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        content = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(content['count'], 2)
+        self.assertEqual(sorted(item['resource_id'] for item in content['results']),
+                         sorted(pids))
+
     def test_resource_list_by_type(self):
 
         gen_res = resource.create_resource('GenericResource',
@@ -225,6 +277,45 @@ class TestResourceList(HSRESTTestCase):
                                                         'params': '140'}, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_resource_list_by_bounding_box_across_antimeridian(self):
+        metadata_dict = [{'coverage': {'type': 'box', 'value': {'northlimit': '-10',
+                                                                'eastlimit': '-170',
+                                                                'southlimit': '-20',
+                                                                'westlimit': '170',
+                                                                'units': 'decimal deg'}}}]
+        gen_res = resource.create_resource('GenericResource', self.user, 'Pacific',
+                                           metadata=metadata_dict)
+        self.resources_to_delete.append(gen_res.short_id)
+
+        coverage = gen_res.metadata.coverages.get(type='box')
+        self.assertEqual(coverage.bounds.count(), 2)
+
+        # a box west of the antimeridian, and one that crosses it
+        for west, east in (('175', '179'), ('160', '-175')):
+            response = self.client.get('/hsapi/resource/', {'coverage_type': 'box',
+                                                            'north': '0',
+                                                            'east': east,
+                                                            'south': '-15',
+                                                            'west': west}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(json.loads(response.content)['count'], 1)
+
+        # the rest of the latitude band does not intersect
+        response = self.client.get('/hsapi/resource/', {'coverage_type': 'box',
+                                                        'north': '0',
+                                                        'east': '160',
+                                                        'south': '-15',
+                                                        'west': '-160'}, format='json')
+        self.assertEqual(json.loads(response.content)['count'], 0)
+
+        # moving the box moves its bounds
+        gen_res.metadata.update_element('coverage', coverage.id, type='box',
+                                        value={'northlimit': 10, 'eastlimit': 20,
+                                               'southlimit': 0, 'westlimit': 10,
+                                               'units': 'decimal deg'})
+        self.assertEqual(list(coverage.bounds.values_list('south', 'north', 'west', 'east')),
+                         [(0, 10, 10, 20)])
+
     def test_resource_list_by_group(self):
         group_one = self.user.uaccess.create_group(title='Group One',
                                                    description='This is a great group',
@@ -0,0 +1,194 @@
+"""Contents of a resource folder for the file browser, built from bulk queries.
+
+All ResourceFile objects under the folder are fetched with one query, together with their
+logical files (aggregations), and the listing is assembled from in-memory maps instead of
+querying for each file and each sub folder.
+
+By default the names and sizes of the entries come from an iRODS listing of the folder, so
+that empty folders and files not yet known to Django are shown as before. With the setting
+HS_FOLDER_LISTING_FROM_DB, the listing is built from the Django file table alone and no
+iRODS call is made; empty folders are then not listed.
+"""
+
+import os
+from collections import defaultdict
+
+from django.conf import settings
+
+from hs_core.hydroshare.utils import get_file_mime_type
+from hs_core.models import ResourceFile
+
+
+def listing_from_db():
+    return getattr(settings, 'HS_FOLDER_LISTING_FROM_DB', False)
+
+
+class FolderListing(object):
+    """Files and folders directly inside one folder of a resource."""
+
+    def __init__(self, resource, folder):
+        """
+        :param resource: the resource, as its content model
+        :param folder: folder path relative to data/contents; empty for the root folder
+        """
+        self.resource = resource
+        self.folder = folder.strip('/')
+        self.is_composite = resource.resource_type == "CompositeResource"
+
+        self.files = {}                          # file name -> ResourceFile in this folder
+        self.sub_folder_files = defaultdict(list)    # folder name -> files directly in it
+        self.sub_folder_tree = defaultdict(list)     # folder name -> files anywhere below it
+        self.sub_folder_folders = defaultdict(set)   # folder name -> names of its sub folders
+
+        all_files = ResourceFile.list_folder(resource, self.folder, sub_folders=True)\
+            .prefetch_related('logical_file_content_object')
+        resource_cache_attr = ResourceFile.content_object.cache_attr
+        self.all_files = []
+        for f in all_files:
+            # every file belongs to this resource; spare each file a query for it
+            setattr(f, resource_cache_attr, resource)
+            self.all_files.append(f)
+            path = f.short_path
+            if self.folder:
+                path = path[len(self.folder) + 1:]
+            parts = path.split('/')
+            if len(parts) == 1:
+                self.files[parts[0]] = f
+            else:
+                self.sub_folder_tree[parts[0]].append(f)
+                if len(parts) == 2:
+                    self.sub_folder_files[parts[0]].append(f)
+                else:
+                    self.sub_folder_folders[parts[0]].add(parts[1])
+
+    def short_path(self, name):
+        return os.path.join(self.folder, name)
+
+    def _irods_listing(self):
+        istorage = self.resource.get_irods_storage()
+        store_path = os.path.join('data', 'contents', self.folder)
+        return istorage.listdir(self.resource.get_irods_path(store_path))
+
+    def _folder_aggregations(self, folder_names):
+        """Return {folder short path: aggregation} for the aggregations that are folders.
+
+        As in CompositeResource.get_aggregation_by_name, fileset aggregations take precedence.
+        """
+        aggregations = {}
+        folders = [self.short_path(name) for name in folder_names]
+        if folders:
+            for fileset in self.resource.filesetlogicalfile_set.filter(folder__in=folders):
+                aggregations.setdefault(fileset.folder.rstrip('/'), fileset)
+
+        # other multi-file aggregations are named after the folder of their first file
+        first_files = {}
+        self.aggregation_files = defaultdict(list)
+        for f in self.all_files:
+            aggregation = f.logical_file
+            if aggregation is None or aggregation.is_single_file_aggregation or \
+                    aggregation.is_fileset:
+                continue
+            key = (aggregation.__class__, aggregation.pk)
+            self.aggregation_files[key].append(f)
+            if key not in first_files or f.pk < first_files[key][1].pk:
+                first_files[key] = (aggregation, f)
+        for aggregation, first_file in first_files.values():
+            if first_file.file_folder:
+                aggregations.setdefault(first_file.file_folder.rstrip('/'), aggregation)
+        return aggregations
+
+    def _main_file_name(self, aggregation):
+        """Name of the main file of an aggregation, as its get_main_file would return."""
+        file_extension = aggregation.get_main_file_type()
+        files = sorted(self.aggregation_files[(aggregation.__class__, aggregation.pk)],
+                       key=lambda f: f.pk)
+        for f in files:
+            if file_extension == ".*" or f.extension == file_extension:
+                return f.file_name
+        return ''
+
+    def _has_sub_folders(self, name):
+        if self.sub_folder_folders[name]:
+            return True
+        if listing_from_db():
+            return False
+        # sub folders without files are only known to iRODS
+        istorage = self.resource.get_irods_storage()
+        store_path = os.path.join('data', 'contents', self.short_path(name))
+        return bool(istorage.listdir(self.resource.get_irods_path(store_path))[0])
+
+    def _folder_entry(self, name, aggregations):
+        folder_short_path = self.short_path(name)
+        entry = {'name': name,
+                 'url': self.resource.get_url_of_path(
+                     os.path.join('data', 'contents', folder_short_path)),
+                 'main_file': '',
+                 'folder_aggregation_type': '',
+                 'folder_aggregation_name': '',
+                 'folder_aggregation_id': '',
+                 'folder_aggregation_type_to_set': '',
+                 'folder_short_path': folder_short_path}
+        if self.is_composite:
+            aggregation = aggregations.get(folder_short_path)
+            if aggregation is not None:
+                entry['folder_aggregation_type'] = aggregation.get_aggregation_class_name()
+                entry['folder_aggregation_name'] = aggregation.get_aggregation_display_name()
+                entry['folder_aggregation_id'] = aggregation.id
+                if not aggregation.is_fileset:
+                    entry['main_file'] = self._main_file_name(aggregation)
+            else:
+                # find if any aggregation type that can be created from this folder
+                type_to_set = self.resource.aggregation_type_to_set(
+                    self.sub_folder_files[name],
+                    lambda: self.sub_folder_tree[name],
+                    lambda: self._has_sub_folders(name))
+                entry['folder_aggregation_type_to_set'] = type_to_set or ''
+        return entry
+
+    def _file_entry(self, f, name, size):
+        mtype = get_file_mime_type(name)
+        idx = mtype.find('/')
+        if idx >= 0:
+            mtype = mtype[idx + 1:]
+        entry = {'name': name, 'size': size, 'type': mtype, 'pk': f.pk, 'url': f.url,
+                 'reference_url': '',
+                 'aggregation_name': '',
+                 'logical_type': '',
+                 'logical_file_id': '',
+                 'is_single_file_aggregation': ''}
+        aggregation = f.logical_file
+        if self.is_composite and aggregation is not None:
+            entry['logical_type'] = aggregation.__class__.__name__
+            entry['logical_file_id'] = aggregation.id
+            entry['aggregation_name'] = aggregation.get_aggregation_display_name()
+            entry['is_single_file_aggregation'] = aggregation.is_single_file_aggregation
+            if 'url' in aggregation.extra_data:
+                entry['reference_url'] = aggregation.extra_data['url']
+        return entry
+
+    def listing(self):
+        """Return (folder entries, file entries) as data_store_structure reports them.
+
+        :raises SessionException: if iRODS cannot list the folder
+        """
+        if listing_from_db():
+            folder_names = sorted(self.sub_folder_tree.keys())
+            file_names = sorted(self.files.keys())
+            sizes = [self.files[name].size for name in file_names]
+        else:
+            store = self._irods_listing()
+            folder_names = [name.decode('utf-8') for name in store[0]]
+            file_names = [name.decode('utf-8') for name in store[1]]
+            sizes = store[2]
+
+        aggregations = self._folder_aggregations(folder_names) if self.is_composite else {}
+        folders = [self._folder_entry(name, aggregations) for name in folder_names]
+
+        files = []
+        for name, size in zip(file_names, sizes):
+            f = self.files.get(name)
+            if f is None:
+                # skip metadata files
+                continue
+            files.append(self._file_entry(f, name, size))
+        return folders, files
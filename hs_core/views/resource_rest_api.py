@@ -9,11 +9,14 @@ import json
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ObjectDoesNotExist, SuspiciousFileOperation
 from django.core.exceptions import ValidationError as CoreValidationError
-from django.http import HttpResponseRedirect
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.contrib.sites.models import Site
 
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import generics, status
@@ -22,7 +25,8 @@ from rest_framework.exceptions import ValidationError, NotAuthenticated, Permiss
 
 from hs_core import hydroshare
 from hs_core.models import AbstractResource
-from hs_core.hydroshare.utils import get_resource_by_shortkey, get_resource_types
+from hs_core.hydroshare.utils import get_resource_by_shortkey, get_resource_types, \
+    prefetch_metadata, first_of
 from hs_core.views import utils as view_utils
 from hs_core.views.utils import ACTION_TO_AUTHORIZE
 from hs_core.views import serializers
@@ -36,8 +40,27 @@ from drf_yasg.utils import swagger_auto_schema
 logger = logging.getLogger(__name__)
 
 
+class ResourceListCursorPagination(CursorPagination):
+    """Keyset pagination over resource ids, for crawling the full resource list.
+
+    Unlike page numbers, a cursor stays fast however deep the crawl goes and does not skip
+    or repeat resources when resources are created during the crawl.
+    """
+    ordering = 'pk'
+    page_size_query_param = 'count'
+
+    def decode_cursor(self, request):
+        # an empty cursor asks for the first page
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super(ResourceListCursorPagination, self).decode_cursor(request)
+
+
 # Mixins
 class ResourceToListItemMixin(object):
+    # metadata read by resourceToResourceListItem, prefetched by resourcesToResourceListItems
+    LIST_ITEM_METADATA_LOOKUPS = ('_title', '_description', 'creators', 'coverages', 'dates')
+
     def resourceToResourceListItem(self, r):
         # URLs in metadata should be fully qualified.
         # ALWAYS qualify them with www.hydroshare.org, rather than the local server name.
@@ -46,20 +69,25 @@ class ResourceToListItemMixin(object):
         science_metadata_url = site_url + reverse('get_update_science_metadata', args=[r.short_id])
         resource_map_url = site_url + reverse('get_resource_map', args=[r.short_id])
         resource_url = site_url + r.get_absolute_url()
-        coverages = [{"type": v['type'], "value": json.loads(v['_value'])}
-                     for v in r.metadata.coverages.values()]
+        # read metadata with .all() only, so that prefetched relations are used
+        coverages = [{"type": c.type, "value": c.value} for c in r.metadata.coverages.all()]
+        creators = r.metadata.creators.all()
         authors = []
-        for c in r.metadata.creators.all():
+        for c in creators:
             authors.append(c.name)
+        first_creator = first_of(c for c in creators if c.order == 1)
+        last_updated = [d for d in r.metadata.dates.all() if d.type == 'modified'][0].start_date
         doi = None
         if r.raccess.published:
             doi = "10.4211/hs.{}".format(r.short_id)
         resource_list_item = serializers.ResourceListItem(resource_type=r.resource_type,
                                                           resource_id=r.short_id,
-                                                          resource_title=r.metadata.title.value,
-                                                          abstract=r.metadata.description,
+                                                          resource_title=first_of(
+                                                              r.metadata._title.all()).value,
+                                                          abstract=first_of(
+                                                              r.metadata._description.all()),
                                                           authors=authors,
-                                                          creator=r.first_creator.name,
+                                                          creator=first_creator.name,
                                                           doi=doi,
                                                           public=r.raccess.public,
                                                           discoverable=r.raccess.discoverable,
@@ -67,7 +95,7 @@ class ResourceToListItemMixin(object):
                                                           immutable=r.raccess.immutable,
                                                           published=r.raccess.published,
                                                           date_created=r.created,
-                                                          date_last_updated=r.last_updated,
+                                                          date_last_updated=last_updated,
                                                           bag_url=bag_url,
                                                           coverages=coverages,
                                                           science_metadata_url=science_metadata_url,
@@ -75,6 +103,13 @@ class ResourceToListItemMixin(object):
                                                           resource_url=resource_url)
         return resource_list_item
 
+    def resourcesToResourceListItems(self, resources):
+        """Convert a list of resources, fetching their metadata with a few bulk queries."""
+        resources = list(resources)
+        prefetch_metadata(resources, self.LIST_ITEM_METADATA_LOOKUPS)
+        prefetch_related_objects(resources, 'raccess')
+        return [self.resourceToResourceListItem(r) for r in resources]
+
 
 class ResourceFileToListItemMixin(object):
     def resourceFileToListItem(self, f):
@@ -251,11 +286,53 @@ class ResourceListCreate(ResourceToListItemMixin, generics.ListCreateAPIView):
     pagination_class = PageNumberPagination
     pagination_class.page_size_query_param = 'count'
 
+    @property
+    def paginator(self):
+        """Use keyset pagination for requests that carry a cursor, e.g. ?cursor= to start."""
+        if not hasattr(self, '_paginator') and \
+                self.request.query_params.get('cursor') is not None:
+            self._paginator = ResourceListCursorPagination()
+        return super(ResourceListCreate, self).paginator
+
     @swagger_auto_schema(query_serializer=serializers.ResourceListRequestValidator,
                          operation_description="List resources")
     def get(self, request):
         return self.list(request)
 
+    def list(self, request, *args, **kwargs):
+        # paginate the queryset in the database, then fetch metadata for that page only
+        resources = self.paginate_queryset(self.get_queryset())
+        page_size = len(resources)
+        threshold = getattr(settings, 'HS_RESOURCE_LIST_STREAM_THRESHOLD', 500)
+        if page_size > threshold and isinstance(request.accepted_renderer, JSONRenderer):
+            return self.get_streaming_response(resources)
+        serializer = self.get_serializer(self.resourcesToResourceListItems(resources),
+                                         many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_streaming_response(self, resources):
+        """Stream a large page as JSON, converting resources a chunk at a time.
+
+        The envelope is that of the paginated response, with results written last.
+        """
+        envelope = self.get_paginated_response([]).data
+        encoder = JSONRenderer.encoder_class
+        chunk_size = getattr(settings, 'HS_RESOURCE_LIST_STREAM_CHUNK', 100)
+
+        def stream():
+            head = json.dumps(envelope, cls=encoder)
+            # the results key is empty in the envelope; open it and fill it with items
+            yield head[:head.rindex('[]')] + '['
+            for start in range(0, len(resources), chunk_size):
+                items = self.resourcesToResourceListItems(resources[start:start + chunk_size])
+                data = self.get_serializer(items, many=True).data
+                body = json.dumps(data, cls=encoder)[1:-1]
+                if body:
+                    yield (',' if start else '') + body
+            yield head[head.rindex('[]') + 2:]
+
+        return StreamingHttpResponse(stream(), content_type='application/json')
+
     # needed for list of resources
     # copied from ResourceList
     def get_queryset(self):
@@ -272,13 +349,8 @@ class ResourceListCreate(ResourceToListItemMixin, generics.ListCreateAPIView):
             filter_parms['type'] = list(filter_parms['type'])
 
         filter_parms['public'] = not self.request.user.is_authenticated()
-        filtered_res_list = []
-
-        for r in hydroshare.get_resource_list(**filter_parms):
-            resource_list_item = self.resourceToResourceListItem(r)
-            filtered_res_list.append(resource_list_item)
-
-        return filtered_res_list
+        # a lazy queryset; list() converts only the resources of the requested page
+        return hydroshare.get_resource_list(**filter_parms)
 
     # covers serialization of output from GET request
     def get_serializer_class(self):
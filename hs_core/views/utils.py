@@ -21,7 +21,8 @@ from django.core.exceptions import SuspiciousFileOperation
 from django.core.files.base import File
 from django.core.urlresolvers import reverse
 from django.core.validators import URLValidator
-from django.db.models import When, Case, Value, BooleanField, Prefetch
+from django.db.models import When, Case, Value, BooleanField, IntegerField, OuterRef, \
+    Prefetch, Q, Subquery
 from django.db.models.query import prefetch_related_objects
 from django.http import HttpResponse, QueryDict
 from django.utils.http import int_to_base36
@@ -33,6 +34,7 @@ from rest_framework.exceptions import NotFound, PermissionDenied, ValidationErro
 
 from django_irods.icommands import SessionException
 from django_irods.storage import IrodsStorage
+from hs_access_control import privilege_cache
 from hs_access_control.models import PrivilegeCodes
 from hs_core import hydroshare
 from hs_core.hydroshare import add_resource_files
@@ -332,6 +334,25 @@ def can_user_copy_resource(res, user):
     return True
 
 
+def _authorize_user(user, res, needed_permission):
+    """Return whether an active, authenticated user has needed_permission over res."""
+    if needed_permission in (ACTION_TO_AUTHORIZE.VIEW_METADATA,
+                             ACTION_TO_AUTHORIZE.VIEW_RESOURCE,
+                             ACTION_TO_AUTHORIZE.VIEW_RESOURCE_ACCESS):
+        return user.uaccess.can_view_resource(res)
+    elif needed_permission == ACTION_TO_AUTHORIZE.EDIT_RESOURCE:
+        return user.uaccess.can_change_resource(res)
+    elif needed_permission == ACTION_TO_AUTHORIZE.DELETE_RESOURCE:
+        return user.uaccess.can_delete_resource(res)
+    elif needed_permission == ACTION_TO_AUTHORIZE.SET_RESOURCE_FLAG:
+        return user.uaccess.can_change_resource_flags(res)
+    elif needed_permission == ACTION_TO_AUTHORIZE.CREATE_RESOURCE_VERSION:
+        return user.uaccess.owns_resource(res)
+    elif needed_permission == ACTION_TO_AUTHORIZE.EDIT_RESOURCE_ACCESS:
+        return user.uaccess.can_share_resource(res, 2)
+    return False
+
+
 def authorize(request, res_id, needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE,
               raises_exception=True):
     """
@@ -363,6 +384,9 @@ def authorize(request, res_id, needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOUR
        needed_permission=ACTION_TO_AUTHORIZE.CREATE_RESOURCE_VERSION)
 
     Note: resource 'shareable' status has no effect on authorization
+
+    Decisions for authenticated users are cached per user and resource; see
+    hs_access_control.privilege_cache.
     """
     authorized = False
     user = get_user(request)
@@ -372,26 +396,13 @@ def authorize(request, res_id, needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOUR
     except ObjectDoesNotExist:
         raise NotFound(detail="No resource was found for resource id:%s" % res_id)
 
-    if needed_permission == ACTION_TO_AUTHORIZE.VIEW_METADATA:
-        if res.raccess.discoverable or res.raccess.public:
-            authorized = True
-        elif user.is_authenticated() and user.is_active:
-            authorized = user.uaccess.can_view_resource(res)
+    if needed_permission == ACTION_TO_AUTHORIZE.VIEW_METADATA and \
+            (res.raccess.discoverable or res.raccess.public):
+        authorized = True
     elif user.is_authenticated() and user.is_active:
-        if needed_permission == ACTION_TO_AUTHORIZE.VIEW_RESOURCE:
-            authorized = user.uaccess.can_view_resource(res)
-        elif needed_permission == ACTION_TO_AUTHORIZE.EDIT_RESOURCE:
-            authorized = user.uaccess.can_change_resource(res)
-        elif needed_permission == ACTION_TO_AUTHORIZE.DELETE_RESOURCE:
-            authorized = user.uaccess.can_delete_resource(res)
-        elif needed_permission == ACTION_TO_AUTHORIZE.SET_RESOURCE_FLAG:
-            authorized = user.uaccess.can_change_resource_flags(res)
-        elif needed_permission == ACTION_TO_AUTHORIZE.CREATE_RESOURCE_VERSION:
-            authorized = user.uaccess.owns_resource(res)
-        elif needed_permission == ACTION_TO_AUTHORIZE.VIEW_RESOURCE_ACCESS:
-            authorized = user.uaccess.can_view_resource(res)
-        elif needed_permission == ACTION_TO_AUTHORIZE.EDIT_RESOURCE_ACCESS:
-            authorized = user.uaccess.can_share_resource(res, 2)
+        authorized = privilege_cache.decide(
+            user, res, needed_permission,
+            lambda: _authorize_user(user, res, needed_permission))
     elif needed_permission == ACTION_TO_AUTHORIZE.VIEW_RESOURCE:
         authorized = res.raccess.public
 
@@ -557,49 +568,28 @@ def get_my_resources_list(user):
     :return: an instance of QuerySet of resources
     """
 
-    # get a list of resources with effective OWNER privilege
-    owned_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.OWNER)
-    # remove obsoleted resources from the owned_resources
-    owned_resources = owned_resources.exclude(object_id__in=Relation.objects.filter(
-        type='isReplacedBy').values('object_id'))
-
-    # get a list of resources with effective CHANGE privilege (should include resources that the
-    # user has access to via group
-    editable_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.CHANGE,
-                                                                         via_group=True)
-    # remove obsoleted resources from the editable_resources
-    editable_resources = editable_resources.exclude(object_id__in=Relation.objects.filter(
-        type='isReplacedBy').values('object_id'))
-
-    # get a list of resources with effective VIEW privilege (should include resources that the
-    # user has access via group
-    viewable_resources = user.uaccess.get_resources_with_explicit_access(PrivilegeCodes.VIEW,
-                                                                         via_group=True)
-    # remove obsoleted resources from the viewable_resources
-    viewable_resources = viewable_resources.exclude(object_id__in=Relation.objects.filter(
-        type='isReplacedBy').values('object_id'))
+    # the combined user and group privilege of the user over each resource, in one query of
+    # the materialized effective privileges
+    privileges = user.uaccess.get_effective_resource_privileges(via_user=True, via_group=True)
+    privilege = privileges.filter(resource=OuterRef('pk')).values('privilege')
 
     labeled_resources = user.ulabels.labeled_resources
     favorite_resources = user.ulabels.favorited_resources
     discovered_resources = user.ulabels.my_resources
 
-    # join all queryset objects
-    resource_collection = owned_resources.distinct() | \
-        editable_resources.distinct() | \
-        viewable_resources.distinct() | \
-        discovered_resources.distinct()
-
-    resource_collection = resource_collection.annotate(
-        owned=Case(When(short_id__in=owned_resources.values_list('short_id', flat=True),
-                        then=Value(True, BooleanField()))))
+    # join privileged resources, except obsoleted ones, with discovered resources
+    obsoleted = Relation.objects.filter(type='isReplacedBy').values('object_id')
+    resource_collection = BaseResource.objects.filter(
+        Q(pk__in=privileges.values('resource')) & ~Q(object_id__in=obsoleted) |
+        Q(pk__in=discovered_resources.values('pk')))
 
     resource_collection = resource_collection.annotate(
-        editable=Case(When(short_id__in=editable_resources.values_list('short_id', flat=True),
-                      then=Value(True, BooleanField()))))
+        privilege=Subquery(privilege, output_field=IntegerField()))
 
     resource_collection = resource_collection.annotate(
-        viewable=Case(When(short_id__in=viewable_resources.values_list('short_id', flat=True),
-                           then=Value(True, BooleanField()))))
+        owned=Case(When(privilege=PrivilegeCodes.OWNER, then=Value(True, BooleanField()))),
+        editable=Case(When(privilege=PrivilegeCodes.CHANGE, then=Value(True, BooleanField()))),
+        viewable=Case(When(privilege=PrivilegeCodes.VIEW, then=Value(True, BooleanField()))))
 
     resource_collection = resource_collection.annotate(
         discovered=Case(When(short_id__in=discovered_resources.values_list('short_id', flat=True),
@@ -908,7 +898,7 @@ def zip_folder(user, res_id, input_coll_path, output_zip_fname, bool_remove_orig
 
     content_dir = os.path.dirname(res_coll_input)
     output_zip_full_path = os.path.join(content_dir, output_zip_fname)
-    istorage.session.run("ibun", None, '-cDzip', '-f', output_zip_full_path, res_coll_input)
+    istorage.zipup(res_coll_input, output_zip_full_path)
 
     output_zip_size = istorage.size(output_zip_full_path)
 
@@ -1077,7 +1067,7 @@ def create_folder(res_id, folder_path):
     # check for duplicate folder path
     if istorage.exists(coll_path):
         raise ValidationError("Folder already exists")
-    istorage.session.run("imkdir", None, '-p', coll_path)
+    istorage.create_folder(coll_path)
 
 
 def remove_folder(user, res_id, folder_path):
@@ -988,16 +988,25 @@ class AbstractLogicalFile(models.Model):
         """allows a zip file that is part of this logical file type to get unzipped"""
         return True
 
+    @property
+    def first_file(self):
+        """Returns the first resource file of this aggregation, taken from the files loaded by
+        the resource's aggregation index when it has loaded them"""
+        files = getattr(self, '_index_files', None)
+        if files is not None:
+            return files[0] if files else None
+        return self.files.first()
+
     @property
     def aggregation_name(self):
         """Returns aggregation name as per the aggregation naming rule defined in issue#2568"""
         if self.is_single_file_aggregation:
             # self is a single file aggregation type
-            return self.files.first().short_path
+            return self.first_file.short_path
         else:
             # self is a multi- file aggregation type
             if not self.is_fileset:
-                return self.files.first().file_folder
+                return self.first_file.file_folder
 
             # self is a fileset aggregation
             return self.folder
@@ -1014,7 +1023,7 @@ class AbstractLogicalFile(models.Model):
         if self.is_fileset:
             file_folder = self.folder
         else:
-            file_folder = self.files.first().file_folder
+            file_folder = self.first_file.file_folder
         if file_folder is not None:
             xml_file_name = os.path.join(file_folder, xml_file_name)
         return xml_file_name
@@ -1036,7 +1045,7 @@ class AbstractLogicalFile(models.Model):
         if self.is_fileset:
             file_folder = self.folder
         else:
-            file_folder = self.files.first().file_folder
+            file_folder = self.first_file.file_folder
         if file_folder is not None:
             xml_file_name = os.path.join(file_folder, xml_file_name)
         return xml_file_name
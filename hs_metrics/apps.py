@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class HSMetricsAppConfig(AppConfig):
+    name = 'hs_metrics'
+
+    def ready(self):
+        # keep the counters of the metrics snapshot up to date
+        import hs_metrics.receivers  # noqa
@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class SiteMetric(models.Model):
+    """One count of the site metrics snapshot; see hs_metrics/snapshot.py."""
+    TOTAL = 'total'
+    RESOURCE_TYPE = 'resource_type'
+    HOST_INSTITUTION = 'host_institution'
+    TITLE = 'title'
+    PROFESSION = 'profession'
+    SUBJECT_AREA = 'subject_area'
+
+    kind = models.CharField(max_length=32)
+    key = models.CharField(max_length=1024)
+    count = models.IntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'key')
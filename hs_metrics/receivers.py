@@ -0,0 +1,37 @@
+"""Signal receivers that keep the counters of the site metrics snapshot up to date."""
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from mezzanine.generic.models import Rating, ThreadedComment
+
+from hs_core.hydroshare import get_resource_types
+from hs_metrics import snapshot
+from hs_metrics.models import SiteMetric
+
+TOTALS = {User: 'users', Rating: 'ratings', ThreadedComment: 'comments'}
+
+
+def _count(sender, instance, delta):
+    if sender in TOTALS:
+        snapshot.increment(SiteMetric.TOTAL, TOTALS[sender], delta)
+    else:
+        # resource types are proxies of BaseResource
+        snapshot.increment(SiteMetric.TOTAL, 'resources', delta)
+        snapshot.increment(SiteMetric.RESOURCE_TYPE, snapshot.resource_type_name(sender),
+                           delta)
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _count(sender, instance, 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    _count(sender, instance, -1)
+
+
+# connected per sender, so that saving other models does not run them; archived resource
+# types are not shown
+for model in list(TOTALS) + get_resource_types():
+    post_save.connect(count_created, sender=model)
+    post_delete.connect(count_deleted, sender=model)
@@ -0,0 +1,102 @@
+"""Snapshot of the site metrics shown by hs_metrics.views.HydroshareSiteMetrics.
+
+The metrics page used to instantiate every resource to count resources by type and to walk
+every user profile, on each page load.  The counts are instead kept in SiteMetric rows of
+(kind, key, count):
+
+* totals of users, resources, ratings and comments, and resources per type, which the
+  receivers in hs_metrics.receivers adjust as those objects are created and deleted;
+* histograms of user titles, professions and subject areas, and the host institutions of
+  users, which change with profiles and are recomputed by refresh().
+
+refresh() recomputes every count with a few aggregate queries.  It runs every
+HS_METRICS_REFRESH_INTERVAL seconds (hs_metrics.tasks.refresh_site_metrics), which also
+corrects the drift of the signal-driven counters, e.g. when the type of a resource changes.
+"""
+
+from collections import Counter, defaultdict
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from mezzanine.generic.models import Rating, ThreadedComment
+
+from hs_core.hydroshare import get_resource_types
+from hs_core.models import BaseResource
+from hs_metrics.models import SiteMetric
+from theme.models import UserProfile
+
+
+def resource_type_name(model):
+    return model._meta.verbose_name if hasattr(model._meta, 'verbose_name') \
+        else model._meta.model_name
+
+
+def _resource_type_names():
+    return dict((model.__name__, resource_type_name(model)) for model in get_resource_types())
+
+
+def compute():
+    """Return {kind: Counter} of every metric, computed from the database."""
+    metrics = defaultdict(Counter)
+    totals = metrics[SiteMetric.TOTAL]
+
+    names = _resource_type_names()
+    for row in BaseResource.objects.values('resource_type').annotate(n=Count('id')):
+        name = names.get(row['resource_type'])
+        if name is not None:  # archived resource types are not shown
+            metrics[SiteMetric.RESOURCE_TYPE][name] += row['n']
+            totals['resources'] += row['n']
+
+    totals['users'] = User.objects.count()
+    totals['ratings'] = Rating.objects.count()
+    totals['comments'] = ThreadedComment.objects.count()
+
+    # FIXME revisit this with the hs_party application
+    # Profiles record neither an organization type nor a profession: every organization
+    # counts as a host institution, and the user type (e.g. University Faculty) stands in
+    # for the profession.
+    for profile in UserProfile.objects.values('organization', 'title', 'user_type',
+                                              'subject_areas').iterator():
+        metrics[SiteMetric.HOST_INSTITUTION][profile['organization'] or ''] += 1
+        metrics[SiteMetric.PROFESSION][profile['user_type'] or ''] += 1
+        metrics[SiteMetric.TITLE][profile['title'] or ''] += 1
+        if profile['subject_areas']:
+            metrics[SiteMetric.SUBJECT_AREA].update(
+                a.strip() for a in profile['subject_areas'].split(','))
+    return metrics
+
+
+def refresh():
+    """Replace the snapshot with freshly computed metrics."""
+    metrics = compute()
+    with transaction.atomic():
+        SiteMetric.objects.all().delete()
+        SiteMetric.objects.bulk_create([
+            SiteMetric(kind=kind, key=key, count=count)
+            for kind, counts in metrics.items()
+            for key, count in counts.items()])
+
+
+def increment(kind, key, delta=1):
+    """Add delta to a count of the snapshot."""
+    if SiteMetric.objects.filter(kind=kind, key=key).update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            SiteMetric.objects.create(kind=kind, key=key, count=delta)
+    except IntegrityError:
+        # created concurrently
+        SiteMetric.objects.filter(kind=kind, key=key).update(count=F('count') + delta)
+
+
+def is_empty():
+    return not SiteMetric.objects.exists()
+
+
+def load():
+    """Return {kind: Counter} of the snapshot, in one query."""
+    metrics = defaultdict(Counter)
+    for kind, key, count in SiteMetric.objects.values_list('kind', 'key', 'count'):
+        metrics[kind][key] = count
+    return metrics
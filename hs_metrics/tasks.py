@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from celery.task import periodic_task
+from django.conf import settings
+from django.core.cache import cache
+
+
+@periodic_task(ignore_result=True,
+               run_every=timedelta(seconds=getattr(settings, 'HS_METRICS_REFRESH_INTERVAL',
+                                                   60 * 60)))
+def refresh_site_metrics():
+    """Recompute the site metrics snapshot of hs_metrics.snapshot."""
+    from hs_metrics.snapshot import refresh
+
+    lock_id = 'hs_metrics.tasks.refresh_site_metrics'
+    if not cache.add(lock_id, 'locked', 60 * 60):
+        return
+    try:
+        refresh()
+    finally:
+        cache.delete(lock_id)
@@ -0,0 +1,86 @@
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from mezzanine.generic.models import Rating
+
+from hs_composite_resource.models import CompositeResource
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+from hs_metrics import snapshot
+from hs_metrics.models import SiteMetric
+
+
+class TestSnapshot(MockIRODSTestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(TestSnapshot, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'metrics@gmail.com',
+            username='metrics',
+            first_name='Site',
+            last_name='Metrics',
+            superuser=False,
+            groups=[],
+            organization='Utah State University'
+        )
+        profile = self.user.userprofile
+        profile.subject_areas = 'Hydrology, Water Quality'
+        profile.save()
+        self.res = hydroshare.create_resource(resource_type='CompositeResource',
+                                              owner=self.user, title='Metrics Resource')
+        self.type_name = snapshot.resource_type_name(CompositeResource)
+
+    def _totals(self):
+        return snapshot.load()[SiteMetric.TOTAL]
+
+    def test_compute(self):
+        metrics = snapshot.compute()
+        totals = metrics[SiteMetric.TOTAL]
+        self.assertEqual(totals['users'], User.objects.count())
+        self.assertEqual(totals['resources'], 1)
+        self.assertEqual(totals['ratings'], 0)
+        self.assertEqual(metrics[SiteMetric.RESOURCE_TYPE][self.type_name], 1)
+        self.assertEqual(metrics[SiteMetric.HOST_INSTITUTION]['Utah State University'], 1)
+        self.assertEqual(metrics[SiteMetric.SUBJECT_AREA]['Hydrology'], 1)
+        self.assertEqual(metrics[SiteMetric.SUBJECT_AREA]['Water Quality'], 1)
+
+    def test_refresh(self):
+        SiteMetric.objects.create(kind=SiteMetric.TITLE, key='gone', count=1)
+        SiteMetric.objects.filter(kind=SiteMetric.TOTAL, key='resources').update(count=10)
+        snapshot.refresh()
+        self.assertFalse(snapshot.is_empty())
+        self.assertEqual(snapshot.load(), snapshot.compute())
+
+    def test_increment(self):
+        snapshot.increment(SiteMetric.TITLE, 'Professor')
+        snapshot.increment(SiteMetric.TITLE, 'Professor', 2)
+        self.assertEqual(snapshot.load()[SiteMetric.TITLE]['Professor'], 3)
+        snapshot.increment(SiteMetric.TITLE, 'Professor', -1)
+        self.assertEqual(snapshot.load()[SiteMetric.TITLE]['Professor'], 2)
+
+    def test_receivers(self):
+        snapshot.refresh()
+        users = self._totals()['users']
+
+        other = hydroshare.create_resource(resource_type='CompositeResource',
+                                           owner=self.user, title='Another Resource')
+        self.assertEqual(self._totals()['resources'], 2)
+        self.assertEqual(snapshot.load()[SiteMetric.RESOURCE_TYPE][self.type_name], 2)
+
+        # saving a resource again does not count it again
+        other.save()
+        self.assertEqual(self._totals()['resources'], 2)
+
+        hydroshare.delete_resource(other.short_id)
+        self.assertEqual(self._totals()['resources'], 1)
+        self.assertEqual(snapshot.load()[SiteMetric.RESOURCE_TYPE][self.type_name], 1)
+
+        rating = Rating(user=self.user, value=1)
+        self.res.rating.add(rating, bulk=False)
+        self.assertEqual(self._totals()['ratings'], 1)
+        rating.delete()
+        self.assertEqual(self._totals()['ratings'], 0)
+
+        hydroshare.create_account('new@gmail.com', username='new', first_name='New',
+                                  last_name='User', superuser=False, groups=[])
+        self.assertEqual(self._totals()['users'], users + 1)
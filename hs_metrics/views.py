@@ -1,11 +1,8 @@
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
-from django.contrib.auth.models import User
-from mezzanine.generic.models import Rating, ThreadedComment
-from theme.models import UserProfile # fixme switch to party model
-from hs_core import hydroshare
-from collections import Counter
+from hs_metrics import snapshot
+from hs_metrics.models import SiteMetric
 
 class HydroshareSiteMetrics(TemplateView):
     template_name = 'hs_metrics/hydrosharesitemetrics.html'
@@ -17,21 +14,19 @@ class HydroshareSiteMetrics(TemplateView):
     def __init__(self, **kwargs):
         super(HydroshareSiteMetrics, self).__init__(**kwargs)
 
-        self.n_registered_users = User.objects.all().count()
+        self.n_registered_users = 0
         self.n_host_institutions = 0
-        self.host_institutions = set()
         self.n_users_logged_on = None # fixme need to track
         self.max_logon_duration = None # fixme need to track
         self.n_courses = 0
         self.n_agencies = 0
-        self.agencies = set()
         self.n_core_contributors = 6 # fixme need to track (use GItHub API Key) https://api.github.com/teams/328946
         self.n_extension_contributors = 10 # fixme need to track (use GitHub API Key) https://api.github.com/teams/964835
         self.n_citations = 0 # fixme hard to quantify
-        self.resource_type_counts = Counter()
-        self.user_titles = Counter()
-        self.user_professions = Counter()
-        self.user_subject_areas = Counter()
+        self.resource_type_counts = []
+        self.user_titles = []
+        self.user_professions = []
+        self.user_subject_areas = []
         self.n_ratings = 0
         self.n_comments = 0
         self.n_resources = 0
@@ -66,46 +61,19 @@ class HydroshareSiteMetrics(TemplateView):
         """
 
         ctx = super(HydroshareSiteMetrics, self).get_context_data(**kwargs)
-        self.get_resource_stats()
-        self.get_user_stats()
-        self.user_professions = self.user_professions.items()
-        self.user_subject_areas = self.user_subject_areas.items()
-        self.resource_type_counts = self.resource_type_counts.items()
-        self.user_titles = self.user_titles.items()
+        # counts come from the snapshot maintained by hs_metrics.snapshot
+        if snapshot.is_empty():
+            snapshot.refresh()
+        metrics = snapshot.load()
+        totals = metrics[SiteMetric.TOTAL]
+        self.n_registered_users = totals['users']
+        self.n_resources = totals['resources']
+        self.n_ratings = totals['ratings']
+        self.n_comments = totals['comments']
+        self.resource_type_counts = metrics[SiteMetric.RESOURCE_TYPE].items()
+        self.user_titles = metrics[SiteMetric.TITLE].items()
+        self.user_professions = metrics[SiteMetric.PROFESSION].items()
+        self.user_subject_areas = metrics[SiteMetric.SUBJECT_AREA].items()
+        self.n_host_institutions = len(metrics[SiteMetric.HOST_INSTITUTION])
         ctx['metrics'] = self
         return ctx
-
-    def get_all_resources(self):
-        """Yield all resources in the system as a single generator"""
-
-        resource_types = hydroshare.get_resource_types()
-        for qs in (res_model.objects.all() for res_model in resource_types):
-            for resource in qs:
-                yield resource
-
-    def get_resource_stats(self):
-        for resource in self.get_all_resources():
-            resource_type_name = resource._meta.verbose_name if hasattr(resource._meta, 'verbose_name') else resource._meta.model_name
-            self.resource_type_counts[resource_type_name] += 1
-            self.n_resources += 1
-
-        self.n_ratings = Rating.objects.all().count()
-        self.n_comments = ThreadedComment.objects.all().count()
-
-    def get_user_stats(self):
-        # FIXME revisit this with the hs_party application
-
-        for profile in UserProfile.objects.all():
-            if profile.organization_type in ('Government','Commercial'):
-                self.agencies.add(profile.organization)
-            else:
-                self.host_institutions.add(profile.organization)
-
-            self.user_professions[profile.profession] += 1
-            self.user_titles[profile.title] += 1
-
-            if profile.subject_areas:
-                self.user_subject_areas.update(a.strip() for a in profile.subject_areas.split(','))
-
-        self.n_host_institutions = len(self.host_institutions)
-        self.n_agencies = len(self.agencies)
\ No newline at end of file
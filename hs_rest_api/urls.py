@@ -12,7 +12,7 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
 
-from .views.hs_core import ShareResourceGroup, ShareResourceUser
+from .views.hs_core import ShareResourceGroup, ShareResourceUser, ShareResources
 
 schema_view_yasg = get_schema_view(
    openapi.Info(
@@ -58,6 +58,9 @@ urlpatterns = [
     url(r'^resource/(?P<pk>[0-9a-f-]+)/copy/$',
         core_views.copy_resource_public, name='copy_resource_public'),
 
+    url(r'^resource/share/(?P<privilege>[a-z]+)/$',
+        ShareResources.as_view(), name='share_resources_public'),
+
     url(r'^resource/(?P<pk>[0-9a-f-]+)/share/(?P<privilege>[a-z]+)/group/(?P<group_id>[\w.@+-]+)/$',
         ShareResourceGroup.as_view(), name='share_resource_group_public'),
 
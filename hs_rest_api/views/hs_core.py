@@ -1,13 +1,16 @@
 from __future__ import absolute_import
 import logging
+
+from django.db import transaction
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.exceptions import ParseError
+from rest_framework.exceptions import ParseError, NotFound, NotAuthenticated
 
 from hs_core.views.utils import authorize, ACTION_TO_AUTHORIZE
 from hs_core.hydroshare import utils as hs_core_utils
+from hs_core.models import BaseResource
 from hs_access_control.models import PrivilegeCodes
 
 logger = logging.getLogger(__name__)
@@ -47,3 +50,46 @@ class ShareResourceGroup(APIView):
             user.uaccess.share_resource_with_group(res, to_group, privilege_code)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ShareResources(APIView):
+    """
+    Set the privileges of many users and groups over many resources at once
+
+    The body lists the short ids of the resources and the ids or names of the users and
+    groups: {"resources": [...], "users": [...], "groups": [...]}.  Every pair is checked
+    as by the single-resource endpoints above, and either every pair is shared (or, for
+    privilege "none", unshared), or none is.
+    """
+
+    @swagger_auto_schema(operation_description="Set user and group privileges of many "
+                                               "resources")
+    def post(self, request, privilege):
+        user = request.user
+        if not user.is_authenticated():
+            raise NotAuthenticated()
+        privilege_code = PrivilegeCodes.from_string(privilege)
+        if not privilege_code:
+            raise ParseError("Bad privilege code")
+
+        short_ids = request.data.get('resources') or []
+        if not isinstance(short_ids, list) or not short_ids:
+            raise ParseError("A list of resources is required")
+        resources = list(BaseResource.objects.filter(short_id__in=short_ids))
+        missing = set(short_ids) - set(r.short_id for r in resources)
+        if missing:
+            raise NotFound("Resources not found: {}".format(", ".join(sorted(missing))))
+        to_users = [hs_core_utils.user_from_id(u) for u in request.data.get('users') or []]
+        to_groups = [hs_core_utils.group_from_id(g) for g in request.data.get('groups') or []]
+
+        with transaction.atomic():
+            if privilege_code == PrivilegeCodes.NONE:
+                user.uaccess.unshare_resources_with_users(resources, to_users)
+                user.uaccess.unshare_resources_with_groups(resources, to_groups)
+            else:
+                user.uaccess.share_resources_with_users(resources, to_users, privilege_code)
+                if to_groups:
+                    user.uaccess.share_resources_with_groups(resources, to_groups,
+                                                             privilege_code)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1 @@
+default_app_config = 'hs_sitemap.apps.HSSitemapAppConfig'
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class HSSitemapAppConfig(AppConfig):
+    name = 'hs_sitemap'
+
+    def ready(self):
+        # rebuild the sitemap pages of resources whose visibility changes
+        import hs_sitemap.receivers  # noqa
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SitemapPage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField(unique=True)),
+                ('content', models.BinaryField(default=b'')),
+                ('size', models.IntegerField(default=0)),
+                ('resources_updated', models.DateTimeField(null=True)),
+                ('etag', models.CharField(blank=True, max_length=32)),
+                ('modified', models.DateTimeField(null=True)),
+                ('stale', models.BooleanField(default=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class SitemapPage(models.Model):
+    """A precomputed page of the resource sitemap; see hs_sitemap/resource_pages.py."""
+    number = models.IntegerField(unique=True)
+    # gzip-compressed urlset document
+    content = models.BinaryField(default=b'')
+    # number of resources listed, and the latest of their updated times when it was built
+    size = models.IntegerField(default=0)
+    resources_updated = models.DateTimeField(null=True)
+    # md5 of the uncompressed document, and when it last changed
+    etag = models.CharField(max_length=32, blank=True)
+    modified = models.DateTimeField(null=True)
+    # set when the visibility of one of its resources changes
+    stale = models.BooleanField(default=True)
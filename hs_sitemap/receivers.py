@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from hs_access_control.models import ResourceAccess
+from hs_sitemap import resource_pages
+
+
+@receiver(post_save, sender=ResourceAccess)
+def sitemap_visibility_handler(sender, instance, **kwargs):
+    """Mark the sitemap page of a resource whose visibility may have changed stale."""
+    resource_pages.mark_stale(instance.resource_id)
@@ -0,0 +1,135 @@
+"""Precomputed pages of the resource sitemap.
+
+Public and discoverable resources are listed in sitemap protocol documents of at most
+HS_SITEMAP_PAGE_SIZE urls: page n lists the resources whose ids are in
+[n * HS_SITEMAP_PAGE_SIZE, (n + 1) * HS_SITEMAP_PAGE_SIZE), with lastmod taken from their
+'modified' metadata date.  Pages are stored gzip-compressed in SitemapPage rows and served
+as they are, with an ETag and a Last-Modified date that only change with their content, so
+crawlers can ask for them conditionally (see hs_sitemap.views).
+
+Since a resource always falls in the same page, a change rebuilds only the page it is in:
+
+* update() compares, with one aggregate query, the number of visible resources and their
+  latest updated time per page to those of the stored pages, and rebuilds the pages that
+  differ or were marked stale.  It runs every HS_SITEMAP_INTERVAL seconds
+  (hs_sitemap.tasks.update_sitemap), and on the first request of the sitemap index if no
+  page was built yet.
+* the receivers in hs_sitemap.receivers mark the page of a resource stale whenever its
+  access flags are saved, since a change of visibility does not change its updated time.
+"""
+
+import gzip
+import hashlib
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Q
+from django.utils.timezone import now
+
+from hs_core.hydroshare.utils import current_site_url
+from hs_core.models import BaseResource, Date
+from hs_sitemap.models import SitemapPage
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def page_size():
+    return getattr(settings, 'HS_SITEMAP_PAGE_SIZE', 10000)
+
+
+def page_number(resource_id):
+    return resource_id // page_size()
+
+
+def _visible():
+    return BaseResource.objects.filter(Q(raccess__public=True) | Q(raccess__discoverable=True))
+
+
+def mark_stale(resource_id):
+    """Have the next update() rebuild the page of the resource with resource_id."""
+    number = page_number(resource_id)
+    if not SitemapPage.objects.filter(number=number).update(stale=True):
+        SitemapPage.objects.get_or_create(number=number, defaults={'stale': True})
+
+
+def _lastmods(rows):
+    """Return {(content_type_id, object_id): modified date} of the metadata of rows."""
+    object_ids = [r['object_id'] for r in rows if r['object_id'] is not None]
+    dates = Date.objects.filter(type='modified', object_id__in=object_ids)\
+        .values_list('content_type_id', 'object_id', 'start_date')
+    return dict(((ct, oid), start_date) for ct, oid, start_date in dates)
+
+
+def render_page(number):
+    """Return (urlset document, number of urls, latest updated time) of page number."""
+    size = page_size()
+    rows = list(_visible().filter(id__gte=number * size, id__lt=(number + 1) * size)
+                .order_by('id')
+                .values('id', 'short_id', 'object_id', 'content_type_id', 'updated'))
+    lastmods = _lastmods(rows)
+    site_url = current_site_url()
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="{}">'.format(SITEMAP_NS)]
+    for row in rows:
+        lastmod = lastmods.get((row['content_type_id'], row['object_id']), row['updated'])
+        lines.append('<url><loc>{}</loc>{}</url>'.format(
+            escape('{}/resource/{}/'.format(site_url, row['short_id'])),
+            '<lastmod>{}</lastmod>'.format(lastmod.date().isoformat()) if lastmod else ''))
+    lines.append('</urlset>')
+    latest = max([r['updated'] for r in rows if r['updated'] is not None] or [None])
+    return '\n'.join(lines).encode('utf-8'), len(rows), latest
+
+
+def compress(document):
+    buf = BytesIO()
+    # a fixed mtime so that the same document compresses to the same bytes
+    with gzip.GzipFile(fileobj=buf, mode='wb', mtime=0) as f:
+        f.write(document)
+    return buf.getvalue()
+
+
+def build_page(number):
+    """Render page number and store it; return its SitemapPage."""
+    page, _ = SitemapPage.objects.get_or_create(number=number)
+    # cleared first, so that marks made while rendering are kept for the next update
+    SitemapPage.objects.filter(pk=page.pk).update(stale=False)
+
+    document, page.size, page.resources_updated = render_page(number)
+    fields = ['size', 'resources_updated']
+    etag = hashlib.md5(document).hexdigest()
+    if etag != page.etag:
+        page.etag = etag
+        page.content = compress(document)
+        page.modified = now()
+        fields += ['etag', 'content', 'modified']
+    page.save(update_fields=fields)
+    return page
+
+
+def is_built():
+    """Whether update() has built any page yet."""
+    return SitemapPage.objects.exclude(etag='').exists()
+
+
+def update():
+    """Rebuild the pages whose resources changed; return the number of pages rebuilt."""
+    current = {}
+    for row in _visible().annotate(page=F('id') / page_size()).values('page')\
+            .annotate(n=Count('id'), latest=Max('updated')):
+        current[row['page']] = (row['n'], row['latest'])
+
+    built = 0
+    for page in SitemapPage.objects.defer('content'):
+        state = current.pop(page.number, None)
+        if state is None:
+            # no visible resources left
+            page.delete()
+        elif page.stale or state != (page.size, page.resources_updated):
+            build_page(page.number)
+            built += 1
+    for number in current:
+        build_page(number)
+        built += 1
+    return built
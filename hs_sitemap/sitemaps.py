@@ -1,5 +1,7 @@
 from django.contrib import sitemaps
 from django.core.urlresolvers import reverse
+from mezzanine.core.models import Displayable
+from mezzanine.core.sitemaps import DisplayableSitemap
 
 
 class PagesSitemap(sitemaps.Sitemap):
@@ -11,3 +13,11 @@ class PagesSitemap(sitemaps.Sitemap):
 
     def location(self, item):
         return reverse(item)
+
+
+class ContentSitemap(DisplayableSitemap):
+    """Published mezzanine content; resources are listed by hs_sitemap.resource_pages."""
+
+    def items(self):
+        return [item for url, item in Displayable.objects.url_map(in_sitemap=True).items()
+                if not url.startswith('/resource/')]
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from celery.task import periodic_task
+from django.conf import settings
+from django.core.cache import cache
+
+
+@periodic_task(ignore_result=True,
+               run_every=timedelta(seconds=getattr(settings, 'HS_SITEMAP_INTERVAL', 60 * 10)))
+def update_sitemap():
+    """Rebuild the resource sitemap pages of hs_sitemap.resource_pages that changed."""
+    from hs_sitemap.resource_pages import update
+
+    lock_id = 'hs_sitemap.tasks.update_sitemap'
+    if not cache.add(lock_id, 'locked', 60 * 60):
+        return
+    try:
+        update()
+    finally:
+        cache.delete(lock_id)
@@ -0,0 +1,95 @@
+import gzip
+from io import BytesIO
+
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+from hs_sitemap import resource_pages
+from hs_sitemap.models import SitemapPage
+
+
+def uncompress(page):
+    return gzip.GzipFile(fileobj=BytesIO(bytes(page.content))).read()
+
+
+# one resource per page
+@override_settings(HS_SITEMAP_PAGE_SIZE=1)
+class TestResourcePages(MockIRODSTestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(TestResourcePages, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.owner = hydroshare.create_account(
+            'sitemap@gmail.com',
+            username='sitemap',
+            first_name='Site',
+            last_name='Map',
+            superuser=False,
+            groups=[]
+        )
+        self.public_res = self._create_resource('Public Resource', public=True)
+        self.private_res = self._create_resource('Private Resource', public=False)
+
+    def tearDown(self):
+        super(TestResourcePages, self).tearDown()
+        SitemapPage.objects.all().delete()
+
+    def _create_resource(self, title, public):
+        res = hydroshare.create_resource(resource_type='CompositeResource',
+                                         owner=self.owner, title=title)
+        if public:
+            res.raccess.public = True
+            res.raccess.save()
+        return res
+
+    def _page(self, res):
+        return SitemapPage.objects.get(number=resource_pages.page_number(res.id))
+
+    def test_update_builds_the_pages_of_visible_resources(self):
+        self.assertFalse(resource_pages.is_built())
+        resource_pages.update()
+        self.assertTrue(resource_pages.is_built())
+
+        page = self._page(self.public_res)
+        self.assertEqual(page.size, 1)
+        self.assertFalse(page.stale)
+        self.assertIn('/resource/{}/'.format(self.public_res.short_id), uncompress(page))
+        # the page of the private resource, marked stale when it was created, is dropped
+        self.assertFalse(SitemapPage.objects.filter(
+            number=resource_pages.page_number(self.private_res.id)).exists())
+
+        # nothing changed
+        self.assertEqual(resource_pages.update(), 0)
+
+    def test_update_rebuilds_pages_whose_visibility_changed(self):
+        resource_pages.update()
+
+        self.private_res.raccess.discoverable = True
+        self.private_res.raccess.save()
+        self.assertEqual(resource_pages.update(), 1)
+        self.assertIn('/resource/{}/'.format(self.private_res.short_id),
+                      uncompress(self._page(self.private_res)))
+
+        self.public_res.raccess.public = False
+        self.public_res.raccess.save()
+        self.assertTrue(self._page(self.public_res).stale)
+        resource_pages.update()
+        self.assertFalse(SitemapPage.objects.filter(
+            number=resource_pages.page_number(self.public_res.id)).exists())
+
+    def test_build_page_changes_version_only_with_content(self):
+        number = resource_pages.page_number(self.private_res.id)
+        page = resource_pages.build_page(number)
+        self.assertEqual(page.size, 0)
+        rebuilt = resource_pages.build_page(number)
+        self.assertEqual(rebuilt.etag, page.etag)
+        self.assertEqual(rebuilt.modified, page.modified)
+
+        self.private_res.raccess.public = True
+        self.private_res.raccess.save()
+        changed = resource_pages.build_page(number)
+        self.assertEqual(changed.size, 1)
+        self.assertNotEqual(changed.etag, page.etag)
+        self.assertIn('/resource/{}/'.format(self.private_res.short_id), uncompress(changed))
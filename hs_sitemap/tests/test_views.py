@@ -0,0 +1,84 @@
+import gzip
+from io import BytesIO
+
+from django.contrib.auth.models import Group
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+from hs_sitemap import resource_pages
+from hs_sitemap.models import SitemapPage
+
+
+@override_settings(HS_SITEMAP_PAGE_SIZE=1)
+class TestSitemapViews(MockIRODSTestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(TestSitemapViews, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.owner = hydroshare.create_account(
+            'sitemap@gmail.com',
+            username='sitemap',
+            first_name='Site',
+            last_name='Map',
+            superuser=False,
+            groups=[]
+        )
+        self.res = hydroshare.create_resource(resource_type='CompositeResource',
+                                              owner=self.owner, title='Public Resource')
+        self.res.raccess.public = True
+        self.res.raccess.save()
+        self.page_url = reverse('resource_sitemap',
+                                kwargs={'number': resource_pages.page_number(self.res.id)})
+
+    def tearDown(self):
+        super(TestSitemapViews, self).tearDown()
+        SitemapPage.objects.all().delete()
+
+    def test_index_builds_the_pages_on_first_use(self):
+        self.assertFalse(resource_pages.is_built())
+        response = self.client.get('/sitemap.xml')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertIn(self.page_url, response.content)
+
+    def test_index_not_modified(self):
+        response = self.client.get('/sitemap.xml')
+        etag = response['ETag']
+        response = self.client.get('/sitemap.xml', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # a new page changes the index
+        other = hydroshare.create_resource(resource_type='CompositeResource',
+                                           owner=self.owner, title='Another Resource')
+        other.raccess.discoverable = True
+        other.raccess.save()
+        resource_pages.update()
+        response = self.client.get('/sitemap.xml', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_resource_sitemap(self):
+        resource_pages.update()
+        location = '/resource/{}/'.format(self.res.short_id)
+
+        response = self.client.get(self.page_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn(location, gzip.GzipFile(fileobj=BytesIO(response.content)).read())
+
+        response = self.client.get(self.page_url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn(location, response.content)
+
+        response = self.client.get(self.page_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_resource_sitemap_not_found(self):
+        resource_pages.update()
+        self.res.raccess.public = False
+        self.res.raccess.save()
+        resource_pages.update()
+        self.assertEqual(self.client.get(self.page_url).status_code, 404)
@@ -1,18 +1,19 @@
 from django.conf.urls import url
 
 from django.contrib.sitemaps import views
-from mezzanine.core.sitemaps import DisplayableSitemap
 
-from .sitemaps import PagesSitemap
+from .sitemaps import ContentSitemap, PagesSitemap
+from .views import index, resource_sitemap
 
 sitemaps = {
-    "resources": DisplayableSitemap,
+    "content": ContentSitemap,
     "pages": PagesSitemap
 }
 sitemap_view = 'django.contrib.sitemaps.views.sitemap'
 
 
 urlpatterns = [
-    url(r'^\.xml$', views.index, {'sitemaps': sitemaps}),
+    url(r'^\.xml$', index, {'sitemaps': sitemaps}),
+    url(r'^-resources-(?P<number>[0-9]+)\.xml$', resource_sitemap, name='resource_sitemap'),
     url(r'^-(?P<section>.+)\.xml$', views.sitemap, {'sitemaps': sitemaps}, name=sitemap_view),
 ]
@@ -1,16 +1,91 @@
-from django.shortcuts import render
+import gzip
+import hashlib
+from calendar import timegm
+from io import BytesIO
+
 from django.db.models import Q
+from django.http import HttpResponse
+from django.core.urlresolvers import reverse
+from django.shortcuts import get_object_or_404, render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
-from hs_core.hydroshare.utils import get_resource_types
+from hs_core.hydroshare.utils import current_site_url, get_resource_types
+from hs_core.models import BaseResource
+from hs_sitemap.models import SitemapPage
+from hs_sitemap.resource_pages import SITEMAP_NS, is_built, update
 
 
 def sitemap(request):
-    resource_types = (
-        (rt.__name__, {
-            "resources": rt.objects.filter(Q(raccess__public=True) | Q(raccess__discoverable=True)),
-        })
-        for rt in get_resource_types()
-    )
+    names = [rt.__name__ for rt in get_resource_types()]
+    resources = BaseResource.objects\
+        .filter(Q(raccess__public=True) | Q(raccess__discoverable=True))\
+        .filter(resource_type__in=names)\
+        .order_by('resource_type', 'id')\
+        .values('resource_type', 'short_id', 'title')
     return render(request, "sitemap.html", {
-        "resource_types": resource_types,
+        "resources": resources,
     })
+
+
+def _conditional(request, etag, modified, content_type, build):
+    """Return a 304 response if the client has the version of etag and modified, else the
+    response of build()."""
+    last_modified = timegm(modified.utctimetuple()) if modified else None
+    response = get_conditional_response(request, etag=quote_etag(etag),
+                                        last_modified=last_modified)
+    if response is None:
+        response = build()
+        response['Content-Type'] = content_type
+    response['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def index(request, sitemaps):
+    """Sitemap index of the sections in sitemaps and of the precomputed resource pages."""
+    if not is_built():
+        # list the resources before hs_sitemap.tasks.update_sitemap first runs
+        update()
+    pages = list(SitemapPage.objects.filter(size__gt=0).order_by('number')
+                 .values_list('number', 'etag', 'modified'))
+    sections = sorted(sitemaps)
+    etag = hashlib.md5(' '.join(sections + [e for _, e, _ in pages])).hexdigest()
+    modified = max([m for _, _, m in pages if m is not None] or [None])
+
+    def build():
+        site_url = current_site_url()
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<sitemapindex xmlns="{}">'.format(SITEMAP_NS)]
+        for section in sections:
+            lines.append('<sitemap><loc>{}{}</loc></sitemap>'.format(
+                site_url, reverse('django.contrib.sitemaps.views.sitemap',
+                                  kwargs={'section': section})))
+        for number, _, page_modified in pages:
+            lines.append('<sitemap><loc>{}{}</loc>{}</sitemap>'.format(
+                site_url, reverse('resource_sitemap', kwargs={'number': number}),
+                '<lastmod>{}</lastmod>'.format(page_modified.isoformat())
+                if page_modified else ''))
+        lines.append('</sitemapindex>')
+        return HttpResponse('\n'.join(lines))
+
+    return _conditional(request, etag, modified, 'application/xml', build)
+
+
+def resource_sitemap(request, number):
+    """A precomputed page of the resource sitemap, gzip-compressed if the client accepts it."""
+    page = get_object_or_404(SitemapPage.objects.defer('content'), number=number, size__gt=0)
+
+    def build():
+        content = bytes(SitemapPage.objects.values_list('content', flat=True).get(pk=page.pk))
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = HttpResponse(content)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.GzipFile(fileobj=BytesIO(content)).read())
+        return response
+
+    response = _conditional(request, page.etag, page.modified, 'application/xml', build)
+    response['Vary'] = 'Accept-Encoding'
+    return response
@@ -1,50 +1,51 @@
-from hs_core.models import get_user, BaseResource
+from hs_core.models import get_user
+from hs_labels.models import UserResourceFlags, FlagCodes
 from hs_core.views.utils import authorize, ACTION_TO_AUTHORIZE
-from hs_tools_resource.models import SupportedResTypeChoices, ToolResource
 from hs_tools_resource.utils import parse_app_url_template
 from hs_tools_resource.app_keys import tool_app_key
+from hs_tools_resource.tool_index import get_index
 
 
 def resource_level_tool_urls(resource_obj, request_obj):
-    res_type_str = resource_obj.resource_type
-
     tool_list = []
     tool_res_id_list = []
     resource_level_app_counter = 0
 
+    # the tools are looked up in the tool index; only the checks that depend upon the user
+    # and upon this resource are made here
+    index = get_index()
     # associate resources with app tools using extended metadata name-value pair with 'appkey' key
-    filterd_res_obj = BaseResource.objects.filter(short_id=resource_obj.short_id,
-                                                  extra_metadata__has_key=tool_app_key).first()
-    if filterd_res_obj:
-        # check appkey matching with web app tool resources
-        appkey_dict = {tool_app_key: filterd_res_obj.extra_metadata[tool_app_key]}
-        for tool_res_obj in ToolResource.objects.filter(extra_metadata__contains=appkey_dict):
-            # tool_res_obj has the same appkey-value pair so needs to associate with the resource
-            if _check_user_can_view_resource(request_obj, resource_obj) and \
-                    _check_user_can_view_app(request_obj, tool_res_obj) and \
-                    _check_app_supports_resource_sharing_status(resource_obj,
-                                                                tool_res_obj):
-                is_open_with_app, tl = _get_app_tool_info(request_obj, resource_obj,
-                                                          tool_res_obj, open_with=True)
-                if tl:
-                    tool_list.append(tl)
-                    tool_res_id_list.append(tl['res_id'])
-                    if is_open_with_app and tl['url']:
-                        resource_level_app_counter += 1
-
-    for choice_obj in SupportedResTypeChoices.objects.filter(description__iexact=res_type_str):
-        for supported_res_types_obj in choice_obj.associated_with.all():
-            tool_res_obj = ToolResource.objects.get(object_id=supported_res_types_obj.object_id)
-            if tool_res_obj.short_id not in tool_res_id_list and \
-                    _check_user_can_view_resource(request_obj, resource_obj) and \
-                    _check_user_can_view_app(request_obj, tool_res_obj) and \
-                    _check_app_supports_resource_sharing_status(resource_obj, tool_res_obj):
-
-                is_open_with_app, tl = _get_app_tool_info(request_obj, resource_obj, tool_res_obj)
-                if tl:
-                    tool_list.append(tl)
-                    if is_open_with_app and tl['url']:
-                        resource_level_app_counter += 1
+    appkey = (resource_obj.extra_metadata or {}).get(tool_app_key)
+    appkey_tools = index.tools_for_appkey(appkey) if appkey is not None else []
+    res_type_tools = index.tools_for_res_type(resource_obj.resource_type)
+    if not (appkey_tools or res_type_tools) or \
+            not _check_user_can_view_resource(request_obj, resource_obj):
+        return None
+    url_key_values = get_app_dict(request_obj.user, resource_obj)
+
+    for tool in appkey_tools:
+        # tool has the same appkey-value pair so needs to associate with the resource
+        if _check_user_can_view_app(request_obj, tool) and \
+                _check_app_supports_resource_sharing_status(resource_obj, tool):
+            is_open_with_app, tl = _get_app_tool_info(tool, url_key_values, open_with=True)
+            if tl:
+                tool_list.append(tl)
+                tool_res_id_list.append(tl['res_id'])
+                if is_open_with_app and tl['url']:
+                    resource_level_app_counter += 1
+
+    open_with_apps = _get_user_open_with_apps(request_obj) if res_type_tools else set()
+    for tool in res_type_tools:
+        if tool['short_id'] not in tool_res_id_list and \
+                _check_user_can_view_app(request_obj, tool) and \
+                _check_app_supports_resource_sharing_status(resource_obj, tool):
+
+            is_open_with_app, tl = _get_app_tool_info(tool, url_key_values,
+                                                      open_with_apps=open_with_apps)
+            if tl:
+                tool_list.append(tl)
+                if is_open_with_app and tl['url']:
+                    resource_level_app_counter += 1
 
     if len(tool_list) > 0:
         return {"tool_list": tool_list,
@@ -53,58 +54,39 @@ def resource_level_tool_urls(resource_obj, request_obj):
         return None
 
 
-def _get_app_tool_info(request_obj, resource_obj, tool_res_obj, open_with=False):
+def _get_app_tool_info(tool, url_key_values, open_with=False, open_with_apps=()):
     """
     get app tool info.
-    :param request_obj: request object
-    :param resource_obj: resource object
-    :param tool_res_obj: web tool app resource object
+    :param tool: web tool app resource information from the tool index
+    :param url_key_values: values of the url template terms, from get_app_dict
     :param open_with: Default is False, meaning check has to be done to see whether
                       the web app resource should show on the resource's open with list;
                       if open_with is True, e.g., appkey extended metadata name-value pair
                       exists that associated this resource with the web app resource, no check
                       is needed, and this web app tool resource will show on this resource's
                       open with list
+    :param open_with_apps: short ids of the web apps in the open with list of the user
     :return: an info dict of web tool resource
     """
-    tool_url_resource = tool_res_obj.metadata.url_base.value \
-        if tool_res_obj.metadata.url_base else None
-    tool_url_aggregation = tool_res_obj.metadata.url_base_aggregation.value \
-        if tool_res_obj.metadata.url_base_aggregation else None
-    tool_url_file = tool_res_obj.metadata.url_base_file.value \
-        if tool_res_obj.metadata.url_base_file else None
-    tool_icon_url = tool_res_obj.metadata.app_icon.data_url \
-        if tool_res_obj.metadata.app_icon else "raise-img-error"
+    tool_url_resource_new = parse_app_url_template(tool['url'], url_key_values)
+    tool_url_agg_new = parse_app_url_template(tool['url_aggregation'], url_key_values)
+    tool_url_file_new = parse_app_url_template(tool['url_file'], url_key_values)
 
-    url_key_values = get_app_dict(request_obj.user, resource_obj)
-
-    tool_url_resource_new = parse_app_url_template(tool_url_resource, url_key_values)
-    tool_url_agg_new = parse_app_url_template(tool_url_aggregation, url_key_values)
-    tool_url_file_new = parse_app_url_template(tool_url_file, url_key_values)
-
-    is_open_with_app = True if open_with else _check_open_with_app(tool_res_obj, request_obj)
-    is_approved_app = _check_webapp_is_approved(tool_res_obj)
-    agg_types = ""
-    file_extensions = ""
-    if tool_res_obj.metadata._supported_agg_types.first():
-        agg_types = tool_res_obj.metadata._supported_agg_types.first() \
-            .get_supported_agg_types_str()
-    if tool_res_obj.metadata.supported_file_extensions:
-        file_extensions = tool_res_obj.metadata.supported_file_extensions.value
+    is_open_with_app = True if open_with else _check_open_with_app(tool, open_with_apps)
 
     if (tool_url_resource_new is not None) or \
             (tool_url_agg_new is not None) or \
             (tool_url_file_new is not None):
-        tl = {'title': str(tool_res_obj.metadata.title.value),
-              'res_id': tool_res_obj.short_id,
-              'icon_url': tool_icon_url,
+        tl = {'title': str(tool['title']),
+              'res_id': tool['short_id'],
+              'icon_url': tool['icon_url'],
               'url': tool_url_resource_new,
               'url_aggregation': tool_url_agg_new,
               'url_file': tool_url_file_new,
               'openwithlist': is_open_with_app,
-              'approved': is_approved_app,
-              'agg_types': agg_types,
-              'file_extensions': file_extensions
+              'approved': tool['approved'],
+              'agg_types': tool['agg_types'],
+              'file_extensions': tool['file_extensions']
               }
 
         return is_open_with_app, tl
@@ -124,32 +106,27 @@ def get_app_dict(user, resource):
     return [resource.get_hs_term_dict(), hs_term_dict_user, hs_term_dict_file]
 
 
-def _check_user_can_view_app(request_obj, tool_res_obj):
+def _check_user_can_view_app(request_obj, tool):
     _, user_can_view_app, _ = authorize(
-        request_obj, tool_res_obj.short_id,
+        request_obj, tool['short_id'],
         needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE,
         raises_exception=False)
     return user_can_view_app
 
 
-def _check_open_with_app(tool_res_obj, request_obj):
-    return _check_webapp_in_user_open_with_list(tool_res_obj, request_obj) or \
-           _check_webapp_is_approved(tool_res_obj)
+def _check_open_with_app(tool, open_with_apps):
+    return tool['short_id'] in open_with_apps or tool['approved']
 
 
-def _check_webapp_in_user_open_with_list(tool_res_obj, request_obj):
+def _get_user_open_with_apps(request_obj):
+    """Return the short ids of the resources that the user has set as open-with-app."""
     if request_obj.user.is_authenticated():
         user_obj = get_user(request_obj)
-        return tool_res_obj.rlabels.is_open_with_app(user_obj)
+        return set(UserResourceFlags.objects
+                   .filter(user=user_obj, kind=FlagCodes.OPEN_WITH_APP)
+                   .values_list('resource__short_id', flat=True))
     else:
-        return False
-
-
-def _check_webapp_is_approved(tool_res_obj):
-    try:
-        return tool_res_obj.metadata.approved
-    except Exception:
-        return False
+        return set()
 
 
 def _check_user_can_view_resource(request_obj, resource_obj):
@@ -160,13 +137,10 @@ def _check_user_can_view_resource(request_obj, resource_obj):
     return user_can_view_res
 
 
-def _check_app_supports_resource_sharing_status(resource_obj, tool_res_obj):
+def _check_app_supports_resource_sharing_status(resource_obj, tool):
     sharing_status_supported = False
-    supported_sharing_status_obj = tool_res_obj.metadata. \
-        supported_sharing_status
-    if supported_sharing_status_obj is not None:
-        supported_sharing_status_str = supported_sharing_status_obj. \
-            get_sharing_status_str()
+    supported_sharing_status_str = tool['sharing_status']
+    if supported_sharing_status_str is not None:
         if len(supported_sharing_status_str) > 0:
             res_sharing_status = resource_obj.raccess.sharing_status
             if supported_sharing_status_str.lower(). \
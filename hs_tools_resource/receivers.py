@@ -1,9 +1,17 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import m2m_changed
 from django.dispatch import receiver
 
 from hs_core.signals import pre_metadata_element_create, pre_metadata_element_update, \
                             pre_create_resource
 
-from hs_tools_resource.models import ToolResource
+from hs_core.models import AbstractMetaDataElement, Title
+from hs_core.receivers import connect_to_models
+from hs_tools_resource import tool_index
+from hs_tools_resource.models import ToolResource, ToolMetaData, SupportedResTypes, \
+    SupportedResTypeChoices, SupportedAggTypes, SupportedAggTypeChoices, \
+    SupportedSharingStatus, SupportedSharingStatusChoices
 from hs_tools_resource.forms import SupportedResTypesValidationForm,  VersionForm, \
                                     UrlValidationForm, \
                                     SupportedSharingStatusValidationForm, RoadmapForm, \
@@ -86,3 +94,33 @@ def validate_form(request, element_name):
         return {'is_valid': True, 'element_data_dict': element_form.cleaned_data}
     else:
         return {'is_valid': False, 'element_data_dict': None, "errors": element_form.errors}
+
+
+def tool_index_invalidation_handler(sender, instance, **kwargs):
+    """Mark the tool index stale when a web app resource or its metadata changes."""
+    tool_index.invalidate()
+
+
+def tool_title_invalidation_handler(sender, instance, **kwargs):
+    """Mark the tool index stale when the title of a web app resource changes."""
+    # titles are core metadata elements, shared with the other resource types
+    if instance.content_type_id == ContentType.objects.get_for_model(ToolMetaData).id:
+        tool_index.invalidate()
+
+
+# connected per sender, so that saving the resources of other types does not run them
+TOOL_ELEMENTS = tuple(model for model in apps.get_app_config('hs_tools_resource').get_models()
+                      if issubclass(model, AbstractMetaDataElement))
+connect_to_models(tool_index_invalidation_handler,
+                  (ToolResource, ToolMetaData, SupportedResTypeChoices, SupportedAggTypeChoices,
+                   SupportedSharingStatusChoices) + TOOL_ELEMENTS)
+connect_to_models(tool_title_invalidation_handler, (Title,))
+
+
+@receiver(m2m_changed, sender=SupportedResTypes.supported_res_types.through)
+@receiver(m2m_changed, sender=SupportedAggTypes.supported_agg_types.through)
+@receiver(m2m_changed, sender=SupportedSharingStatus.sharing_status.through)
+def tool_index_choices_handler(sender, **kwargs):
+    """Mark the tool index stale when the choices of a web app metadata element change."""
+    if kwargs['action'] in ('post_add', 'post_remove', 'post_clear'):
+        tool_index.invalidate()
@@ -574,6 +574,32 @@ class TestWebAppFeature(TestCaseCommonUtilities, TransactionTestCase):
         self.assertEqual('', tl['agg_types'])
         self.assertEqual('.tif', tl['file_extensions'])
 
+    def test_tool_index(self):
+        # the tools offered change with the web app metadata once the index has been built
+        metadata = [{'requesturlbase': {'value': 'https://www.google.com'}}]
+        self.resWebApp.metadata.update(metadata, self.user)
+        self.resWebApp.extra_metadata = {tool_app_key: 'test-app-value'}
+        self.resWebApp.save()
+        self.resComposite.extra_metadata = {tool_app_key: 'test-app-value'}
+        self.resComposite.save()
+
+        url = '/resource/' + self.resComposite.short_id + '/'
+        request = self.factory.get(url)
+        request.user = self.user
+
+        relevant_tools = resource_level_tool_urls(self.resComposite, request)
+        self.assertFalse(relevant_tools['tool_list'][0]['approved'])
+
+        self.resWebApp.metadata.approved = True
+        self.resWebApp.metadata.save()
+        relevant_tools = resource_level_tool_urls(self.resComposite, request)
+        self.assertTrue(relevant_tools['tool_list'][0]['approved'])
+
+        # web apps that do not support the sharing status of the resource are not offered
+        resource.create_metadata_element(self.resWebApp.short_id, 'SupportedSharingStatus',
+                                         sharing_status=['Published'])
+        self.assertIsNone(resource_level_tool_urls(self.resComposite, request))
+
     def test_copy(self):
 
         # create 1 SupportedResTypes obj with required params
@@ -0,0 +1,143 @@
+"""Index of the web app tools that may be offered on resource landing pages.
+
+resource_level_tool_urls used to find, on every landing page view, the tools sharing the
+appkey of a resource with a JSON containment query, then the tools supporting its resource
+type by walking SupportedResTypeChoices and fetching each associated tool, and then to read
+the url templates, icon, approval, supported sharing status, aggregation types and file
+extensions of each tool from its metadata, one query at a time.  None of this depends upon
+the resource being viewed or the viewer.  ToolIndex loads it once for all tools and answers
+the lookups by appkey and by resource type from memory, leaving only the checks that
+depend upon the viewer, the resource and its sharing status to each request.
+
+An index is kept per process and in the Django cache under a version token, as
+hs_core.aggregation_index does, and rebuilt when the token changes.  The receivers in
+hs_tools_resource.receivers replace the token whenever a web app resource, its metadata,
+its metadata elements or their choices are saved, deleted or changed.
+
+A replaced token only reaches other processes through a cache backend that they share
+(see hs_core.shared_cache).  With a process-local backend such as the default
+LocMemCache, each process instead rebuilds its index once it is LOCAL_TIMEOUT seconds old,
+and at once after a change made by the process itself.
+"""
+
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from hs_core import shared_cache
+from hs_tools_resource.app_keys import tool_app_key
+
+_VERSION_KEY = u'tool_index'
+# indexes of replaced versions are left to expire
+_INDEX_TIMEOUT = 60 * 60 * 24
+# seconds for which a process keeps its index when the cache is not shared
+LOCAL_TIMEOUT = 60
+
+_local_index = None
+
+
+def _replace_version():
+    global _local_index
+    _local_index = None
+    cache.set(_VERSION_KEY, uuid4().hex, None)
+
+
+def invalidate():
+    """Mark every index of the web app tools as stale."""
+    _replace_version()
+    transaction.on_commit(_replace_version)
+
+
+def _current_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        # never invalidated, or evicted from the cache: indexes built before now are stale
+        version = uuid4().hex
+        if not cache.add(_VERSION_KEY, version, None):
+            version = cache.get(_VERSION_KEY, version)
+    return version
+
+
+def get_index():
+    """Return the up-to-date ToolIndex."""
+    global _local_index
+    if not shared_cache.is_shared():
+        if _local_index is None or time.time() - _local_index.built > LOCAL_TIMEOUT:
+            _local_index = ToolIndex()
+        return _local_index
+
+    version = _current_version()
+    if _local_index is not None and _local_index.version == version:
+        return _local_index
+    index_key = u'tool_index:{}'.format(version)
+    index = cache.get(index_key)
+    if index is None:
+        index = ToolIndex(version)
+        cache.set(index_key, index, _INDEX_TIMEOUT)
+    _local_index = index
+    return index
+
+
+def _describe_tool(tool):
+    """Return the information about a web app tool that resource_level_tool_urls needs."""
+    metadata = tool.metadata
+    sharing_status = metadata.supported_sharing_status
+    agg_types = metadata._supported_agg_types.first()
+    try:
+        approved = metadata.approved
+    except Exception:
+        approved = False
+    return {
+        'short_id': tool.short_id,
+        'title': metadata.title.value if metadata.title else '',
+        'url': metadata.url_base.value if metadata.url_base else None,
+        'url_aggregation': metadata.url_base_aggregation.value
+        if metadata.url_base_aggregation else None,
+        'url_file': metadata.url_base_file.value if metadata.url_base_file else None,
+        'icon_url': metadata.app_icon.data_url if metadata.app_icon else "raise-img-error",
+        'approved': approved,
+        # None for a webapp without supported_sharing_status metadata
+        'sharing_status': sharing_status.get_sharing_status_str()
+        if sharing_status is not None else None,
+        'agg_types': agg_types.get_supported_agg_types_str() if agg_types else "",
+        'file_extensions': metadata.supported_file_extensions.value
+        if metadata.supported_file_extensions else "",
+    }
+
+
+class ToolIndex(object):
+    """The web app tools, by appkey and by supported resource type."""
+
+    def __init__(self, version=None):
+        from hs_tools_resource.models import ToolResource, SupportedResTypeChoices
+
+        self.version = version
+        self.built = time.time()
+
+        tools = {}
+        by_metadata = {}
+        self.by_appkey = {}
+        for tool in ToolResource.objects.all().order_by('pk'):
+            tools[tool.pk] = _describe_tool(tool)
+            by_metadata[tool.object_id] = tools[tool.pk]
+            appkey = (tool.extra_metadata or {}).get(tool_app_key)
+            if appkey is not None:
+                self.by_appkey.setdefault(appkey, []).append(tools[tool.pk])
+
+        self.by_res_type = {}
+        for choice in SupportedResTypeChoices.objects.all()\
+                .prefetch_related('associated_with'):
+            for supported_res_types in choice.associated_with.all():
+                tool = by_metadata.get(supported_res_types.object_id)
+                if tool is not None:
+                    self.by_res_type.setdefault(choice.description.lower(), []).append(tool)
+
+    def tools_for_appkey(self, appkey):
+        """Return the tools that share an appkey value."""
+        return self.by_appkey.get(appkey, [])
+
+    def tools_for_res_type(self, res_type):
+        """Return the tools that support a resource type, ignoring case."""
+        return self.by_res_type.get(res_type.lower(), [])
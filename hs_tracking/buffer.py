@@ -0,0 +1,159 @@
+"""Buffered, batched writes of tracking variables.
+
+The tracking middleware records a 'visit' variable for every successful page.  Instead of
+looking up its resource and inserting it before the response is returned, it calls
+Variable.record_later(), which appends the variable to an in-process ring buffer and returns.
+A daemon thread per process then writes the buffer
+
+* whenever it holds TRACKING_BUFFER_FLUSH_SIZE variables, or at the latest every
+  TRACKING_BUFFER_FLUSH_INTERVAL seconds;
+* with one bulk_create per flush, after resolving the resource ids of all buffered
+  variables with a single query.
+
+The buffer holds at most TRACKING_BUFFER_MAX_SIZE variables.  If the database falls behind
+and the buffer fills up, TRACKING_BUFFER_DROP_POLICY decides what is lost: 'oldest' drops
+the oldest buffered variable to make room, 'newest' drops the variable being recorded.
+Either way the request does not wait; the number of dropped variables is logged.
+
+Variables still buffered when a process exits normally are written at exit; those of a
+process that is killed are lost.  Buffering is off while testing and when
+TRACKING_BUFFERED is False, in which case record_later() writes immediately.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = 'oldest'
+DROP_NEWEST = 'newest'
+
+Event = namedtuple('Event', 'session_id timestamp name type value resource_pk '
+                            'last_resource_id rest landing')
+
+
+def is_buffered():
+    """Return True if record_later() should go through the buffer."""
+    return getattr(settings, 'TRACKING_BUFFERED', True) and \
+        not getattr(settings, 'TESTING', False)
+
+
+def write_events(events):
+    """Write buffered events as Variables, resolving their resources in one query."""
+    from hs_core.models import BaseResource
+    from hs_tracking.models import Variable
+
+    short_ids = set(e.last_resource_id for e in events
+                    if e.resource_pk is None and e.last_resource_id)
+    resource_pks = {}
+    if short_ids:
+        resource_pks = dict(BaseResource.objects.filter(short_id__in=short_ids)
+                            .values_list('short_id', 'id'))
+    Variable.objects.bulk_create([
+        Variable(session_id=e.session_id, timestamp=e.timestamp, name=e.name, type=e.type,
+                 value=e.value, last_resource_id=e.last_resource_id,
+                 resource_id=e.resource_pk or resource_pks.get(e.last_resource_id),
+                 rest=e.rest, landing=e.landing)
+        for e in events])
+
+
+class TrackingBuffer(object):
+    """Ring buffer of Events, written to the database by a background thread."""
+
+    def __init__(self, background=True):
+        """
+        :param background: start a thread that flushes the buffer; if False, events are
+            only written by calling flush()
+        """
+        self.max_size = getattr(settings, 'TRACKING_BUFFER_MAX_SIZE', 10000)
+        self.flush_size = getattr(settings, 'TRACKING_BUFFER_FLUSH_SIZE', 500)
+        self.flush_interval = getattr(settings, 'TRACKING_BUFFER_FLUSH_INTERVAL', 5)
+        self.drop_policy = getattr(settings, 'TRACKING_BUFFER_DROP_POLICY', DROP_OLDEST)
+        self.background = background
+        self.events = deque()
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.full = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.stopping = False
+
+    def push(self, event):
+        """Add event to the buffer; never blocks on the database."""
+        if self.background:
+            self._start()
+        with self.lock:
+            if len(self.events) >= self.max_size:
+                self.dropped += 1
+                if self.drop_policy == DROP_NEWEST:
+                    return
+                self.events.popleft()
+            self.events.append(event)
+            if len(self.events) >= self.flush_size:
+                self.full.set()
+
+    def _start(self):
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.pid != os.getpid():
+                # a forked worker inherits neither the thread nor the events of its parent
+                self.events.clear()
+                self.dropped = 0
+            if self.pid != os.getpid() or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name='hs_tracking buffer')
+                self.thread.daemon = True
+                self.thread.start()
+
+    def _run(self):
+        while not self.stopping:
+            self.full.wait(self.flush_interval)
+            self.full.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("cannot write tracking variables")
+
+    def stop(self):
+        """Stop the thread and write what remains in the buffer."""
+        self.stopping = True
+        self.full.set()
+        if self.thread is not None and self.pid == os.getpid():
+            self.thread.join(self.flush_interval)
+        self.flush()
+
+    def flush(self):
+        """Write and empty the buffer; return the number of variables written."""
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.warning("tracking buffer full: dropped {} variables".format(dropped))
+        if not events:
+            return 0
+        close_old_connections()
+        try:
+            write_events(events)
+        finally:
+            close_old_connections()
+        return len(events)
+
+
+tracking_buffer = TrackingBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    if tracking_buffer.pid == os.getpid():
+        try:
+            tracking_buffer.stop()
+        except Exception:
+            logger.exception("cannot write tracking variables at exit")
@@ -6,12 +6,12 @@ from calendar import monthrange
 
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
-from django.db.models import Q
 from django.utils import timezone
 from hs_core.models import BaseResource
 from theme.models import UserProfile
 
 from ... import models as hs_tracking
+from ... import rollup
 
 # Add logger for stderr messages.
 err = logging.getLogger('stats-command')
@@ -101,16 +101,12 @@ class Command(BaseCommand):
         self.print_var("monthly_orgs_counts", org_count, (start_date, end_date))
 
     def monthly_users_by_type(self, start_date, end_date):
+        sessions = rollup.activity_counts(hs_tracking.ActivityDailyStats.USER_TYPE,
+                                          start_date, end_date)
         user_types = UserProfile.objects.values('user_type').distinct()
         for ut in [_['user_type'] for _ in user_types]:
-            ut_users = User.objects.filter(userprofile__user_type=ut)
-            sessions = hs_tracking.Session.objects.filter(
-                Q(begin__gte=start_date) &
-                Q(begin__lte=end_date) &
-                Q(visitor__user__in=ut_users)
-            )
             self.print_var("active_{}".format(ut),
-                           sessions.count(), (end_date, start_date))
+                           sessions.get(ut, 0), (end_date, start_date))
 
     def users_details(self):
         w = csv.writer(sys.stdout)
@@ -242,6 +238,7 @@ class Command(BaseCommand):
         if options["users_details"]:
             self.users_details()
         if options["monthly_users_by_type"]:
+            rollup.update()
             for month_end in month_year_iter(start_date, end_date):
                 month_start = month_end.replace(day=1)
                 self.monthly_users_by_type(month_start, month_end)
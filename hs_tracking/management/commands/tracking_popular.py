@@ -2,7 +2,7 @@
 Check tracking functions for proper output.
 """
 from django.core.management.base import BaseCommand
-from hs_tracking.models import Variable
+from hs_tracking import rollup
 
 
 class Command(BaseCommand):
@@ -18,7 +18,8 @@ class Command(BaseCommand):
         days = options['days']
         n_resources = options['n_resources']
 
-        popular = Variable.popular_resources(days=days, n_resources=n_resources)
+        rollup.update()
+        popular = rollup.popular_resources(days=days, n_resources=n_resources)
         for v in popular:
             print("users={} short_id={}"
                   .format(v.users, v.short_id))
@@ -3,7 +3,7 @@ Check tracking functions for proper output.
 """
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from hs_tracking.models import Variable
+from hs_tracking import rollup
 
 
 class Command(BaseCommand):
@@ -27,7 +27,8 @@ class Command(BaseCommand):
             print("username '{}' not found".format(username))
             exit(1)
 
-        recent = Variable.recent_resources(user, days=days, n_resources=n_resources)
+        rollup.update()
+        recent = rollup.recent_resources(user, days=days, n_resources=n_resources)
         for v in recent:
             print("last_access={} short_id={}"
                   .format(v.last_accessed.strftime("%Y-%m-%d %H:%M:%S"),
@@ -0,0 +1,26 @@
+"""Bring the daily tracking rollup tables up to date; see hs_tracking/rollup.py.
+* By default, counts the variables recorded since the last run.
+* Optional argument --rebuild: empty the tables and count every variable again.
+"""
+
+from django.core.management.base import BaseCommand
+
+from hs_tracking.models import RollupMark
+from hs_tracking.rollup import MARK_NAME, rebuild, update
+
+
+class Command(BaseCommand):
+    help = "Update the daily rollups of tracking variables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', dest='rebuild',
+                            help='recount all variables from scratch')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild()
+        else:
+            count = update()
+        mark = RollupMark.objects.get(name=MARK_NAME)
+        print("{} variables counted; counted up to variable {}"
+              .format(count, mark.last_variable_id))
@@ -2,7 +2,7 @@
 Check tracking functions for proper output.
 """
 from django.core.management.base import BaseCommand
-from hs_tracking.models import Variable
+from hs_tracking import rollup
 from hs_core.models import BaseResource
 from hs_core.hydroshare import get_resource_by_shortkey
 
@@ -28,7 +28,8 @@ class Command(BaseCommand):
             print("resource '{}' not found".format(resource_id))
             exit(1)
 
-        recent = Variable.recent_users(resource,  days=days, n_users=n_users)
+        rollup.update()
+        recent = rollup.recent_users(resource, days=days, n_users=n_users)
         for v in recent:
             print("username={} last_access={}"
                   .format(v.username, v.last_accessed.strftime("%Y-%m-%d %H:%M:%S")))
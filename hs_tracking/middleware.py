@@ -83,8 +83,8 @@ class Tracking(object):
         rest = get_rest_from_url(request.path)
         landing = get_landing_from_url(request.path)
 
-        # save the activity in the database
-        session.record('visit', value=msg, resource_id=resource_id,
-                       landing=landing, rest=rest)
+        # save the activity in the database, through the buffer of hs_tracking/buffer.py
+        session.record_later('visit', value=msg, resource_id=resource_id,
+                             landing=landing, rest=rest)
 
         return response
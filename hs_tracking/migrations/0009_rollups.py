@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hs_tracking', '0008_variable_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityDailyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('dimension', models.CharField(choices=[('user_type', 'User type'), ('email_domain', 'Email domain')], max_length=16)),
+                ('key', models.CharField(max_length=1024)),
+                ('sessions', models.IntegerField(default=0)),
+                ('visits', models.IntegerField(default=0)),
+                ('downloads', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResourceDailyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('resource_id', models.CharField(max_length=32)),
+                ('visits', models.IntegerField(default=0)),
+                ('user_visits', models.IntegerField(default=0)),
+                ('landing_visits', models.IntegerField(default=0)),
+                ('rest_visits', models.IntegerField(default=0)),
+                ('downloads', models.IntegerField(default=0)),
+                ('last_accessed', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResourceUserDailyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('resource_id', models.CharField(max_length=32)),
+                ('visits', models.IntegerField(default=0)),
+                ('last_accessed', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupMark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True)),
+                ('last_variable_id', models.BigIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='activitydailystats',
+            unique_together=set([('dimension', 'key', 'date')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resourcedailystats',
+            unique_together=set([('resource_id', 'date')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='resourcedailystats',
+            index_together=set([('date', 'resource_id')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resourceuserdailystats',
+            unique_together=set([('resource_id', 'user', 'date')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='resourceuserdailystats',
+            index_together=set([('user', 'date')]),
+        ),
+    ]
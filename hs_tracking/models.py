@@ -3,14 +3,17 @@ from datetime import datetime, timedelta
 from django.db import models
 from django.db.models import F
 from django.core import signing
+from django.core.cache import cache
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.contrib.auth.models import User
+from django.utils.timezone import now
 
 from theme.models import UserProfile
 from utils import get_std_log_fields
 from hs_core.models import BaseResource
 from hs_core.hydroshare import get_resource_by_shortkey
+from hs_tracking import buffer
 
 SESSION_TIMEOUT = settings.TRACKING_SESSION_TIMEOUT
 PROFILE_FIELDS = settings.TRACKING_PROFILE_FIELDS
@@ -21,6 +24,10 @@ if set(PROFILE_FIELDS) & set(USER_FIELDS):
                                " overlapping field names")
 
 
+def _session_cache_key(session_id):
+    return 'hs_tracking:session:{}'.format(session_id)
+
+
 class SessionManager(models.Manager):
     def for_request(self, request, user=None):
         if hasattr(request, 'user'):
@@ -32,11 +39,18 @@ class SessionManager(models.Manager):
             cut_off = datetime.now() - timedelta(seconds=SESSION_TIMEOUT)
             session = None
 
-            try:
-                session = Session.objects.filter(
-                    variable__timestamp__gte=cut_off).filter(id=tracking_id['id']).first()
-            except Session.DoesNotExist:
-                pass
+            # sessions recently recorded are cached with the time of their last variable,
+            # which may still be in the tracking buffer
+            cached = cache.get(_session_cache_key(tracking_id['id']))
+            if cached is not None and cached[1] >= cut_off:
+                session = cached[0]
+            else:
+                try:
+                    session = Session.objects.filter(
+                        variable__timestamp__gte=cut_off).filter(id=tracking_id['id'])\
+                        .select_related('visitor__user__userprofile').first()
+                except Session.DoesNotExist:
+                    pass
 
             if session is not None and user is not None:
                 if session.visitor.user is None and user.is_authenticated():
@@ -108,6 +122,14 @@ class Session(models.Model):
         args = (self,) + args
         return Variable.record(*args, **kwargs)
 
+    def record_later(self, *args, **kwargs):
+        args = (self,) + args
+        return Variable.record_later(*args, **kwargs)
+
+    def mark_active(self):
+        """Cache this session for for_request() as active now."""
+        cache.set(_session_cache_key(self.id), (self, datetime.now()), SESSION_TIMEOUT)
+
 
 class Variable(models.Model):
     TYPES = (
@@ -126,7 +148,8 @@ class Variable(models.Model):
     from hs_core.models import BaseResource
 
     session = models.ForeignKey(Session, related_name='variable')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # not auto_now_add, so that buffered variables keep the time they were recorded
+    timestamp = models.DateTimeField(default=now, editable=False)
     name = models.CharField(max_length=32)
     type = models.IntegerField(choices=TYPE_CHOICES)
     # change value to TextField to be less restrictive as max_length of CharField has been
@@ -170,13 +193,32 @@ class Variable(models.Model):
                 resource = get_resource_by_shortkey(resource_id, or_404=False)
             except BaseResource.DoesNotExist:
                 resource = None
-        return Variable.objects.create(session=session, name=name,
-                                       type=cls.encode_type(value),
-                                       value=cls.encode(value),
-                                       last_resource_id=resource_id,
-                                       resource=resource,
-                                       rest=rest,
-                                       landing=landing)
+        variable = Variable.objects.create(session=session, name=name,
+                                           type=cls.encode_type(value),
+                                           value=cls.encode(value),
+                                           last_resource_id=resource_id,
+                                           resource=resource,
+                                           rest=rest,
+                                           landing=landing)
+        session.mark_active()
+        return variable
+
+    @classmethod
+    def record_later(cls, session, name, value=None, resource=None, resource_id=None,
+                     rest=False, landing=False):
+        """Record a variable through the tracking buffer; see hs_tracking/buffer.py.
+
+        The variable is written within TRACKING_BUFFER_FLUSH_INTERVAL seconds, with its
+        resource looked up then.  Returns None, or the Variable if buffering is off.
+        """
+        if not buffer.is_buffered():
+            return cls.record(session, name, value=value, resource=resource,
+                              resource_id=resource_id, rest=rest, landing=landing)
+        buffer.tracking_buffer.push(buffer.Event(
+            session_id=session.id, timestamp=now(), name=name, type=cls.encode_type(value),
+            value=cls.encode(value), resource_pk=resource.pk if resource is not None else None,
+            last_resource_id=resource_id, rest=rest, landing=landing))
+        session.mark_active()
 
     @classmethod
     def encode(cls, value):
@@ -284,3 +326,64 @@ class Variable(models.Model):
             .annotate(last_accessed=models.Max('visitor__session__variable__timestamp'))\
             .filter(visitor__session__variable__timestamp=F('last_accessed'))\
             .order_by('-last_accessed')[:n_users]
+
+
+# Daily rollups of Variable, written by hs_tracking.rollup and read by the reports
+
+class RollupMark(models.Model):
+    """The id of the last Variable counted in the rollup tables."""
+    name = models.CharField(max_length=32, unique=True)
+    last_variable_id = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+
+class ResourceDailyStats(models.Model):
+    """Activity on one resource on one day.
+
+    Resources are identified by short_id so that the counts outlive deleted resources.
+    """
+    date = models.DateField()
+    resource_id = models.CharField(max_length=32)
+    visits = models.IntegerField(default=0)
+    user_visits = models.IntegerField(default=0)  # visits by authenticated users
+    landing_visits = models.IntegerField(default=0)
+    rest_visits = models.IntegerField(default=0)
+    downloads = models.IntegerField(default=0)
+    last_accessed = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = ('resource_id', 'date')
+        index_together = [['date', 'resource_id']]
+
+
+class ResourceUserDailyStats(models.Model):
+    """Visits of an authenticated user to one resource on one day."""
+    date = models.DateField()
+    resource_id = models.CharField(max_length=32)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    visits = models.IntegerField(default=0)
+    last_accessed = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('resource_id', 'user', 'date')
+        index_together = [['user', 'date']]
+
+
+class ActivityDailyStats(models.Model):
+    """Sessions, visits and downloads on one day by the users of a user type or email domain.
+
+    Users are classified by their current profile; anonymous activity has an empty key.
+    """
+    USER_TYPE = 'user_type'
+    EMAIL_DOMAIN = 'email_domain'
+    DIMENSION_CHOICES = ((USER_TYPE, 'User type'), (EMAIL_DOMAIN, 'Email domain'))
+
+    date = models.DateField()
+    dimension = models.CharField(max_length=16, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=1024)
+    sessions = models.IntegerField(default=0)
+    visits = models.IntegerField(default=0)
+    downloads = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('dimension', 'key', 'date')
@@ -0,0 +1,256 @@
+"""Daily rollups of tracking variables for the reports.
+
+The reports of the stats, tracking_popular, tracking_resources and tracking_users commands
+used to scan the Variable table, which gains a row per page view.  update() instead counts
+new variables once into daily summary tables (see the models below RollupMark):
+
+* ResourceDailyStats: visits, landing page, REST and authenticated visits, and downloads of
+  each resource;
+* ResourceUserDailyStats: visits of each authenticated user to each resource;
+* ActivityDailyStats: sessions, visits and downloads by user type and by email domain.
+
+RollupMark keeps the id of the last variable counted, so every run reads only the variables
+recorded since.  Variables are only counted once they are TRACKING_ROLLUP_SETTLE seconds old,
+so that those still in a tracking buffer (hs_tracking/buffer.py) or in an uncommitted
+transaction when a run starts are not skipped; the reports therefore lag by that much plus
+TRACKING_ROLLUP_INTERVAL, the period of hs_tracking.tasks.update_tracking_rollups.
+
+The management command tracking_rollup runs update() on demand, or rebuilds the tables.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.utils.timezone import now
+
+from hs_core.models import BaseResource
+from hs_tracking.models import ActivityDailyStats, ResourceDailyStats, \
+    ResourceUserDailyStats, RollupMark, Variable
+
+logger = logging.getLogger(__name__)
+
+MARK_NAME = 'daily'
+
+
+def _email_domain(email):
+    # as utils.get_user_email_domain
+    return '.'.join(email.split('@')[-1].split('.')[1:])
+
+
+class _Counts(object):
+    """Counters of one batch of variables, keyed as the rows of the rollup tables."""
+
+    def __init__(self):
+        self.resources = defaultdict(lambda: defaultdict(int))
+        self.resource_users = defaultdict(lambda: defaultdict(int))
+        self.activity = defaultdict(lambda: defaultdict(int))
+
+    def add(self, v, user_type, email_domain):
+        date = v['timestamp'].date()
+        resource_id = v['resource__short_id'] or v['last_resource_id']
+        user_id = v['session__visitor__user_id']
+        name = v['name']
+
+        if name == 'begin_session':
+            field = 'sessions'
+        elif name == 'visit':
+            field = 'visits'
+        elif name == 'download':
+            field = 'downloads'
+        else:
+            return
+
+        activity = [(ActivityDailyStats.USER_TYPE, user_type or ''),
+                    (ActivityDailyStats.EMAIL_DOMAIN, email_domain or '')]
+        for dimension, key in activity:
+            self.activity[(dimension, key, date)][field] += 1
+
+        if resource_id is None or field == 'sessions':
+            return
+        counts = self.resources[(resource_id, date)]
+        counts[field] += 1
+        if field == 'visits':
+            counts['landing_visits'] += v['landing']
+            counts['rest_visits'] += v['rest']
+            _latest(counts, v['timestamp'])
+            if user_id is not None:
+                counts['user_visits'] += 1
+                user_counts = self.resource_users[(resource_id, user_id, date)]
+                user_counts['visits'] += 1
+                _latest(user_counts, v['timestamp'])
+
+
+def _latest(counts, timestamp):
+    if counts.get('last_accessed') is None or counts['last_accessed'] < timestamp:
+        counts['last_accessed'] = timestamp
+
+
+def _merge(model, key_fields, counts):
+    """Add counts, a dict of {key tuple: {field: count}}, to the rows of model."""
+    if not counts:
+        return
+    dates = set(key[-1] for key in counts)
+    first = set(key[0] for key in counts)
+    existing = {}
+    for row in model.objects.filter(date__in=dates, **{key_fields[0] + '__in': first}):
+        existing[tuple(getattr(row, f) for f in key_fields)] = row
+
+    new_rows = []
+    for key, fields in counts.items():
+        row = existing.get(key)
+        if row is None:
+            row = model(**dict(zip(key_fields, key)))
+            new_rows.append(row)
+        for field, value in fields.items():
+            if field == 'last_accessed':
+                if row.last_accessed is None or row.last_accessed < value:
+                    row.last_accessed = value
+            else:
+                setattr(row, field, getattr(row, field) + value)
+        if row.pk is not None:
+            row.save()
+    model.objects.bulk_create(new_rows)
+
+
+def update(batch_size=None):
+    """Count the variables recorded since the last run; return the number counted."""
+    if batch_size is None:
+        batch_size = getattr(settings, 'TRACKING_ROLLUP_BATCH', 10000)
+    settle = getattr(settings, 'TRACKING_ROLLUP_SETTLE', 300)
+    RollupMark.objects.get_or_create(name=MARK_NAME)
+
+    last_id = Variable.objects.filter(timestamp__lt=now() - timedelta(seconds=settle))\
+        .aggregate(models.Max('id'))['id__max']
+    total = 0
+    while last_id is not None:
+        with transaction.atomic():
+            # concurrent runs wait here, then carry on from where the other stopped
+            mark = RollupMark.objects.select_for_update().get(name=MARK_NAME)
+            variables = list(
+                Variable.objects.filter(id__gt=mark.last_variable_id, id__lte=last_id)
+                .order_by('id')
+                .values('id', 'timestamp', 'name', 'landing', 'rest', 'last_resource_id',
+                        'resource__short_id', 'session__visitor__user_id')[:batch_size])
+            if not variables:
+                break
+
+            user_ids = set(v['session__visitor__user_id'] for v in variables) - {None}
+            users = dict((u['id'], (u['userprofile__user_type'], _email_domain(u['email'])))
+                         for u in User.objects.filter(id__in=user_ids)
+                         .values('id', 'email', 'userprofile__user_type'))
+            counts = _Counts()
+            for v in variables:
+                user_type, email_domain = users.get(v['session__visitor__user_id'],
+                                                    (None, None))
+                counts.add(v, user_type, email_domain)
+
+            _merge(ResourceDailyStats, ('resource_id', 'date'), counts.resources)
+            _merge(ResourceUserDailyStats, ('resource_id', 'user_id', 'date'),
+                   counts.resource_users)
+            _merge(ActivityDailyStats, ('dimension', 'key', 'date'), counts.activity)
+
+            mark.last_variable_id = variables[-1]['id']
+            mark.save()
+            total += len(variables)
+    return total
+
+
+def rebuild():
+    """Empty the rollup tables and count every variable again."""
+    with transaction.atomic():
+        ResourceDailyStats.objects.all().delete()
+        ResourceUserDailyStats.objects.all().delete()
+        ActivityDailyStats.objects.all().delete()
+        RollupMark.objects.filter(name=MARK_NAME).update(last_variable_id=0)
+    return update()
+
+
+# reports
+
+def _since(days, today=None):
+    if today is None:
+        today = now()
+    return (today - timedelta(days)).date(), today.date()
+
+
+def popular_resources(n_resources=5, days=60, today=None):
+    """Return the resources most visited by authenticated users in the last days.
+
+    As Variable.popular_resources, each resource is annotated with users (the number of
+    such visits), public, discoverable, published and last_accessed.
+    """
+    start, end = _since(days, today)
+    stats = ResourceDailyStats.objects.filter(date__gte=start, date__lte=end, user_visits__gt=0)\
+        .values('resource_id')\
+        .annotate(users=models.Sum('user_visits'), last_accessed=models.Max('last_accessed'))\
+        .order_by('-users', 'resource_id')
+    return _resources(stats, n_resources)
+
+
+def recent_resources(user, n_resources=5, days=60):
+    """Return the resources that user visited last in the last days, as
+    Variable.recent_resources does."""
+    start, _ = _since(days)
+    stats = ResourceUserDailyStats.objects.filter(user=user, date__gte=start)\
+        .values('resource_id')\
+        .annotate(last_accessed=models.Max('last_accessed'))\
+        .order_by('-last_accessed')
+    return _resources(stats, n_resources)
+
+
+def _resources(stats, n_resources):
+    """Return the existing resources of rows of stats, in order, with their annotations."""
+    found = []
+    offset = 0
+    # resources that no longer exist are skipped; look further for as many as are asked for
+    while len(found) < n_resources:
+        rows = list(stats[offset:offset + n_resources])
+        if not rows:
+            break
+        offset += len(rows)
+        resources = BaseResource.objects.filter(short_id__in=[r['resource_id'] for r in rows])\
+            .select_related('raccess')
+        by_id = dict((r.short_id, r) for r in resources)
+        for row in rows:
+            resource = by_id.get(row['resource_id'])
+            if resource is None:
+                continue
+            resource.public = resource.raccess.public
+            resource.discoverable = resource.raccess.discoverable
+            resource.published = resource.raccess.published
+            for field, value in row.items():
+                if field != 'resource_id':
+                    setattr(resource, field, value)
+            found.append(resource)
+    return found[:n_resources]
+
+
+def recent_users(resource, n_users=5, days=60):
+    """Return the users who visited resource last in the last days, as
+    Variable.recent_users does."""
+    start, _ = _since(days)
+    rows = list(ResourceUserDailyStats.objects.filter(resource_id=resource.short_id,
+                                                      date__gte=start)
+                .values('user_id')
+                .annotate(last_accessed=models.Max('last_accessed'))
+                .order_by('-last_accessed')[:n_users])
+    users = User.objects.in_bulk([r['user_id'] for r in rows])
+    recent = []
+    for row in rows:
+        user = users[row['user_id']]
+        user.last_accessed = row['last_accessed']
+        recent.append(user)
+    return recent
+
+
+def activity_counts(dimension, start_date, end_date, field='sessions'):
+    """Return {key: count} of field for the days from start_date to end_date inclusive."""
+    return dict(ActivityDailyStats.objects
+                .filter(dimension=dimension, date__gte=start_date, date__lte=end_date)
+                .values('key')
+                .annotate(count=models.Sum(field))
+                .values_list('key', 'count'))
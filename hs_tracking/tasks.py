@@ -0,0 +1,25 @@
+import logging
+from datetime import timedelta
+
+from celery.task import periodic_task
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+@periodic_task(ignore_result=True,
+               run_every=timedelta(seconds=getattr(settings, 'TRACKING_ROLLUP_INTERVAL', 900)))
+def update_tracking_rollups():
+    """Count new tracking variables into the daily rollup tables of hs_tracking.rollup."""
+    from hs_tracking.rollup import update
+
+    lock_id = 'hs_tracking.tasks.update_tracking_rollups'
+    if not cache.add(lock_id, 'locked', 60 * 60):
+        return
+    try:
+        count = update()
+        if __debug__:
+            logger.debug("tracking rollups: {} variables counted".format(count))
+    finally:
+        cache.delete(lock_id)
@@ -1,6 +1,7 @@
 from django.test import TestCase
 from django.contrib.auth.models import Group
-from hs_tracking.models import Variable
+from hs_tracking import rollup
+from hs_tracking.models import ResourceDailyStats, Variable
 from hs_core import hydroshare
 from rest_framework import status
 import socket
@@ -94,3 +95,28 @@ class TestDashboard(TestCase):
         self.assertEqual(one.last_resource_id, self.holes.short_id)
         self.assertEqual(one.landing, True)
         self.assertEqual(one.rest, False)
+
+    def test_rollup(self):
+        """ rollups count each view once and answer the reports """
+
+        url = self.resource_url.format(res_id=self.holes.short_id)
+        self.client.get(url)
+        self.client.get(url)
+
+        with self.settings(TRACKING_ROLLUP_SETTLE=0):
+            self.assertEqual(rollup.update(), Variable.objects.count())
+            self.assertEqual(rollup.update(), 0)
+
+        stats = ResourceDailyStats.objects.get(resource_id=self.holes.short_id)
+        self.assertEqual(stats.visits, 2)
+        self.assertEqual(stats.user_visits, 2)
+        self.assertEqual(stats.landing_visits, 2)
+
+        recent = rollup.recent_resources(self.dog)
+        self.assertEqual([r.short_id for r in recent], [self.holes.short_id])
+        self.assertEqual(recent[0].public, False)
+        self.assertEqual([u.username for u in rollup.recent_users(self.holes)], ['dog'])
+
+        # visits of today count
+        popular = rollup.popular_resources()
+        self.assertEqual([(r.short_id, r.users) for r in popular], [(self.holes.short_id, 2)])
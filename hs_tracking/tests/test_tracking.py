@@ -6,8 +6,10 @@ from django.test import TestCase
 from django.contrib.auth.models import User
 from django.test import Client
 from django.http import HttpRequest, QueryDict, response
+from django.utils.timezone import now
 from mock import patch, Mock
 
+from hs_tracking import buffer
 from hs_tracking.models import Variable, Session, Visitor, SESSION_TIMEOUT, VISITOR_FIELDS
 from hs_tracking.views import AppLaunch
 import hs_tracking.utils as utils
@@ -148,6 +150,38 @@ class TrackingTests(TestCase):
     def test_record_bad_value(self):
         self.assertRaises(TypeError, self.session.record, 'bad', ['oh no i cannot handle arrays'])
 
+    def test_tracking_buffer(self):
+        tracking_buffer = buffer.TrackingBuffer(background=False)
+        with patch('hs_tracking.buffer.tracking_buffer', tracking_buffer), \
+                patch('hs_tracking.buffer.is_buffered', return_value=True):
+            self.assertIsNone(self.session.record_later('visit', 'first', resource_id='0' * 32))
+            self.session.record_later('visit', 'second', landing=True)
+            self.assertEqual(Variable.objects.filter(name='visit').count(), 0)
+
+            self.assertEqual(tracking_buffer.flush(), 2)
+            self.assertEqual(tracking_buffer.flush(), 0)
+
+        first, second = Variable.objects.filter(name='visit').order_by('timestamp')
+        self.assertEqual(first.get_value(), 'first')
+        self.assertEqual(first.last_resource_id, '0' * 32)
+        self.assertIsNone(first.resource)
+        self.assertEqual(first.session_id, self.session.id)
+        self.assertTrue(second.landing)
+
+    def test_tracking_buffer_drop_policy(self):
+        def events(tracking_buffer):
+            for value in ('a', 'b', 'c'):
+                tracking_buffer.push(buffer.Event(self.session.id, now(), 'visit', 2, value,
+                                                  None, None, False, False))
+            return [e.value for e in tracking_buffer.events]
+
+        with self.settings(TRACKING_BUFFER_MAX_SIZE=2, TRACKING_BUFFER_DROP_POLICY='oldest'):
+            self.assertEqual(events(buffer.TrackingBuffer(background=False)), ['b', 'c'])
+        with self.settings(TRACKING_BUFFER_MAX_SIZE=2, TRACKING_BUFFER_DROP_POLICY='newest'):
+            tracking_buffer = buffer.TrackingBuffer(background=False)
+            self.assertEqual(events(tracking_buffer), ['a', 'b'])
+        self.assertEqual(tracking_buffer.dropped, 1)
+
     def test_get(self):
         v = Variable(name='foo', value='0', type=3)
         pprint(v)
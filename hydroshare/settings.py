@@ -482,6 +482,30 @@ HAYSTACK_CONNECTIONS = {
 }
 HAYSTACK_SIGNAL_PROCESSOR = "hs_core.hydro_realtime_signal_processor.HydroRealtimeSignalProcessor"
 
+# Resource saves queue SOLR updates, which hs_core.tasks.process_solr_index_queue pushes to
+# SOLR in batches. See hs_core/solr_queue.py.
+SOLR_INDEX_DEFERRED = True
+SOLR_INDEX_QUEUE_INTERVAL = 30  # seconds between runs of the queue task
+SOLR_INDEX_QUEUE_SETTLE = 10  # seconds a resource must go unchanged before it is indexed
+SOLR_INDEX_QUEUE_BATCH = 100  # resources per bulk SOLR update
+SOLR_INDEX_QUEUE_MAX_DEPTH = 10000  # beyond this many pending entries, saves index directly
+SOLR_INDEX_MAX_ATTEMPTS = 5  # failing resources stay queued for inspection after this
+
+# REST resource listing: pages larger than this are streamed, converting this many at a time
+HS_RESOURCE_LIST_STREAM_THRESHOLD = 500
+HS_RESOURCE_LIST_STREAM_CHUNK = 100
+
+# build file browser folder listings from the Django file table alone, without iRODS
+HS_FOLDER_LISTING_FROM_DB = False
+
+# update bags in place, rewriting only changed files; see hs_core/hydroshare/incremental_bag.py
+HS_BAG_INCREMENTAL = True
+HS_BAG_COMPACT_RATIO = 0.5  # rebuild a bag once this fraction of it is superseded members
+
+# stream zipped folder and bag downloads instead of zipping them in a task; a request may
+# opt out with the parameter streaming=false.  See django_irods/zip_download.py
+HS_STREAMING_ZIP = False
+
 
 # customized value for password reset token, email verification and group invitation link token
 # to expire in 7 days
@@ -574,6 +598,33 @@ LOGGING = {
 TRACKING_SESSION_TIMEOUT = 60 * 15
 TRACKING_PROFILE_FIELDS = ["title", "user_type", "subject_areas", "public", "state", "country"]
 TRACKING_USER_FIELDS = ["username", "email", "first_name", "last_name"]
+# visits are written in batches by a thread per process. See hs_tracking/buffer.py.
+TRACKING_BUFFERED = True
+TRACKING_BUFFER_MAX_SIZE = 10000  # variables held before dropping
+TRACKING_BUFFER_FLUSH_SIZE = 500  # variables that trigger a write
+TRACKING_BUFFER_FLUSH_INTERVAL = 5  # seconds between writes
+TRACKING_BUFFER_DROP_POLICY = 'oldest'  # or 'newest': what to drop when full
+# tracking reports read daily rollups of the variables. See hs_tracking/rollup.py.
+TRACKING_ROLLUP_INTERVAL = 60 * 15  # seconds between runs of the rollup task
+TRACKING_ROLLUP_SETTLE = 60 * 5  # seconds before a variable is counted
+TRACKING_ROLLUP_BATCH = 10000  # variables counted per transaction
+# seconds between recomputations of the site metrics snapshot. See hs_metrics/snapshot.py.
+HS_METRICS_REFRESH_INTERVAL = 60 * 60
+# precomputed pages of the resource sitemap. See hs_sitemap/resource_pages.py.
+HS_SITEMAP_PAGE_SIZE = 10000  # resource ids per page; the protocol allows 50000 urls
+HS_SITEMAP_INTERVAL = 60 * 10  # seconds between updates of the pages
+# resource files of unknown size are sized in the background. See hs_core.tasks.
+FILE_SIZE_BACKFILL_INTERVAL = 60 * 60  # seconds between runs of backfill_file_sizes
+FILE_SIZE_BACKFILL_BATCH = 100  # resources sized per run
+# authorization decisions of users over resources are shared between requests for this many
+# seconds; 0 keeps them per request only. A positive value requires a CACHES backend shared
+# by all web and celery processes (memcached, redis, ...) and is ignored with LocMemCache.
+# See hs_access_control.privilege_cache.
+PRIVILEGE_CACHE_TIMEOUT = 0
+# the parts of resource landing pages that do not depend upon the viewer are cached for this
+# many seconds; 0 disables the cache. A positive value requires a CACHES backend shared by all
+# web and celery processes and is ignored with LocMemCache. See hs_core.landing_page_cache.
+LANDING_PAGE_CACHE_TIMEOUT = 0
 
 # info django that a reverse proxy sever (nginx) is handling ssl/https for it
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
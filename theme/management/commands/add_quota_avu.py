@@ -38,11 +38,9 @@ class Command(BaseCommand):
                 # Now reset the quota system by setting the AVU 'resetQuotaDir' to anything
                 istorage = res.get_irods_storage()
                 # Add a specific AVU to invoke quota recalculation
-                istorage.session.run("imeta", None, 'set', '-C', res.root_path,
-                                     'resetQuotaDir', '0')
+                istorage.setAVU(res.root_path, 'resetQuotaDir', '0')
                 # Now remove that AVU to clean up; this is not part of the resource API
-                istorage.session.run("imeta", None, 'rm', '-C', res.root_path,
-                                     'resetQuotaDir', '0')
+                istorage.removeAVU(res.root_path, 'resetQuotaDir', '0')
 
             except SessionException as ex:
                 # this is needed for migration testing where some resources copied from www
@@ -1,8 +1,6 @@
-from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
 
-from theme.models import UserQuota
-from hs_core.tasks import update_quota_usage_task
+from hs_core.quota_sync import sync_usage
 
 
 class Command(BaseCommand):
@@ -13,6 +11,5 @@ class Command(BaseCommand):
            "brought in sync with iRODS quota AVUs"
 
     def handle(self, *args, **options):
-        for u in User.objects.all():
-            if UserQuota.objects.filter(user=u).exists() and u.is_active and not u.is_superuser:
-                update_quota_usage_task(u.username)
+        updated = sync_usage()
+        print("Updated the used storage of {} users".format(updated))